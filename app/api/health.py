@@ -6,6 +6,7 @@ from typing import Dict, Any
 from app.models.base import APIResponse, HealthCheckResponse
 from config.settings import settings
 from app.utils.logger import get_logger
+from app.services.database_service import database_service
 
 logger = get_logger(__name__)
 router = APIRouter()
@@ -52,8 +53,8 @@ async def detailed_health_check():
             },
             "database": {
                 "status": "healthy",
-                "type": "json",
-                "path": settings.json_database_path
+                "type": getattr(settings, "database_backend", "json"),
+                "path": str(database_service.get_database().db_path)
             },
             "external_services": {
                 "qwen_api": {
@@ -83,7 +83,7 @@ async def process_task_request(request: TaskRequest):
 async def get_chat_history(session_id: str = Path(..., description="会话ID")):
     """获取聊天历史"""
     try:
-        history = qwen_agent_service.get_chat_history(session_id)
+        history = await qwen_agent_service.get_chat_history(session_id)
         
         return APIResponse.success_response(
             data={
@@ -102,7 +102,7 @@ async def get_chat_history(session_id: str = Path(..., description="会话ID")):
 async def get_user_sessions(user_id: str = Path(..., description="用户ID")):
     """获取用户的所有会话"""
     try:
-        sessions = qwen_agent_service.get_user_sessions(user_id)
+        sessions = await qwen_agent_service.get_user_sessions(user_id)
         
         return APIResponse.success_response(
             data={
@@ -121,7 +121,7 @@ async def get_user_sessions(user_id: str = Path(..., description="用户ID")):
 async def close_session(session_id: str = Path(..., description="会话ID")):
     """关闭会话"""
     try:
-        success = qwen_agent_service.close_session(session_id)
+        success = await qwen_agent_service.close_session(session_id)
         
         if success:
             return APIResponse.success_response(
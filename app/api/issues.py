@@ -5,6 +5,7 @@ from fastapi import APIRouter, HTTPException, Query, Path
 from typing import List, Optional
 from app.models.base import APIResponse, PaginationParams, PaginationResponse
 from app.models.issue import Issue, IssueCreate, IssueUpdate, IssueResponse
+from app.services.issue_service import issue_service
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -19,16 +20,21 @@ async def get_issues(
     project_id: Optional[str] = Query(None, description="项目ID"),
     category: Optional[str] = Query(None, description="问题类别"),
     severity: Optional[str] = Query(None, description="严重程度"),
-    status: Optional[str] = Query(None, description="问题状态")
+    status: Optional[str] = Query(None, description="问题状态"),
+    sort: Optional[str] = Query(None, description="排序字段，多个字段用逗号分隔，前缀-表示降序")
 ):
     """获取问题列表"""
     try:
-        # TODO: 实现从数据库获取问题列表的逻辑
-        # 这里先返回模拟数据
-        issues = []
-        
-        # 模拟分页
-        total = len(issues)
+        filters = {
+            "project_id": project_id,
+            "category": category,
+            "severity": severity,
+            "status": status
+        }
+        filters = {key: value for key, value in filters.items() if value is not None}
+        issues, total = issue_service.get_issues_page(
+            filters=filters, search=search, page=page, page_size=page_size, sort=sort
+        )
         pagination = PaginationResponse.create(total, page, page_size)
         
         return APIResponse.success_response(
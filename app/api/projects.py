@@ -8,6 +8,7 @@ from app.models.project import (
     Project, ProjectCreate, ProjectUpdate, ProjectResponse, 
     ProjectSummary, ProjectStatistics
 )
+from app.services.project_service import project_service
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -21,16 +22,20 @@ async def get_projects(
     search: Optional[str] = Query(None, description="搜索关键词"),
     status: Optional[str] = Query(None, description="项目状态"),
     project_type: Optional[str] = Query(None, description="项目类型"),
-    priority: Optional[str] = Query(None, description="优先级")
+    priority: Optional[str] = Query(None, description="优先级"),
+    sort: Optional[str] = Query(None, description="排序字段，多个字段用逗号分隔，前缀-表示降序")
 ):
     """获取项目列表"""
     try:
-        # TODO: 实现从数据库获取项目列表的逻辑
-        # 这里先返回模拟数据
-        projects = []
-        
-        # 模拟分页
-        total = len(projects)
+        filters = {
+            "status": status,
+            "project_type": project_type,
+            "priority": priority
+        }
+        filters = {key: value for key, value in filters.items() if value is not None}
+        projects, total = project_service.get_projects_page(
+            filters=filters, search=search, page=page, page_size=page_size, sort=sort
+        )
         pagination = PaginationResponse.create(total, page, page_size)
         
         return APIResponse.success_response(
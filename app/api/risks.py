@@ -5,6 +5,7 @@ from fastapi import APIRouter, HTTPException, Query, Path
 from typing import List, Optional
 from app.models.base import APIResponse, PaginationParams, PaginationResponse
 from app.models.risk import Risk, RiskCreate, RiskUpdate, RiskResponse
+from app.services.risk_service import risk_service
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -19,16 +20,21 @@ async def get_risks(
     project_id: Optional[str] = Query(None, description="项目ID"),
     category: Optional[str] = Query(None, description="风险类别"),
     risk_level: Optional[str] = Query(None, description="风险等级"),
-    status: Optional[str] = Query(None, description="风险状态")
+    status: Optional[str] = Query(None, description="风险状态"),
+    sort: Optional[str] = Query(None, description="排序字段，多个字段用逗号分隔，前缀-表示降序")
 ):
     """获取风险列表"""
     try:
-        # TODO: 实现从数据库获取风险列表的逻辑
-        # 这里先返回模拟数据
-        risks = []
-        
-        # 模拟分页
-        total = len(risks)
+        filters = {
+            "project_id": project_id,
+            "category": category,
+            "risk_level": risk_level,
+            "status": status
+        }
+        filters = {key: value for key, value in filters.items() if value is not None}
+        risks, total = risk_service.get_risks_page(
+            filters=filters, search=search, page=page, page_size=page_size, sort=sort
+        )
         pagination = PaginationResponse.create(total, page, page_size)
         
         return APIResponse.success_response(
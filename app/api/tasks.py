@@ -8,6 +8,7 @@ from app.models.task import (
     Task, TaskCreate, TaskUpdate, TaskResponse, 
     TaskSummary, TaskStatistics
 )
+from app.services.task_service import task_service
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -22,16 +23,21 @@ async def get_tasks(
     project_id: Optional[str] = Query(None, description="项目ID"),
     status: Optional[str] = Query(None, description="任务状态"),
     assigned_to: Optional[str] = Query(None, description="分配给"),
-    priority: Optional[str] = Query(None, description="优先级")
+    priority: Optional[str] = Query(None, description="优先级"),
+    sort: Optional[str] = Query(None, description="排序字段，多个字段用逗号分隔，前缀-表示降序")
 ):
     """获取任务列表"""
     try:
-        # TODO: 实现从数据库获取任务列表的逻辑
-        # 这里先返回模拟数据
-        tasks = []
-        
-        # 模拟分页
-        total = len(tasks)
+        filters = {
+            "project_id": project_id,
+            "status": status,
+            "assigned_to": assigned_to,
+            "priority": priority
+        }
+        filters = {key: value for key, value in filters.items() if value is not None}
+        tasks, total = task_service.get_tasks_page(
+            filters=filters, search=search, page=page, page_size=page_size, sort=sort
+        )
         pagination = PaginationResponse.create(total, page, page_size)
         
         return APIResponse.success_response(
@@ -6,11 +6,15 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
+import os
 import time
 from typing import Dict, Any
 
 from config.settings import settings
 from app.utils.logger import get_logger
+from app.services.database_service import database_service
+from app.services.metric_history import metric_history_service
+from app.services.rag_system import rag_system
 from app.api import health, projects, tasks, risks, issues, auto_task_capture, intelligent_progress_summary, risk_monitoring, report_generator, intelligent_chat, ai_analysis, cache_management, monitoring
 from app.models.base import APIResponse, HealthCheckResponse
 
@@ -29,13 +33,20 @@ async def lifespan(app: FastAPI):
     # 初始化数据库等资源
     # TODO: 在这里添加数据库初始化等逻辑
     
+    # 加载PMBOK知识库：嵌入索引缺失时在后台构建，不阻塞启动与首个检索请求
+    pmbok_dir = getattr(settings, "pmbok_dir", "PMBOK第七版中英文资料")
+    if os.path.isdir(pmbok_dir):
+        rag_system.load_pmbok_documents(pmbok_dir)
+    
     logger.info("应用启动完成")
     
     yield
     
     # 关闭时执行
     logger.info("应用关闭中...")
-    # TODO: 在这里添加清理逻辑
+    # 先写入指标历史缓冲区中的采样，再关闭数据库
+    metric_history_service.close()
+    database_service.close()
     logger.info("应用关闭完成")
 
 
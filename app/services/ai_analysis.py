@@ -8,6 +8,8 @@ from dataclasses import dataclass, asdict
 from app.models.enums import TaskStatus, RiskLevel, IssueCategory
 from app.utils.logger import get_logger
 from app.services.database_service import database_service
+from app.services.project_aggregates import project_aggregate_service
+from app.services.metric_history import metric_history_service
 from app.services.qwen_agent import qwen_agent_service
 
 logger = get_logger(__name__)
@@ -55,6 +57,7 @@ class AIAnalysisService:
     def __init__(self):
         """初始化服务"""
         self.db = database_service.get_database()
+        self.async_db = database_service.get_async_database()
         logger.info("智能分析服务初始化完成")
     
     async def analyze_project_trends(self, project_id: str, days: int = 30) -> List[TrendAnalysis]:
@@ -93,19 +96,20 @@ class AIAnalysisService:
     async def _analyze_task_completion_trend(self, project_id: str, days: int) -> Optional[TrendAnalysis]:
         """分析任务完成趋势"""
         try:
-            # 获取任务数据
-            tasks = self.db.get_by_field("tasks", "project_id", project_id)
+            # 读取项目聚合统计
+            aggregate = project_aggregate_service.get(project_id)
             
-            if not tasks:
+            if aggregate.task_total == 0:
                 return None
             
             # 计算当前完成率
-            total_tasks = len(tasks)
-            completed_tasks = len([t for t in tasks if t.get("status") == "已完成"])
+            total_tasks = aggregate.task_total
+            completed_tasks = aggregate.task_status["已完成"]
             current_completion_rate = (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0
             
-            # 模拟历史数据（实际项目中应该从历史记录获取）
-            previous_completion_rate = max(0, current_completion_rate - 10)
+            # 读取days天前的历史完成率
+            previous_completion_rate = metric_history_service.previous_value(
+                project_id, "completion_rate", days, current_completion_rate)
             
             # 计算趋势
             trend_direction = "上升" if current_completion_rate > previous_completion_rate else "下降" if current_completion_rate < previous_completion_rate else "稳定"
@@ -144,14 +148,15 @@ class AIAnalysisService:
         """分析进度趋势"""
         try:
             # 获取项目数据
-            project = self.db.read("projects", project_id)
+            project = await self.async_db.read("projects", project_id)
             if not project:
                 return None
             
             current_progress = project.get("progress_percentage", 0)
             
-            # 模拟历史进度（实际项目中应该从历史记录获取）
-            previous_progress = max(0, current_progress - 5)
+            # 读取days天前的历史进度
+            previous_progress = metric_history_service.previous_value(
+                project_id, "progress_percentage", days, current_progress)
             
             # 计算趋势
             trend_direction = "上升" if current_progress > previous_progress else "下降" if current_progress < previous_progress else "稳定"
@@ -174,17 +179,18 @@ class AIAnalysisService:
     async def _analyze_risk_trend(self, project_id: str, days: int) -> Optional[TrendAnalysis]:
         """分析风险趋势"""
         try:
-            # 获取风险数据
-            risks = self.db.get_by_field("risks", "project_id", project_id)
+            # 读取项目聚合统计
+            aggregate = project_aggregate_service.get(project_id)
             
-            if not risks:
+            if aggregate.risk_total == 0:
                 return None
             
             # 计算当前高风险数量
-            current_high_risks = len([r for r in risks if r.get("risk_level") in ["高", "严重"]])
+            current_high_risks = aggregate.high_risks
             
-            # 模拟历史数据
-            previous_high_risks = max(0, current_high_risks - 1)
+            # 读取days天前的高风险数量
+            previous_high_risks = int(metric_history_service.previous_value(
+                project_id, "high_risks", days, current_high_risks))
             
             # 计算趋势
             trend_direction = "上升" if current_high_risks > previous_high_risks else "下降" if current_high_risks < previous_high_risks else "稳定"
@@ -207,17 +213,18 @@ class AIAnalysisService:
     async def _analyze_issue_resolution_trend(self, project_id: str, days: int) -> Optional[TrendAnalysis]:
         """分析问题解决趋势"""
         try:
-            # 获取问题数据
-            issues = self.db.get_by_field("issues", "project_id", project_id)
+            # 读取项目聚合统计
+            aggregate = project_aggregate_service.get(project_id)
             
-            if not issues:
+            if aggregate.issue_total == 0:
                 return None
             
             # 计算当前未解决问题数量
-            current_open_issues = len([i for i in issues if i.get("status") not in ["已解决", "已关闭"]])
+            current_open_issues = aggregate.open_issues
             
-            # 模拟历史数据
-            previous_open_issues = max(0, current_open_issues + 2)
+            # 读取days天前的未解决问题数量
+            previous_open_issues = int(metric_history_service.previous_value(
+                project_id, "open_issues", days, current_open_issues))
             
             # 计算趋势
             trend_direction = "下降" if current_open_issues < previous_open_issues else "上升" if current_open_issues > previous_open_issues else "稳定"
@@ -273,16 +280,16 @@ class AIAnalysisService:
     async def _generate_performance_insight(self, project_id: str) -> Optional[ProjectInsight]:
         """生成性能洞察"""
         try:
-            # 获取项目数据
-            project = self.db.read("projects", project_id)
-            tasks = self.db.get_by_field("tasks", "project_id", project_id)
+            # 获取项目数据与聚合统计
+            project = await self.async_db.read("projects", project_id)
+            aggregate = project_aggregate_service.get(project_id)
             
-            if not project or not tasks:
+            if not project or aggregate.task_total == 0:
                 return None
             
             # 计算性能指标
-            total_tasks = len(tasks)
-            completed_tasks = len([t for t in tasks if t.get("status") == "已完成"])
+            total_tasks = aggregate.task_total
+            completed_tasks = aggregate.task_status["已完成"]
             completion_rate = (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0
             
             # 使用AI生成洞察
@@ -330,15 +337,15 @@ class AIAnalysisService:
     async def _generate_risk_insight(self, project_id: str) -> Optional[ProjectInsight]:
         """生成风险洞察"""
         try:
-            # 获取风险数据
-            risks = self.db.get_by_field("risks", "project_id", project_id)
+            # 读取项目聚合统计
+            aggregate = project_aggregate_service.get(project_id)
             
-            if not risks:
+            if aggregate.risk_total == 0:
                 return None
             
             # 计算风险指标
-            total_risks = len(risks)
-            high_risks = len([r for r in risks if r.get("risk_level") in ["高", "严重"]])
+            total_risks = aggregate.risk_total
+            high_risks = aggregate.high_risks
             risk_ratio = (high_risks / total_risks * 100) if total_risks > 0 else 0
             
             title = "项目风险分析"
@@ -371,15 +378,16 @@ class AIAnalysisService:
     async def _generate_efficiency_insight(self, project_id: str) -> Optional[ProjectInsight]:
         """生成效率洞察"""
         try:
-            # 获取任务数据
-            tasks = self.db.get_by_field("tasks", "project_id", project_id)
+            # 读取项目聚合统计
+            aggregate = project_aggregate_service.get(project_id)
+            total_tasks = aggregate.task_total
             
-            if not tasks:
+            if total_tasks == 0:
                 return None
             
             # 计算效率指标
-            overdue_tasks = len([t for t in tasks if self._is_task_overdue(t)])
-            efficiency_rate = ((len(tasks) - overdue_tasks) / len(tasks) * 100) if tasks else 0
+            overdue_tasks = aggregate.overdue_tasks
+            efficiency_rate = (total_tasks - overdue_tasks) / total_tasks * 100
             
             title = "项目效率分析"
             description = f"项目效率率为 {efficiency_rate:.1f}%，共有 {overdue_tasks} 个逾期任务"
@@ -399,7 +407,7 @@ class AIAnalysisService:
                 confidence=0.7,
                 recommendations=recommendations,
                 data_support={
-                    "total_tasks": len(tasks),
+                    "total_tasks": total_tasks,
                     "overdue_tasks": overdue_tasks,
                     "efficiency_rate": efficiency_rate
                 }
@@ -411,15 +419,15 @@ class AIAnalysisService:
     async def _generate_quality_insight(self, project_id: str) -> Optional[ProjectInsight]:
         """生成质量洞察"""
         try:
-            # 获取问题数据
-            issues = self.db.get_by_field("issues", "project_id", project_id)
+            # 读取项目聚合统计
+            aggregate = project_aggregate_service.get(project_id)
             
-            if not issues:
+            if aggregate.issue_total == 0:
                 return None
             
             # 计算质量指标
-            total_issues = len(issues)
-            resolved_issues = len([i for i in issues if i.get("status") in ["已解决", "已关闭"]])
+            total_issues = aggregate.issue_total
+            resolved_issues = aggregate.resolved_issues
             quality_rate = (resolved_issues / total_issues * 100) if total_issues > 0 else 0
             
             title = "项目质量分析"
@@ -449,27 +457,6 @@ class AIAnalysisService:
             logger.error(f"生成质量洞察失败: {str(e)}")
             return None
     
-    def _is_task_overdue(self, task: Dict[str, Any]) -> bool:
-        """判断任务是否逾期"""
-        due_date = task.get("due_date")
-        if not due_date:
-            return False
-        
-        status = task.get("status", "")
-        if status in ["已完成", "已取消"]:
-            return False
-        
-        # 简化日期比较
-        try:
-            if isinstance(due_date, str):
-                due_dt = datetime.fromisoformat(due_date.replace('Z', '+00:00'))
-            else:
-                due_dt = due_date
-            
-            return due_dt < datetime.now()
-        except:
-            return False
-    
     async def generate_ai_recommendations(self, project_id: str) -> List[AIRecommendation]:
         """生成AI建议"""
         try:
@@ -506,20 +493,20 @@ class AIAnalysisService:
     async def _generate_task_recommendation(self, project_id: str) -> Optional[AIRecommendation]:
         """生成任务建议"""
         try:
-            # 获取任务数据
-            tasks = self.db.get_by_field("tasks", "project_id", project_id)
+            # 读取项目聚合统计
+            aggregate = project_aggregate_service.get(project_id)
             
-            if not tasks:
+            if aggregate.task_total == 0:
                 return None
             
             # 分析任务状态
-            pending_tasks = len([t for t in tasks if t.get("status") == "待开始"])
-            overdue_tasks = len([t for t in tasks if self._is_task_overdue(t)])
+            pending_tasks = aggregate.task_status["待开始"]
+            overdue_tasks = aggregate.overdue_tasks
             
             # 使用AI生成建议
             recommendation_prompt = f"""
             基于以下任务数据，生成任务管理建议：
-            总任务数: {len(tasks)}
+            总任务数: {aggregate.task_total}
             待开始任务: {pending_tasks}
             逾期任务: {overdue_tasks}
             
@@ -559,15 +546,15 @@ class AIAnalysisService:
     async def _generate_risk_recommendation(self, project_id: str) -> Optional[AIRecommendation]:
         """生成风险建议"""
         try:
-            # 获取风险数据
-            risks = self.db.get_by_field("risks", "project_id", project_id)
+            # 读取项目聚合统计
+            aggregate = project_aggregate_service.get(project_id)
             
-            if not risks:
+            if aggregate.risk_total == 0:
                 return None
             
             # 分析风险状态
-            high_risks = len([r for r in risks if r.get("risk_level") in ["高", "严重"]])
-            unmitigated_risks = len([r for r in risks if r.get("status") == "Open"])
+            high_risks = aggregate.high_risks
+            unmitigated_risks = aggregate.risk_status["Open"]
             
             title = "风险管理优化建议"
             description = f"项目有 {high_risks} 个高风险和 {unmitigated_risks} 个未缓解风险，需要加强风险管理"
@@ -599,7 +586,7 @@ class AIAnalysisService:
         """生成资源建议"""
         try:
             # 获取任务数据
-            tasks = self.db.get_by_field("tasks", "project_id", project_id)
+            tasks = await self.async_db.get_by_field("tasks", "project_id", project_id)
             
             if not tasks:
                 return None
@@ -644,16 +631,16 @@ class AIAnalysisService:
     async def _generate_schedule_recommendation(self, project_id: str) -> Optional[AIRecommendation]:
         """生成进度建议"""
         try:
-            # 获取项目数据
-            project = self.db.read("projects", project_id)
-            tasks = self.db.get_by_field("tasks", "project_id", project_id)
+            # 获取项目数据与聚合统计
+            project = await self.async_db.read("projects", project_id)
+            aggregate = project_aggregate_service.get(project_id)
             
-            if not project or not tasks:
+            if not project or aggregate.task_total == 0:
                 return None
             
             # 分析进度状态
             current_progress = project.get("progress_percentage", 0)
-            overdue_tasks = len([t for t in tasks if self._is_task_overdue(t)])
+            overdue_tasks = aggregate.overdue_tasks
             
             title = "项目进度优化建议"
             description = f"项目进度为 {current_progress:.1f}%，有 {overdue_tasks} 个逾期任务，需要优化进度管理"
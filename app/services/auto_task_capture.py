@@ -264,7 +264,7 @@ class AutoTaskCaptureService:
                 meeting_content, DataSourceType.MEETING
             )
             
-            created_tasks = []
+            task_dicts = []
             for extracted_task in extracted_tasks:
                 task_data = TaskCreate(
                     project_id=project_id,
@@ -283,11 +283,12 @@ class AutoTaskCaptureService:
                 task_dict["status"] = "待开始"
                 task_dict["progress_percentage"] = 0
                 
-                created_task = self.db.create("tasks", task_dict)
-                created_tasks.append(created_task)
+                task_dicts.append(task_dict)
                 
                 logger.info(f"从会议纪要创建任务: {extracted_task.title}")
             
+            # 批量写入，整段内容只提交一次
+            created_tasks = self.db.create_many("tasks", task_dicts)
             return created_tasks
         except Exception as e:
             logger.error(f"从会议纪要提取任务失败: {str(e)}")
@@ -300,7 +301,7 @@ class AutoTaskCaptureService:
                 chat_content, DataSourceType.CHAT
             )
             
-            created_tasks = []
+            task_dicts = []
             for extracted_task in extracted_tasks:
                 task_data = TaskCreate(
                     project_id=project_id,
@@ -319,11 +320,12 @@ class AutoTaskCaptureService:
                 task_dict["status"] = "待开始"
                 task_dict["progress_percentage"] = 0
                 
-                created_task = self.db.create("tasks", task_dict)
-                created_tasks.append(created_task)
+                task_dicts.append(task_dict)
                 
                 logger.info(f"从群聊消息创建任务: {extracted_task.title}")
             
+            # 批量写入，整段内容只提交一次
+            created_tasks = self.db.create_many("tasks", task_dicts)
             return created_tasks
         except Exception as e:
             logger.error(f"从群聊消息提取任务失败: {str(e)}")
@@ -336,7 +338,7 @@ class AutoTaskCaptureService:
                 email_content, DataSourceType.EMAIL
             )
             
-            created_tasks = []
+            task_dicts = []
             for extracted_task in extracted_tasks:
                 task_data = TaskCreate(
                     project_id=project_id,
@@ -355,11 +357,12 @@ class AutoTaskCaptureService:
                 task_dict["status"] = "待开始"
                 task_dict["progress_percentage"] = 0
                 
-                created_task = self.db.create("tasks", task_dict)
-                created_tasks.append(created_task)
+                task_dicts.append(task_dict)
                 
                 logger.info(f"从邮件内容创建任务: {extracted_task.title}")
             
+            # 批量写入，整段内容只提交一次
+            created_tasks = self.db.create_many("tasks", task_dicts)
             return created_tasks
         except Exception as e:
             logger.error(f"从邮件内容提取任务失败: {str(e)}")
@@ -372,7 +375,7 @@ class AutoTaskCaptureService:
                 document_content, DataSourceType.DOCUMENT
             )
             
-            created_tasks = []
+            task_dicts = []
             for extracted_task in extracted_tasks:
                 task_data = TaskCreate(
                     project_id=project_id,
@@ -391,11 +394,12 @@ class AutoTaskCaptureService:
                 task_dict["status"] = "待开始"
                 task_dict["progress_percentage"] = 0
                 
-                created_task = self.db.create("tasks", task_dict)
-                created_tasks.append(created_task)
+                task_dicts.append(task_dict)
                 
                 logger.info(f"从文档内容创建任务: {extracted_task.title}")
             
+            # 批量写入，整段内容只提交一次
+            created_tasks = self.db.create_many("tasks", task_dicts)
             return created_tasks
         except Exception as e:
             logger.error(f"从文档内容提取任务失败: {str(e)}")
@@ -411,22 +415,24 @@ class AutoTaskCaptureService:
                 "document": []
             }
             
-            for content_item in content_list:
-                content_type = content_item.get("type", "meeting")
-                content_text = content_item.get("content", "")
-                
-                if content_type == "meeting":
-                    tasks = self.extract_tasks_from_meeting(content_text, project_id, created_by)
-                    results["meeting"].extend(tasks)
-                elif content_type == "chat":
-                    tasks = self.extract_tasks_from_chat(content_text, project_id, created_by)
-                    results["chat"].extend(tasks)
-                elif content_type == "email":
-                    tasks = self.extract_tasks_from_email(content_text, project_id, created_by)
-                    results["email"].extend(tasks)
-                elif content_type == "document":
-                    tasks = self.extract_tasks_from_document(content_text, project_id, created_by)
-                    results["document"].extend(tasks)
+            # 所有内容的任务在同一个事务中写入，只提交一次
+            with self.db.transaction():
+                for content_item in content_list:
+                    content_type = content_item.get("type", "meeting")
+                    content_text = content_item.get("content", "")
+                    
+                    if content_type == "meeting":
+                        tasks = self.extract_tasks_from_meeting(content_text, project_id, created_by)
+                        results["meeting"].extend(tasks)
+                    elif content_type == "chat":
+                        tasks = self.extract_tasks_from_chat(content_text, project_id, created_by)
+                        results["chat"].extend(tasks)
+                    elif content_type == "email":
+                        tasks = self.extract_tasks_from_email(content_text, project_id, created_by)
+                        results["email"].extend(tasks)
+                    elif content_type == "document":
+                        tasks = self.extract_tasks_from_document(content_text, project_id, created_by)
+                        results["document"].extend(tasks)
             
             total_tasks = sum(len(tasks) for tasks in results.values())
             logger.info(f"批量提取任务完成，共创建 {total_tasks} 个任务")
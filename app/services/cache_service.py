@@ -250,5 +250,41 @@ def invalidate_user_cache(user_id: str):
     logger.info(f"使用户 {user_id} 的 {len(keys_to_delete)} 个缓存项失效")
 
 
+def invalidate_on_changes(events: List[Any]):
+    """
+    数据库变更流的批量订阅回调：使受变更影响的项目、用户缓存失效（集合被整体替换时清除全部项目与用户缓存）
+    
+    同一批变更先汇总受影响的键前缀，再只遍历一次缓存键；缓存为空时直接返回。
+    回调在数据库写锁内执行，批量写入时不逐条遍历缓存。
+    """
+    if not cache_service.cache:
+        return
+    prefixes = set()
+    for event in events:
+        if event.op == "replace":
+            prefixes = {"project_", "user_"}
+            break
+        project_ids = {record.get("project_id") for record in (event.before, event.after) if record}
+        if event.collection == "projects":
+            project_ids.add(event.key)
+        prefixes.update(f"project_{project_id}_" for project_id in project_ids if project_id is not None)
+        if event.collection == "users" and event.key is not None:
+            prefixes.add(f"user_{event.key}_")
+    if not prefixes:
+        return
+    
+    prefixes = tuple(prefixes)
+    keys_to_delete = [key for key in list(cache_service.cache.keys()) if key.startswith(prefixes)]
+    for key in keys_to_delete:
+        cache_service.delete(key)
+    if keys_to_delete:
+        logger.debug(f"{len(events)} 条数据变更使 {len(keys_to_delete)} 个缓存项失效")
+
+
+def invalidate_on_change(event: Any):
+    """单条变更的缓存失效（见invalidate_on_changes）"""
+    invalidate_on_changes([event])
+
+
 # 创建全局缓存服务实例
 cache_service = CacheService(max_size=1000, default_ttl=3600)
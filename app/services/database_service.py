@@ -1,8 +1,14 @@
 """
 数据库服务
 """
+from datetime import datetime
+from pathlib import Path
 from typing import Any, Dict, List, Optional, Union
+from app.services.cache_service import invalidate_on_changes
+from app.utils.async_database import AsyncDatabase
+from app.utils.backup import IncrementalBackupStore
 from app.utils.database import JSONDatabase
+from app.utils.sqlite_database import SQLiteDatabase
 from app.utils.logger import get_logger
 from config.settings import settings
 
@@ -14,13 +20,55 @@ class DatabaseService:
     
     def __init__(self):
         """初始化数据库服务"""
-        self.db = JSONDatabase(settings.json_database_path)
-        logger.info("数据库服务初始化完成")
+        self.backend = getattr(settings, "database_backend", "json")
+        self.db = self._create_database(self.backend)
+        # 数据变更后使相关缓存失效（每次提交的变更合并处理一次）
+        self.db.changes.subscribe_batch(invalidate_on_changes)
+        # 异步接口：磁盘I/O在有界线程池中执行，不阻塞事件循环
+        self.async_db = AsyncDatabase(self.db, max_workers=getattr(settings, "database_io_workers", 4))
+        self.backup_store = IncrementalBackupStore(
+            getattr(settings, "backup_directory", None) or Path(settings.json_database_path).parent / "backups"
+        )
+        logger.info(f"数据库服务初始化完成，存储后端: {self.backend}")
     
-    def get_database(self) -> JSONDatabase:
+    def _create_database(self, backend: str) -> Union[JSONDatabase, SQLiteDatabase]:
+        """根据配置创建存储后端"""
+        if backend == "sqlite":
+            sqlite_path = getattr(settings, "sqlite_database_path", None) or \
+                str(Path(settings.json_database_path).with_suffix(".sqlite3"))
+            db = SQLiteDatabase(sqlite_path)
+            # 首次切换到SQLite时从现有JSON数据库迁移数据
+            if db.is_empty() and Path(settings.json_database_path).exists():
+                db.migrate_from_json(settings.json_database_path)
+            return db
+        if backend != "json":
+            raise ValueError(f"不支持的数据库后端: {backend}")
+        return JSONDatabase(
+            settings.json_database_path,
+            flush_interval=getattr(settings, "json_database_flush_interval", 0.0),
+            journal=getattr(settings, "json_database_journal", False),
+            codec=getattr(settings, "json_database_codec", None),
+            multiprocess=getattr(settings, "json_database_multiprocess", False)
+        )
+    
+    def get_database(self) -> Union[JSONDatabase, SQLiteDatabase]:
         """获取数据库实例"""
         return self.db
     
+    def get_async_database(self) -> AsyncDatabase:
+        """获取数据库的异步接口（供async def接口与服务使用）"""
+        return self.async_db
+    
+    def flush(self) -> bool:
+        """将未落盘的修改提交到磁盘"""
+        return self.db.flush()
+    
+    def close(self):
+        """关闭数据库，提交所有未落盘的修改"""
+        self.async_db.close()
+        self.db.close()
+        logger.info("数据库服务已关闭")
+    
     def backup_database(self, backup_path: str = None) -> str:
         """备份数据库"""
         try:
@@ -44,6 +92,42 @@ class DatabaseService:
             logger.error(f"数据库恢复失败: {str(e)}")
             raise
     
+    def create_incremental_backup(self, label: str = None) -> Dict[str, Any]:
+        """创建增量备份（只写入自上次备份以来变化的集合）"""
+        try:
+            manifest = self.backup_store.create_backup(self.db, label)
+            logger.info(f"增量备份完成: {manifest['backup_id']}")
+            return manifest
+        except Exception as e:
+            logger.error(f"增量备份失败: {str(e)}")
+            raise
+    
+    def list_backups(self) -> List[Dict[str, Any]]:
+        """列出全部增量备份"""
+        return self.backup_store.list_backups()
+    
+    def verify_backup(self, backup_id: str) -> List[str]:
+        """校验增量备份的完整性，返回发现的问题"""
+        return self.backup_store.verify_backup(backup_id)
+    
+    def restore_incremental_backup(self, backup_id: str = None, at: datetime = None) -> Dict[str, Any]:
+        """恢复到指定增量备份或时间点（均未指定时恢复最近一次备份）"""
+        try:
+            manifest = self.backup_store.restore(self.db, backup_id=backup_id, at=at)
+            logger.info(f"数据库恢复完成: {manifest['backup_id']}")
+            return manifest
+        except Exception as e:
+            logger.error(f"数据库恢复失败: {str(e)}")
+            raise
+    
+    def prune_backups(self, keep: int) -> int:
+        """只保留最近keep次增量备份，返回删除的对象数量"""
+        try:
+            return self.backup_store.prune(keep)
+        except Exception as e:
+            logger.error(f"清理备份失败: {str(e)}")
+            raise
+    
     def get_database_info(self) -> Dict[str, Any]:
         """获取数据库信息"""
         try:
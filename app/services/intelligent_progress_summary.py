@@ -8,6 +8,7 @@ from app.models.base import BaseModel
 from app.models.enums import TaskStatus, RiskLevel, IssueCategory
 from app.utils.logger import get_logger
 from app.services.database_service import database_service
+from app.services.project_aggregates import project_aggregate_service
 
 logger = get_logger(__name__)
 
@@ -81,7 +82,7 @@ class IntelligentProgressSummaryService:
             tasks = self.db.get_by_field("tasks", "project_id", project_id)
             
             # 计算任务统计
-            task_stats = self._calculate_task_statistics(tasks, date)
+            task_stats = project_aggregate_service.task_statistics(project_id, date)
             
             # 获取今日任务
             today_tasks = self._get_today_tasks(tasks, date)
@@ -148,7 +149,7 @@ class IntelligentProgressSummaryService:
             tasks = self.db.get_by_field("tasks", "project_id", project_id)
             
             # 计算任务统计
-            task_stats = self._calculate_task_statistics(tasks, week_end)
+            task_stats = project_aggregate_service.task_statistics(project_id, week_end)
             
             # 获取周亮点和挑战
             week_highlights = self._get_weekly_highlights(tasks, week_start, week_end)
@@ -217,7 +218,7 @@ class IntelligentProgressSummaryService:
             tasks = self.db.get_by_field("tasks", "project_id", project_id)
             
             # 计算任务统计
-            task_stats = self._calculate_task_statistics(tasks, month_end)
+            task_stats = project_aggregate_service.task_statistics(project_id, month_end)
             
             # 获取月成就和经验教训
             month_achievements = self._get_monthly_achievements(tasks, month_start, month_end)
@@ -263,30 +264,6 @@ class IntelligentProgressSummaryService:
             logger.error(f"生成月报失败: {str(e)}")
             raise
     
-    def _calculate_task_statistics(self, tasks: List[Dict[str, Any]], end_date: datetime) -> Dict[str, Any]:
-        """计算任务统计信息"""
-        total = len(tasks)
-        completed = len([t for t in tasks if t.get("status") == "已完成"])
-        in_progress = len([t for t in tasks if t.get("status") == "进行中"])
-        pending = len([t for t in tasks if t.get("status") == "待开始"])
-        overdue = len([t for t in tasks if self._is_task_overdue(t, end_date)])
-        
-        completion_rate = (completed / total * 100) if total > 0 else 0.0
-        
-        # 计算平均进度
-        total_progress = sum(t.get("progress_percentage", 0) for t in tasks)
-        progress_percentage = (total_progress / total) if total > 0 else 0.0
-        
-        return {
-            "total": total,
-            "completed": completed,
-            "in_progress": in_progress,
-            "pending": pending,
-            "overdue": overdue,
-            "completion_rate": completion_rate,
-            "progress_percentage": progress_percentage
-        }
-    
     def _is_task_overdue(self, task: Dict[str, Any], end_date: datetime) -> bool:
         """判断任务是否逾期"""
         due_date = task.get("due_date")
@@ -403,28 +380,10 @@ class IntelligentProgressSummaryService:
             if not project:
                 raise ValueError(f"项目 {project_id} 不存在")
             
-            # 获取任务数据
-            tasks = self.db.get_by_field("tasks", "project_id", project_id)
-            
-            # 计算各种统计
-            task_stats = self._calculate_task_statistics(tasks, datetime.now())
-            
-            # 获取风险和问题统计
-            risks = self.db.get_by_field("risks", "project_id", project_id)
-            issues = self.db.get_by_field("issues", "project_id", project_id)
-            
-            risk_stats = {
-                "total": len(risks),
-                "high": len([r for r in risks if r.get("risk_level") in ["高", "严重"]]),
-                "medium": len([r for r in risks if r.get("risk_level") == "中"]),
-                "low": len([r for r in risks if r.get("risk_level") == "低"])
-            }
-            
-            issue_stats = {
-                "total": len(issues),
-                "open": len([i for i in issues if i.get("status") not in ["已解决", "已关闭"]]),
-                "resolved": len([i for i in issues if i.get("status") in ["已解决", "已关闭"]])
-            }
+            # 任务、风险和问题统计直接读取物化的项目聚合，无需加载记录
+            task_stats = project_aggregate_service.task_statistics(project_id)
+            risk_stats = project_aggregate_service.risk_statistics(project_id)
+            issue_stats = project_aggregate_service.issue_statistics(project_id)
             
             return {
                 "project_info": {
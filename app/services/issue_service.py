@@ -1,11 +1,12 @@
 """
 问题服务
 """
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from app.models.issue import Issue, IssueCreate, IssueUpdate, IssueResponse
 from app.services.database_service import database_service
 from app.utils.logger import get_logger
 from app.utils.helpers import generate_id
+from app.utils.query import SortSpec, page_window
 
 logger = get_logger(__name__)
 
@@ -18,21 +19,27 @@ class IssueService:
         self.db = database_service.get_database()
         logger.info("问题服务初始化完成")
     
-    def get_issues(self, filters: Optional[Dict[str, Any]] = None, search: Optional[str] = None) -> List[IssueResponse]:
+    def get_issues(self, filters: Optional[Dict[str, Any]] = None, search: Optional[str] = None,
+                   sort: SortSpec = None) -> List[IssueResponse]:
         """获取问题列表"""
+        issues, _ = self.get_issues_page(filters, search, sort=sort)
+        return issues
+    
+    def get_issues_page(self, filters: Optional[Dict[str, Any]] = None, search: Optional[str] = None,
+                        page: Optional[int] = None, page_size: Optional[int] = None,
+                        sort: SortSpec = None) -> Tuple[List[IssueResponse], int]:
+        """分页获取问题列表，过滤、搜索、排序与分页均在数据库层完成，只为当前页计算指标"""
         try:
-            issues_data = self.db.read("issues", filters=filters)
-            
-            if search:
-                issues_data = self.db.search("issues", search, ["issue_title", "description"])
+            offset, limit = page_window(page, page_size)
+            result = self.db.query("issues", filters=filters, sort=sort, offset=offset, limit=limit,
+                                   search=search, search_fields=["issue_title", "description"])
             
             issues = []
-            for issue_data in issues_data:
-                issue_response = self._calculate_issue_metrics(issue_data)
-                issues.append(issue_response)
+            for issue_data in result:
+                issues.append(self._calculate_issue_metrics(issue_data))
             
-            logger.info(f"获取到 {len(issues)} 个问题")
-            return issues
+            logger.info(f"获取到 {len(issues)} 个问题（共 {result.total} 个）")
+            return issues, result.total
         except Exception as e:
             logger.error(f"获取问题列表失败: {str(e)}")
             raise
@@ -127,11 +134,7 @@ class IssueService:
         """获取未解决问题列表"""
         try:
             open_statuses = ["新建", "已分配", "进行中"]
-            open_issues = []
-            
-            for status in open_statuses:
-                issues = self.get_issues(filters={"status": status})
-                open_issues.extend(issues)
+            open_issues = self.get_issues(filters={"status": {"$in": open_statuses}})
             
             logger.info(f"获取到 {len(open_issues)} 个未解决问题")
             return open_issues
@@ -0,0 +1,454 @@
+"""
+项目指标历史服务：按项目保存指标的时间序列，用于趋势分析
+"""
+import bisect
+import os
+import struct
+import threading
+import time
+from array import array
+from contextlib import contextmanager
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+
+from app.utils.change_feed import ChangeEvent
+from app.utils.logger import get_logger
+from app.services.database_service import database_service
+from app.services.project_aggregates import project_aggregate_service
+from config.settings import settings
+
+logger = get_logger(__name__)
+
+try:
+    import fcntl
+except ImportError:  # Windows等平台不支持flock
+    fcntl = None
+
+# 记录的项目指标（均为水平量，日/周汇总取区间内最后一个值）
+METRICS = ("completion_rate", "progress_percentage", "high_risks", "open_issues", "budget_utilization")
+# 触发采样的集合
+SAMPLED_COLLECTIONS = ("projects", "tasks", "risks", "issues")
+
+# 日志记录：项目ID长度 + 项目ID（UTF-8）+ 时间戳与各指标值
+_ID_LENGTH = struct.Struct("<H")
+_SAMPLE = struct.Struct(f"<d{len(METRICS)}d")
+
+
+class MetricSeries:
+    """单个项目的指标序列
+    
+    原始采样按时间顺序保存在定长数值数组中（array('d')），另按自然日维护每天最后一个采样；
+    超过原始数据保留期的采样从内存中移除，只保留日汇总。
+    """
+    
+    __slots__ = ("timestamps", "values", "days", "day_times", "day_values")
+    
+    def __init__(self):
+        self.timestamps = array("d")
+        self.values: Dict[str, array] = {metric: array("d") for metric in METRICS}
+        self.days = array("l")
+        self.day_times = array("d")
+        self.day_values: Dict[str, array] = {metric: array("d") for metric in METRICS}
+    
+    def append(self, timestamp: float, sample: Tuple[float, ...]):
+        """追加采样（时间戳早于最后一个采样时按最后一个采样的时间计）"""
+        if self.timestamps and timestamp < self.timestamps[-1]:
+            timestamp = self.timestamps[-1]
+        self.timestamps.append(timestamp)
+        for metric, value in zip(METRICS, sample):
+            self.values[metric].append(value)
+        self._roll_up(timestamp, sample)
+    
+    def _roll_up(self, timestamp: float, sample: Tuple[float, ...]):
+        day = date.fromtimestamp(timestamp).toordinal()
+        if self.days and self.days[-1] == day:
+            self.day_times[-1] = timestamp
+            for metric, value in zip(METRICS, sample):
+                self.day_values[metric][-1] = value
+            return
+        self.days.append(day)
+        self.day_times.append(timestamp)
+        for metric, value in zip(METRICS, sample):
+            self.day_values[metric].append(value)
+    
+    def trim(self, cutoff: float):
+        """移除早于cutoff的原始采样（日汇总保留）"""
+        count = bisect.bisect_left(self.timestamps, cutoff)
+        if count:
+            del self.timestamps[:count]
+            for values in self.values.values():
+                del values[:count]
+    
+    def value_at(self, metric: str, timestamp: float) -> Optional[float]:
+        """指定时间点（含）之前最后一个采样的值，原始采样已移除时使用日汇总"""
+        if self.timestamps and timestamp >= self.timestamps[0]:
+            position = bisect.bisect_right(self.timestamps, timestamp) - 1
+            return self.values[metric][position]
+        position = bisect.bisect_right(self.day_times, timestamp) - 1
+        return self.day_values[metric][position] if position >= 0 else None
+    
+    def first(self, metric: str) -> float:
+        """最早保留的值（原始采样仍覆盖第一天时取第一个原始采样）"""
+        if self.timestamps and self.timestamps[0] <= self.day_times[0]:
+            return self.values[metric][0]
+        return self.day_values[metric][0]
+    
+    def raw(self, metric: str, since: float) -> List[Tuple[float, float]]:
+        start = bisect.bisect_left(self.timestamps, since)
+        return list(zip(self.timestamps[start:], self.values[metric][start:]))
+    
+    def daily(self, metric: str, since: float) -> List[Tuple[float, float]]:
+        start = bisect.bisect_left(self.day_times, since)
+        return list(zip(self.day_times[start:], self.day_values[metric][start:]))
+    
+    def downsample(self, metric: str, since: float, bucket_days: int) -> List[Tuple[float, float]]:
+        """按bucket_days天（周汇总为7天，从周一开始）分桶，取每桶最后一个日汇总值"""
+        start = bisect.bisect_left(self.day_times, since)
+        points: List[Tuple[float, float]] = []
+        last_bucket = None
+        values = self.day_values[metric]
+        for position in range(start, len(self.days)):
+            # ordinal 1（0001-01-01）为周一，按此对齐分桶
+            bucket = (self.days[position] - 1) // bucket_days
+            point = (self.day_times[position], values[position])
+            if bucket == last_bucket:
+                points[-1] = point
+            else:
+                points.append(point)
+                last_bucket = bucket
+        return points
+    
+    def compacted(self, cutoff: float) -> List[Tuple[float, Tuple[float, ...]]]:
+        """降采样后的全部采样：cutoff之前结束的每一天只保留最后一个采样，之后保留原始采样"""
+        samples = []
+        for position in range(len(self.days)):
+            if self.day_times[position] >= cutoff:
+                break
+            samples.append((self.day_times[position],
+                            tuple(self.day_values[metric][position] for metric in METRICS)))
+        for position in range(bisect.bisect_left(self.timestamps, cutoff), len(self.timestamps)):
+            samples.append((self.timestamps[position], tuple(self.values[metric][position] for metric in METRICS)))
+        return samples
+
+
+class MetricHistoryService:
+    """项目指标历史服务
+    
+    订阅数据库变更流：项目、任务、风险、问题发生变更时，从项目聚合统计计算当前指标并采样，
+    同一项目在min_interval秒内只采样一次，期间的变更由后台线程在间隔到期后补采。
+    变更流回调在数据库写锁内执行，只把采样写入内存并放入缓冲区，由后台线程（或flush）在锁外追加到二进制日志；
+    多个进程共用日志时追加与重写都持有文件锁。启动时重放日志；日志超过大小阈值时合并全部进程的采样后降采样重写：
+    超过原始数据保留期的采样每天只保留最后一个。
+    """
+    
+    def __init__(self, db: Any = None, path: Union[str, Path, None] = None, aggregates: Any = None,
+                 min_interval: float = 300.0, raw_retention_days: int = 7, max_log_bytes: int = 4 * 1024 * 1024,
+                 background: bool = True):
+        """
+        初始化服务
+        
+        Args:
+            db: 数据库实例，默认使用全局数据库服务的实例
+            path: 采样日志文件路径，默认与数据库文件同目录
+            aggregates: 项目聚合统计服务，默认使用全局实例
+            min_interval: 同一项目两次采样的最小间隔（秒）
+            raw_retention_days: 原始采样的保留天数，更早的采样只保留日汇总
+            max_log_bytes: 日志超过该大小时降采样重写
+            background: 是否启动后台补采线程
+        """
+        self.db = db if db is not None else database_service.get_database()
+        self.aggregates = aggregates if aggregates is not None else project_aggregate_service
+        if path is None:
+            path = getattr(settings, "metric_history_path", None) \
+                or Path(settings.json_database_path).parent / "metric_history.bin"
+        self.path = Path(path)
+        self.min_interval = min_interval
+        self.raw_retention = raw_retention_days * 86400
+        self.max_log_bytes = max_log_bytes
+        self._pending: Set[str] = set()
+        # 尚未写入日志的采样
+        self._buffer: List[Tuple[str, float, Tuple[float, ...]]] = []
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = threading.Event()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock_file = open(self.path.with_name(f"{self.path.name}.lock"), "a+b")
+        if fcntl is None:
+            logger.warning("当前平台不支持fcntl文件锁，多个进程共用指标历史日志时可能丢失采样")
+        with self._file_lock():
+            self._series, self._last_sampled = self._replay()
+            self._log = open(self.path, "ab")
+        self._compact_threshold = max(self.max_log_bytes, 2 * self._log.tell())
+        self.db.changes.subscribe(self._on_change, collections=SAMPLED_COLLECTIONS)
+        if background:
+            threading.Thread(target=self._sample_loop, name="MetricHistorySampler", daemon=True).start()
+        logger.info(f"项目指标历史服务初始化完成，已加载 {len(self._series)} 个项目的历史")
+    
+    @contextmanager
+    def _file_lock(self):
+        """跨进程排他锁（不支持fcntl的平台上只有进程内互斥）"""
+        if fcntl is None:
+            yield
+            return
+        fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+    
+    def _replay(self) -> Tuple[Dict[str, MetricSeries], Dict[str, float]]:
+        """重放采样日志，返回各项目的序列与最后采样时间（调用方持有文件锁）"""
+        series: Dict[str, MetricSeries] = {}
+        last_sampled: Dict[str, float] = {}
+        if not self.path.exists():
+            return series, last_sampled
+        payload = self.path.read_bytes()
+        offset = 0
+        while offset + _ID_LENGTH.size <= len(payload):
+            (length,) = _ID_LENGTH.unpack_from(payload, offset)
+            end = offset + _ID_LENGTH.size + length + _SAMPLE.size
+            if end > len(payload):
+                # 末尾不完整的记录（写入中断）
+                logger.warning(f"忽略指标历史日志末尾不完整的记录: {self.path}")
+                break
+            project_id = payload[offset + _ID_LENGTH.size:offset + _ID_LENGTH.size + length].decode("utf-8")
+            timestamp, *sample = _SAMPLE.unpack_from(payload, end - _SAMPLE.size)
+            self._series_for(project_id, series).append(timestamp, tuple(sample))
+            last_sampled[project_id] = timestamp
+            offset = end
+        cutoff = time.time() - self.raw_retention
+        for project_series in series.values():
+            project_series.trim(cutoff)
+        return series, last_sampled
+    
+    def _series_for(self, project_id: str, series: Optional[Dict[str, MetricSeries]] = None) -> MetricSeries:
+        series = self._series if series is None else series
+        project_series = series.get(project_id)
+        if project_series is None:
+            project_series = series[project_id] = MetricSeries()
+        return project_series
+    
+    @staticmethod
+    def _encode(project_id: str, timestamp: float, sample: Tuple[float, ...]) -> bytes:
+        key = project_id.encode("utf-8")
+        return _ID_LENGTH.pack(len(key)) + key + _SAMPLE.pack(timestamp, *sample)
+    
+    def _on_change(self, event: ChangeEvent):
+        """变更流回调：采样受影响的项目（在数据库写锁内调用，不写文件）"""
+        if event.op == "replace":
+            return
+        if event.collection == "projects":
+            project_ids = {event.key} if event.op != "delete" else set()
+        else:
+            project_ids = {record.get("project_id") for record in (event.before, event.after) if record}
+            project_ids.discard(None)
+        for project_id in project_ids:
+            self.record(project_id)
+    
+    def current(self, project_id: str) -> Dict[str, float]:
+        """
+        计算项目当前的各项指标
+        
+        Args:
+            project_id: 项目ID
+        """
+        aggregate = self.aggregates.get(project_id)
+        project = self.db.read("projects", project_id) or {}
+        total = aggregate.task_total
+        budget = project.get("budget") or 0
+        return {
+            "completion_rate": (aggregate.task_status["已完成"] / total * 100) if total > 0 else 0.0,
+            "progress_percentage": float(project.get("progress_percentage") or 0),
+            "high_risks": float(aggregate.high_risks),
+            "open_issues": float(aggregate.open_issues),
+            "budget_utilization": ((project.get("actual_cost") or 0) / budget * 100) if budget > 0 else 0.0
+        }
+    
+    def record(self, project_id: str, force: bool = False) -> bool:
+        """
+        采样项目当前指标（距上次采样不足min_interval秒时推迟到后台补采），采样先放入缓冲区
+        
+        Args:
+            project_id: 项目ID
+            force: 忽略采样间隔立即采样
+            
+        Returns:
+            是否已采样
+        """
+        now = time.time()
+        with self._lock:
+            if not force and now - self._last_sampled.get(project_id, 0.0) < self.min_interval:
+                self._pending.add(project_id)
+                return False
+            self._pending.discard(project_id)
+            self._last_sampled[project_id] = now
+        try:
+            values = self.current(project_id)
+        except Exception as e:
+            logger.error(f"计算项目 {project_id} 的指标失败: {str(e)}")
+            return False
+        self._append(project_id, now, tuple(values[metric] for metric in METRICS))
+        return True
+    
+    def _append(self, project_id: str, timestamp: float, sample: Tuple[float, ...]):
+        """保存一个采样：写入内存序列并放入缓冲区，唤醒后台线程写日志"""
+        with self._lock:
+            series = self._series_for(project_id)
+            series.append(timestamp, sample)
+            # 超出保留期一天以上时才裁剪，避免每次采样都移动数组
+            if series.timestamps[0] < timestamp - self.raw_retention - 86400:
+                series.trim(timestamp - self.raw_retention)
+            self._buffer.append((project_id, timestamp, sample))
+        self._wakeup.set()
+    
+    def _reopen_if_replaced(self):
+        """其他进程重写日志后，改为追加到新文件"""
+        try:
+            current = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            current = None
+        if current != os.fstat(self._log.fileno()).st_ino:
+            self._log.close()
+            self._log = open(self.path, "ab")
+    
+    def flush(self):
+        """把缓冲区中的采样追加到日志（持有文件锁），日志超过阈值时降采样重写"""
+        with self._flush_lock:
+            with self._lock:
+                records, self._buffer = self._buffer, []
+            if not records:
+                return
+            with self._file_lock():
+                self._reopen_if_replaced()
+                self._log.write(b"".join(self._encode(*record) for record in records))
+                self._log.flush()
+                if self._log.tell() > self._compact_threshold:
+                    self._compact()
+    
+    def record_pending(self):
+        """补采间隔已到期的待采样项目"""
+        now = time.time()
+        with self._lock:
+            due = [project_id for project_id in self._pending
+                   if now - self._last_sampled.get(project_id, 0.0) >= self.min_interval]
+        for project_id in due:
+            self.record(project_id)
+    
+    def _sample_loop(self):
+        while not self._closed.is_set():
+            self._wakeup.wait(min(max(self.min_interval, 1.0), 60.0))
+            self._wakeup.clear()
+            try:
+                self.record_pending()
+                self.flush()
+            except Exception as e:
+                logger.error(f"补采或写入项目指标失败: {str(e)}")
+    
+    def compact(self):
+        """降采样并重写采样日志：保留期之前每个项目每天只保留最后一个采样"""
+        self.flush()
+        with self._flush_lock, self._file_lock():
+            self._reopen_if_replaced()
+            self._compact()
+    
+    def _compact(self):
+        """合并日志中全部进程的采样后降采样重写（调用方持有写日志锁与文件锁）"""
+        series, last_sampled = self._replay()
+        cutoff = time.time() - self.raw_retention
+        tmp_path = self.path.with_name(f".{self.path.name}.tmp")
+        with open(tmp_path, "wb") as f:
+            for project_id, project_series in series.items():
+                for timestamp, sample in project_series.compacted(cutoff):
+                    f.write(self._encode(project_id, timestamp, sample))
+        self._log.close()
+        tmp_path.replace(self.path)
+        self._log = open(self.path, "ab")
+        # 降采样后仍较大时按当前大小的两倍设置下次重写的阈值，避免频繁重写
+        self._compact_threshold = max(self.max_log_bytes, 2 * self._log.tell())
+        with self._lock:
+            # 重放期间新产生、尚在缓冲区中的采样补回内存序列
+            for project_id, timestamp, sample in self._buffer:
+                self._series_for(project_id, series).append(timestamp, sample)
+            for project_id, timestamp in last_sampled.items():
+                if timestamp > self._last_sampled.get(project_id, 0.0):
+                    self._last_sampled[project_id] = timestamp
+            self._series = series
+        logger.info(f"指标历史日志已降采样重写: {self.path}")
+    
+    def value_at(self, project_id: str, metric: str, at: datetime) -> Optional[float]:
+        """
+        指定时间点的指标值（该时间点之前最后一个采样）
+        
+        Returns:
+            指标值，该时间点之前没有采样时返回None
+        """
+        with self._lock:
+            series = self._series.get(project_id)
+            return series.value_at(metric, at.timestamp()) if series is not None else None
+    
+    def series(self, project_id: str, metric: str, since: Optional[datetime] = None,
+               resolution: str = "daily") -> List[Tuple[datetime, float]]:
+        """
+        获取指标序列
+        
+        Args:
+            project_id: 项目ID
+            metric: 指标名称
+            since: 起始时间（可选）
+            resolution: raw（原始采样，仅保留期内）、daily（每天最后一个值）或 weekly（每周最后一个值）
+            
+        Returns:
+            (时间, 值) 列表
+        """
+        if metric not in METRICS:
+            raise ValueError(f"未知的指标: {metric}")
+        start = since.timestamp() if since is not None else 0.0
+        with self._lock:
+            series = self._series.get(project_id)
+            if series is None:
+                return []
+            if resolution == "raw":
+                points = series.raw(metric, start)
+            elif resolution == "daily":
+                points = series.daily(metric, start)
+            elif resolution == "weekly":
+                points = series.downsample(metric, start, 7)
+            else:
+                raise ValueError(f"不支持的时间粒度: {resolution}")
+        return [(datetime.fromtimestamp(timestamp), value) for timestamp, value in points]
+    
+    def previous_value(self, project_id: str, metric: str, days: int, default: float) -> float:
+        """
+        指标在days天前的值
+        
+        Args:
+            project_id: 项目ID
+            metric: 指标名称
+            days: 回溯天数
+            default: 项目尚无历史时的返回值（通常为当前值）
+            
+        Returns:
+            days天前最后一个采样的值，更早没有采样时取最早保留的值
+        """
+        at = time.time() - days * 86400
+        with self._lock:
+            series = self._series.get(project_id)
+            if series is None or not series.days:
+                return default
+            previous = series.value_at(metric, at)
+            return previous if previous is not None else series.first(metric)
+    
+    def close(self):
+        """停止后台补采，写入缓冲区中的采样并关闭日志"""
+        self._closed.set()
+        self._wakeup.set()
+        self.flush()
+        with self._flush_lock:
+            self._log.close()
+        self._lock_file.close()
+
+
+# 创建全局服务实例
+metric_history_service = MetricHistoryService()
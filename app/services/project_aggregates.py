@@ -0,0 +1,218 @@
+"""
+项目聚合统计服务：按项目物化任务、风险、问题的统计数据，订阅数据库变更流逐条增量维护
+"""
+import bisect
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from app.utils.change_feed import ChangeEvent
+from app.utils.logger import get_logger
+from app.services.database_service import database_service
+
+logger = get_logger(__name__)
+
+# 参与聚合的集合
+AGGREGATED_COLLECTIONS = ("tasks", "risks", "issues")
+# 不再计入逾期的任务状态
+CLOSED_TASK_STATUSES = ("已完成", "已取消")
+HIGH_RISK_LEVELS = ("高", "严重")
+RESOLVED_ISSUE_STATUSES = ("已解决", "已关闭")
+
+
+@dataclass
+class ProjectAggregate:
+    """单个项目的聚合统计"""
+    project_id: str
+    task_total: int = 0
+    task_status: Counter = field(default_factory=Counter)
+    task_progress_sum: float = 0.0
+    # 逾期任务数（由snapshot按查询时间计算）
+    overdue_tasks: int = 0
+    risk_total: int = 0
+    risk_level: Counter = field(default_factory=Counter)
+    risk_status: Counter = field(default_factory=Counter)
+    risk_category: Counter = field(default_factory=Counter)
+    issue_total: int = 0
+    issue_status: Counter = field(default_factory=Counter)
+    # 未关闭且有截止日期的任务的截止日期（升序），逾期数按查询时间二分得到；快照中不包含
+    open_task_due_dates: List[str] = field(default_factory=list, repr=False)
+    
+    def snapshot(self, at: Optional[datetime] = None) -> "ProjectAggregate":
+        """复制计数并计算指定时间点（默认当前时间）的逾期任务数"""
+        return ProjectAggregate(
+            project_id=self.project_id,
+            task_total=self.task_total,
+            task_status=Counter(self.task_status),
+            task_progress_sum=self.task_progress_sum,
+            overdue_tasks=bisect.bisect_left(self.open_task_due_dates, (at or datetime.now()).isoformat()),
+            risk_total=self.risk_total,
+            risk_level=Counter(self.risk_level),
+            risk_status=Counter(self.risk_status),
+            risk_category=Counter(self.risk_category),
+            issue_total=self.issue_total,
+            issue_status=Counter(self.issue_status)
+        )
+    
+    @property
+    def is_empty(self) -> bool:
+        return self.task_total == 0 and self.risk_total == 0 and self.issue_total == 0
+    
+    @property
+    def high_risks(self) -> int:
+        return sum(self.risk_level[level] for level in HIGH_RISK_LEVELS)
+    
+    @property
+    def resolved_issues(self) -> int:
+        return sum(self.issue_status[status] for status in RESOLVED_ISSUE_STATUSES)
+    
+    @property
+    def open_issues(self) -> int:
+        return self.issue_total - self.resolved_issues
+    
+    def apply(self, collection_name: str, record: Dict[str, Any], sign: int, bulk: bool = False):
+        """计入（sign=1）或移除（sign=-1）一条记录的贡献；bulk为True时截止日期只追加，由调用方最后统一排序"""
+        if collection_name == "tasks":
+            self.task_total += sign
+            self.task_status[record.get("status")] += sign
+            self.task_progress_sum += sign * (record.get("progress_percentage") or 0)
+            due_date = record.get("due_date")
+            if due_date and record.get("status") not in CLOSED_TASK_STATUSES:
+                due_date = str(due_date)
+                if bulk:
+                    self.open_task_due_dates.append(due_date)
+                elif sign > 0:
+                    bisect.insort(self.open_task_due_dates, due_date)
+                else:
+                    position = bisect.bisect_left(self.open_task_due_dates, due_date)
+                    if position < len(self.open_task_due_dates) and self.open_task_due_dates[position] == due_date:
+                        del self.open_task_due_dates[position]
+        elif collection_name == "risks":
+            self.risk_total += sign
+            self.risk_level[record.get("risk_level")] += sign
+            self.risk_status[record.get("status")] += sign
+            self.risk_category[record.get("category", "其他")] += sign
+        elif collection_name == "issues":
+            self.issue_total += sign
+            self.issue_status[record.get("status")] += sign
+
+
+class ProjectAggregateService:
+    """项目聚合统计服务（物化视图）
+    
+    首次查询时全量扫描一次任务、风险、问题集合，此后每次数据变更只按变更前后的记录增减计数，
+    查询耗时与项目的任务数量无关。集合被整体替换（清空、覆盖导入、恢复、其他进程重写）时标记失效，
+    下次查询时重新扫描。
+    """
+    
+    def __init__(self, db: Any = None):
+        """
+        初始化服务
+        
+        Args:
+            db: 数据库实例，默认使用全局数据库服务的实例
+        """
+        self.db = db if db is not None else database_service.get_database()
+        self._aggregates: Dict[str, ProjectAggregate] = {}
+        self._lock = threading.RLock()
+        self._stale = True
+        self.db.changes.subscribe(self._on_change, collections=AGGREGATED_COLLECTIONS)
+        logger.info("项目聚合统计服务初始化完成")
+    
+    def _aggregate(self, project_id: str) -> ProjectAggregate:
+        aggregate = self._aggregates.get(project_id)
+        if aggregate is None:
+            aggregate = self._aggregates[project_id] = ProjectAggregate(project_id)
+        return aggregate
+    
+    def _on_change(self, event: ChangeEvent):
+        """变更流回调（在数据库写锁内调用）"""
+        with self._lock:
+            if self._stale:
+                return
+            if event.op == "replace":
+                self._stale = True
+                return
+            for record, sign in ((event.before, -1), (event.after, 1)):
+                if record is None or record.get("project_id") is None:
+                    continue
+                aggregate = self._aggregate(record["project_id"])
+                aggregate.apply(event.collection, record, sign)
+                if aggregate.is_empty:
+                    del self._aggregates[aggregate.project_id]
+    
+    def rebuild(self):
+        """全量重建聚合统计（持有数据库写锁，期间不会遗漏或重复计入变更）"""
+        with self.db.lock, self._lock:
+            self._aggregates = {}
+            for collection_name in AGGREGATED_COLLECTIONS:
+                for record in self.db.read(collection_name):
+                    if record.get("project_id") is not None:
+                        self._aggregate(record["project_id"]).apply(collection_name, record, 1, bulk=True)
+            for aggregate in self._aggregates.values():
+                aggregate.open_task_due_dates.sort()
+            self._stale = False
+        logger.info(f"项目聚合统计已重建，共 {len(self._aggregates)} 个项目")
+    
+    def get(self, project_id: str, at: Optional[datetime] = None) -> ProjectAggregate:
+        """
+        获取项目聚合统计的快照
+        
+        Args:
+            project_id: 项目ID
+            at: 逾期判断的时间点，默认当前时间
+            
+        Returns:
+            聚合统计（项目没有任何任务、风险、问题时各项为0）
+        """
+        if self._stale:
+            self.rebuild()
+        with self._lock:
+            aggregate = self._aggregates.get(project_id)
+            return aggregate.snapshot(at) if aggregate is not None else ProjectAggregate(project_id)
+    
+    def task_statistics(self, project_id: str, at: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        任务统计
+        
+        Args:
+            project_id: 项目ID
+            at: 逾期判断的时间点，默认当前时间
+        """
+        aggregate = self.get(project_id, at)
+        total = aggregate.task_total
+        completed = aggregate.task_status["已完成"]
+        return {
+            "total": total,
+            "completed": completed,
+            "in_progress": aggregate.task_status["进行中"],
+            "pending": aggregate.task_status["待开始"],
+            "overdue": aggregate.overdue_tasks,
+            "completion_rate": (completed / total * 100) if total > 0 else 0.0,
+            "progress_percentage": (aggregate.task_progress_sum / total) if total > 0 else 0.0
+        }
+    
+    def risk_statistics(self, project_id: str) -> Dict[str, Any]:
+        """风险统计"""
+        aggregate = self.get(project_id)
+        return {
+            "total": aggregate.risk_total,
+            "high": aggregate.high_risks,
+            "medium": aggregate.risk_level["中"],
+            "low": aggregate.risk_level["低"]
+        }
+    
+    def issue_statistics(self, project_id: str) -> Dict[str, Any]:
+        """问题统计"""
+        aggregate = self.get(project_id)
+        return {
+            "total": aggregate.issue_total,
+            "open": aggregate.open_issues,
+            "resolved": aggregate.resolved_issues
+        }
+
+
+# 创建全局服务实例
+project_aggregate_service = ProjectAggregateService()
@@ -1,11 +1,12 @@
 """
 项目服务
 """
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from app.models.project import Project, ProjectCreate, ProjectUpdate, ProjectResponse, ProjectSummary, ProjectStatistics
 from app.services.database_service import database_service
 from app.utils.logger import get_logger
 from app.utils.helpers import generate_id
+from app.utils.query import SortSpec, page_window
 
 logger = get_logger(__name__)
 
@@ -18,22 +19,27 @@ class ProjectService:
         self.db = database_service.get_database()
         logger.info("项目服务初始化完成")
     
-    def get_projects(self, filters: Optional[Dict[str, Any]] = None, search: Optional[str] = None) -> List[ProjectResponse]:
+    def get_projects(self, filters: Optional[Dict[str, Any]] = None, search: Optional[str] = None,
+                     sort: SortSpec = None) -> List[ProjectResponse]:
         """获取项目列表"""
+        projects, _ = self.get_projects_page(filters, search, sort=sort)
+        return projects
+    
+    def get_projects_page(self, filters: Optional[Dict[str, Any]] = None, search: Optional[str] = None,
+                          page: Optional[int] = None, page_size: Optional[int] = None,
+                          sort: SortSpec = None) -> Tuple[List[ProjectResponse], int]:
+        """分页获取项目列表，过滤、搜索、排序与分页均在数据库层完成，只为当前页计算指标"""
         try:
-            projects_data = self.db.read("projects", filters=filters)
-            
-            if search:
-                projects_data = self.db.search("projects", search, ["project_name", "description", "project_code"])
+            offset, limit = page_window(page, page_size)
+            result = self.db.query("projects", filters=filters, sort=sort, offset=offset, limit=limit,
+                                   search=search, search_fields=["project_name", "description", "project_code"])
             
             projects = []
-            for project_data in projects_data:
-                # 计算项目指标
-                project_response = self._calculate_project_metrics(project_data)
-                projects.append(project_response)
+            for project_data in result:
+                projects.append(self._calculate_project_metrics(project_data))
             
-            logger.info(f"获取到 {len(projects)} 个项目")
-            return projects
+            logger.info(f"获取到 {len(projects)} 个项目（共 {result.total} 个）")
+            return projects, result.total
         except Exception as e:
             logger.error(f"获取项目列表失败: {str(e)}")
             raise
@@ -68,6 +68,7 @@ class QwenAgentService:
     def __init__(self):
         """初始化服务"""
         self.db = database_service.get_database()
+        self.async_db = database_service.get_async_database()
         self.api_key = settings.qwen_api_key
         self.model = settings.qwen_model
         self.max_tokens = settings.qwen_max_tokens
@@ -124,7 +125,7 @@ class QwenAgentService:
             self.chat_sessions[session.session_id] = session
             
             # 保存会话到数据库
-            self._save_session(session)
+            await self._save_session(session)
             
             return {
                 "session_id": session.session_id,
@@ -167,7 +168,7 @@ class QwenAgentService:
             # 从项目数据中搜索
             if project_id:
                 # 搜索项目信息
-                project = self.db.read("projects", project_id)
+                project = await self.async_db.read("projects", project_id)
                 if project:
                     doc = RAGDocument(
                         doc_id=f"project_{project_id}",
@@ -187,7 +188,7 @@ class QwenAgentService:
                     ))
                 
                 # 搜索任务信息
-                tasks = self.db.get_by_field("tasks", "project_id", project_id)
+                tasks = await self.async_db.get_by_field("tasks", "project_id", project_id)
                 for task in tasks[:3]:  # 限制数量
                     doc = RAGDocument(
                         doc_id=f"task_{task.get('task_id', '')}",
@@ -207,7 +208,7 @@ class QwenAgentService:
                     ))
                 
                 # 搜索风险信息
-                risks = self.db.get_by_field("risks", "project_id", project_id)
+                risks = await self.async_db.get_by_field("risks", "project_id", project_id)
                 for risk in risks[:2]:  # 限制数量
                     doc = RAGDocument(
                         doc_id=f"risk_{risk.get('risk_id', '')}",
@@ -305,7 +306,7 @@ class QwenAgentService:
                 "error": str(e)
             }
     
-    def _save_session(self, session: ChatSession):
+    async def _save_session(self, session: ChatSession):
         """保存会话到数据库"""
         try:
             session_data = {
@@ -320,11 +321,11 @@ class QwenAgentService:
             }
             
             # 保存到数据库
-            self.db.create("chat_sessions", session_data)
+            await self.async_db.create("chat_sessions", session_data)
         except Exception as e:
             logger.error(f"保存会话失败: {str(e)}")
     
-    def get_chat_history(self, session_id: str) -> List[Dict[str, Any]]:
+    async def get_chat_history(self, session_id: str) -> List[Dict[str, Any]]:
         """获取聊天历史"""
         try:
             if session_id in self.chat_sessions:
@@ -332,7 +333,7 @@ class QwenAgentService:
                 return [asdict(msg) for msg in session.messages]
             else:
                 # 从数据库加载
-                session_data = self.db.read("chat_sessions", session_id)
+                session_data = await self.async_db.read("chat_sessions", session_id)
                 if session_data:
                     return session_data.get("messages", [])
                 return []
@@ -340,10 +341,10 @@ class QwenAgentService:
             logger.error(f"获取聊天历史失败: {str(e)}")
             return []
     
-    def get_user_sessions(self, user_id: str) -> List[Dict[str, Any]]:
+    async def get_user_sessions(self, user_id: str) -> List[Dict[str, Any]]:
         """获取用户的所有会话"""
         try:
-            sessions = self.db.get_by_field("chat_sessions", "user_id", user_id)
+            sessions = await self.async_db.get_by_field("chat_sessions", "user_id", user_id)
             return [
                 {
                     "session_id": session["session_id"],
@@ -359,14 +360,14 @@ class QwenAgentService:
             logger.error(f"获取用户会话失败: {str(e)}")
             return []
     
-    def close_session(self, session_id: str) -> bool:
+    async def close_session(self, session_id: str) -> bool:
         """关闭会话"""
         try:
             if session_id in self.chat_sessions:
                 session = self.chat_sessions[session_id]
                 session.is_active = False
                 session.updated_at = datetime.now()
-                self._save_session(session)
+                await self._save_session(session)
                 return True
             return False
         except Exception as e:
@@ -451,7 +452,7 @@ class QwenAgentService:
             task_data["status"] = "待开始"
             task_data["progress_percentage"] = 0
             
-            created_task = self.db.create("tasks", task_data)
+            created_task = await self.async_db.create("tasks", task_data)
             
             return {
                 "action": "task_created",
@@ -477,7 +478,7 @@ class QwenAgentService:
         """处理查询任务请求"""
         try:
             # 获取项目任务
-            tasks = self.db.get_by_field("tasks", "project_id", project_id)
+            tasks = await self.async_db.get_by_field("tasks", "project_id", project_id)
             
             # 使用AI分析查询意图
             analysis_prompt = f"""
@@ -511,8 +512,8 @@ class QwenAgentService:
         """处理分析进度请求"""
         try:
             # 获取项目数据
-            project = self.db.read("projects", project_id)
-            tasks = self.db.get_by_field("tasks", "project_id", project_id)
+            project = await self.async_db.read("projects", project_id)
+            tasks = await self.async_db.get_by_field("tasks", "project_id", project_id)
             
             # 计算进度统计
             total_tasks = len(tasks)
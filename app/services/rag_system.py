@@ -7,12 +7,22 @@ import dashscope
 from http import HTTPStatus
 from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, replace
 import re
 import os
+import threading
+from pathlib import Path
+from app.utils.embedding_index import EmbeddingIndex, normalize_rows
+from app.utils.ann_index import IVFIndex
+from app.utils.bm25_index import BM25Index, reciprocal_rank_fusion
 from app.utils.logger import get_logger
+from app.utils.mapped_vector_store import MappedVectorStore
+from app.utils.corpus_pipeline import KnowledgeBase
+from app.utils.embedding_client import EmbeddingClient, EmbeddingRequestError
+from app.utils.query_cache import EmbeddingCache, ResultCache, normalize_query
 from app.services.database_service import database_service
 from app.services.qwen_agent import RAGDocument, RAGSearchResult
+from config.settings import settings
 
 logger = get_logger(__name__)
 
@@ -34,6 +44,7 @@ class PMBOKDocument:
     section: str
     document_type: str = "PMBOK"
     source_file: str = "PMBOK第七版中文版"
+    end_page: Optional[int] = None  # 跨页文本块的结束页码
 
 
 class RAGSystem:
@@ -42,10 +53,52 @@ class RAGSystem:
     def __init__(self):
         """初始化RAG系统"""
         self.db = database_service.get_database()
-        self.vector_db = {}  # 简化版向量数据库
         self.embedding_dim = 1024  # text-embedding-v4的默认维度
+        # 向量库：int8量化后内存映射到磁盘，按项目ID与文档类型过滤
+        vector_store_path = getattr(settings, "vector_store_path", None) \
+            or Path(settings.json_database_path).parent / "vector_store"
+        self.vector_store = MappedVectorStore(vector_store_path, self.embedding_dim,
+                                              fields=("project_id", "doc_type"),
+                                              dtype=getattr(settings, "vector_store_dtype", "int8"))
+        # 检索方式：flat（精确检索）或 ivf（IVF近似检索，nprobe越大召回率越高）
+        if getattr(settings, "vector_index", "flat") == "ivf":
+            self.vector_store.attach_index(IVFIndex(nprobe=getattr(settings, "vector_index_nprobe", 8)))
         self.embedding_model = "text-embedding-v4"  # 使用阿里云text-embedding-v4模型
+        # 批量嵌入客户端：text-embedding-v4单次最多10条文本，批次并发执行并统一限速
+        self.embedding_client = EmbeddingClient(
+            self._request_embeddings,
+            batch_size=getattr(settings, "embedding_batch_size", 10),
+            max_concurrency=getattr(settings, "embedding_max_concurrency", 4),
+            requests_per_second=getattr(settings, "embedding_requests_per_second", 5.0),
+            max_retries=getattr(settings, "embedding_max_retries", 3)
+        )
         self.pmbok_documents = []  # PMBOK文档存储
+        # 知识库索引：资料目录下每份语料一个分片（文本块与按内容哈希持久化的嵌入）
+        pmbok_index_path = getattr(settings, "pmbok_index_path", None) \
+            or Path(settings.json_database_path).parent / "pmbok_index"
+        self.knowledge_base = KnowledgeBase(pmbok_index_path, self.embedding_model, self.embedding_dim)
+        # 已建立索引的PMBOK文档块的下标及其向量矩阵
+        self._pmbok_positions = np.zeros(0, dtype=np.int64)
+        self._pmbok_matrix = np.zeros((0, self.embedding_dim), dtype=np.float32)
+        # 后台构建线程；_pmbok_lock保护文档块与索引的整体替换，_pmbok_ingest_lock使导入串行执行
+        self._pmbok_build_thread: Optional[threading.Thread] = None
+        self._pmbok_lock = threading.Lock()
+        self._pmbok_ingest_lock = threading.Lock()
+        # BM25词法索引：与向量检索结果按倒数排名融合，不依赖嵌入服务
+        self.hybrid_search = getattr(settings, "hybrid_search", True)
+        self.document_bm25 = BM25Index()
+        self._document_bm25_built = False
+        self.pmbok_bm25 = BM25Index()
+        # 查询缓存：规范化查询 -> 查询嵌入（持久化，重启后重复的查询不再请求嵌入服务），
+        # 以及按查询嵌入分桶、过滤条件与索引版本缓存的检索结果
+        query_cache_path = getattr(settings, "query_cache_path", None) \
+            or Path(settings.json_database_path).parent / "query_embeddings"
+        self.query_embeddings = EmbeddingCache(query_cache_path, self.embedding_model, self.embedding_dim,
+                                               capacity=getattr(settings, "query_embedding_cache_size", 10000))
+        self.result_cache = ResultCache(self.embedding_dim,
+                                        capacity=getattr(settings, "search_result_cache_size", 1024))
+        # PMBOK索引版本：每次重新挂载文档块与向量后递增
+        self._pmbok_version = 0
         logger.info("RAG检索系统初始化完成，使用text-embedding-v4模型")
     
     def add_document(self, document: RAGDocument) -> bool:
@@ -68,11 +121,8 @@ class RAGSystem:
                 created_at=datetime.now()
             )
             
-            # 存储到向量数据库
-            self.vector_db[document.doc_id] = vector_embedding
-            
-            # 保存到持久化存储
-            self._save_embedding(vector_embedding)
+            # 存储到向量库（同时持久化）
+            self._store_embeddings([vector_embedding])
             
             logger.info(f"文档 {document.doc_id} 已添加到RAG系统")
             return True
@@ -80,49 +130,102 @@ class RAGSystem:
             logger.error(f"添加文档失败: {str(e)}")
             return False
     
+    def _fusion_depth(self, top_k: int) -> int:
+        """混合检索时每一路取出的候选数量"""
+        return max(top_k * 4, 20)
+    
+    def _document_lexical_index(self) -> BM25Index:
+        """项目文档的BM25索引（首次使用时从向量库的元数据构建，之后随文档增删更新）"""
+        if not self._document_bm25_built:
+            for doc_id, payload in self.vector_store.items():
+                self.document_bm25.add(doc_id, f"{payload['title']}\n{payload['content']}")
+            self._document_bm25_built = True
+        return self.document_bm25
+    
+    def _embed_query(self, query: str) -> Tuple[List[float], bool]:
+        """
+        生成查询嵌入（规范化后相同的查询直接使用缓存）
+        
+        Returns:
+            (查询嵌入, 是否来自嵌入服务)；嵌入服务不可用时降级为简化版向量，既不缓存嵌入也不缓存检索结果
+        """
+        cached = self.query_embeddings.get(query)
+        if cached is not None:
+            return cached, True
+        try:
+            embedding = self._request_embeddings([query])[0]
+        except Exception as e:
+            logger.error(f"生成查询嵌入时发生错误: {str(e)}")
+            return self._fallback_embedding(query), False
+        self.query_embeddings.put(query, embedding)
+        return embedding, True
+    
+    def _lexical_key(self, query: str) -> Optional[str]:
+        """结果缓存键中的查询文本：混合检索的BM25一路由查询原文决定，嵌入同桶的不同查询不能共用结果"""
+        return normalize_query(query) if self.hybrid_search else None
+    
     def search_documents(self, query: str, top_k: int = 5, 
                         project_id: Optional[str] = None,
                         doc_types: Optional[List[str]] = None) -> List[RAGSearchResult]:
-        """搜索相关文档"""
+        """搜索相关文档（向量检索与BM25检索按倒数排名融合）"""
         try:
             # 生成查询嵌入
-            query_embedding = self._generate_embedding(query)
-            
-            # 计算相似度
-            similarities = []
-            for doc_id, vector_embedding in self.vector_db.items():
-                # 过滤条件
-                if project_id and vector_embedding.metadata.get("project_id") != project_id:
-                    continue
-                if doc_types and vector_embedding.metadata.get("doc_type") not in doc_types:
-                    continue
-                
-                # 计算余弦相似度
-                similarity = self._cosine_similarity(query_embedding, vector_embedding.embedding)
+            query_embedding, cacheable = self._embed_query(query)
+            
+            # 向量库版本未变化时，嵌入落在同一分桶的查询直接返回缓存的结果
+            if cacheable:
+                bucket = self.result_cache.bucket(query_embedding)
+                key = (top_k, project_id, tuple(doc_types or ()), self._lexical_key(query))
+                cached = self.result_cache.get("documents", bucket, key, self.vector_store.version)
+                if cached is not None:
+                    logger.info(f"搜索查询 '{query}' 命中结果缓存，返回 {len(cached)} 个结果")
+                    return [replace(result) for result in cached]
+            
+            # 过滤条件
+            filters = {}
+            if project_id:
+                filters["project_id"] = project_id
+            if doc_types:
+                filters["doc_type"] = list(doc_types)
+            
+            # 一次矩阵乘法计算全部相似度，取前k个结果
+            depth = self._fusion_depth(top_k) if self.hybrid_search else top_k
+            hits = {doc_id: (similarity, payload)
+                    for doc_id, similarity, payload in self.vector_store.search(query_embedding, depth, filters)}
+            ranked = list(hits)
+            
+            if self.hybrid_search:
+                # 词法检索命中嵌入漏掉的专有名词（如“挣值”“WBS”），嵌入服务不可用时仍能给出可靠结果
+                def accept(doc_id: str) -> bool:
+                    payload = self.vector_store.metadata(doc_id)
+                    return payload is not None \
+                        and (not project_id or payload["project_id"] == project_id) \
+                        and (not doc_types or payload["doc_type"] in doc_types)
                 
-                similarities.append({
-                    "doc_id": doc_id,
-                    "similarity": similarity,
-                    "vector_embedding": vector_embedding
-                })
+                lexical = [doc_id for doc_id, _ in self._document_lexical_index().search(query, depth, accept)]
+                ranked = [doc_id for doc_id, _ in reciprocal_rank_fusion([ranked, lexical])]
+                query_vector = normalize_rows(np.asarray(query_embedding, dtype=np.float32))
             
-            # 按相似度排序
-            similarities.sort(key=lambda x: x["similarity"], reverse=True)
-            
-            # 返回前k个结果
             results = []
-            for item in similarities[:top_k]:
-                vector_embedding = item["vector_embedding"]
+            for doc_id in ranked[:top_k]:
+                if doc_id in hits:
+                    similarity, payload = hits[doc_id]
+                else:
+                    vector, payload = self.vector_store.get(doc_id)
+                    similarity = float(vector @ query_vector)
                 result = RAGSearchResult(
-                    doc_id=item["doc_id"],
-                    title=vector_embedding.metadata["title"],
-                    content=vector_embedding.metadata["content"],
-                    doc_type=vector_embedding.metadata["doc_type"],
-                    relevance_score=item["similarity"],
-                    metadata=vector_embedding.metadata["metadata"]
+                    doc_id=doc_id,
+                    title=payload["title"],
+                    content=payload["content"],
+                    doc_type=payload["doc_type"],
+                    relevance_score=similarity,
+                    metadata=payload["metadata"]
                 )
                 results.append(result)
             
+            if cacheable:
+                self.result_cache.put("documents", bucket, key, self.vector_store.version,
+                                      [replace(result) for result in results])
             logger.info(f"搜索查询 '{query}' 返回 {len(results)} 个结果")
             return results
         except Exception as e:
@@ -153,7 +256,7 @@ class RAGSystem:
                 logger.error(f"DashScope API调用失败: {resp.message}")
                 # 降级到简化版向量化
                 return self._fallback_embedding(text)
-                
+        
         except Exception as e:
             logger.error(f"生成文本嵌入时发生错误: {str(e)}")
             # 降级到简化版向量化
@@ -191,38 +294,44 @@ class RAGSystem:
         
         return embedding
     
+    def _request_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """调用DashScope批量生成文本嵌入（失败时抛出异常，不降级）"""
+        # 检查并截断过长的文本
+        processed_texts = []
+        for text in texts:
+            if len(text) > 8192:
+                text = text[:8192]
+                logger.warning(f"批量处理中截断过长文本到8192字符")
+            processed_texts.append(text)
+        
+        # 调用阿里云DashScope的text-embedding-v4模型进行批量处理
+        resp = dashscope.TextEmbedding.call(
+            model=self.embedding_model,
+            input=processed_texts,
+            dimension=self.embedding_dim
+        )
+        
+        if resp.status_code != HTTPStatus.OK:
+            raise EmbeddingRequestError(f"DashScope批量API调用失败: {resp.message}", resp.status_code)
+        
+        # 按输入顺序提取嵌入向量
+        embeddings = sorted(resp.output['embeddings'], key=lambda item: item.get('text_index', 0))
+        logger.debug(f"成功批量生成{len(embeddings)}个文本嵌入")
+        return [item['embedding'] for item in embeddings]
+    
+    def _embed_texts(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """通过批量嵌入客户端生成嵌入（按批并发、限速、失败重试），生成失败的文本为None"""
+        return self.embedding_client.embed_sync(texts)
+    
     def _generate_batch_embeddings(self, texts: List[str]) -> List[List[float]]:
-        """批量生成文本嵌入，提高效率"""
+        """批量生成文本嵌入，只有生成失败的文本降级为简化版向量"""
         try:
-            # 检查并截断过长的文本
-            processed_texts = []
-            for text in texts:
-                if len(text) > 8192:
-                    text = text[:8192]
-                    logger.warning(f"批量处理中截断过长文本到8192字符")
-                processed_texts.append(text)
-            
-            # 调用阿里云DashScope的text-embedding-v4模型进行批量处理
-            resp = dashscope.TextEmbedding.call(
-                model=self.embedding_model,
-                input=processed_texts,
-                dimension=self.embedding_dim
-            )
-            
-            if resp.status_code == HTTPStatus.OK:
-                # 提取所有嵌入向量
-                embeddings = [item['embedding'] for item in resp.output['embeddings']]
-                logger.debug(f"成功批量生成{len(embeddings)}个文本嵌入")
-                return embeddings
-            else:
-                logger.error(f"DashScope批量API调用失败: {resp.message}")
-                # 降级到单个处理
-                return [self._fallback_embedding(text) for text in processed_texts]
-                
+            embeddings = self._embed_texts(texts)
         except Exception as e:
             logger.error(f"批量生成文本嵌入时发生错误: {str(e)}")
-            # 降级到单个处理
-            return [self._fallback_embedding(text) for text in texts]
+            embeddings = [None] * len(texts)
+        return [embedding if embedding is not None else self._fallback_embedding(text)
+                for text, embedding in zip(texts, embeddings)]
     
     def _cosine_similarity(self, vec1: List[float], vec2: List[float]) -> float:
         """计算余弦相似度"""
@@ -245,37 +354,39 @@ class RAGSystem:
             logger.error(f"计算余弦相似度失败: {str(e)}")
             return 0.0
     
-    def _save_embedding(self, vector_embedding: VectorEmbedding):
-        """保存嵌入到数据库"""
-        try:
-            embedding_data = {
-                "doc_id": vector_embedding.doc_id,
-                "embedding": vector_embedding.embedding,
-                "metadata": vector_embedding.metadata,
-                "created_at": vector_embedding.created_at.isoformat()
-            }
-            
-            # 保存到数据库
-            self.db.create("vector_embeddings", embedding_data)
-        except Exception as e:
-            logger.error(f"保存嵌入失败: {str(e)}")
+    def _store_embeddings(self, vector_embeddings: List[VectorEmbedding]):
+        """批量写入向量库（元数据附带创建时间，重复的doc_id覆盖旧向量），同时更新BM25索引"""
+        self.vector_store.add_many(
+            [vector_embedding.doc_id for vector_embedding in vector_embeddings],
+            [vector_embedding.embedding for vector_embedding in vector_embeddings],
+            [dict(vector_embedding.metadata, created_at=vector_embedding.created_at.isoformat())
+             for vector_embedding in vector_embeddings]
+        )
+        if self._document_bm25_built:
+            for vector_embedding in vector_embeddings:
+                metadata = vector_embedding.metadata
+                self.document_bm25.add(vector_embedding.doc_id, f"{metadata['title']}\n{metadata['content']}")
     
     def load_embeddings(self):
-        """从数据库加载嵌入"""
+        """加载嵌入：向量库打开时已从磁盘映射，这里只迁移旧版本保存在数据库中的嵌入"""
         try:
             embeddings = self.db.read("vector_embeddings")
+            if not embeddings:
+                logger.info(f"向量库中共有 {len(self.vector_store)} 个嵌入向量")
+                return
+            
+            # 旧版本以JSON浮点数组保存在vector_embeddings集合中，迁移到向量库后清空该集合
+            self.vector_store.add_many(
+                [embedding_data["doc_id"] for embedding_data in embeddings],
+                [embedding_data["embedding"] for embedding_data in embeddings],
+                [dict(embedding_data["metadata"], created_at=embedding_data["created_at"]) for embedding_data in embeddings]
+            )
+            self.db.clear_collection("vector_embeddings")
+            # 迁移的文档在下次检索时重新建立BM25索引
+            self.document_bm25.clear()
+            self._document_bm25_built = False
             
-            for embedding_data in embeddings:
-                vector_embedding = VectorEmbedding(
-                    doc_id=embedding_data["doc_id"],
-                    embedding=embedding_data["embedding"],
-                    metadata=embedding_data["metadata"],
-                    created_at=datetime.fromisoformat(embedding_data["created_at"])
-                )
-                
-                self.vector_db[vector_embedding.doc_id] = vector_embedding
-            
-            logger.info(f"加载了 {len(embeddings)} 个嵌入向量")
+            logger.info(f"已将 {len(embeddings)} 个嵌入向量从数据库迁移到向量库")
         except Exception as e:
             logger.error(f"加载嵌入失败: {str(e)}")
     
@@ -360,6 +471,7 @@ class RAGSystem:
             embeddings = self._generate_batch_embeddings(texts)
             
             indexed_count = 0
+            vector_embeddings = []
             for i, doc in enumerate(documents):
                 try:
                     # 创建向量嵌入对象
@@ -376,21 +488,20 @@ class RAGSystem:
                         created_at=datetime.now()
                     )
                     
-                    # 存储到向量数据库
-                    self.vector_db[doc.doc_id] = vector_embedding
-                    
-                    # 保存到持久化存储
-                    self._save_embedding(vector_embedding)
-                    
+                    vector_embeddings.append(vector_embedding)
                     indexed_count += 1
                     logger.debug(f"文档 {doc.doc_id} 已添加到RAG系统")
-                    
+                
                 except Exception as e:
                     logger.error(f"添加文档 {doc.doc_id} 失败: {str(e)}")
             
+            # 批量写入向量库，只落盘一次
+            if vector_embeddings:
+                self._store_embeddings(vector_embeddings)
+            
             logger.info(f"批量索引完成，成功索引 {indexed_count}/{len(documents)} 个文档")
             return indexed_count
-            
+        
         except Exception as e:
             logger.error(f"批量索引文档失败: {str(e)}")
             return 0
@@ -398,17 +509,18 @@ class RAGSystem:
     def get_document(self, doc_id: str) -> Optional[RAGDocument]:
         """获取文档"""
         try:
-            if doc_id in self.vector_db:
-                vector_embedding = self.vector_db[doc_id]
+            stored = self.vector_store.get(doc_id)
+            if stored is not None:
+                embedding, payload = stored
                 return RAGDocument(
-                    doc_id=vector_embedding.doc_id,
-                    title=vector_embedding.metadata["title"],
-                    content=vector_embedding.metadata["content"],
-                    doc_type=vector_embedding.metadata["doc_type"],
-                    project_id=vector_embedding.metadata["project_id"],
-                    metadata=vector_embedding.metadata["metadata"],
-                    embedding=vector_embedding.embedding,
-                    created_at=vector_embedding.created_at
+                    doc_id=doc_id,
+                    title=payload["title"],
+                    content=payload["content"],
+                    doc_type=payload["doc_type"],
+                    project_id=payload["project_id"],
+                    metadata=payload["metadata"],
+                    embedding=embedding.tolist(),
+                    created_at=datetime.fromisoformat(payload["created_at"])
                 )
             return None
         except Exception as e:
@@ -418,12 +530,8 @@ class RAGSystem:
     def delete_document(self, doc_id: str) -> bool:
         """删除文档"""
         try:
-            if doc_id in self.vector_db:
-                del self.vector_db[doc_id]
-                
-                # 从数据库删除
-                self.db.delete("vector_embeddings", doc_id)
-                
+            if self.vector_store.delete(doc_id):
+                self.document_bm25.remove(doc_id)
                 logger.info(f"文档 {doc_id} 已删除")
                 return True
             return False
@@ -434,19 +542,13 @@ class RAGSystem:
     def get_system_statistics(self) -> Dict[str, Any]:
         """获取系统统计信息"""
         try:
-            total_documents = len(self.vector_db)
-            
-            # 按类型统计
-            type_stats = {}
-            for vector_embedding in self.vector_db.values():
-                doc_type = vector_embedding.metadata.get("doc_type", "unknown")
-                type_stats[doc_type] = type_stats.get(doc_type, 0) + 1
+            total_documents = len(self.vector_store)
             
-            # 按项目统计
-            project_stats = {}
-            for vector_embedding in self.vector_db.values():
-                project_id = vector_embedding.metadata.get("project_id", "unknown")
-                project_stats[project_id] = project_stats.get(project_id, 0) + 1
+            # 按类型、项目统计（缺失值计入unknown）
+            type_stats = {("unknown" if key is None else key): count
+                          for key, count in self.vector_store.field_counts("doc_type").items()}
+            project_stats = {("unknown" if key is None else key): count
+                             for key, count in self.vector_store.field_counts("project_id").items()}
             
             return {
                 "total_documents": total_documents,
@@ -459,155 +561,178 @@ class RAGSystem:
             logger.error(f"获取系统统计信息失败: {str(e)}")
             return {}
     
+    def _ingest_knowledge(self, pmbok_dir: str, embed: bool) -> Dict[str, int]:
+        """导入资料目录下的全部语料（未变化的语料直接复用分片），并刷新文档块列表"""
+        # 启动加载与后台构建可能同时进行，导入过程串行执行
+        with self._pmbok_ingest_lock:
+            stats = self.knowledge_base.ingest(
+                pmbok_dir,
+                embed_batch=self._embed_texts if embed else None,
+                workers=getattr(settings, "knowledge_ingest_workers", None),
+                # 每次交给嵌入客户端的文本数，客户端再按服务商上限切分并发请求
+                batch_size=getattr(settings, "knowledge_embed_chunk", 200),
+                target_tokens=getattr(settings, "pmbok_chunk_tokens", 400),
+                max_tokens=getattr(settings, "pmbok_chunk_max_tokens", 500),
+                overlap_tokens=getattr(settings, "pmbok_chunk_overlap_tokens", 80)
+            )
+            self._attach_pmbok_index([
+                PMBOKDocument(
+                    content=chunk.content,
+                    page_number=chunk.page_number,
+                    section=chunk.section,
+                    document_type="PMBOK",
+                    source_file=shard.corpus.name,
+                    end_page=chunk.end_page
+                )
+                for shard in self.knowledge_base.shards
+                for chunk in shard.chunks
+            ])
+        return stats
+    
     def load_pmbok_documents(self, pmbok_dir: str = "PMBOK第七版中英文资料") -> bool:
-        """加载PMBOK文档并解析页码信息"""
+        """
+        加载资料目录下全部语料的文档块（带页码与所属章节的重叠文本块）及已构建的嵌入
+        
+        有文档块尚未建立嵌入时在后台线程中构建索引（可通过pmbok_background_build配置关闭），
+        构建完成前检索只使用BM25。
+        """
         try:
-            # 构建文件路径
-            full_md_path = os.path.join(pmbok_dir, "0- PMBOK指南 第七版_中文版.pdf-3bf8755e-73b1-4670-863e-8a3846f244be", "full.md")
-            layout_json_path = os.path.join(pmbok_dir, "0- PMBOK指南 第七版_中文版.pdf-3bf8755e-73b1-4670-863e-8a3846f244be", "layout.json")
-            
-            if not os.path.exists(full_md_path) or not os.path.exists(layout_json_path):
-                logger.error(f"PMBOK文档文件不存在: {full_md_path} 或 {layout_json_path}")
+            if not os.path.isdir(pmbok_dir):
+                logger.error(f"PMBOK资料目录不存在: {pmbok_dir}")
                 return False
             
-            # 读取布局信息
-            with open(layout_json_path, 'r', encoding='utf-8') as f:
-                layout_data = json.load(f)
-            
-            # 构建页码到内容的映射
-            page_content_map = {}
-            for page_info in layout_data.get("pdf_info", []):
-                page_idx = page_info.get("page_idx", 0)
-                for block in page_info.get("para_blocks", []):
-                    if block.get("type") == "text":
-                        for line in block.get("lines", []):
-                            for span in line.get("spans", []):
-                                content = span.get("content", "").strip()
-                                if content:
-                                    if page_idx not in page_content_map:
-                                        page_content_map[page_idx] = []
-                                    page_content_map[page_idx].append(content)
-            
-            # 读取完整文档内容
-            with open(full_md_path, 'r', encoding='utf-8') as f:
-                full_content = f.read()
-            
-            # 按章节分割内容
-            sections = self._split_pmbok_sections(full_content)
-            
-            # 为每个章节创建文档块
-            self.pmbok_documents = []
-            for section_name, section_content in sections.items():
-                # 尝试匹配页码
-                page_number = self._extract_page_number_from_section(section_content, page_content_map)
-                
-                # 创建PMBOK文档块
-                pmbok_doc = PMBOKDocument(
-                    content=section_content,
-                    page_number=page_number,
-                    section=section_name,
-                    document_type="PMBOK",
-                    source_file="PMBOK第七版中文版"
-                )
-                self.pmbok_documents.append(pmbok_doc)
+            # 源文件未变化的语料直接加载分片，其余语料在进程池中并行解析
+            self._ingest_knowledge(pmbok_dir, embed=False)
+            if not self.pmbok_documents:
+                logger.error(f"PMBOK资料目录中没有可用的语料: {pmbok_dir}")
+                return False
             
-            logger.info(f"成功加载{len(self.pmbok_documents)}个PMBOK文档块")
+            logger.info(f"成功加载{len(self.knowledge_base.shards)}份语料，共{len(self.pmbok_documents)}个文档块")
+            if len(self._pmbok_positions) < len(self.pmbok_documents) \
+                    and getattr(settings, "pmbok_background_build", True):
+                self.start_pmbok_index_build(pmbok_dir)
             return True
-            
+        
         except Exception as e:
             logger.error(f"加载PMBOK文档失败: {str(e)}")
             return False
     
-    def _split_pmbok_sections(self, content: str) -> Dict[str, str]:
-        """分割PMBOK文档为章节"""
-        sections = {}
-        current_section = "前言"
-        current_content = []
-        
-        lines = content.split('\n')
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-                
-            # 检测章节标题
-            if line.startswith('# ') and len(line) > 2:
-                # 保存前一章节
-                if current_content:
-                    sections[current_section] = '\n'.join(current_content)
-                
-                # 开始新章节
-                current_section = line[2:].strip()
-                current_content = [line]
-            else:
-                current_content.append(line)
-        
-        # 保存最后一章节
-        if current_content:
-            sections[current_section] = '\n'.join(current_content)
-        
-        return sections
+    def _attach_pmbok_index(self, documents: List[PMBOKDocument]):
+        """将文档块与各分片嵌入索引中的向量对应起来，并为全部文档块建立BM25索引，构建完成后一起替换"""
+        bm25 = BM25Index()
+        for position, doc in enumerate(documents):
+            bm25.add(position, f"{doc.section}\n{doc.content}")
+        positions, matrices = [], []
+        offset = 0
+        for shard in self.knowledge_base.shards:
+            rows = shard.index.rows_for([chunk.content for chunk in shard.chunks])
+            indexed = np.flatnonzero(rows >= 0)
+            positions.append(indexed + offset)
+            matrices.append(shard.index.vectors[rows[indexed]])
+            offset += len(shard.chunks)
+        with self._pmbok_lock:
+            self.pmbok_documents = documents
+            self.pmbok_bm25 = bm25
+            self._pmbok_positions = np.concatenate(positions) if positions else np.zeros(0, dtype=np.int64)
+            self._pmbok_matrix = np.vstack(matrices) if matrices \
+                else np.zeros((0, self.embedding_dim), dtype=np.float32)
+            self._pmbok_version += 1
+        missing = len(documents) - len(self._pmbok_positions)
+        if missing:
+            logger.warning(f"{missing} 个PMBOK文档块尚未建立嵌入索引，请运行 build_pmbok_index()")
     
-    def _extract_page_number_from_section(self, section_content: str, page_content_map: Dict[int, List[str]]) -> int:
-        """从章节内容中提取页码信息"""
-        try:
-            # 简单的页码匹配逻辑
-            # 查找章节内容在哪个页面中出现
-            section_words = section_content.split()[:10]  # 取前10个词进行匹配
-            
-            best_match_page = 1
-            max_matches = 0
-            
-            for page_num, page_contents in page_content_map.items():
-                matches = 0
-                for word in section_words:
-                    for content in page_contents:
-                        if word in content:
-                            matches += 1
-                            break
-                
-                if matches > max_matches:
-                    max_matches = matches
-                    best_match_page = page_num
+    def build_pmbok_index(self, pmbok_dir: str = "PMBOK第七版中英文资料") -> Dict[str, int]:
+        """
+        离线构建知识库索引：逐份语料解析分块并批量生成嵌入，源文件未变化的语料跳过解析，
+        内容未变化的文本块直接复用已有嵌入
+        
+        Args:
+            pmbok_dir: PMBOK资料目录
             
-            return best_match_page
+        Returns:
+            构建统计（corpora、parsed、skipped、chunks、reused、embedded、failed）
+        """
+        try:
+            return self._ingest_knowledge(pmbok_dir, embed=True)
         except Exception as e:
-            logger.error(f"提取页码失败: {str(e)}")
-            return 1
+            logger.error(f"构建知识库索引失败: {str(e)}")
+            return {"corpora": 0, "parsed": 0, "skipped": 0, "chunks": 0, "reused": 0, "embedded": 0, "failed": 0}
+    
+    def start_pmbok_index_build(self, pmbok_dir: str = "PMBOK第七版中英文资料") -> threading.Thread:
+        """在后台线程中构建知识库索引（已有构建在进行时直接返回该线程）"""
+        with self._pmbok_lock:
+            if self._pmbok_build_thread is None or not self._pmbok_build_thread.is_alive():
+                self._pmbok_build_thread = threading.Thread(
+                    target=self.build_pmbok_index, args=(pmbok_dir,), name="PMBOKIndexBuilder", daemon=True
+                )
+                self._pmbok_build_thread.start()
+                logger.info("已在后台开始构建PMBOK嵌入索引")
+            return self._pmbok_build_thread
     
     def search_pmbok_knowledge(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
-        """搜索PMBOK知识库"""
+        """搜索PMBOK知识库（嵌入索引尚未就绪时只使用BM25检索，不在请求中构建索引）"""
         try:
-            if not self.pmbok_documents:
+            # 取同一版本的文档块与索引，后台构建完成时整体替换
+            with self._pmbok_lock:
+                documents, bm25 = self.pmbok_documents, self.pmbok_bm25
+                indexed_positions, matrix, version = self._pmbok_positions, self._pmbok_matrix, self._pmbok_version
+            if not documents:
                 logger.warning("PMBOK文档未加载，请先调用load_pmbok_documents()")
                 return []
             
-            # 生成查询向量
-            query_embedding = self._generate_embedding(query)
-            
-            # 计算相似度
-            results = []
-            for doc in self.pmbok_documents:
-                doc_embedding = self._generate_embedding(doc.content)
-                similarity = self._cosine_similarity(query_embedding, doc_embedding)
-                
-                results.append({
-                    "content": doc.content,
-                    "page_number": doc.page_number,
-                    "section": doc.section,
-                    "similarity": similarity,
-                    "source": doc.source_file
-                })
-            
-            # 按相似度排序
-            results.sort(key=lambda x: x["similarity"], reverse=True)
-            
-            return results[:top_k]
+            if not len(indexed_positions):
+                logger.warning("PMBOK嵌入索引尚未就绪（后台构建中或未构建），仅返回BM25检索结果")
+                ranked = [(position, 0.0) for position, _ in bm25.search(query, top_k)]
+                return [self._pmbok_result(documents[position], similarity) for position, similarity in ranked]
+            
+            # 生成查询向量，与全部文档块向量做一次矩阵乘法
+            query_embedding, cacheable = self._embed_query(query)
+            
+            if cacheable:
+                bucket = self.result_cache.bucket(query_embedding)
+                key = (top_k, self._lexical_key(query))
+                cached = self.result_cache.get("pmbok", bucket, key, version)
+                if cached is not None:
+                    return [dict(result) for result in cached]
+            
+            if self.hybrid_search:
+                # 向量检索与BM25检索各取一批候选，按倒数排名融合
+                depth = self._fusion_depth(top_k)
+                semantic = [int(indexed_positions[row])
+                            for row, _ in EmbeddingIndex.top_k(matrix, query_embedding, depth)]
+                lexical = [position for position, _ in bm25.search(query, depth)]
+                positions = [position for position, _ in reciprocal_rank_fusion([semantic, lexical])[:top_k]]
+                # 融合结果的相似度仍报告余弦相似度（尚未建立嵌入的文档块为0）
+                query_vector = normalize_rows(np.asarray(query_embedding, dtype=np.float32))
+                rows = np.searchsorted(indexed_positions, positions)
+                ranked = []
+                for position, row in zip(positions, rows.tolist()):
+                    indexed = row < len(indexed_positions) and indexed_positions[row] == position
+                    ranked.append((position, float(matrix[row] @ query_vector) if indexed else 0.0))
+            else:
+                ranked = [(int(indexed_positions[row]), similarity)
+                          for row, similarity in EmbeddingIndex.top_k(matrix, query_embedding, top_k)]
             
+            results = [self._pmbok_result(documents[position], similarity) for position, similarity in ranked]
+            if cacheable:
+                self.result_cache.put("pmbok", bucket, key, version, [dict(result) for result in results])
+            return results
+        
         except Exception as e:
             logger.error(f"搜索PMBOK知识库失败: {str(e)}")
             return []
     
+    @staticmethod
+    def _pmbok_result(doc: PMBOKDocument, similarity: float) -> Dict[str, Any]:
+        return {
+            "content": doc.content,
+            "page_number": doc.page_number,
+            "end_page": doc.end_page,
+            "section": doc.section,
+            "similarity": similarity,
+            "source": doc.source_file
+        }
+    
     def validate_page_references(self, claimed_pages: List[int], search_results: List[Dict[str, Any]]) -> List[int]:
         """验证页码引用，防止幻觉页码"""
         try:
@@ -632,7 +757,7 @@ class RAGSystem:
                             break
             
             return validated_pages
-            
+        
         except Exception as e:
             logger.error(f"验证页码引用失败: {str(e)}")
             return claimed_pages
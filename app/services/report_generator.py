@@ -10,6 +10,7 @@ from dataclasses import dataclass
 from app.models.enums import ReportType, ReportFormat
 from app.utils.logger import get_logger
 from app.services.database_service import database_service
+from app.services.project_aggregates import project_aggregate_service
 from app.services.project_service import project_service
 from app.services.task_service import task_service
 from app.services.risk_service import risk_service
@@ -325,20 +326,14 @@ class ReportGeneratorService:
                 if project and project.status == "进行中":
                     active_projects += 1
                 
-                # 任务统计
-                tasks = task_service.get_project_tasks(project_id)
-                total_tasks += len(tasks)
-                completed_tasks += len([t for t in tasks if t.status == "已完成"])
-                
-                # 风险统计
-                risks = risk_service.get_project_risks(project_id)
-                total_risks += len(risks)
-                high_risks += len([r for r in risks if r.risk_level in ["高", "严重"]])
-                
-                # 问题统计
-                issues = issue_service.get_project_issues(project_id)
-                total_issues += len(issues)
-                open_issues += len([i for i in issues if i.status not in ["已解决", "已关闭"]])
+                # 任务、风险、问题统计读取物化的项目聚合
+                aggregate = project_aggregate_service.get(project_id)
+                total_tasks += aggregate.task_total
+                completed_tasks += aggregate.task_status["已完成"]
+                total_risks += aggregate.risk_total
+                high_risks += aggregate.high_risks
+                total_issues += aggregate.issue_total
+                open_issues += aggregate.open_issues
                 
             except Exception as e:
                 logger.error(f"获取项目 {project_id} 仪表板数据失败: {str(e)}")
@@ -398,7 +393,7 @@ class ReportGeneratorService:
                 value = item.get(field, "")
                 # 处理特殊字符
                 if isinstance(value, str) and ("," in value or '"' in value or "\n" in value):
-                    value = f'"{value.replace('"', '""')}"'
+                    value = '"' + value.replace('"', '""') + '"'
                 row.append(str(value))
             output.append(",".join(row))
         
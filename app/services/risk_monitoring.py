@@ -9,6 +9,7 @@ from app.models.enums import TaskStatus, IssueCategory
 from app.utils.logger import get_logger
 from app.utils.helpers import generate_id
 from app.services.database_service import database_service
+from app.services.project_aggregates import project_aggregate_service
 
 logger = get_logger(__name__)
 
@@ -386,25 +387,19 @@ class RiskMonitoringService:
         try:
             logger.info(f"分析项目 {project_id} 的风险")
             
-            # 获取项目风险
-            risks = self.db.get_by_field("risks", "project_id", project_id)
-            
-            # 统计风险等级
-            total_risks = len(risks)
-            high_risks = len([r for r in risks if r.get("risk_level") in ["高", "严重"]])
-            medium_risks = len([r for r in risks if r.get("risk_level") == "中"])
-            low_risks = len([r for r in risks if r.get("risk_level") == "低"])
+            # 风险等级与类别统计直接读取物化的项目聚合
+            aggregate = project_aggregate_service.get(project_id)
+            total_risks = aggregate.risk_total
+            high_risks = aggregate.high_risks
+            medium_risks = aggregate.risk_level["中"]
+            low_risks = aggregate.risk_level["低"]
             
             # 分析风险趋势（简化版）
             risk_trend = "稳定"  # 实际应该基于历史数据计算
             
             # 统计风险类别
-            category_count = {}
-            for risk in risks:
-                category = risk.get("category", "其他")
-                category_count[category] = category_count.get(category, 0) + 1
-            
-            top_categories = sorted(category_count.items(), key=lambda x: x[1], reverse=True)[:3]
+            top_categories = [(category, count) for category, count in aggregate.risk_category.most_common()
+                              if count > 0][:3]
             
             # 影响评估
             impact_assessment = {
@@ -1,11 +1,12 @@
 """
 风险服务
 """
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from app.models.risk import Risk, RiskCreate, RiskUpdate, RiskResponse
 from app.services.database_service import database_service
 from app.utils.logger import get_logger
 from app.utils.helpers import generate_id
+from app.utils.query import SortSpec, page_window
 
 logger = get_logger(__name__)
 
@@ -18,21 +19,27 @@ class RiskService:
         self.db = database_service.get_database()
         logger.info("风险服务初始化完成")
     
-    def get_risks(self, filters: Optional[Dict[str, Any]] = None, search: Optional[str] = None) -> List[RiskResponse]:
+    def get_risks(self, filters: Optional[Dict[str, Any]] = None, search: Optional[str] = None,
+                  sort: SortSpec = None) -> List[RiskResponse]:
         """获取风险列表"""
+        risks, _ = self.get_risks_page(filters, search, sort=sort)
+        return risks
+    
+    def get_risks_page(self, filters: Optional[Dict[str, Any]] = None, search: Optional[str] = None,
+                       page: Optional[int] = None, page_size: Optional[int] = None,
+                       sort: SortSpec = None) -> Tuple[List[RiskResponse], int]:
+        """分页获取风险列表，过滤、搜索、排序与分页均在数据库层完成，只为当前页计算指标"""
         try:
-            risks_data = self.db.read("risks", filters=filters)
-            
-            if search:
-                risks_data = self.db.search("risks", search, ["risk_title", "description"])
+            offset, limit = page_window(page, page_size)
+            result = self.db.query("risks", filters=filters, sort=sort, offset=offset, limit=limit,
+                                   search=search, search_fields=["risk_title", "description"])
             
             risks = []
-            for risk_data in risks_data:
-                risk_response = self._calculate_risk_metrics(risk_data)
-                risks.append(risk_response)
+            for risk_data in result:
+                risks.append(self._calculate_risk_metrics(risk_data))
             
-            logger.info(f"获取到 {len(risks)} 个风险")
-            return risks
+            logger.info(f"获取到 {len(risks)} 个风险（共 {result.total} 个）")
+            return risks, result.total
         except Exception as e:
             logger.error(f"获取风险列表失败: {str(e)}")
             raise
@@ -137,10 +144,7 @@ class RiskService:
     def get_high_risks(self) -> List[RiskResponse]:
         """获取高风险列表"""
         try:
-            high_risks = self.get_risks(filters={"risk_level": "高"})
-            critical_risks = self.get_risks(filters={"risk_level": "严重"})
-            
-            all_high_risks = high_risks + critical_risks
+            all_high_risks = self.get_risks(filters={"risk_level": {"$in": ["高", "严重"]}})
             logger.info(f"获取到 {len(all_high_risks)} 个高风险")
             return all_high_risks
         except Exception as e:
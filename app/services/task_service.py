@@ -1,12 +1,13 @@
 """
 任务服务
 """
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime
 from app.models.task import Task, TaskCreate, TaskUpdate, TaskResponse, TaskSummary, TaskStatistics
 from app.services.database_service import database_service
 from app.utils.logger import get_logger
 from app.utils.helpers import generate_id
+from app.utils.query import SortSpec, page_window
 
 logger = get_logger(__name__)
 
@@ -19,21 +20,27 @@ class TaskService:
         self.db = database_service.get_database()
         logger.info("任务服务初始化完成")
     
-    def get_tasks(self, filters: Optional[Dict[str, Any]] = None, search: Optional[str] = None) -> List[TaskResponse]:
+    def get_tasks(self, filters: Optional[Dict[str, Any]] = None, search: Optional[str] = None,
+                  sort: SortSpec = None) -> List[TaskResponse]:
         """获取任务列表"""
+        tasks, _ = self.get_tasks_page(filters, search, sort=sort)
+        return tasks
+    
+    def get_tasks_page(self, filters: Optional[Dict[str, Any]] = None, search: Optional[str] = None,
+                       page: Optional[int] = None, page_size: Optional[int] = None,
+                       sort: SortSpec = None) -> Tuple[List[TaskResponse], int]:
+        """分页获取任务列表，过滤、搜索、排序与分页均在数据库层完成，只为当前页计算指标"""
         try:
-            tasks_data = self.db.read("tasks", filters=filters)
-            
-            if search:
-                tasks_data = self.db.search("tasks", search, ["task_name", "description"])
+            offset, limit = page_window(page, page_size)
+            result = self.db.query("tasks", filters=filters, sort=sort, offset=offset, limit=limit,
+                                   search=search, search_fields=["task_name", "description"])
             
             tasks = []
-            for task_data in tasks_data:
-                task_response = self._calculate_task_metrics(task_data)
-                tasks.append(task_response)
+            for task_data in result:
+                tasks.append(self._calculate_task_metrics(task_data))
             
-            logger.info(f"获取到 {len(tasks)} 个任务")
-            return tasks
+            logger.info(f"获取到 {len(tasks)} 个任务（共 {result.total} 个）")
+            return tasks, result.total
         except Exception as e:
             logger.error(f"获取任务列表失败: {str(e)}")
             raise
@@ -128,18 +135,13 @@ class TaskService:
     def get_overdue_tasks(self) -> List[TaskResponse]:
         """获取逾期任务列表"""
         try:
-            all_tasks = self.db.read("tasks")
-            overdue_tasks = []
-            
             current_date = datetime.now()
-            
-            for task_data in all_tasks:
-                due_date = task_data.get("due_date")
-                if due_date and task_data.get("status") not in ["已完成", "已取消"]:
-                    # 简化日期比较，实际应该解析日期字符串
-                    if due_date < current_date.isoformat():
-                        task_response = self._calculate_task_metrics(task_data)
-                        overdue_tasks.append(task_response)
+            # 简化日期比较，实际应该解析日期字符串；"$gt": "" 用于排除空截止日期
+            overdue_data = self.db.query("tasks", filters={
+                "due_date": {"$gt": "", "$lt": current_date.isoformat()},
+                "status": {"$nin": ["已完成", "已取消"]},
+            })
+            overdue_tasks = [self._calculate_task_metrics(task_data) for task_data in overdue_data]
             
             logger.info(f"获取到 {len(overdue_tasks)} 个逾期任务")
             return overdue_tasks
@@ -3,12 +3,14 @@
 """
 from .logger import setup_logger, get_logger
 from .database import JSONDatabase
+from .sqlite_database import SQLiteDatabase
+from .async_database import AsyncDatabase
 from .validators import validate_email, validate_phone, validate_date
 from .helpers import generate_id, format_datetime, parse_datetime
 
 __all__ = [
     "setup_logger", "get_logger",
-    "JSONDatabase", 
+    "JSONDatabase", "SQLiteDatabase", "AsyncDatabase",
     "validate_email", "validate_phone", "validate_date",
     "generate_id", "format_datetime", "parse_datetime"
 ]
@@ -0,0 +1,244 @@
+"""
+近似最近邻索引（IVF-Flat）：球面k-means粗量化，检索时只扫描与查询最接近的nprobe个倒排列表
+"""
+import time
+from array import array
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from app.utils.embedding_index import normalize_rows
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 分配或训练时每次计算的行数
+ASSIGN_BLOCK_ROWS = 4096
+
+
+def spherical_kmeans(vectors: np.ndarray, clusters: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """
+    球面k-means：以点积为相似度，质心归一化
+    
+    Args:
+        vectors: 归一化后的训练向量
+        clusters: 质心数量
+        iterations: 迭代次数
+        
+    Returns:
+        归一化的质心矩阵
+    """
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), clusters, replace=False)].copy()
+    for _ in range(iterations):
+        labels = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, vectors)
+        counts = np.bincount(labels, minlength=clusters)
+        # 空簇重新取一个随机样本作为质心
+        empty = np.flatnonzero(counts == 0)
+        sums[empty] = vectors[rng.choice(len(vectors), len(empty), replace=False)]
+        centroids = normalize_rows(sums)
+    return centroids
+
+
+class IVFIndex:
+    """IVF-Flat倒排索引
+    
+    训练后每个向量归入最接近的质心对应的倒排列表；检索时计算查询与全部质心的相似度，
+    只对最接近的nprobe个列表中的向量精确打分。nprobe越大召回率越高、耗时越长，
+    nprobe等于列表数时与精确检索结果一致。训练前（向量数少于min_train_size）不提供候选，由调用方精确检索。
+    """
+    
+    def __init__(self, nlist: Optional[int] = None, nprobe: int = 8, min_train_size: int = 4096,
+                 iterations: int = 10):
+        """
+        初始化索引
+        
+        Args:
+            nlist: 倒排列表数量，默认训练时取向量数的平方根
+            nprobe: 检索时扫描的列表数量
+            min_train_size: 向量数达到该值后才训练索引
+            iterations: k-means迭代次数
+        """
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train_size = min_train_size
+        self.iterations = iterations
+        self.centroids: Optional[np.ndarray] = None
+        # 行号 -> 所属列表（-1表示未分配）
+        self._assignments = np.full(0, -1, dtype=np.int32)
+        self._lists: List[array] = []
+        self.trained_size = 0
+    
+    @property
+    def ready(self) -> bool:
+        return self.centroids is not None
+    
+    def _nearest(self, vectors: np.ndarray) -> np.ndarray:
+        return np.argmax(vectors @ self.centroids.T, axis=1).astype(np.int32)
+    
+    def _ensure_rows(self, size: int):
+        if size > len(self._assignments):
+            grown = np.full(max(size, 2 * len(self._assignments)), -1, dtype=np.int32)
+            grown[:len(self._assignments)] = self._assignments
+            self._assignments = grown
+    
+    def train(self, store: Any, sample_size: Optional[int] = None):
+        """
+        在向量库的现有向量上训练质心并分配全部向量
+        
+        Args:
+            store: VectorStore实例
+            sample_size: k-means训练样本数，默认每个列表64个样本
+        """
+        start = time.time()
+        live = store.live_rows()
+        nlist = self.nlist or max(1, int(np.sqrt(len(live))))
+        nlist = min(nlist, len(live))
+        sample_size = min(len(live), sample_size or 64 * nlist)
+        sample = np.sort(np.random.default_rng(0).choice(live, sample_size, replace=False))
+        self.centroids = spherical_kmeans(normalize_rows(store.read_vectors(sample)), nlist, self.iterations)
+        self._assignments = np.full(store.capacity, -1, dtype=np.int32)
+        self._lists = [array("q") for _ in range(nlist)]
+        self.add(store, live)
+        self.trained_size = len(live)
+        logger.info(f"IVF索引训练完成: {len(live)} 个向量，{nlist} 个列表，耗时 {time.time() - start:.2f} 秒")
+    
+    def add(self, store: Any, rows: np.ndarray, vectors: Optional[np.ndarray] = None):
+        """
+        将向量分配到倒排列表（未训练时忽略）
+        
+        Args:
+            store: VectorStore实例
+            rows: 行号
+            vectors: 对应的归一化向量（可选，默认从向量库读取）
+        """
+        if not self.ready or not len(rows):
+            return
+        self._ensure_rows(int(rows.max()) + 1)
+        for start in range(0, len(rows), ASSIGN_BLOCK_ROWS):
+            block = rows[start:start + ASSIGN_BLOCK_ROWS]
+            block_vectors = vectors[start:start + ASSIGN_BLOCK_ROWS] if vectors is not None \
+                else store.read_vectors(block)
+            labels = self._nearest(np.asarray(block_vectors, dtype=np.float32))
+            for row, label in zip(block.tolist(), labels.tolist()):
+                # 覆盖写入的行若换了列表，旧列表中的条目在检索时按分配结果过滤
+                self._assignments[row] = label
+                self._lists[label].append(row)
+    
+    def remap(self, live: np.ndarray):
+        """向量库压缩后按新行号重建倒排列表（live为压缩前仍有效的行号，按新行号顺序）"""
+        if not self.ready:
+            return
+        assignments = self._assignments[live] if len(live) else np.zeros(0, dtype=np.int32)
+        self._assignments = np.full(max(len(live), 1), -1, dtype=np.int32)
+        self._assignments[:len(live)] = assignments
+        self._rebuild_lists(len(live))
+    
+    def _rebuild_lists(self, count: int):
+        assignments = self._assignments[:count]
+        order = np.argsort(assignments, kind="stable")
+        bounds = np.searchsorted(assignments[order], np.arange(len(self.centroids) + 1))
+        self._lists = [array("q", order[bounds[i]:bounds[i + 1]].astype(np.int64).tobytes())
+                       for i in range(len(self.centroids))]
+    
+    def candidates(self, query: np.ndarray, nprobe: Optional[int] = None) -> np.ndarray:
+        """
+        查询的候选行号
+        
+        Args:
+            query: 归一化的查询向量
+            nprobe: 扫描的列表数量（默认使用实例设置）
+            
+        Returns:
+            升序排列的候选行号
+        """
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        similarity = self.centroids @ query
+        probes = np.argpartition(-similarity, nprobe - 1)[:nprobe] if nprobe < len(similarity) \
+            else np.arange(len(similarity))
+        parts = []
+        for label in probes.tolist():
+            rows = np.frombuffer(self._lists[label], dtype=np.int64) if len(self._lists[label]) \
+                else np.zeros(0, dtype=np.int64)
+            parts.append(rows[self._assignments[rows] == label])
+        return np.unique(np.concatenate(parts)) if parts else np.zeros(0, dtype=np.int64)
+    
+    def save(self, path: Union[str, Path], count: int):
+        """保存质心与前count行的分配结果"""
+        if not self.ready:
+            return
+        path = Path(path)
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, centroids=self.centroids, assignments=self._assignments[:count],
+                     trained_size=np.array(self.trained_size), nprobe=np.array(self.nprobe))
+        tmp_path.replace(path)
+    
+    def load(self, path: Union[str, Path], store: Any) -> bool:
+        """
+        加载索引，保存之后新增的向量在此补充分配
+        
+        Returns:
+            是否加载成功
+        """
+        path = Path(path)
+        if not path.exists():
+            return False
+        try:
+            with np.load(path) as data:
+                centroids = data["centroids"]
+                assignments = data["assignments"]
+                self.trained_size = int(data["trained_size"])
+            if centroids.shape[1] != store.dimension:
+                logger.warning(f"IVF索引的维度与向量库不一致，忽略: {path}")
+                return False
+            self.centroids = centroids.astype(np.float32)
+            self._assignments = np.full(max(store.capacity, len(assignments)), -1, dtype=np.int32)
+            self._assignments[:len(assignments)] = assignments
+            self._rebuild_lists(len(assignments))
+            live = store.live_rows()
+            self.add(store, live[live >= len(assignments)])
+            return True
+        except Exception as e:
+            logger.error(f"加载IVF索引失败: {str(e)}")
+            return False
+
+
+def recall_benchmark(store: Any, queries: np.ndarray, top_k: int = 10,
+                     nprobes: Sequence[int] = (1, 2, 4, 8, 16, 32)) -> List[Dict[str, float]]:
+    """
+    以精确检索为基准测量IVF索引在不同nprobe下的召回率与平均耗时
+    
+    Args:
+        store: 已挂载并训练了IVF索引的向量库
+        queries: 查询向量矩阵
+        top_k: 每个查询的结果数
+        nprobes: 待测的nprobe取值
+        
+    Returns:
+        每个nprobe一行：nprobe、recall、avg_ms，另有nprobe为0的一行表示精确检索
+    """
+    index = store.ann
+    store.ann = None
+    try:
+        start = time.perf_counter()
+        exact = [{doc_id for doc_id, _, _ in store.search(query, top_k)} for query in queries]
+        rows = [{"nprobe": 0, "recall": 1.0, "avg_ms": (time.perf_counter() - start) / len(queries) * 1000}]
+    finally:
+        store.ann = index
+    original = index.nprobe
+    try:
+        for nprobe in nprobes:
+            index.nprobe = nprobe
+            start = time.perf_counter()
+            found = [{doc_id for doc_id, _, _ in store.search(query, top_k)} for query in queries]
+            elapsed = (time.perf_counter() - start) / len(queries) * 1000
+            hits = sum(len(approximate & truth) for approximate, truth in zip(found, exact))
+            rows.append({"nprobe": nprobe, "recall": hits / max(1, sum(len(truth) for truth in exact)),
+                         "avg_ms": elapsed})
+    finally:
+        index.nprobe = original
+    return rows
@@ -0,0 +1,128 @@
+"""
+存储后端的异步外观：磁盘I/O在专用的有界线程池中执行，避免阻塞事件循环
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from app.utils.database import JSONDatabase
+from app.utils.logger import get_logger
+from app.utils.sqlite_database import SQLiteDatabase
+
+logger = get_logger(__name__)
+
+
+class AsyncDatabase:
+    """JSONDatabase / SQLiteDatabase 的异步外观
+    
+    写操作（可能写穿落盘、追加日志或等待跨进程锁）与需要访问磁盘的读操作提交到专用线程池执行，
+    线程数有上限，写操作较多时在池中排队而不会占满默认线程池。
+    JSONDatabase在单进程模式下的读操作只访问内存中已发布的版本且无需加锁，直接在事件循环中执行。
+    """
+    
+    def __init__(self, db: Union[JSONDatabase, SQLiteDatabase], max_workers: int = 4):
+        """
+        初始化异步外观
+        
+        Args:
+            db: 存储后端实例
+            max_workers: I/O线程池的线程数
+        """
+        self.db = db
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="database-io")
+        # 单进程JSON数据库的读操作不涉及磁盘与锁，直接执行比切换线程更快
+        self.inline_reads = isinstance(db, JSONDatabase) and not db.lock.interprocess
+    
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        在I/O线程池中执行任意同步调用（如包含多次写操作的事务）
+        
+        Args:
+            func: 同步函数
+            
+        Returns:
+            函数返回值
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+    
+    async def _read(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        if self.inline_reads:
+            return func(*args, **kwargs)
+        return await self.run(func, *args, **kwargs)
+    
+    # 读操作
+    
+    async def read(self, collection_name: str, item_id: str = None,
+                   filters: Dict[str, Any] = None) -> Union[List[Dict[str, Any]], Dict[str, Any], None]:
+        """读取记录"""
+        return await self._read(self.db.read, collection_name, item_id, filters)
+    
+    async def query(self, collection_name: str, filters: Dict[str, Any] = None, **kwargs) -> List[Dict[str, Any]]:
+        """条件查询（排序、分页、投影参数同同步接口）"""
+        return await self._read(self.db.query, collection_name, filters, **kwargs)
+    
+    async def get_by_field(self, collection_name: str, field_name: str, field_value: Any) -> List[Dict[str, Any]]:
+        """根据字段值获取记录"""
+        return await self._read(self.db.get_by_field, collection_name, field_name, field_value)
+    
+    async def search(self, collection_name: str, search_term: str, search_fields: List[str] = None,
+                     **kwargs) -> List[Dict[str, Any]]:
+        """全文搜索"""
+        return await self._read(self.db.search, collection_name, search_term, search_fields, **kwargs)
+    
+    async def count(self, collection_name: str, filters: Dict[str, Any] = None) -> int:
+        """统计记录数量"""
+        return await self._read(self.db.count, collection_name, filters)
+    
+    async def get_collections(self) -> List[str]:
+        """获取所有集合名称"""
+        return await self._read(self.db.get_collections)
+    
+    async def get_metadata(self) -> Dict[str, Any]:
+        """获取数据库元数据"""
+        return await self._read(self.db.get_metadata)
+    
+    # 写操作
+    
+    async def create(self, collection_name: str, item: Dict[str, Any]) -> Dict[str, Any]:
+        """创建新记录"""
+        return await self.run(self.db.create, collection_name, item)
+    
+    async def create_many(self, collection_name: str, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """批量创建记录"""
+        return await self.run(self.db.create_many, collection_name, items)
+    
+    async def update(self, collection_name: str, item_id: str, updates: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """更新记录"""
+        return await self.run(self.db.update, collection_name, item_id, updates)
+    
+    async def update_many(self, collection_name: str, updates: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """批量更新记录"""
+        return await self.run(self.db.update_many, collection_name, updates)
+    
+    async def upsert_many(self, collection_name: str, items: List[Dict[str, Any]],
+                          key_field: str = None) -> List[Dict[str, Any]]:
+        """批量插入或更新记录"""
+        return await self.run(self.db.upsert_many, collection_name, items, key_field)
+    
+    async def delete(self, collection_name: str, item_id: str) -> bool:
+        """删除记录"""
+        return await self.run(self.db.delete, collection_name, item_id)
+    
+    async def import_data(self, collection_name: str, items: List[Dict[str, Any]], clear_existing: bool = False) -> int:
+        """导入数据到集合"""
+        return await self.run(self.db.import_data, collection_name, items, clear_existing)
+    
+    async def clear_collection(self, collection_name: str) -> bool:
+        """清空集合"""
+        return await self.run(self.db.clear_collection, collection_name)
+    
+    async def flush(self) -> bool:
+        """将未落盘的修改提交到磁盘"""
+        return await self.run(self.db.flush)
+    
+    def close(self):
+        """等待已提交的I/O完成并关闭线程池（不关闭底层数据库）"""
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,302 @@
+"""
+增量备份：集合数据按内容寻址存储，每次备份只写入发生变化的集合，清单记录校验和并支持按时间点恢复
+"""
+import hashlib
+import json
+import os
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from app.utils.database import DatabaseCodec, get_codec
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class BackupIntegrityError(Exception):
+    """备份数据缺失或校验失败"""
+
+
+class IncrementalBackupStore:
+    """增量备份仓库
+    
+    目录结构：
+        objects/ab/abcd...      压缩后的集合数据，以压缩前内容的SHA-256命名，相同内容只存一份
+        manifests/<备份ID>.json  备份清单：每个集合对应的对象、大小与记录数，以及清单自身的校验和
+    
+    每份清单都列出全部集合，恢复时只需读取一份清单；未变化的集合直接引用已有对象。
+    JSON数据库按集合版本号判断集合是否变化，无需重新序列化未变化的集合；
+    其他存储后端每次都会序列化全部集合，但相同内容不会重复写入。
+    """
+    
+    def __init__(self, root: Union[str, Path], codec: Union[str, DatabaseCodec, None] = None,
+                 compression_level: int = 6):
+        """
+        初始化增量备份仓库
+        
+        Args:
+            root: 备份目录
+            codec: 集合数据的序列化格式，默认紧凑JSON
+            compression_level: zlib压缩级别（0表示不压缩）
+        """
+        self.root = Path(root)
+        self.codec = get_codec(codec)
+        self.compression_level = compression_level
+        self.objects_dir = self.root / "objects"
+        self.manifests_dir = self.root / "manifests"
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self.manifests_dir.mkdir(parents=True, exist_ok=True)
+        # 集合名称 -> ((数据库实例id, 集合版本号), 清单条目)，用于跳过未变化集合的序列化
+        self._cache: Dict[str, Tuple[Tuple[int, int], Dict[str, Any]]] = {}
+    
+    def _object_path(self, digest: str) -> Path:
+        return self.objects_dir / digest[:2] / digest
+    
+    @staticmethod
+    def _manifest_checksum(manifest: Dict[str, Any]) -> str:
+        body = {key: value for key, value in manifest.items() if key != "checksum"}
+        return hashlib.sha256(json.dumps(body, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+    
+    def _write_atomic(self, path: Path, payload: bytes):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    
+    def _store(self, value: Any) -> Tuple[Dict[str, Any], int]:
+        """序列化并存储集合数据，返回(清单条目, 新写入的字节数)"""
+        raw = self.codec.dumps(value)
+        digest = hashlib.sha256(raw).hexdigest()
+        entry = {"hash": digest, "size": len(raw)}
+        if isinstance(value, list):
+            entry["count"] = len(value)
+        path = self._object_path(digest)
+        if path.exists():
+            return entry, 0
+        payload = zlib.compress(raw, self.compression_level)
+        self._write_atomic(path, payload)
+        return entry, len(payload)
+    
+    @staticmethod
+    def _capture(db: Any) -> Tuple[Dict[str, Any], Dict[str, int]]:
+        """获取数据库的一致性视图及各集合版本号（无版本号的后端返回空字典）"""
+        checkpoint = getattr(db, "checkpoint", None)
+        if checkpoint is not None:
+            snapshot = checkpoint()
+            return dict(snapshot.data), dict(snapshot.collection_versions)
+        data = {name: db.read(name) for name in db.get_collections()}
+        data["metadata"] = db.get_metadata()
+        return data, {}
+    
+    def create_backup(self, db: Any, label: Optional[str] = None) -> Dict[str, Any]:
+        """
+        创建一次增量备份
+        
+        Args:
+            db: 数据库实例（JSONDatabase或SQLiteDatabase）
+            label: 备份说明（可选）
+            
+        Returns:
+            备份清单
+        """
+        data, versions = self._capture(db)
+        created_at = datetime.now()
+        previous = self.latest_backup()
+        collections: Dict[str, Dict[str, Any]] = {}
+        changed = []
+        bytes_written = 0
+        
+        for name, value in data.items():
+            version = versions.get(name)
+            cache_key = (id(db), version)
+            cached = self._cache.get(name)
+            if version is not None and cached is not None and cached[0] == cache_key \
+                    and self._object_path(cached[1]["hash"]).exists():
+                collections[name] = cached[1]
+                continue
+            entry, written = self._store(value)
+            collections[name] = entry
+            bytes_written += written
+            if version is not None:
+                self._cache[name] = (cache_key, entry)
+            if previous is None or previous["collections"].get(name, {}).get("hash") != entry["hash"]:
+                changed.append(name)
+        
+        manifest = {
+            "backup_id": created_at.strftime("%Y%m%dT%H%M%S_%f"),
+            "created_at": created_at.isoformat(),
+            "label": label,
+            "parent": previous["backup_id"] if previous else None,
+            "codec": self.codec.name,
+            "collections": collections,
+            "changed": sorted(changed),
+            "bytes_written": bytes_written,
+        }
+        manifest["checksum"] = self._manifest_checksum(manifest)
+        self._write_atomic(self.manifests_dir / f"{manifest['backup_id']}.json",
+                           json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8"))
+        
+        logger.info(f"增量备份完成: {manifest['backup_id']}，变化集合 {len(changed)} 个，新写入 {bytes_written} 字节")
+        return manifest
+    
+    def list_backups(self) -> List[Dict[str, Any]]:
+        """
+        列出全部备份（按时间升序）
+        
+        Returns:
+            备份摘要列表
+        """
+        backups = []
+        for path in sorted(self.manifests_dir.glob("*.json")):
+            try:
+                manifest = self.get_manifest(path.stem)
+            except BackupIntegrityError as e:
+                logger.warning(f"跳过损坏的备份清单: {e}")
+                continue
+            backups.append({
+                "backup_id": manifest["backup_id"],
+                "created_at": manifest["created_at"],
+                "label": manifest.get("label"),
+                "changed": manifest.get("changed", []),
+                "bytes_written": manifest.get("bytes_written", 0),
+            })
+        return backups
+    
+    def get_manifest(self, backup_id: str) -> Dict[str, Any]:
+        """
+        读取并校验备份清单
+        
+        Raises:
+            BackupIntegrityError: 清单不存在或校验和不匹配
+        """
+        path = self.manifests_dir / f"{backup_id}.json"
+        if not path.exists():
+            raise BackupIntegrityError(f"备份不存在: {backup_id}")
+        manifest = json.loads(path.read_text(encoding="utf-8"))
+        if manifest.get("checksum") != self._manifest_checksum(manifest):
+            raise BackupIntegrityError(f"备份清单校验失败: {backup_id}")
+        return manifest
+    
+    def latest_backup(self) -> Optional[Dict[str, Any]]:
+        """最近一次备份的清单，没有备份时返回None"""
+        paths = sorted(self.manifests_dir.glob("*.json"))
+        return self.get_manifest(paths[-1].stem) if paths else None
+    
+    def find_backup(self, at: datetime) -> Optional[Dict[str, Any]]:
+        """
+        查找指定时间点之前（含）最近的一次备份
+        
+        Args:
+            at: 时间点
+            
+        Returns:
+            备份清单，该时间点之前没有备份时返回None
+        """
+        target = at.strftime("%Y%m%dT%H%M%S_%f")
+        candidates = [path.stem for path in sorted(self.manifests_dir.glob("*.json")) if path.stem <= target]
+        return self.get_manifest(candidates[-1]) if candidates else None
+    
+    def _load_object(self, entry: Dict[str, Any], codec: DatabaseCodec) -> Any:
+        path = self._object_path(entry["hash"])
+        if not path.exists():
+            raise BackupIntegrityError(f"备份对象缺失: {entry['hash']}")
+        try:
+            raw = zlib.decompress(path.read_bytes())
+        except zlib.error as e:
+            raise BackupIntegrityError(f"备份对象无法解压: {entry['hash']}") from e
+        if hashlib.sha256(raw).hexdigest() != entry["hash"]:
+            raise BackupIntegrityError(f"备份对象校验失败: {entry['hash']}")
+        return codec.loads(raw)
+    
+    def load_backup(self, backup_id: str) -> Dict[str, Any]:
+        """
+        读取并校验一次备份的完整数据库内容
+        
+        Raises:
+            BackupIntegrityError: 清单或对象缺失、校验失败
+        """
+        manifest = self.get_manifest(backup_id)
+        codec = get_codec(manifest.get("codec"))
+        return {name: self._load_object(entry, codec) for name, entry in manifest["collections"].items()}
+    
+    def verify_backup(self, backup_id: str) -> List[str]:
+        """
+        校验一次备份引用的全部对象
+        
+        Returns:
+            发现的问题列表（为空表示备份完整）
+        """
+        try:
+            manifest = self.get_manifest(backup_id)
+        except BackupIntegrityError as e:
+            return [str(e)]
+        problems = []
+        for name, entry in manifest["collections"].items():
+            path = self._object_path(entry["hash"])
+            if not path.exists():
+                problems.append(f"集合 {name} 的备份对象缺失")
+                continue
+            try:
+                raw = zlib.decompress(path.read_bytes())
+            except zlib.error:
+                problems.append(f"集合 {name} 的备份对象无法解压")
+                continue
+            if hashlib.sha256(raw).hexdigest() != entry["hash"]:
+                problems.append(f"集合 {name} 的备份对象校验失败")
+        return problems
+    
+    def restore(self, db: Any, backup_id: Optional[str] = None, at: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        恢复到指定备份或时间点（均未指定时恢复最近一次备份）
+        
+        Args:
+            db: 数据库实例
+            backup_id: 备份ID（可选）
+            at: 时间点（可选），恢复到该时间点之前最近的一次备份
+            
+        Returns:
+            所恢复备份的清单
+        """
+        if backup_id is not None:
+            manifest = self.get_manifest(backup_id)
+        elif at is not None:
+            manifest = self.find_backup(at)
+        else:
+            manifest = self.latest_backup()
+        if manifest is None:
+            raise BackupIntegrityError("没有可用于恢复的备份")
+        
+        # 全部对象校验通过后才替换数据库内容
+        data = self.load_backup(manifest["backup_id"])
+        db.restore_data(data)
+        self._cache.clear()
+        logger.info(f"数据库已恢复到备份: {manifest['backup_id']}")
+        return manifest
+    
+    def prune(self, keep: int) -> int:
+        """
+        只保留最近keep次备份，并删除不再被引用的对象
+        
+        Returns:
+            删除的对象数量
+        """
+        paths = sorted(self.manifests_dir.glob("*.json"))
+        for path in paths[:max(len(paths) - keep, 0)]:
+            path.unlink()
+        referenced = set()
+        for path in self.manifests_dir.glob("*.json"):
+            manifest = json.loads(path.read_text(encoding="utf-8"))
+            referenced.update(entry["hash"] for entry in manifest["collections"].values())
+        removed = 0
+        for path in self.objects_dir.glob("*/*"):
+            if path.name not in referenced and not path.name.startswith("."):
+                path.unlink()
+                removed += 1
+        self._cache = {name: cached for name, cached in self._cache.items() if cached[1]["hash"] in referenced}
+        logger.info(f"已清理旧备份，保留 {min(keep, len(paths))} 份，删除对象 {removed} 个")
+        return removed
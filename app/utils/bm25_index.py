@@ -0,0 +1,171 @@
+"""
+BM25词法检索：中日韩文字按bigram、拉丁文按单词分词，倒排列表以紧凑数组保存；
+以及合并多路检索结果的倒数排名融合（RRF）
+"""
+from array import array
+from collections import Counter
+from typing import Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.utils.text_index import tokenize
+from app.utils.vector_store import top_positions
+
+# 倒数排名融合的平滑常数（常用取值）
+RRF_K = 60
+
+
+class BM25Index:
+    """BM25倒排索引
+    
+    每个词元的倒排列表是两个array('I')：文档编号与词频，文档长度同样保存在数组中。
+    检索时把每个查询词元的得分向量化累加到得分数组上，只对命中的文档排序。
+    删除只标记墓碑（文档频率按有效文档统计），墓碑超过一半时压缩倒排列表。
+    """
+    
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        """
+        初始化索引
+        
+        Args:
+            k1: 词频饱和参数
+            b: 文档长度归一化参数
+        """
+        self.k1 = k1
+        self.b = b
+        self._keys: List[Optional[Hashable]] = []
+        self._positions: Dict[Hashable, int] = {}
+        self._lengths = array('I')
+        self._alive = array('B')
+        self._total_length = 0
+        # 词元 -> (文档编号, 词频)
+        self._postings: Dict[str, Tuple[array, array]] = {}
+    
+    def __len__(self) -> int:
+        return len(self._positions)
+    
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._positions
+    
+    def add(self, key: Hashable, text: str):
+        """加入文档（键已存在时替换）"""
+        self.remove(key)
+        counts = Counter(tokenize(text))
+        number = len(self._keys)
+        self._keys.append(key)
+        self._positions[key] = number
+        length = sum(counts.values())
+        self._lengths.append(length)
+        self._alive.append(1)
+        self._total_length += length
+        for token, tf in counts.items():
+            posting = self._postings.get(token)
+            if posting is None:
+                posting = self._postings[token] = (array('I'), array('I'))
+            posting[0].append(number)
+            posting[1].append(tf)
+    
+    def remove(self, key: Hashable) -> bool:
+        """删除文档"""
+        number = self._positions.pop(key, None)
+        if number is None:
+            return False
+        self._keys[number] = None
+        self._alive[number] = 0
+        self._total_length -= self._lengths[number]
+        if len(self._positions) * 2 < len(self._keys):
+            self.compact()
+        return True
+    
+    def clear(self):
+        """清空索引"""
+        self.__init__(self.k1, self.b)
+    
+    def compact(self):
+        """移除墓碑文档并重新编号"""
+        alive = np.frombuffer(self._alive, dtype=np.uint8).astype(bool)
+        renumber = (np.cumsum(alive) - 1).astype(np.uint32)
+        postings = {}
+        for token, (numbers, tfs) in self._postings.items():
+            docs = np.frombuffer(numbers, dtype=np.uint32)
+            keep = alive[docs]
+            if keep.any():
+                postings[token] = (array('I', renumber[docs[keep]].tobytes()),
+                                   array('I', np.frombuffer(tfs, dtype=np.uint32)[keep].tobytes()))
+        lengths = np.frombuffer(self._lengths, dtype=np.uint32)[alive]
+        self._keys = [key for key in self._keys if key is not None]
+        self._positions = {key: number for number, key in enumerate(self._keys)}
+        self._lengths = array('I', lengths.tobytes())
+        self._alive = array('B', bytes([1]) * len(self._keys))
+        self._postings = postings
+    
+    def search(self, query: str, top_k: int = 5,
+               accept: Optional[Callable[[Hashable], bool]] = None) -> List[Tuple[Hashable, float]]:
+        """
+        按BM25得分检索
+        
+        Args:
+            query: 查询文本
+            top_k: 返回数量
+            accept: 过滤函数（按键判断是否保留），按得分从高到低调用直到凑满top_k
+            
+        Returns:
+            (键, BM25得分) 列表，按得分降序；没有词元命中时为空
+        """
+        total = len(self._positions)
+        if total == 0 or top_k <= 0:
+            return []
+        count = len(self._keys)
+        tombstones = total < count
+        alive = np.frombuffer(self._alive, dtype=np.uint8).astype(bool) if tombstones else None
+        lengths = np.frombuffer(self._lengths, dtype=np.uint32)
+        average = self._total_length / total or 1.0
+        scores = np.zeros(count, dtype=np.float32)
+        for token in set(tokenize(query)):
+            posting = self._postings.get(token)
+            if posting is None:
+                continue
+            docs = np.frombuffer(posting[0], dtype=np.uint32)
+            tfs = np.frombuffer(posting[1], dtype=np.uint32).astype(np.float32)
+            df = int(np.count_nonzero(alive[docs])) if tombstones else len(docs)
+            if df == 0:
+                continue
+            idf = np.log(1.0 + (total - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1.0 - self.b + self.b * lengths[docs] / average)
+            scores[docs] += idf * tfs * (self.k1 + 1.0) / (tfs + norm)
+        if tombstones:
+            scores[~alive] = 0.0
+        hits = np.flatnonzero(scores)
+        if len(hits) == 0:
+            return []
+        results = []
+        # 有过滤函数时按得分顺序逐个判断
+        limit = len(hits) if accept is not None else top_k
+        for position in top_positions(scores[hits], min(limit, len(hits))):
+            key = self._keys[hits[position]]
+            if accept is not None and not accept(key):
+                continue
+            results.append((key, float(scores[hits[position]])))
+            if len(results) >= top_k:
+                break
+        return results
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[Hashable]], k: int = RRF_K) -> List[Tuple[Hashable, float]]:
+    """
+    倒数排名融合：每路结果中排名r的条目得分 1 / (k + r)，条目总分为各路得分之和
+    
+    只依赖排名而不依赖原始得分，余弦相似度与BM25得分无需归一化即可合并。
+    
+    Args:
+        rankings: 多路检索结果（每路为按相关性降序的键列表）
+        k: 平滑常数
+        
+    Returns:
+        (键, 融合得分) 列表，按融合得分降序
+    """
+    fused: Dict[Hashable, float] = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, 1):
+            fused[key] = fused.get(key, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,262 @@
+"""
+数据变更流（CDC）：数据库每次提交后按顺序发布变更事件，支持同步/异步订阅与可重放的游标
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 变更类型：replace表示整个集合被替换（清空、覆盖导入、恢复或其他进程重写）
+CHANGE_OPS = ("create", "update", "delete", "replace")
+
+# (变更类型, 集合, 记录主键, 变更前记录, 变更后记录)
+Change = Tuple[str, str, Any, Optional[Dict[str, Any]], Optional[Dict[str, Any]]]
+
+
+@dataclass(frozen=True)
+class ChangeEvent:
+    """一条数据变更事件
+    
+    op为replace时key/before/after均为空，订阅方应重新同步整个集合。
+    """
+    seq: int
+    op: str
+    collection: str
+    key: Any = None
+    before: Optional[Dict[str, Any]] = None
+    after: Optional[Dict[str, Any]] = None
+    version: Optional[int] = None
+    timestamp: float = field(default_factory=time.time)
+    
+    def get(self, field_name: str, default: Any = None) -> Any:
+        """读取变更记录的字段（优先取变更后的值）"""
+        for record in (self.after, self.before):
+            if record is not None and field_name in record:
+                return record[field_name]
+        return default
+
+
+class ChangeFeedGap(Exception):
+    """游标位置早于事件缓冲区中最早的事件，订阅方需要全量重新同步"""
+
+
+class Subscription:
+    """变更订阅，close后不再接收事件；batch为True时每批变更只回调一次（参数为该批匹配的事件列表）"""
+    
+    def __init__(self, feed: "ChangeFeed", deliver: Callable[[Any], None],
+                 collections: Optional[Sequence[str]] = None, batch: bool = False):
+        self._feed = feed
+        self._deliver = deliver
+        self.collections: Optional[Set[str]] = set(collections) if collections else None
+        self.batch = batch
+        self.active = True
+    
+    def matches(self, event: ChangeEvent) -> bool:
+        return self.collections is None or event.collection in self.collections
+    
+    def deliver(self, event: Any):
+        self._deliver(event)
+    
+    def close(self):
+        """取消订阅"""
+        self.active = False
+        self._feed._unsubscribe(self)
+
+
+class ChangeCursor:
+    """可重放的变更游标：记录已消费到的序号，按需拉取之后的事件"""
+    
+    def __init__(self, feed: "ChangeFeed", position: int, collections: Optional[Sequence[str]] = None):
+        self._feed = feed
+        self.position = position
+        self.collections = list(collections) if collections else None
+    
+    def poll(self, limit: Optional[int] = None) -> List[ChangeEvent]:
+        """
+        拉取游标之后的事件并前移游标
+        
+        Raises:
+            ChangeFeedGap: 游标之后的部分事件已被移出缓冲区
+        """
+        events, last_seq = self._feed._read_since(self.position, self.collections, limit)
+        self.position = last_seq
+        return events
+
+
+class ChangeFeed:
+    """进程内变更流：事件按提交顺序编号并保存在定长缓冲区中
+    
+    同步订阅者在提交线程中（持有数据库写锁时）依次调用，应尽快返回；
+    耗时处理请使用异步订阅（在事件循环中执行）或游标按需拉取。
+    """
+    
+    def __init__(self, capacity: int = 10000):
+        """
+        初始化变更流
+        
+        Args:
+            capacity: 缓冲区保留的事件数，游标落后超过该数量时需要全量重新同步
+        """
+        self._events: Deque[ChangeEvent] = deque(maxlen=capacity)
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._subscribers: List[Subscription] = []
+    
+    @property
+    def last_seq(self) -> int:
+        """最近一条事件的序号"""
+        return self._seq
+    
+    def publish(self, changes: Iterable[Change], version: Optional[int] = None) -> List[ChangeEvent]:
+        """
+        发布一批已提交的变更
+        
+        Args:
+            changes: 变更列表
+            version: 变更所在的数据版本号（如有）
+            
+        Returns:
+            生成的事件列表
+        """
+        timestamp = time.time()
+        with self._lock:
+            events = []
+            for op, collection, key, before, after in changes:
+                self._seq += 1
+                events.append(ChangeEvent(self._seq, op, collection, key, before, after, version, timestamp))
+            self._events.extend(events)
+            subscribers = list(self._subscribers)
+        for event in events:
+            for subscription in subscribers:
+                if subscription.batch or not subscription.active or not subscription.matches(event):
+                    continue
+                try:
+                    subscription.deliver(event)
+                except Exception as e:
+                    logger.error(f"变更订阅处理事件失败: {event.collection}/{event.key}: {e}")
+        for subscription in subscribers:
+            if not subscription.batch or not subscription.active:
+                continue
+            matched = [event for event in events if subscription.matches(event)]
+            if not matched:
+                continue
+            try:
+                subscription.deliver(matched)
+            except Exception as e:
+                logger.error(f"变更订阅处理 {len(matched)} 条事件失败: {e}")
+        return events
+    
+    def subscribe(self, callback: Callable[[ChangeEvent], None],
+                  collections: Optional[Sequence[str]] = None) -> Subscription:
+        """
+        同步订阅：每条事件提交后立即在提交线程中回调
+        
+        Args:
+            callback: 事件回调
+            collections: 只订阅这些集合（可选）
+        """
+        subscription = Subscription(self, callback, collections)
+        with self._lock:
+            self._subscribers.append(subscription)
+        return subscription
+    
+    def subscribe_batch(self, callback: Callable[[List[ChangeEvent]], None],
+                        collections: Optional[Sequence[str]] = None) -> Subscription:
+        """
+        同步批量订阅：每次提交（单条写入、批量写入或事务）发布的事件合并为一次回调，
+        适合按批合并处理的订阅方（如缓存失效），避免批量写入时逐条处理
+        
+        Args:
+            callback: 回调，参数为该批中匹配的事件列表
+            collections: 只订阅这些集合（可选）
+        """
+        subscription = Subscription(self, callback, collections, batch=True)
+        with self._lock:
+            self._subscribers.append(subscription)
+        return subscription
+    
+    def subscribe_async(self, callback: Callable[[ChangeEvent], Awaitable[None]],
+                        collections: Optional[Sequence[str]] = None) -> Subscription:
+        """
+        异步订阅：事件投递到当前事件循环的队列，由后台任务按顺序await回调（须在事件循环中调用）
+        
+        Args:
+            callback: 异步事件回调
+            collections: 只订阅这些集合（可选）
+        """
+        loop = asyncio.get_running_loop()
+        queue: "asyncio.Queue[ChangeEvent]" = asyncio.Queue()
+        
+        def deliver(event: ChangeEvent):
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+            except RuntimeError:
+                # 事件循环已关闭
+                subscription.close()
+        
+        async def consume():
+            while subscription.active:
+                event = await queue.get()
+                try:
+                    await callback(event)
+                except Exception as e:
+                    logger.error(f"异步变更订阅处理事件失败: {event.collection}/{event.key}: {e}")
+        
+        subscription = Subscription(self, deliver, collections)
+        with self._lock:
+            self._subscribers.append(subscription)
+        subscription.task = loop.create_task(consume())
+        return subscription
+    
+    def _unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
+        task = getattr(subscription, "task", None)
+        if task is not None and not task.done():
+            task.get_loop().call_soon_threadsafe(task.cancel)
+    
+    def cursor(self, start: Optional[int] = None, collections: Optional[Sequence[str]] = None) -> ChangeCursor:
+        """
+        创建游标
+        
+        Args:
+            start: 起始序号（只返回序号大于它的事件），默认从当前位置开始，0表示从变更流创建时开始
+            collections: 只关注这些集合（可选）
+        """
+        return ChangeCursor(self, self._seq if start is None else start, collections)
+    
+    def events_since(self, seq: int, collections: Optional[Sequence[str]] = None) -> List[ChangeEvent]:
+        """
+        获取序号大于seq的事件
+        
+        Raises:
+            ChangeFeedGap: 部分事件已被移出缓冲区
+        """
+        return self._read_since(seq, collections)[0]
+    
+    def _read_since(self, seq: int, collections: Optional[Sequence[str]] = None,
+                    limit: Optional[int] = None) -> Tuple[List[ChangeEvent], int]:
+        """返回(事件列表, 已读到的序号)"""
+        with self._lock:
+            first_seq = self._seq - len(self._events) + 1
+            if seq < first_seq - 1:
+                raise ChangeFeedGap(f"序号 {seq} 之后的部分事件已被移出缓冲区（最早序号 {first_seq}）")
+            start = seq - first_seq + 1
+            wanted = set(collections) if collections else None
+            events = []
+            last_seq = seq
+            for event in islice(self._events, start, None):
+                if limit is not None and len(events) >= limit:
+                    break
+                last_seq = event.seq
+                if wanted is None or event.collection in wanted:
+                    events.append(event)
+            return events, last_seq
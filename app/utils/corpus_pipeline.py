@@ -0,0 +1,182 @@
+"""
+多语料知识库的导入流水线：发现资料目录下的全部MinerU语料，在进程池中并行解析分块，
+按语料写入索引分片（文本块 + 嵌入），源文件哈希未变化的语料直接复用已有分片
+"""
+import hashlib
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+from app.utils.embedding_index import EmbedBatch, EmbeddingIndex
+from app.utils.logger import get_logger
+from app.utils.page_chunker import MAX_TOKENS, OVERLAP_TOKENS, TARGET_TOKENS, TextChunk, chunk_document
+
+logger = get_logger(__name__)
+
+# MinerU输出目录名：序号- 原文件名.扩展名-任务ID
+_CORPUS_DIR_PATTERN = re.compile(r"^(?:[\d.]+-\s*)?(?P<name>.+?)\.[A-Za-z]+-[0-9a-f]{8}(?:-[0-9a-f]{4}){3}-[0-9a-f]{12}$")
+
+
+@dataclass
+class Corpus:
+    """一份MinerU语料"""
+    key: str  # 分片目录名（语料目录的任务ID）
+    name: str  # 原文件名（不含序号与扩展名）
+    path: Path
+    source: Path  # 分块读取的源文件（content_list.json或layout.json）
+
+
+def discover_corpora(root: Union[str, Path]) -> List[Corpus]:
+    """
+    发现资料目录下的全部语料（含 *_content_list.json 或 layout.json 的子目录），按目录名排序
+    """
+    root = Path(root)
+    if not root.is_dir():
+        return []
+    corpora = []
+    for path in sorted(child for child in root.iterdir() if child.is_dir()):
+        sources = sorted(path.glob("*_content_list.json")) or [path / "layout.json"]
+        if not sources[0].exists():
+            continue
+        match = _CORPUS_DIR_PATTERN.match(path.name)
+        name = match.group("name") if match else path.name
+        key = path.name[-36:] if match else hashlib.sha1(path.name.encode("utf-8")).hexdigest()[:16]
+        corpora.append(Corpus(key=key, name=name, path=path, source=sources[0]))
+    return corpora
+
+
+def file_hash(path: Path) -> str:
+    """文件内容的SHA-256哈希（分块读取）"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class CorpusShard:
+    """一份语料的索引分片
+    
+    目录结构：
+        chunks.json  源文件指纹、语料名称与文本块（内容、页码、章节）
+        index.json / vectors.npy  文本块的嵌入索引（EmbeddingIndex）
+    """
+    
+    def __init__(self, path: Union[str, Path], corpus: Corpus, model: str, dimension: int):
+        self.path = Path(path)
+        self.corpus = corpus
+        self.fingerprint: Optional[str] = None
+        self.chunks: List[TextChunk] = []
+        self.index = EmbeddingIndex(self.path, model, dimension)
+    
+    def load(self) -> bool:
+        """加载已保存的文本块与嵌入索引"""
+        chunks_path = self.path / "chunks.json"
+        if not chunks_path.exists():
+            return False
+        try:
+            with open(chunks_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.fingerprint = data["fingerprint"]
+            self.chunks = [TextChunk(**chunk) for chunk in data["chunks"]]
+            self.index.load()
+            return True
+        except Exception as e:
+            logger.error(f"加载语料分片失败 {self.path}: {str(e)}")
+            return False
+    
+    def save_chunks(self, fingerprint: str, chunks: List[TextChunk]):
+        """原子地保存文本块"""
+        self.fingerprint = fingerprint
+        self.chunks = chunks
+        self.path.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path / ".chunks.json.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"fingerprint": fingerprint, "name": self.corpus.name,
+                       "chunks": [asdict(chunk) for chunk in chunks]}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path / "chunks.json")
+
+
+class KnowledgeBase:
+    """按语料分片的知识库索引"""
+    
+    def __init__(self, path: Union[str, Path], model: str, dimension: int):
+        """
+        初始化知识库
+        
+        Args:
+            path: 索引目录（每份语料一个子目录）
+            model: 嵌入模型名称
+            dimension: 向量维度
+        """
+        self.path = Path(path)
+        self.model = model
+        self.dimension = dimension
+        self.shards: List[CorpusShard] = []
+    
+    def ingest(self, root: Union[str, Path], embed_batch: Optional[EmbedBatch] = None,
+               workers: Optional[int] = None, batch_size: int = 10, target_tokens: int = TARGET_TOKENS,
+               max_tokens: int = MAX_TOKENS, overlap_tokens: int = OVERLAP_TOKENS) -> Dict[str, int]:
+        """
+        导入资料目录下的全部语料
+        
+        源文件与分块参数的指纹未变化的语料直接加载已有分片，其余语料在进程池中并行解析分块。
+        提供embed_batch时为新文本块批量生成嵌入（内容未变化的文本块复用已有向量）。
+        
+        Args:
+            root: 资料目录
+            embed_batch: 批量生成嵌入的函数（为None时只解析分块）
+            workers: 解析进程数，默认为CPU核数
+            batch_size: 每批生成嵌入的文本数量
+            target_tokens: 文本块目标词元数
+            max_tokens: 文本块词元数上限
+            overlap_tokens: 相邻文本块的重叠词元数
+            
+        Returns:
+            统计：corpora、parsed、skipped、chunks，生成嵌入时另有reused、embedded、failed
+        """
+        start = time.time()
+        params = f"{target_tokens}/{max_tokens}/{overlap_tokens}"
+        shards: List[CorpusShard] = []
+        stale: List[CorpusShard] = []
+        fingerprints: Dict[str, str] = {}
+        for corpus in discover_corpora(root):
+            shard = CorpusShard(self.path / corpus.key, corpus, self.model, self.dimension)
+            fingerprints[corpus.key] = f"{file_hash(corpus.source)}:{params}"
+            if not (shard.load() and shard.fingerprint == fingerprints[corpus.key]):
+                stale.append(shard)
+            shards.append(shard)
+        
+        if stale:
+            sources = [shard.corpus.path for shard in stale]
+            workers = min(workers or os.cpu_count() or 1, len(stale))
+            if workers > 1:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    results = list(executor.map(chunk_document, sources, [target_tokens] * len(stale),
+                                                [max_tokens] * len(stale), [overlap_tokens] * len(stale)))
+            else:
+                results = [chunk_document(source, target_tokens, max_tokens, overlap_tokens) for source in sources]
+            for shard, chunks in zip(stale, results):
+                shard.save_chunks(fingerprints[shard.corpus.key], chunks)
+        
+        stats = {"corpora": len(shards), "parsed": len(stale), "skipped": len(shards) - len(stale),
+                 "chunks": sum(len(shard.chunks) for shard in shards)}
+        if embed_batch is not None:
+            stats.update(reused=0, embedded=0, failed=0)
+            for shard in shards:
+                before = len(shard.index)
+                built = shard.index.build([chunk.content for chunk in shard.chunks], embed_batch, batch_size)
+                # 只有新生成或移除了向量时才重写分片的嵌入索引
+                if built["embedded"] or built["reused"] != before:
+                    shard.index.save()
+                for name, count in built.items():
+                    stats[name] += count
+        self.shards = shards
+        logger.info(f"知识库导入完成: {stats['corpora']} 份语料（解析 {stats['parsed']} 份，"
+                    f"跳过 {stats['skipped']} 份），共 {stats['chunks']} 个文本块，耗时 {time.time() - start:.2f} 秒")
+        return stats
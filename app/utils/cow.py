@@ -0,0 +1,161 @@
+"""
+写时复制数据结构
+
+索引的每个版本都从上一版本复制而来。为避免每次写入都复制整张哈希表，
+这里的结构把数据拆成小块：复制时只复制块列表并共享块本身，修改前才复制被修改的块。
+"""
+from itertools import chain
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+_MISSING = object()
+
+
+class ShardedMap:
+    """按键哈希分片的字典：复制时共享分片，修改某个键前只复制其所在分片"""
+    
+    __slots__ = ("_shards", "_owned", "_size")
+    
+    SHARD_COUNT = 64
+    
+    def __init__(self):
+        self._shards: List[Dict[Any, Any]] = [{} for _ in range(self.SHARD_COUNT)]
+        # 本版本自有的分片；None表示全部自有（新建的结构）
+        self._owned: Optional[Set[int]] = None
+        self._size = 0
+    
+    def copy(self) -> "ShardedMap":
+        """复制出新版本，分片在首次修改前与原结构共享"""
+        clone = ShardedMap.__new__(ShardedMap)
+        clone._shards = list(self._shards)
+        clone._owned = set()
+        clone._size = self._size
+        return clone
+    
+    def _shard(self, key: Any) -> Dict[Any, Any]:
+        return self._shards[hash(key) % self.SHARD_COUNT]
+    
+    def _writable_shard(self, key: Any) -> Dict[Any, Any]:
+        position = hash(key) % self.SHARD_COUNT
+        shard = self._shards[position]
+        if self._owned is not None and id(shard) not in self._owned:
+            shard = self._shards[position] = dict(shard)
+            self._owned.add(id(shard))
+        return shard
+    
+    def get(self, key: Any, default: Any = None) -> Any:
+        return self._shard(key).get(key, default)
+    
+    def __contains__(self, key: Any) -> bool:
+        return key in self._shard(key)
+    
+    def __getitem__(self, key: Any) -> Any:
+        return self._shard(key)[key]
+    
+    def __setitem__(self, key: Any, value: Any):
+        shard = self._writable_shard(key)
+        if key not in shard:
+            self._size += 1
+        shard[key] = value
+    
+    def __delitem__(self, key: Any):
+        if key not in self._shard(key):
+            raise KeyError(key)
+        del self._writable_shard(key)[key]
+        self._size -= 1
+    
+    def setdefault(self, key: Any, default: Any = None) -> Any:
+        value = self._shard(key).get(key, _MISSING)
+        if value is _MISSING:
+            self[key] = value = default
+        return value
+    
+    def __len__(self) -> int:
+        return self._size
+    
+    def __iter__(self) -> Iterator[Any]:
+        return chain.from_iterable(self._shards)
+    
+    def keys(self) -> Iterator[Any]:
+        return iter(self)
+    
+    def values(self) -> Iterator[Any]:
+        return chain.from_iterable(shard.values() for shard in self._shards)
+    
+    def items(self) -> Iterator[Tuple[Any, Any]]:
+        return chain.from_iterable(shard.items() for shard in self._shards)
+
+
+class RecordBucket:
+    """按记录对象id存放记录的桶：分段存储，修改时只复制被修改的段，迭代顺序接近写入顺序"""
+    
+    __slots__ = ("_segments", "_owned", "_size")
+    
+    SEGMENT_SIZE = 512
+    
+    def __init__(self):
+        self._segments: List[Dict[int, Dict[str, Any]]] = []
+        self._owned: Optional[Set[int]] = None
+        self._size = 0
+    
+    def copy(self) -> "RecordBucket":
+        """复制出新版本，段在首次修改前与原桶共享"""
+        clone = RecordBucket.__new__(RecordBucket)
+        clone._segments = list(self._segments)
+        clone._owned = set()
+        clone._size = self._size
+        return clone
+    
+    def _writable_segment(self, position: int) -> Dict[int, Dict[str, Any]]:
+        segment = self._segments[position]
+        if self._owned is not None and id(segment) not in self._owned:
+            segment = self._segments[position] = dict(segment)
+            self._owned.add(id(segment))
+        return segment
+    
+    def add(self, record: Dict[str, Any]):
+        """加入记录（调用方保证记录尚未在桶中）"""
+        key = id(record)
+        if self._segments and len(self._segments[-1]) < self.SEGMENT_SIZE:
+            segment = self._writable_segment(len(self._segments) - 1)
+        else:
+            segment = {}
+            self._segments.append(segment)
+            if self._owned is not None:
+                self._owned.add(id(segment))
+        segment[key] = record
+        self._size += 1
+    
+    def remove(self, record: Dict[str, Any]) -> bool:
+        """移除记录，返回记录是否存在"""
+        key = id(record)
+        for position, segment in enumerate(self._segments):
+            if key in segment:
+                segment = self._writable_segment(position)
+                del segment[key]
+                if not segment:
+                    del self._segments[position]
+                self._size -= 1
+                return True
+        return False
+    
+    def __contains__(self, key: int) -> bool:
+        return any(key in segment for segment in self._segments)
+    
+    def get(self, key: int) -> Optional[Dict[str, Any]]:
+        for segment in self._segments:
+            record = segment.get(key)
+            if record is not None:
+                return record
+        return None
+    
+    def __len__(self) -> int:
+        return self._size
+    
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return chain.from_iterable(segment.values() for segment in self._segments)
+    
+    def keys(self) -> Iterator[int]:
+        return chain.from_iterable(self._segments)
+    
+    def items(self) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        return chain.from_iterable(segment.items() for segment in self._segments)
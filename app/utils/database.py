@@ -3,34 +3,712 @@ JSON数据库操作类
 """
 import json
 import os
+import atexit
+import heapq
+import time
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Union
+from itertools import islice
+from operator import itemgetter
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union, Set
 from datetime import datetime
 import threading
+from contextlib import contextmanager
 from app.utils.logger import get_logger
+from app.utils.change_feed import Change, ChangeFeed
+from app.utils.cow import RecordBucket, ShardedMap
+from app.utils.text_index import FullTextIndex, parse_query, score_record
+from app.utils.query import QueryResult, SortSpec, is_operator, matches, paginate, project
 
 logger = get_logger(__name__)
 
+# 默认声明的二级索引（集合 -> 字段列表）
+DEFAULT_SECONDARY_INDEXES: Dict[str, List[str]] = {
+    "projects": ["status"],
+    "tasks": ["project_id", "assigned_to", "status"],
+    "risks": ["project_id", "risk_level", "status"],
+    "issues": ["project_id", "assigned_to", "status"],
+    "milestones": ["project_id"],
+    "resources": ["project_id"],
+    "time_tracking": ["project_id"],
+    "change_requests": ["project_id"],
+    "chat_sessions": ["user_id"],
+    "vector_embeddings": ["doc_id"],
+}
+
+# 默认声明的全文索引（集合 -> 字段列表），与各服务的搜索字段保持一致
+DEFAULT_FULLTEXT_INDEXES: Dict[str, List[str]] = {
+    "projects": ["project_name", "description", "project_code"],
+    "tasks": ["task_name", "description"],
+    "risks": ["risk_title", "description"],
+    "issues": ["issue_title", "description"],
+}
+
+
+try:
+    import fcntl
+except ImportError:  # Windows等平台不支持flock，多进程模式不可用
+    fcntl = None
+
+try:
+    import orjson
+except ImportError:  # 可选依赖，未安装时使用标准库json
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # 可选依赖，未安装时不支持MessagePack格式
+    msgpack = None
+
+
+# 流式读写时每块的记录数
+STREAM_CHUNK_SIZE = 1000
+
+
+class DatabaseCodec:
+    """数据库文件的序列化格式"""
+    
+    name = ""
+    suffix = ""
+    
+    def dumps(self, data: Any) -> bytes:
+        """序列化为字节串"""
+        raise NotImplementedError
+    
+    def loads(self, raw: bytes) -> Any:
+        """从字节串反序列化"""
+        raise NotImplementedError
+    
+    def dump(self, data: Any, f: BinaryIO):
+        """序列化并写入文件"""
+        f.write(self.dumps(data))
+    
+    def matches(self, raw: bytes) -> bool:
+        """字节串是否为本格式"""
+        raise NotImplementedError
+
+
+class JSONCodec(DatabaseCodec):
+    """JSON格式：默认紧凑输出，安装orjson时自动使用其加速序列化与解析"""
+    
+    suffix = ".json"
+    
+    def __init__(self, indent: Optional[int] = None):
+        """
+        初始化JSON格式
+        
+        Args:
+            indent: 缩进空格数，为空时输出紧凑JSON（仅供程序读取的文件无需缩进）
+        """
+        self.indent = indent
+        self.name = "json" if indent is None else "json-pretty"
+    
+    def dumps(self, data: Any) -> bytes:
+        if orjson is not None:
+            option = orjson.OPT_NON_STR_KEYS
+            if self.indent is not None:
+                option |= orjson.OPT_INDENT_2
+            return orjson.dumps(data, option=option)
+        if self.indent is not None:
+            return json.dumps(data, ensure_ascii=False, indent=self.indent).encode("utf-8")
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    
+    def dump(self, data: Any, f: BinaryIO):
+        """紧凑JSON按集合、按记录分块写出，整个文件的序列化结果不会同时驻留内存"""
+        if self.indent is not None or not isinstance(data, (dict, list)):
+            f.write(self.dumps(data))
+        elif isinstance(data, list):
+            self._dump_list(data, f)
+        else:
+            f.write(b"{")
+            for i, (key, value) in enumerate(data.items()):
+                if i:
+                    f.write(b",")
+                f.write(self.dumps(str(key)) + b":")
+                if isinstance(value, list):
+                    self._dump_list(value, f)
+                else:
+                    f.write(self.dumps(value))
+            f.write(b"}")
+    
+    def _dump_list(self, items: List[Any], f: BinaryIO):
+        f.write(b"[")
+        for start in range(0, len(items), STREAM_CHUNK_SIZE):
+            if start:
+                f.write(b",")
+            # 整块序列化后去掉首尾的方括号
+            f.write(self.dumps(items[start:start + STREAM_CHUNK_SIZE])[1:-1])
+        f.write(b"]")
+    
+    def loads(self, raw: bytes) -> Any:
+        raw = raw.removeprefix(b"\xef\xbb\xbf")
+        if orjson is not None:
+            return orjson.loads(raw)
+        return json.loads(raw.decode("utf-8"))
+    
+    def matches(self, raw: bytes) -> bool:
+        return raw.lstrip(b"\xef\xbb\xbf \t\r\n")[:1] in (b"{", b"[")
+
+
+class MessagePackCodec(DatabaseCodec):
+    """MessagePack二进制格式（需安装msgpack），文件以魔数开头便于自动识别"""
+    
+    name = "msgpack"
+    suffix = ".msgpack"
+    MAGIC = b"PMDB\x00MSGPACK\x01"
+    
+    def _require(self):
+        if msgpack is None:
+            raise RuntimeError("MessagePack格式需要安装msgpack: pip install msgpack")
+    
+    def dumps(self, data: Any) -> bytes:
+        self._require()
+        return self.MAGIC + msgpack.packb(data, use_bin_type=True)
+    
+    def loads(self, raw: bytes) -> Any:
+        self._require()
+        return msgpack.unpackb(raw[len(self.MAGIC):], raw=False, strict_map_key=False)
+    
+    def matches(self, raw: bytes) -> bool:
+        return raw.startswith(self.MAGIC)
+
+
+CODECS: Dict[str, DatabaseCodec] = {
+    codec.name: codec for codec in (JSONCodec(), JSONCodec(indent=2), MessagePackCodec())
+}
+
+
+def get_codec(codec: Union[str, DatabaseCodec, None]) -> DatabaseCodec:
+    """按名称获取序列化格式（json、json-pretty、msgpack），为空时返回紧凑JSON"""
+    if isinstance(codec, DatabaseCodec):
+        return codec
+    if not codec:
+        return CODECS["json"]
+    if codec not in CODECS:
+        raise ValueError(f"不支持的序列化格式: {codec}，可选: {', '.join(CODECS)}")
+    return CODECS[codec]
+
+
+def detect_codec(raw: bytes) -> DatabaseCodec:
+    """根据文件内容识别序列化格式"""
+    for codec in CODECS.values():
+        if codec.name != "json-pretty" and codec.matches(raw):
+            return codec
+    raise ValueError("无法识别的数据库文件格式")
+
+
+def iter_jsonl(path: Union[str, Path]) -> Iterator[Dict[str, Any]]:
+    """逐行读取JSONL文件（跳过空行），内存占用与文件大小无关"""
+    with open(path, 'rb') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                yield orjson.loads(line) if orjson is not None else json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"JSONL第{line_number}行格式错误: {e}") from e
+
+
+def chunked(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """将可迭代对象按固定大小分块"""
+    if size <= 0:
+        raise ValueError("分块大小必须大于0")
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def write_jsonl(lines: Iterable[str], output_path: Union[str, Path],
+                progress: Optional[Callable[[int], None]] = None) -> int:
+    """
+    将JSONL行分块写入文件（先写临时文件再原子替换）
+    
+    Args:
+        lines: 以换行结尾的JSONL行
+        output_path: 输出文件路径
+        progress: 进度回调，每写出一块后以已写出的行数调用
+        
+    Returns:
+        写出的行数
+    """
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = output_path.with_name(f".{output_path.name}.tmp")
+    written = 0
+    try:
+        with open(tmp_path, 'wb') as f:
+            for chunk in chunked(lines, STREAM_CHUNK_SIZE):
+                f.write("".join(chunk).encode("utf-8"))
+                written += len(chunk)
+                if progress is not None:
+                    progress(written)
+        os.replace(tmp_path, output_path)
+    except Exception:
+        if tmp_path.exists():
+            tmp_path.unlink()
+        raise
+    return written
+
+
+def read_database_file(path: Union[str, Path]) -> Any:
+    """读取数据库文件，自动识别序列化格式"""
+    raw = Path(path).read_bytes()
+    return detect_codec(raw).loads(raw)
+
+
+def _dumps_line(value: Any) -> str:
+    """将日志记录序列化为单行JSON"""
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+class CollectionIndex:
+    """集合索引：主键哈希索引 + 可声明的二级哈希索引 + 可声明的全文倒排索引"""
+    
+    def __init__(self, collection_name: str, fields: Optional[List[str]] = None,
+                 fulltext_fields: Optional[List[str]] = None):
+        """
+        初始化集合索引
+        
+        Args:
+            collection_name: 集合名称
+            fields: 二级索引字段列表（可选）
+            fulltext_fields: 全文索引字段列表（可选）
+        """
+        self.collection_name = collection_name
+        self.pk_fields = ("id", f"{collection_name[:-1]}_id")
+        self.primary = ShardedMap()
+        # 字段 -> 字段值 -> 记录桶，桶内保持插入顺序
+        self.secondary: Dict[str, ShardedMap] = {field: ShardedMap() for field in (fields or [])}
+        self.fulltext = FullTextIndex(fulltext_fields or [])
+        # 写时复制：复制出的索引与旧版本共享记录桶，记录本版本自有的桶，修改前先复制
+        self._owned: Optional[Set[int]] = None
+    
+    @staticmethod
+    def _hashable(value: Any) -> bool:
+        try:
+            hash(value)
+            return True
+        except TypeError:
+            return False
+    
+    def copy(self) -> "CollectionIndex":
+        """复制索引用于构建新版本，只复制分片/分段的目录，数据在首次修改时才复制"""
+        clone = CollectionIndex.__new__(CollectionIndex)
+        clone.collection_name = self.collection_name
+        clone.pk_fields = self.pk_fields
+        clone.primary = self.primary.copy()
+        clone.secondary = {field: buckets.copy() for field, buckets in self.secondary.items()}
+        clone.fulltext = self.fulltext.copy()
+        clone._owned = set()
+        return clone
+    
+    def _bucket(self, buckets: ShardedMap, value: Any, create: bool) -> Optional[RecordBucket]:
+        """获取可修改的记录桶（与旧版本共享时先复制）"""
+        bucket = buckets.get(value)
+        if bucket is None:
+            if not create:
+                return None
+            bucket = buckets[value] = RecordBucket()
+        elif self._owned is not None and id(bucket) not in self._owned:
+            bucket = buckets[value] = bucket.copy()
+        else:
+            return bucket
+        if self._owned is not None:
+            self._owned.add(id(bucket))
+        return bucket
+    
+    def rebuild(self, records: List[Dict[str, Any]]):
+        """根据集合数据重建全部索引"""
+        self._owned = None
+        self.primary = ShardedMap()
+        for field in self.secondary:
+            self.secondary[field] = ShardedMap()
+        self.fulltext = FullTextIndex(self.fulltext.fields)
+        for record in records:
+            self.add(record)
+    
+    def add_field(self, field: str, records: List[Dict[str, Any]]):
+        """新增二级索引字段并回填"""
+        self.secondary[field] = ShardedMap()
+        for record in records:
+            value = record.get(field)
+            if self._hashable(value):
+                self._bucket(self.secondary[field], value, create=True).add(record)
+    
+    def add_fulltext_field(self, field: str, records: List[Dict[str, Any]]):
+        """新增全文索引字段并回填"""
+        self.fulltext = FullTextIndex(self.fulltext.fields + [field])
+        for record in records:
+            self.fulltext.add(record)
+    
+    def add(self, record: Dict[str, Any]):
+        """将记录加入索引"""
+        for pk_field in self.pk_fields:
+            key = record.get(pk_field)
+            if key is not None and self._hashable(key):
+                # 与线性扫描保持一致：重复主键时以先出现的记录为准
+                self.primary.setdefault(key, record)
+        for field, buckets in self.secondary.items():
+            value = record.get(field)
+            if self._hashable(value):
+                self._bucket(buckets, value, create=True).add(record)
+        self.fulltext.add(record)
+    
+    def remove(self, record: Dict[str, Any]):
+        """将记录从索引中移除（需在记录字段被修改之前调用）"""
+        for pk_field in self.pk_fields:
+            key = record.get(pk_field)
+            if key is not None and self._hashable(key) and self.primary.get(key) is record:
+                del self.primary[key]
+        for field, buckets in self.secondary.items():
+            value = record.get(field)
+            if not self._hashable(value) or id(record) not in buckets.get(value, ()):
+                continue
+            bucket = self._bucket(buckets, value, create=False)
+            bucket.remove(record)
+            if not bucket:
+                del buckets[value]
+        self.fulltext.remove(record)
+    
+    def get(self, key: Any) -> Optional[Dict[str, Any]]:
+        """按主键查找记录"""
+        if not self._hashable(key):
+            return None
+        return self.primary.get(key)
+    
+    def has_field(self, field: str) -> bool:
+        """字段是否建有二级索引"""
+        return field in self.secondary
+    
+    def lookup(self, field: str, value: Any) -> List[Dict[str, Any]]:
+        """按二级索引查找记录"""
+        if not self._hashable(value):
+            return []
+        return list(self.secondary[field].get(value, ()))
+    
+    def bucket_size(self, field: str, value: Any) -> int:
+        """二级索引中某个取值对应的记录数"""
+        if not self._hashable(value):
+            return 0
+        return len(self.secondary[field].get(value, ()))
+
+
+class DatabaseJournal:
+    """追加写的JSONL变更日志（WAL），每条记录一行"""
+    
+    def __init__(self, path: Path):
+        """
+        初始化变更日志
+        
+        Args:
+            path: 日志文件路径
+        """
+        self.path = path
+        self._file = None
+        self.first_entry_at: Optional[float] = None
+        # 已读取到的位置，多进程模式下只需读取其他进程新追加的记录
+        self.read_offset = 0
+    
+    def _open(self):
+        if self._file is None:
+            self._file = open(self.path, 'ab')
+        return self._file
+    
+    def append(self, lines: List[str]):
+        """追加一批记录并刷盘（只对日志做fsync）"""
+        if not lines:
+            return
+        f = self._open()
+        f.write(("\n".join(lines) + "\n").encode('utf-8'))
+        f.flush()
+        os.fsync(f.fileno())
+        if self.first_entry_at is None:
+            self.first_entry_at = time.monotonic()
+    
+    def read_records(self, offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        读取完整记录，遇到崩溃导致的残缺尾部时截断丢弃
+        
+        Args:
+            offset: 起始位置（字节），用于只读取新追加的记录
+        """
+        if not self.path.exists():
+            self.read_offset = 0
+            return []
+        records = []
+        valid_bytes = offset
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            for raw_line in f:
+                if not raw_line.endswith(b"\n"):
+                    break
+                try:
+                    records.append(json.loads(raw_line))
+                except json.JSONDecodeError:
+                    break
+                valid_bytes += len(raw_line)
+        if valid_bytes < self.path.stat().st_size:
+            logger.warning(f"变更日志尾部不完整，已截断: {self.path}")
+            with open(self.path, 'r+b') as f:
+                f.truncate(valid_bytes)
+        self.read_offset = valid_bytes
+        if records and self.first_entry_at is None:
+            self.first_entry_at = time.monotonic()
+        return records
+    
+    def size(self) -> int:
+        """日志文件大小（字节）"""
+        try:
+            return self.path.stat().st_size
+        except FileNotFoundError:
+            return 0
+    
+    def age(self) -> float:
+        """最早一条未合并记录距今的秒数"""
+        if self.first_entry_at is None:
+            return 0.0
+        return time.monotonic() - self.first_entry_at
+    
+    def truncate(self):
+        """清空日志（快照已包含全部记录后调用）"""
+        self.close()
+        with open(self.path, 'wb') as f:
+            f.flush()
+            os.fsync(f.fileno())
+        self.first_entry_at = None
+        self.read_offset = 0
+    
+    def close(self):
+        """关闭日志文件句柄"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def _file_stamp(path: Path) -> Optional[Tuple[int, int, int]]:
+    """文件的(inode, 修改时间, 大小)，用于低成本地判断文件是否被其他进程修改"""
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+class DatabaseLock:
+    """数据库写锁：进程内可重入锁，可选叠加基于fcntl.flock的跨进程排他锁
+    
+    最外层获取时加文件锁并回调on_acquire（同步其他进程的修改），
+    最外层释放前回调before_release（提交本进程的修改）后再解开文件锁。
+    """
+    
+    def __init__(self, lock_path: Optional[Path] = None, on_acquire: Optional[Callable[[], None]] = None,
+                 before_release: Optional[Callable[[], None]] = None):
+        """
+        初始化数据库写锁
+        
+        Args:
+            lock_path: 锁文件路径，为空时只使用进程内锁
+            on_acquire: 取得跨进程锁后的回调
+            before_release: 释放跨进程锁前的回调
+        """
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._file = None
+        self.on_acquire = on_acquire
+        self.before_release = before_release
+        if lock_path is not None:
+            if fcntl is None:
+                logger.warning("当前平台不支持fcntl文件锁，多进程写入无法互斥")
+            else:
+                self._file = open(lock_path, 'a+b')
+    
+    @property
+    def interprocess(self) -> bool:
+        """是否启用了跨进程文件锁"""
+        return self._file is not None
+    
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        if not self._lock.acquire(blocking, timeout):
+            return False
+        self._depth += 1
+        if self._depth == 1 and self._file is not None:
+            try:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+                if self.on_acquire is not None:
+                    self.on_acquire()
+            except BaseException:
+                self._unlock_file()
+                self._depth -= 1
+                self._lock.release()
+                raise
+        return True
+    
+    def release(self):
+        try:
+            if self._depth == 1 and self._file is not None:
+                try:
+                    if self.before_release is not None:
+                        self.before_release()
+                finally:
+                    self._unlock_file()
+        finally:
+            self._depth -= 1
+            self._lock.release()
+    
+    def _unlock_file(self):
+        try:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        except (OSError, ValueError) as e:
+            logger.error(f"释放数据库文件锁失败: {e}")
+    
+    def __enter__(self) -> "DatabaseLock":
+        self.acquire()
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+    
+    def close(self):
+        """关闭锁文件"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class FrozenRecord(dict):
+    """只读记录：已发布版本中的记录被多个读者共享，禁止原地修改，需通过数据库接口更新"""
+    
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("记录只读，请通过数据库的update/upsert接口修改")
+    
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+    
+    def __reduce__(self):
+        return FrozenRecord, (dict(self),)
+
+
+class DatabaseSnapshot:
+    """数据库的一个只读版本（集合数据 + 索引），发布后不再修改，读者无需加锁即可访问"""
+    
+    __slots__ = ("version", "data", "indexes", "collection_versions")
+    
+    def __init__(self, version: int, data: Dict[str, Any], indexes: Dict[str, "CollectionIndex"],
+                 collection_versions: Dict[str, int]):
+        self.version = version
+        self.data = data
+        self.indexes = indexes
+        self.collection_versions = collection_versions
+    
+    def collection(self, collection_name: str) -> Any:
+        """获取集合数据（不存在时返回空列表）"""
+        return self.data.get(collection_name, [])
+    
+    def index(self, collection_name: str) -> Optional["CollectionIndex"]:
+        """获取集合索引（非列表集合或集合不存在时返回None）"""
+        return self.indexes.get(collection_name)
+
 
 class JSONDatabase:
-    """JSON数据库操作类"""
+    """JSON数据库操作类
+    
+    数据在初始化时一次性加载到内存（常驻模式），读操作直接访问内存，
+    写操作标记脏集合后按组提交间隔批量落盘，落盘采用“写临时文件+原子重命名”。
+    开启变更日志后，写操作只追加并fsync日志记录，由后台线程按大小或时间阈值合并为新快照。
+    每个集合自动维护主键索引，并按声明维护二级索引。
+    
+    读写采用多版本（写时复制）：写操作在锁内复制受影响的集合与索引，完成后原子地发布新版本；
+    读操作直接读取当前已发布的版本，无需加锁，记录为只读的FrozenRecord，列表结果携带数据版本号。
+    每个新版本发布后，其中的记录变更按顺序发布到变更流changes（事务回滚的修改不会发布）。
+    """
     
-    def __init__(self, db_path: str = "./data/simulated_database.json"):
+    def __init__(self, db_path: str = "./data/simulated_database.json", flush_interval: float = 0.0,
+                 indexes: Optional[Dict[str, List[str]]] = None, journal: bool = False,
+                 journal_max_bytes: int = 4 * 1024 * 1024, journal_max_age: float = 300.0,
+                 fulltext_indexes: Optional[Dict[str, List[str]]] = None,
+                 codec: Union[str, DatabaseCodec, None] = None, multiprocess: bool = False):
         """
         初始化JSON数据库
         
         Args:
             db_path: 数据库文件路径
+            flush_interval: 组提交间隔（秒），小于等于0时每次写操作立即落盘
+            indexes: 二级索引声明（集合 -> 字段列表），默认使用DEFAULT_SECONDARY_INDEXES
+            journal: 是否启用追加写变更日志
+            journal_max_bytes: 日志超过该大小时合并为快照
+            journal_max_age: 日志中最早记录超过该秒数时合并为快照
+            fulltext_indexes: 全文索引声明（集合 -> 字段列表），默认使用DEFAULT_FULLTEXT_INDEXES
+            codec: 快照文件的序列化格式（json、json-pretty、msgpack），默认紧凑JSON；
+                加载时自动识别文件格式，下次写入时转换为该格式
+            multiprocess: 多进程模式（如uvicorn多worker）：写操作持有跨进程文件锁，开始前同步其他进程的修改，
+                结束前立即提交；读操作通过文件状态检查发现外部修改，只重新加载发生变化的集合
         """
         self.db_path = Path(db_path)
-        self.lock = threading.RLock()  # 使用可重入锁
-        self._ensure_db_file()
+        self.codec = get_codec(codec)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = DatabaseLock(
+            self.db_path.with_name(f".{self.db_path.name}.lock") if multiprocess else None,
+            on_acquire=self._sync_external,
+            before_release=self._commit_external
+        )
+        self.flush_interval = flush_interval
+        self.journal_max_bytes = journal_max_bytes
+        self.journal_max_age = journal_max_age
+        self._journal: Optional[DatabaseJournal] = (
+            DatabaseJournal(self.db_path.with_name(f"{self.db_path.name}.journal")) if journal else None
+        )
+        self._journal_seq = 0
+        self._pending: List[str] = []
+        self._tx_depth = 0
+        # 持有事务的线程：该线程的读操作看到事务内尚未提交的修改
+        self._tx_thread: Optional[int] = None
+        self.index_fields: Dict[str, List[str]] = {
+            name: list(fields)
+            for name, fields in (DEFAULT_SECONDARY_INDEXES if indexes is None else indexes).items()
+        }
+        self.fulltext_fields: Dict[str, List[str]] = {
+            name: list(fields)
+            for name, fields in (DEFAULT_FULLTEXT_INDEXES if fulltext_indexes is None else fulltext_indexes).items()
+        }
+        self._snapshot = DatabaseSnapshot(0, {}, {}, {})
+        self._working: Optional[DatabaseSnapshot] = None
+        self._owned: Set[str] = set()
+        self._positions: Dict[str, Dict[int, int]] = {}
+        self._located: Set[str] = set()
+        self._written_version = 0
+        # 跨进程的修改序号：每次提交递增，记录各集合最后一次修改时的序号，据此只重新加载变化的集合
+        self._revision = 0
+        self._revisions: Dict[str, int] = {}
+        self._disk_stamp: Tuple[Any, Any] = (None, None)
+        self._last_updated: Optional[str] = None
+        # 变更流：工作版本中的变更在发布时一并发出
+        self.changes = ChangeFeed()
+        self._changes: List[Change] = []
+        self._write_lock = threading.Lock()
+        self._dirty: Set[str] = set()
+        self._closed = threading.Event()
+        self._flush_thread: Optional[threading.Thread] = None
+        
+        # 多进程模式下由文件锁保证只有一个进程创建并加载初始文件
+        with self.lock:
+            self._ensure_db_file()
+            self._load_db()
+        
+        if self.flush_interval > 0 or self._journal is not None:
+            self._flush_thread = threading.Thread(
+                target=self._flush_loop,
+                name=f"JSONDatabaseFlusher-{self.db_path.name}",
+                daemon=True
+            )
+            self._flush_thread.start()
+        atexit.register(self.close)
     
     def _ensure_db_file(self):
         """确保数据库文件存在"""
-        # 创建目录
-        self.db_path.parent.mkdir(parents=True, exist_ok=True)
-        
         # 如果文件不存在，创建初始数据库结构
         if not self.db_path.exists():
             initial_data = {
@@ -53,43 +731,677 @@ class JSONDatabase:
             self._write_data(initial_data)
             logger.info(f"创建初始数据库文件: {self.db_path}")
     
+    def _load_db(self):
+        """从磁盘加载数据库到内存"""
+        with self.lock:
+            self._reset(self._read_data())
+            self._dirty.clear()
+            self._pending = []
+            metadata = self._data.get("metadata", {})
+            self._revision = metadata.get("revision", 0)
+            self._revisions = dict(metadata.get("collection_revisions", {}))
+            if self._journal is not None:
+                self._replay_journal()
+                # 启动时重放日志恢复的是已有数据，不作为变更发布
+                self._changes = []
+                self._publish()
+            self._disk_stamp = self._stamp()
+        logger.debug(f"数据库已加载到内存: {self.db_path}")
+    
+    def _stamp(self) -> Tuple[Any, Any]:
+        """快照文件与变更日志的文件状态"""
+        journal_stamp = _file_stamp(self._journal.path) if self._journal is not None else None
+        return _file_stamp(self.db_path), journal_stamp
+    
+    def _sync_external(self):
+        """取得跨进程锁后同步其他进程已提交的修改：快照文件变化时只重新加载修改序号变化的集合，变更日志只读取新追加的记录"""
+        if self._snapshot.version == 0:
+            # 初始化阶段，随后的_load_db会完整加载
+            return
+        stamp = self._stamp()
+        if stamp == self._disk_stamp:
+            return
+        if stamp[0] != self._disk_stamp[0]:
+            self._sync_snapshot()
+        if self._journal is not None:
+            for record in self._journal.read_records(self._journal.read_offset):
+                seq = record.get("seq", 0)
+                if seq > self._journal_seq:
+                    self._apply_record(record)
+                    self._journal_seq = seq
+        self._publish()
+        self._written_version = self._snapshot.version
+        self._disk_stamp = self._stamp()
+    
+    def _sync_snapshot(self):
+        """快照文件被其他进程重写后，重新加载其中修改序号与本进程不一致的集合"""
+        data = self._read_data()
+        metadata = data.get("metadata", {})
+        revisions = metadata.get("collection_revisions")
+        current = self._begin_write().data
+        reloaded = []
+        for name in set(data) | set(current):
+            unchanged = (
+                revisions is not None and name in data and name in current
+                and revisions.get(name) == self._revisions.get(name)
+            )
+            if name == "metadata" or unchanged:
+                continue
+            if name in data:
+                self._set_collection(name, data[name])
+            else:
+                self._drop_collection(name)
+            self._changes.append(("replace", name, None, None, None))
+            reloaded.append(name)
+        self._set_collection("metadata", metadata)
+        self._revision = metadata.get("revision", 0)
+        self._revisions = dict(revisions or {})
+        if self._journal is not None:
+            # 快照被重写意味着日志已被合并清空，此后的日志记录从快照的序号开始
+            self._journal_seq = metadata.get("journal_seq", 0)
+            self._journal.read_offset = 0
+        if reloaded:
+            logger.info(f"检测到其他进程的修改，已重新加载集合: {sorted(reloaded)}")
+    
+    def _commit_external(self):
+        """释放跨进程锁前提交本进程的修改，并记录提交后的文件状态（避免把自己的写入当作外部修改）"""
+        if self._dirty:
+            self.flush()
+        self._disk_stamp = self._stamp()
+    
+    def _bump_revision(self, collection_names: List[str]) -> Dict[str, Any]:
+        """为一次提交分配修改序号，返回需要写入快照元数据的内容"""
+        self._revision += 1
+        for name in collection_names:
+            self._revisions[name] = self._revision
+        return {"revision": self._revision, "collection_revisions": dict(self._revisions)}
+    
+    def _replay_journal(self):
+        """在快照之上重放变更日志中尚未合并的记录"""
+        snapshot_seq = self._data.get("metadata", {}).get("journal_seq", 0)
+        self._journal_seq = snapshot_seq
+        replayed = 0
+        for record in self._journal.read_records():
+            seq = record.get("seq", 0)
+            if seq <= snapshot_seq:
+                continue
+            self._apply_record(record)
+            self._journal_seq = seq
+            replayed += 1
+        if replayed:
+            logger.info(f"已从变更日志重放 {replayed} 条记录")
+    
+    def _apply_record(self, record: Dict[str, Any]):
+        """将一条日志记录应用到内存数据"""
+        op = record["op"]
+        collection_name = record["c"]
+        if op == "revision":
+            self._revision = record["r"]
+            for name in collection_name:
+                self._revisions[name] = record["r"]
+            return
+        
+        if op == "replace":
+            self._set_collection(collection_name, record["v"])
+            self._changes.append(("replace", collection_name, None, None, None))
+            return
+        
+        if op == "append":
+            value = FrozenRecord(record["v"])
+            self._append_record(collection_name, value)
+            self._changes.append(("create", collection_name, self._record_key(collection_name, value), None, value))
+            return
+        
+        item = self._find_by_key(self._begin_write(), collection_name, record.get("f"), record["k"])
+        if item is None:
+            logger.warning(f"重放日志时未找到记录 {collection_name}/{record['k']}")
+            return
+        if op == "put":
+            value = FrozenRecord(record["v"])
+            self._replace_record(collection_name, item, value)
+            self._changes.append(("update", collection_name, self._record_key(collection_name, value), item, value))
+        elif op == "delete":
+            self._drop_record(collection_name, item)
+            self._changes.append(("delete", collection_name, self._record_key(collection_name, item), item, None))
+    
+    def _log(self, op: str, collection_name: str, key: Any = None, value: Any = None, key_field: str = None):
+        """记录一次变更（仅在启用变更日志时生效），在写入时立即序列化"""
+        if self._journal is None:
+            return
+        self._journal_seq += 1
+        record = {"seq": self._journal_seq, "op": op, "c": collection_name}
+        if key is not None:
+            record["k"] = key
+        if key_field is not None:
+            record["f"] = key_field
+        if value is not None:
+            record["v"] = value
+        self._pending.append(_dumps_line(record))
+    
+    @staticmethod
+    def _freeze(value: Any) -> Any:
+        """将列表集合中的记录转换为只读记录"""
+        if not isinstance(value, list):
+            return value
+        return [FrozenRecord(item) if isinstance(item, dict) and not isinstance(item, FrozenRecord) else item
+                for item in value]
+    
+    def _build_index(self, collection_name: str, collection: List[Dict[str, Any]]) -> CollectionIndex:
+        """为集合构建全新的索引"""
+        index = CollectionIndex(collection_name, self.index_fields.get(collection_name),
+                                self.fulltext_fields.get(collection_name))
+        index.rebuild(collection)
+        return index
+    
+    def _reset(self, data: Dict[str, Any]):
+        """以新数据整体替换当前版本并立即发布（加载、恢复时使用）"""
+        data = {name: self._freeze(value) for name, value in data.items()}
+        indexes = {
+            name: self._build_index(name, value) for name, value in data.items() if isinstance(value, list)
+        }
+        version = self._snapshot.version + 1
+        self._working = None
+        self._owned = set()
+        self._positions = {}
+        self._located = set()
+        self._snapshot = DatabaseSnapshot(version, data, indexes, {name: version for name in data})
+    
+    def _current(self, staged: bool = True) -> DatabaseSnapshot:
+        """
+        读操作使用的已发布版本；多进程模式下先比较文件状态，发现其他进程的修改时同步
+        
+        事务进行中时，持有事务的线程读取工作版本（看到本事务已暂存的修改），其他线程仍读取已发布版本；
+        staged为False时总是返回已发布版本（快照、备份不包含未提交的修改）。
+        """
+        working = self._working
+        if staged and working is not None and self._tx_thread == threading.get_ident():
+            return working
+        if self.lock.interprocess and self._stamp() != self._disk_stamp:
+            # 本进程正有写操作时不等待，写操作开始时已同步过外部修改
+            if self.lock.acquire(blocking=False):
+                self.lock.release()
+        return self._snapshot
+    
+    @property
+    def _data(self) -> Dict[str, Any]:
+        """写入方视角的最新数据（写操作进行中时为尚未发布的工作版本）"""
+        return (self._working or self._snapshot).data
+    
+    def _begin_write(self) -> DatabaseSnapshot:
+        """获取当前写操作的工作版本，首次写入时从已发布版本浅复制"""
+        if self._working is None:
+            snapshot = self._snapshot
+            self._working = DatabaseSnapshot(snapshot.version + 1, dict(snapshot.data), dict(snapshot.indexes),
+                                             dict(snapshot.collection_versions))
+            self._owned = set()
+            self._positions = {}
+            self._located = set()
+        return self._working
+    
+    def _writable(self, collection_name: str):
+        """获取工作版本中可修改的集合与索引，集合在本版本内首次修改时复制"""
+        working = self._begin_write()
+        if collection_name not in self._owned:
+            collection = working.data.get(collection_name)
+            if collection is not None and not isinstance(collection, list):
+                raise TypeError(f"集合 {collection_name} 不是列表集合")
+            collection = list(collection or [])
+            index = working.indexes.get(collection_name)
+            working.data[collection_name] = collection
+            working.indexes[collection_name] = (
+                index.copy() if index is not None else self._build_index(collection_name, collection)
+            )
+            working.collection_versions[collection_name] = working.version
+            self._owned.add(collection_name)
+        return working.data[collection_name], working.indexes[collection_name]
+    
+    def _publish(self):
+        """原子地发布工作版本，之后的读操作看到新数据，随后发布其中的变更事件"""
+        if self._working is None:
+            return
+        self._snapshot = self._working
+        self._working = None
+        self._owned = set()
+        self._positions = {}
+        self._located = set()
+        if self._changes:
+            changes, self._changes = self._changes, []
+            self.changes.publish(changes, version=self._snapshot.version)
+    
+    def _discard(self):
+        """丢弃尚未发布的工作版本及其变更（事务回滚）"""
+        self._working = None
+        self._owned = set()
+        self._positions = {}
+        self._located = set()
+        self._changes = []
+    
+    @staticmethod
+    def _record_key(collection_name: str, record: Dict[str, Any]) -> Any:
+        """记录的主键值（id或<集合名单数>_id）"""
+        for field_name in ("id", f"{collection_name[:-1]}_id"):
+            value = record.get(field_name)
+            if value is not None:
+                return value
+        return None
+    
+    def _rebuild_indexes(self, collection_name: str = None):
+        """在工作版本中重建索引（不指定集合时重建全部）"""
+        working = self._begin_write()
+        names = [collection_name] if collection_name else list(working.data.keys())
+        for name in names:
+            if not isinstance(working.data.get(name), list):
+                working.indexes.pop(name, None)
+                continue
+            collection, _ = self._writable(name)
+            working.indexes[name] = self._build_index(name, collection)
+    
+    def create_index(self, collection_name: str, field_name: str):
+        """
+        声明二级索引
+        
+        Args:
+            collection_name: 集合名称
+            field_name: 字段名
+        """
+        with self.lock:
+            fields = self.index_fields.setdefault(collection_name, [])
+            if field_name in fields:
+                return
+            fields.append(field_name)
+            if isinstance(self._data.get(collection_name), list):
+                collection, index = self._writable(collection_name)
+                index.add_field(field_name, collection)
+                if self._tx_depth == 0:
+                    self._publish()
+        logger.info(f"为集合 {collection_name} 创建索引: {field_name}")
+    
+    def create_fulltext_index(self, collection_name: str, field_name: str):
+        """
+        声明全文索引
+        
+        Args:
+            collection_name: 集合名称
+            field_name: 字段名
+        """
+        with self.lock:
+            fields = self.fulltext_fields.setdefault(collection_name, [])
+            if field_name in fields:
+                return
+            fields.append(field_name)
+            if isinstance(self._data.get(collection_name), list):
+                collection, index = self._writable(collection_name)
+                index.add_fulltext_field(field_name, collection)
+                if self._tx_depth == 0:
+                    self._publish()
+        logger.info(f"为集合 {collection_name} 创建全文索引: {field_name}")
+    
+    def _candidates(self, state: DatabaseSnapshot, collection_name: str,
+                    filters: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """根据过滤条件选出候选记录，优先使用选择性最高的二级索引（支持相等与$in条件）"""
+        index = state.index(collection_name)
+        if index is not None:
+            lookups = {}
+            for key, condition in filters.items():
+                if not index.has_field(key):
+                    continue
+                values = self._index_values(condition)
+                if values is not None:
+                    lookups[key] = values
+            if lookups:
+                best = min(lookups, key=lambda key: sum(index.bucket_size(key, v) for v in lookups[key]))
+                values = lookups[best]
+                if len(values) == 1:
+                    return index.lookup(best, values[0])
+                merged: Dict[int, Dict[str, Any]] = {}
+                for value in values:
+                    for record in index.lookup(best, value):
+                        merged[id(record)] = record
+                return list(merged.values())
+        return state.collection(collection_name)
+    
+    @staticmethod
+    def _index_values(condition: Any) -> Optional[List[Any]]:
+        """提取可通过哈希索引查找的取值列表，条件无法走索引时返回None"""
+        if is_operator(condition):
+            if "$eq" in condition:
+                values = [condition["$eq"]]
+            elif "$in" in condition:
+                values = list(condition["$in"])
+            else:
+                return None
+        else:
+            values = [condition]
+        return values if all(CollectionIndex._hashable(value) for value in values) else None
+    
+    def _find_by_key(self, state: DatabaseSnapshot, collection_name: str, key_field: Optional[str],
+                     key: Any) -> Optional[Dict[str, Any]]:
+        """按主键（key_field为空时）或指定字段查找第一条记录"""
+        index = state.index(collection_name)
+        if index is None:
+            return None
+        if key_field is None:
+            return index.get(key)
+        if key_field in index.pk_fields:
+            item = index.get(key)
+            if item is not None and item.get(key_field) == key:
+                return item
+        for item in self._candidates(state, collection_name, {key_field: key}):
+            if item.get(key_field) == key:
+                return item
+        return None
+    
+    def reload(self):
+        """丢弃内存中的数据并从磁盘重新加载（会先提交未落盘的修改）"""
+        with self.lock:
+            self.flush()
+            self._load_db()
+            snapshot = self._snapshot
+            self.changes.publish([("replace", name, None, None, None) for name in snapshot.data if name != "metadata"],
+                                 version=snapshot.version)
+    
     def _read_data(self) -> Dict[str, Any]:
-        """读取数据库数据"""
+        """读取数据库数据（自动识别序列化格式）"""
         try:
-            with open(self.db_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError) as e:
+            return read_database_file(self.db_path)
+        except (FileNotFoundError, ValueError) as e:
             logger.error(f"读取数据库文件失败: {e}")
             return {}
     
-    def _write_data(self, data: Dict[str, Any]):
-        """写入数据库数据"""
+    def _write_data(self, data: Dict[str, Any], **metadata_updates: Any):
+        """写入数据库数据（写临时文件后原子替换），不修改传入的数据"""
+        tmp_path = self.db_path.with_name(f".{self.db_path.name}.tmp")
         try:
-            # 更新元数据
-            if "metadata" in data:
-                data["metadata"]["last_updated"] = datetime.now().isoformat()
+            # 更新元数据（复制后修改，已发布版本中的数据保持不变）
+            if "metadata" in data or metadata_updates:
+                self._last_updated = datetime.now().isoformat()
+                data = dict(data)
+                data["metadata"] = {**data.get("metadata", {}), **metadata_updates,
+                                    "last_updated": self._last_updated}
             
-            # 写入文件
-            with open(self.db_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            # 先写入临时文件并刷盘，再原子替换目标文件
+            with open(tmp_path, 'wb') as f:
+                self.codec.dump(data, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.db_path)
+            self._fsync_dir()
             
             logger.debug(f"数据库文件已更新: {self.db_path}")
         except Exception as e:
             logger.error(f"写入数据库文件失败: {e}")
+            if tmp_path.exists():
+                tmp_path.unlink()
+            raise
+    
+    def _fsync_dir(self):
+        """刷新目录项，保证重命名持久化（部分平台不支持，忽略即可）"""
+        try:
+            dir_fd = os.open(str(self.db_path.parent), os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(dir_fd)
+        except OSError:
+            pass
+        finally:
+            os.close(dir_fd)
+    
+    def _mark_dirty(self, collection_name: str):
+        """标记集合已修改，事务外立即发布新版本，并按组提交策略落盘"""
+        self._dirty.add(collection_name)
+        if self._tx_depth == 0:
+            self._publish()
+            if self.flush_interval <= 0:
+                self.flush()
+    
+    def _flush_loop(self):
+        """后台组提交与日志合并线程"""
+        interval = self.flush_interval if self.flush_interval > 0 else 1.0
+        while not self._closed.wait(interval):
+            try:
+                self.flush()
+                if self._journal is not None and self._should_compact():
+                    self.compact()
+            except Exception as e:
+                logger.error(f"后台提交数据库失败: {e}")
+    
+    def _should_compact(self) -> bool:
+        """日志是否达到合并阈值"""
+        size = self._journal.size()
+        if size == 0:
+            return False
+        return size >= self.journal_max_bytes or self._journal.age() >= self.journal_max_age
+    
+    def flush(self) -> bool:
+        """
+        将脏集合提交到磁盘（启用变更日志时只追加日志记录）
+        
+        Returns:
+            是否执行了写入
+        """
+        with self.lock:
+            if not self._dirty:
+                return False
+            dirty = sorted(self._dirty)
+            snapshot = self._snapshot
+            metadata = self._bump_revision(dirty)
+            if self._journal is not None:
+                if self.lock.interprocess:
+                    # 修改序号随日志一起提交，其他进程重放日志后与本进程保持一致
+                    self._journal_seq += 1
+                    self._pending.append(_dumps_line({"seq": self._journal_seq, "op": "revision",
+                                                      "c": dirty, "r": self._revision}))
+                self._journal.append(self._pending)
+                self._pending = []
+            self._dirty.clear()
+            if self._journal is None and self.lock.interprocess:
+                # 多进程模式下写盘必须在文件锁内完成
+                self._write_snapshot(snapshot, dirty, metadata)
+        
+        if self._journal is None and not self.lock.interprocess:
+            # 已发布版本不会再被修改，序列化与写盘无需持有数据库锁
+            self._write_snapshot(snapshot, dirty, metadata)
+        logger.debug(f"已提交脏集合: {dirty}")
+        return True
+    
+    def _write_snapshot(self, snapshot: DatabaseSnapshot, dirty: List[str], metadata: Dict[str, Any]):
+        """将已发布版本写入快照文件，按版本号保证不会用旧版本覆盖新版本，失败时恢复脏标记"""
+        try:
+            with self._write_lock:
+                if snapshot.version > self._written_version:
+                    self._write_data(snapshot.data, **metadata)
+                    self._written_version = snapshot.version
+        except Exception:
+            with self.lock:
+                self._dirty.update(dirty)
             raise
     
-    def _get_collection(self, collection_name: str) -> List[Dict[str, Any]]:
-        """获取集合数据"""
+    def compact(self) -> bool:
+        """
+        将变更日志合并为新快照并清空日志
+        
+        Returns:
+            是否执行了合并
+        """
+        if self._journal is None:
+            return False
         with self.lock:
-            data = self._read_data()
-            return data.get(collection_name, [])
+            self.flush()
+            if self._journal.size() == 0:
+                return False
+            # 快照记录已合并的日志序号，崩溃后重放时跳过这些记录
+            with self._write_lock:
+                self._write_data(self._snapshot.data, journal_seq=self._journal_seq, revision=self._revision,
+                                 collection_revisions=dict(self._revisions))
+                self._written_version = self._snapshot.version
+            self._journal.truncate()
+        logger.info(f"变更日志已合并为快照: {self.db_path}")
+        return True
+    
+    def close(self):
+        """停止后台提交线程并落盘所有修改"""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        if self._flush_thread is not None:
+            self._flush_thread.join(timeout=max(self.flush_interval, 1.0))
+        self.flush()
+        if self._journal is not None:
+            self.compact()
+            self._journal.close()
+        self.lock.close()
+    
+    def _set_collection(self, collection_name: str, collection_data: Any):
+        """在工作版本中整体替换集合并重建其索引"""
+        working = self._begin_write()
+        collection_data = self._freeze(collection_data)
+        working.data[collection_name] = collection_data
+        if isinstance(collection_data, list):
+            working.indexes[collection_name] = self._build_index(collection_name, collection_data)
+        else:
+            working.indexes.pop(collection_name, None)
+        working.collection_versions[collection_name] = working.version
+        self._owned.add(collection_name)
+        self._positions.pop(collection_name, None)
+        return collection_data
+    
+    def _drop_collection(self, collection_name: str):
+        """从工作版本中移除集合"""
+        working = self._begin_write()
+        working.data.pop(collection_name, None)
+        working.indexes.pop(collection_name, None)
+        working.collection_versions[collection_name] = working.version
+        self._owned.discard(collection_name)
+        self._positions.pop(collection_name, None)
     
     def _update_collection(self, collection_name: str, collection_data: List[Dict[str, Any]]):
         """更新集合数据"""
         with self.lock:
-            data = self._read_data()
-            data[collection_name] = collection_data
-            self._write_data(data)
+            collection_data = self._set_collection(collection_name, collection_data)
+            self._log("replace", collection_name, value=collection_data)
+            self._changes.append(("replace", collection_name, None, None, None))
+            self._mark_dirty(collection_name)
+    
+    def _locate(self, collection_name: str, collection: List[Dict[str, Any]], item: Dict[str, Any]) -> Optional[int]:
+        """查找记录在工作版本集合中的位置；同一版本内多次查找同一集合时建立位置表"""
+        positions = self._positions.get(collection_name)
+        if positions is not None:
+            return positions.get(id(item))
+        if collection_name in self._located:
+            positions = {id(record): i for i, record in enumerate(collection)}
+            self._positions[collection_name] = positions
+            return positions.get(id(item))
+        self._located.add(collection_name)
+        try:
+            # list.index在C层逐个比较，相同对象直接命中；内容相同的其他记录需按对象身份确认
+            position = collection.index(item)
+        except ValueError:
+            return None
+        if collection[position] is item:
+            return position
+        return next((i for i, record in enumerate(collection) if record is item), None)
+    
+    def _append_record(self, collection_name: str, record: FrozenRecord):
+        collection, index = self._writable(collection_name)
+        collection.append(record)
+        index.add(record)
+        positions = self._positions.get(collection_name)
+        if positions is not None:
+            positions[id(record)] = len(collection) - 1
+    
+    def _replace_record(self, collection_name: str, item: Dict[str, Any], record: FrozenRecord):
+        collection, index = self._writable(collection_name)
+        position = self._locate(collection_name, collection, item)
+        index.remove(item)
+        if position is None:
+            collection.append(record)
+            position = len(collection) - 1
+        else:
+            collection[position] = record
+        index.add(record)
+        positions = self._positions.get(collection_name)
+        if positions is not None:
+            positions.pop(id(item), None)
+            positions[id(record)] = position
+    
+    def _drop_record(self, collection_name: str, item: Dict[str, Any]):
+        collection, index = self._writable(collection_name)
+        position = self._locate(collection_name, collection, item)
+        if position is not None:
+            del collection[position]
+            # 删除后其后记录的位置整体前移，位置表失效
+            self._positions.pop(collection_name, None)
+        index.remove(item)
+    
+    def _insert_item(self, collection_name: str, item: Dict[str, Any]) -> FrozenRecord:
+        """追加记录并维护索引与日志，返回写入的只读记录"""
+        record = item if isinstance(item, FrozenRecord) else FrozenRecord(item)
+        self._append_record(collection_name, record)
+        self._log("append", collection_name, value=record)
+        self._changes.append(("create", collection_name, self._record_key(collection_name, record), None, record))
+        return record
+    
+    def _modify_item(self, collection_name: str, item: Dict[str, Any], updates: Dict[str, Any],
+                     key: Any, key_field: str = None) -> FrozenRecord:
+        """以更新后的新记录替换旧记录（旧版本中的记录保持不变），并维护索引与日志"""
+        values = dict(item)
+        values.update(updates)
+        values["updated_at"] = datetime.now().isoformat()
+        record = FrozenRecord(values)
+        self._replace_record(collection_name, item, record)
+        self._log("put", collection_name, key=key, value=record, key_field=key_field)
+        self._changes.append(("update", collection_name, self._record_key(collection_name, record), item, record))
+        return record
+    
+    def _remove_item(self, collection_name: str, item: Dict[str, Any], key: Any):
+        """删除记录并维护索引与日志"""
+        self._drop_record(collection_name, item)
+        self._log("delete", collection_name, key=key)
+        self._changes.append(("delete", collection_name, self._record_key(collection_name, item), item, None))
+    
+    @contextmanager
+    def transaction(self, flush: bool = True) -> Iterator["JSONDatabase"]:
+        """
+        事务上下文：块内的全部写操作合并为一个新版本并只提交一次，发生异常时全部回滚
+        
+        事务期间持有数据库写锁，嵌套事务并入最外层事务；事务内的读操作能看到本事务已暂存的修改，
+        其他线程在提交前只能看到事务开始前的版本。回滚时脏标记恢复为事务开始前的状态。
+        
+        Args:
+            flush: 写穿模式下提交后是否立即落盘（为False时由调用方自行调用flush）
+        """
+        with self.lock:
+            if self._tx_depth > 0:
+                self._tx_depth += 1
+                try:
+                    yield self
+                finally:
+                    self._tx_depth -= 1
+                return
+            
+            self._tx_depth = 1
+            self._tx_thread = threading.get_ident()
+            pending_mark = len(self._pending)
+            seq_mark = self._journal_seq
+            dirty_mark = set(self._dirty)
+            try:
+                yield self
+            except BaseException:
+                self._discard()
+                del self._pending[pending_mark:]
+                self._journal_seq = seq_mark
+                self._dirty.clear()
+                self._dirty.update(dirty_mark)
+                logger.warning("事务已回滚")
+                raise
+            finally:
+                self._tx_depth = 0
+                self._tx_thread = None
+            
+            self._publish()
+            if flush and self._dirty and self.flush_interval <= 0:
+                self.flush()
     
     def create(self, collection_name: str, item: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -103,54 +1415,104 @@ class JSONDatabase:
             创建后的记录
         """
         with self.lock:
-            collection = self._get_collection(collection_name)
-            
-            # 添加创建时间
-            item["created_at"] = datetime.now().isoformat()
-            item["updated_at"] = datetime.now().isoformat()
+            # 添加创建时间（写入副本，不修改调用方传入的字典）
+            current_time = datetime.now().isoformat()
             
             # 添加到集合
-            collection.append(item)
-            self._update_collection(collection_name, collection)
+            record = self._insert_item(collection_name, {**item, "created_at": current_time, "updated_at": current_time})
+            self._mark_dirty(collection_name)
             
             logger.info(f"在集合 {collection_name} 中创建新记录")
-            return item
+            return record
+    
+    def create_many(self, collection_name: str, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        批量创建记录，只提交一次
+        
+        Args:
+            collection_name: 集合名称
+            items: 要创建的记录列表
+            
+        Returns:
+            创建后的记录列表
+        """
+        records = []
+        with self.transaction():
+            current_time = datetime.now().isoformat()
+            for item in items:
+                records.append(self._insert_item(
+                    collection_name, {**item, "created_at": current_time, "updated_at": current_time}
+                ))
+            if records:
+                self._mark_dirty(collection_name)
+        
+        logger.info(f"在集合 {collection_name} 中批量创建 {len(records)} 条记录")
+        return records
     
     def read(self, collection_name: str, item_id: str = None, filters: Dict[str, Any] = None) -> Union[List[Dict[str, Any]], Dict[str, Any], None]:
         """
-        读取记录
+        读取记录（读取当前已发布版本，无需加锁）
         
         Args:
             collection_name: 集合名称
             item_id: 记录ID（可选）
-            filters: 过滤条件（可选）
+            filters: 过滤条件（可选，支持与query相同的运算符表达式）
             
         Returns:
-            记录列表或单个记录
+            单个只读记录，或携带version属性的记录列表
         """
-        collection = self._get_collection(collection_name)
-        
+        snapshot = self._current()
         if item_id:
-            # 根据ID查找单个记录
-            for item in collection:
-                if item.get("id") == item_id or item.get(f"{collection_name[:-1]}_id") == item_id:
-                    return item
-            return None
+            # 根据主键索引查找单个记录
+            index = snapshot.index(collection_name)
+            return index.get(item_id) if index is not None else None
         
         if filters:
-            # 根据过滤条件查找记录
-            filtered_items = []
-            for item in collection:
-                match = True
-                for key, value in filters.items():
-                    if item.get(key) != value:
-                        match = False
-                        break
-                if match:
-                    filtered_items.append(item)
-            return filtered_items
-        
-        return collection
+            # 根据过滤条件查找记录，可用时走二级索引
+            items = [item for item in self._candidates(snapshot, collection_name, filters) if matches(item, filters)]
+            return QueryResult(items, version=snapshot.version)
+        
+        collection = snapshot.collection(collection_name)
+        if not isinstance(collection, list):
+            return dict(collection)
+        # 返回列表副本，调用方增删列表元素不影响数据库
+        return QueryResult(collection, version=snapshot.version)
+    
+    def query(self, collection_name: str, filters: Dict[str, Any] = None, sort: SortSpec = None,
+              offset: int = 0, limit: Optional[int] = None, fields: List[str] = None,
+              search: Optional[str] = None, search_fields: List[str] = None) -> QueryResult:
+        """
+        条件查询
+        
+        过滤条件中普通值表示相等，也可使用运算符表达式：{"status": {"$in": ["进行中", "已延期"]}}、
+        {"due_date": {"$gte": "2024-01-01", "$lt": "2024-02-01"}}，支持$eq/$ne/$in/$nin/$gt/$gte/$lt/$lte。
+        相等与$in条件优先走二级索引；指定limit时按排序键用堆取前offset+limit条，不对整个集合排序。
+        未指定排序时不保证结果顺序与集合中的顺序一致，分页场景应显式指定排序。
+        
+        Args:
+            collection_name: 集合名称
+            filters: 过滤条件（可选）
+            sort: 排序声明，如 "-priority,due_date" 或 [("due_date", "asc")]，空值排在最后
+            offset: 跳过的记录数
+            limit: 返回的最大记录数（可选）
+            fields: 投影字段（可选，指定时返回只含这些字段的新字典）
+            search: 全文搜索词（可选，未指定排序时按相关度排序）
+            search_fields: 全文搜索字段（可选）
+            
+        Returns:
+            当前页记录，total属性为满足条件的记录总数，version属性为查询所基于的数据版本
+        """
+        snapshot = self._current()
+        if search:
+            candidates = self._search(snapshot, collection_name, search, search_fields)
+        elif filters:
+            candidates = self._candidates(snapshot, collection_name, filters)
+        else:
+            candidates = snapshot.collection(collection_name)
+        matched = [item for item in candidates if matches(item, filters)] if filters else list(candidates)
+        page = paginate(matched, sort, offset, limit)
+        
+        return QueryResult((project(item, fields) for item in page), total=len(matched), version=snapshot.version)
     
     def update(self, collection_name: str, item_id: str, updates: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """
@@ -165,22 +1527,79 @@ class JSONDatabase:
             更新后的记录或None
         """
         with self.lock:
-            collection = self._get_collection(collection_name)
-            
-            for i, item in enumerate(collection):
-                if item.get("id") == item_id or item.get(f"{collection_name[:-1]}_id") == item_id:
-                    # 更新记录
-                    item.update(updates)
-                    item["updated_at"] = datetime.now().isoformat()
-                    collection[i] = item
-                    self._update_collection(collection_name, collection)
-                    
-                    logger.info(f"更新集合 {collection_name} 中的记录 {item_id}")
-                    return item
+            item = self._find_by_key(self._working or self._snapshot, collection_name, None, item_id)
+            
+            if item is not None:
+                # 以新记录替换旧记录，先移出索引再按新值重新加入
+                record = self._modify_item(collection_name, item, updates, key=item_id)
+                self._mark_dirty(collection_name)
+                
+                logger.info(f"更新集合 {collection_name} 中的记录 {item_id}")
+                return record
             
             logger.warning(f"在集合 {collection_name} 中未找到记录 {item_id}")
             return None
     
+    def update_many(self, collection_name: str, updates: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        批量更新记录，只提交一次
+        
+        Args:
+            collection_name: 集合名称
+            updates: 记录ID -> 更新数据
+            
+        Returns:
+            更新后的记录列表（未找到的记录被跳过）
+        """
+        updated = []
+        with self.transaction():
+            for item_id, item_updates in updates.items():
+                item = self._find_by_key(self._begin_write(), collection_name, None, item_id)
+                if item is None:
+                    logger.warning(f"在集合 {collection_name} 中未找到记录 {item_id}")
+                    continue
+                updated.append(self._modify_item(collection_name, item, item_updates, key=item_id))
+            if updated:
+                self._mark_dirty(collection_name)
+        
+        logger.info(f"批量更新集合 {collection_name} 中的 {len(updated)} 条记录")
+        return updated
+    
+    def upsert_many(self, collection_name: str, items: List[Dict[str, Any]], key_field: str = None) -> List[Dict[str, Any]]:
+        """
+        批量插入或更新记录，只提交一次
+        
+        Args:
+            collection_name: 集合名称
+            items: 记录列表
+            key_field: 用于匹配已有记录的字段，默认为 <集合名单数>_id
+            
+        Returns:
+            插入或更新后的记录列表
+        """
+        key_field = key_field or f"{collection_name[:-1]}_id"
+        results = []
+        created = 0
+        with self.transaction():
+            current_time = datetime.now().isoformat()
+            for item in items:
+                key = item.get(key_field)
+                existing = (
+                    self._find_by_key(self._begin_write(), collection_name, key_field, key) if key is not None else None
+                )
+                if existing is None:
+                    results.append(self._insert_item(
+                        collection_name, {**item, "created_at": current_time, "updated_at": current_time}
+                    ))
+                    created += 1
+                else:
+                    results.append(self._modify_item(collection_name, existing, item, key=key, key_field=key_field))
+            if results:
+                self._mark_dirty(collection_name)
+        
+        logger.info(f"批量写入集合 {collection_name}：新增 {created} 条，更新 {len(results) - created} 条")
+        return results
+    
     def delete(self, collection_name: str, item_id: str) -> bool:
         """
         删除记录
@@ -193,19 +1612,47 @@ class JSONDatabase:
             是否删除成功
         """
         with self.lock:
-            collection = self._get_collection(collection_name)
+            item = self._find_by_key(self._working or self._snapshot, collection_name, None, item_id)
             
-            for i, item in enumerate(collection):
-                if item.get("id") == item_id or item.get(f"{collection_name[:-1]}_id") == item_id:
-                    del collection[i]
-                    self._update_collection(collection_name, collection)
-                    
-                    logger.info(f"从集合 {collection_name} 中删除记录 {item_id}")
-                    return True
+            if item is not None:
+                self._remove_item(collection_name, item, key=item_id)
+                self._mark_dirty(collection_name)
+                
+                logger.info(f"从集合 {collection_name} 中删除记录 {item_id}")
+                return True
             
             logger.warning(f"在集合 {collection_name} 中未找到记录 {item_id}")
             return False
     
+    @property
+    def version(self) -> int:
+        """当前已发布的数据版本号，每次提交写操作后单调递增"""
+        return self._current().version
+    
+    def get_version(self, collection_name: str = None) -> int:
+        """
+        获取数据版本号，可用作ETag或缓存键
+        
+        Args:
+            collection_name: 集合名称（可选，指定时返回该集合最近一次修改时的版本号）
+            
+        Returns:
+            版本号
+        """
+        snapshot = self._current()
+        if collection_name is None:
+            return snapshot.version
+        return snapshot.collection_versions.get(collection_name, 0)
+    
+    def snapshot(self) -> DatabaseSnapshot:
+        """
+        获取当前已发布版本的只读快照，适合需要在多次读取间保持一致的场景
+        
+        Returns:
+            数据快照（不会被后续写操作修改）
+        """
+        return self._current(staged=False)
+    
     def count(self, collection_name: str, filters: Dict[str, Any] = None) -> int:
         """
         统计记录数量
@@ -217,53 +1664,64 @@ class JSONDatabase:
         Returns:
             记录数量
         """
-        collection = self._get_collection(collection_name)
-        
+        snapshot = self._current()
         if not filters:
-            return len(collection)
-        
-        count = 0
-        for item in collection:
-            match = True
-            for key, value in filters.items():
-                if item.get(key) != value:
-                    match = False
-                    break
-            if match:
-                count += 1
+            return len(snapshot.collection(collection_name))
         
-        return count
+        return sum(1 for item in self._candidates(snapshot, collection_name, filters) if matches(item, filters))
     
-    def search(self, collection_name: str, search_term: str, search_fields: List[str] = None) -> List[Dict[str, Any]]:
+    def search(self, collection_name: str, search_term: str, search_fields: List[str] = None,
+               mode: str = "and", limit: Optional[int] = None) -> List[Dict[str, Any]]:
         """
         搜索记录
         
+        搜索词按空白切分为多个查询词，以*结尾的查询词与以拉丁单词结尾的最后一个查询词按前缀匹配；
+        其余拉丁词按整词命中，中文按子串命中。
+        指定字段全部建有全文索引时通过倒排索引取候选记录，否则回退到全表扫描，两者命中规则一致。
+        结果按查询词在字段中出现的次数（词频）降序排列。
+        
         Args:
             collection_name: 集合名称
             search_term: 搜索词
-            search_fields: 搜索字段列表（可选）
+            search_fields: 搜索字段列表（可选，不指定时搜索全部字段）
+            mode: 多个查询词的组合方式，"and"要求全部命中，"or"命中任一即可
+            limit: 最多返回的记录数（可选）
             
         Returns:
             匹配的记录列表
         """
-        collection = self._get_collection(collection_name)
-        results = []
+        if mode not in ("and", "or"):
+            raise ValueError(f"不支持的搜索模式: {mode}")
+        snapshot = self._current()
+        results = self._search(snapshot, collection_name, search_term, search_fields, mode, limit)
+        return QueryResult(results, version=snapshot.version)
+    
+    def _search(self, state: DatabaseSnapshot, collection_name: str, search_term: str,
+                search_fields: Optional[List[str]], mode: str = "and",
+                limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """在指定版本上执行搜索，返回按词频排序的记录（指定limit时用堆取前limit条）"""
+        terms = parse_query(search_term)
+        if not terms:
+            records = list(state.collection(collection_name))
+            return records[:limit] if limit is not None else records
         
-        for item in collection:
-            if search_fields:
-                # 在指定字段中搜索
-                for field in search_fields:
-                    if field in item and search_term.lower() in str(item[field]).lower():
-                        results.append(item)
-                        break
-            else:
-                # 在所有字段中搜索
-                for value in item.values():
-                    if search_term.lower() in str(value).lower():
-                        results.append(item)
-                        break
+        index = state.index(collection_name)
+        if index is not None and search_fields and index.fulltext.covers(search_fields):
+            results = index.fulltext.search(terms, search_fields, mode, limit)
+            if results is not None:
+                return results
         
-        return results
+        # 未建全文索引或查询词不含可索引的词元（如纯符号），逐条比对
+        scored = []
+        for item in state.collection(collection_name):
+            score = score_record(item, terms, search_fields, mode)
+            if score is not None:
+                scored.append((score, item))
+        if limit is not None:
+            scored = heapq.nlargest(limit, scored, key=itemgetter(0))
+        else:
+            scored.sort(key=itemgetter(0), reverse=True)
+        return [item for _, item in scored]
     
     def get_by_field(self, collection_name: str, field_name: str, field_value: Any) -> List[Dict[str, Any]]:
         """
@@ -277,36 +1735,30 @@ class JSONDatabase:
         Returns:
             匹配的记录列表
         """
-        collection = self._get_collection(collection_name)
-        results = []
-        
-        for item in collection:
-            if item.get(field_name) == field_value:
-                results.append(item)
-        
-        return results
+        return self.read(collection_name, filters={field_name: field_value})
     
-    def backup(self, backup_path: str = None) -> str:
+    def backup(self, backup_path: str = None, codec: Union[str, DatabaseCodec, None] = None) -> str:
         """
         备份数据库
         
         Args:
             backup_path: 备份文件路径（可选）
+            codec: 备份文件的序列化格式（可选，默认与数据库文件一致）
             
         Returns:
             备份文件路径
         """
+        codec = get_codec(codec) if codec else self.codec
         if not backup_path:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_path = f"{self.db_path.stem}_backup_{timestamp}.json"
+            backup_path = f"{self.db_path.stem}_backup_{timestamp}{codec.suffix}"
         
         backup_path = Path(backup_path)
         backup_path.parent.mkdir(parents=True, exist_ok=True)
         
-        with self.lock:
-            data = self._read_data()
-            with open(backup_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+        # 备份已发布的版本，无需阻塞写操作
+        with open(backup_path, 'wb') as f:
+            codec.dump(self._current(staged=False).data, f)
         
         logger.info(f"数据库已备份到: {backup_path}")
         return str(backup_path)
@@ -327,18 +1779,49 @@ class JSONDatabase:
             return False
         
         try:
-            with open(backup_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            with self.lock:
-                self._write_data(data)
-            
+            self.restore_data(read_database_file(backup_path))
             logger.info(f"数据库已从备份恢复: {backup_path}")
             return True
         except Exception as e:
             logger.error(f"恢复数据库失败: {e}")
             return False
     
+    def restore_data(self, data: Dict[str, Any]):
+        """
+        用完整的数据库内容整体替换当前数据并落盘
+        
+        Args:
+            data: 数据库内容（集合名称 -> 集合数据，含metadata）
+        """
+        data = dict(data)
+        with self.lock:
+            if self._journal is not None:
+                # 恢复后的快照覆盖全部日志记录
+                data["metadata"] = {**data.get("metadata", {}), "journal_seq": self._journal_seq}
+            metadata = self._bump_revision([name for name in data if name != "metadata"])
+            data["metadata"] = {**data.get("metadata", {}), **metadata}
+            self._write_data(data)
+            self._reset(data)
+            self._written_version = self._snapshot.version
+            self._changes = []
+            self.changes.publish([("replace", name, None, None, None) for name in data if name != "metadata"],
+                                 version=self._snapshot.version)
+            self._dirty.clear()
+            self._pending = []
+            if self._journal is not None:
+                self._journal.truncate()
+    
+    def checkpoint(self) -> DatabaseSnapshot:
+        """
+        落盘全部修改并返回当前已发布版本（增量备份据集合版本号判断集合是否变化）
+        
+        Returns:
+            已发布版本
+        """
+        with self.lock:
+            self.flush()
+            return self._snapshot
+    
     def get_metadata(self) -> Dict[str, Any]:
         """
         获取数据库元数据
@@ -346,8 +1829,10 @@ class JSONDatabase:
         Returns:
             元数据字典
         """
-        data = self._read_data()
-        return data.get("metadata", {})
+        metadata = dict(self._current().data.get("metadata", {}))
+        if self._last_updated:
+            metadata["last_updated"] = self._last_updated
+        return metadata
     
     def get_collections(self) -> List[str]:
         """
@@ -356,12 +1841,7 @@ class JSONDatabase:
         Returns:
             集合名称列表
         """
-        data = self._read_data()
-        collections = []
-        for key in data.keys():
-            if key != "metadata":
-                collections.append(key)
-        return collections
+        return [key for key in self._current().data.keys() if key != "metadata"]
     
     def clear_collection(self, collection_name: str) -> bool:
         """
@@ -374,10 +1854,8 @@ class JSONDatabase:
             是否清空成功
         """
         with self.lock:
-            data = self._read_data()
-            if collection_name in data:
-                data[collection_name] = []
-                self._write_data(data)
+            if collection_name in self._data:
+                self._update_collection(collection_name, [])
                 logger.info(f"已清空集合: {collection_name}")
                 return True
             else:
@@ -397,46 +1875,193 @@ class JSONDatabase:
             导入的记录数量
         """
         with self.lock:
-            collection = self._get_collection(collection_name)
-            
-            if clear_existing:
-                collection = []
-            
             # 添加时间戳
             current_time = datetime.now().isoformat()
-            for item in items:
-                if "created_at" not in item:
-                    item["created_at"] = current_time
-                item["updated_at"] = current_time
+            items = [{"created_at": current_time, **item, "updated_at": current_time} for item in items]
             
-            collection.extend(items)
-            self._update_collection(collection_name, collection)
+            if clear_existing:
+                self._update_collection(collection_name, list(items))
+            else:
+                # 追加导入时增量维护索引
+                with self.transaction():
+                    for item in items:
+                        self._insert_item(collection_name, item)
+                    self._mark_dirty(collection_name)
             
             logger.info(f"向集合 {collection_name} 导入了 {len(items)} 条记录")
             return len(items)
     
-    def export_data(self, collection_name: str, output_path: str = None) -> str:
+    def export_data(self, collection_name: str, output_path: str = None,
+                    codec: Union[str, DatabaseCodec, None] = None) -> str:
         """
         导出集合数据
         
         Args:
             collection_name: 集合名称
             output_path: 输出文件路径（可选）
+            codec: 输出文件的序列化格式（可选，默认与数据库文件一致；需人工阅读时可用json-pretty）
             
         Returns:
             输出文件路径
         """
-        collection = self._get_collection(collection_name)
-        
+        codec = get_codec(codec) if codec else self.codec
         if not output_path:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_path = f"{collection_name}_export_{timestamp}.json"
+            output_path = f"{collection_name}_export_{timestamp}{codec.suffix}"
         
         output_path = Path(output_path)
         output_path.parent.mkdir(parents=True, exist_ok=True)
         
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(collection, f, ensure_ascii=False, indent=2)
+        collection = self._current().collection(collection_name)
+        with open(output_path, 'wb') as f:
+            codec.dump(collection, f)
         
         logger.info(f"集合 {collection_name} 的数据已导出到: {output_path}")
         return str(output_path)
+    
+    def import_stream(self, collection_name: str, items: Union[str, Path, Iterable[Dict[str, Any]]],
+                      chunk_size: int = STREAM_CHUNK_SIZE, clear_existing: bool = False,
+                      progress: Optional[Callable[[int], None]] = None) -> int:
+        """
+        流式导入记录：按块提交，内存占用只与块大小有关
+        
+        每块在一个事务中提交并发布新版本，中途失败时已提交的块保留。未启用变更日志时，
+        为避免每块都重写整个快照文件，导入期间按组提交间隔（至少1秒）落盘，结束时再落盘一次。
+        
+        Args:
+            collection_name: 集合名称
+            items: 记录的可迭代对象（可为生成器），或JSONL文件路径
+            chunk_size: 每次提交的记录数
+            clear_existing: 是否先清空现有数据
+            progress: 进度回调，每提交一块后以已导入的记录总数调用
+            
+        Returns:
+            导入的记录数量
+        """
+        if isinstance(items, (str, Path)):
+            items = iter_jsonl(items)
+        if clear_existing and collection_name in self._current().data:
+            self.clear_collection(collection_name)
+        
+        defer_flush = self._journal is None
+        flush_every = max(self.flush_interval, 1.0)
+        last_flush = time.monotonic()
+        imported = 0
+        try:
+            for chunk in chunked(items, chunk_size):
+                current_time = datetime.now().isoformat()
+                with self.transaction(flush=not defer_flush):
+                    for item in chunk:
+                        self._insert_item(collection_name,
+                                          {"created_at": current_time, **item, "updated_at": current_time})
+                    self._mark_dirty(collection_name)
+                imported += len(chunk)
+                if defer_flush and time.monotonic() - last_flush >= flush_every:
+                    self.flush()
+                    last_flush = time.monotonic()
+                if progress is not None:
+                    progress(imported)
+                logger.debug(f"集合 {collection_name} 已导入 {imported} 条记录")
+        finally:
+            if defer_flush and self.flush_interval <= 0:
+                self.flush()
+        
+        logger.info(f"向集合 {collection_name} 流式导入了 {imported} 条记录")
+        return imported
+    
+    def export_stream(self, collection_name: str, filters: Dict[str, Any] = None) -> Iterator[str]:
+        """
+        流式导出集合为JSONL行，基于导出开始时的版本，导出期间的写入不影响结果
+        
+        Args:
+            collection_name: 集合名称
+            filters: 过滤条件（可选）
+            
+        Yields:
+            以换行结尾的JSON行
+        """
+        snapshot = self._current()
+        collection = snapshot.collection(collection_name)
+        if not isinstance(collection, list):
+            collection = [collection]
+        for item in collection:
+            if matches(item, filters):
+                yield _dumps_line(item) + "\n"
+    
+    def export_jsonl(self, collection_name: str, output_path: str = None, filters: Dict[str, Any] = None,
+                     progress: Optional[Callable[[int], None]] = None) -> str:
+        """
+        将集合分块导出为JSONL文件
+        
+        Args:
+            collection_name: 集合名称
+            output_path: 输出文件路径（可选）
+            filters: 过滤条件（可选）
+            progress: 进度回调，每写出一块后以已导出的记录数调用
+            
+        Returns:
+            输出文件路径
+        """
+        if not output_path:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            output_path = f"{collection_name}_export_{timestamp}.jsonl"
+        
+        exported = write_jsonl(self.export_stream(collection_name, filters), output_path, progress)
+        logger.info(f"集合 {collection_name} 的 {exported} 条记录已导出到: {output_path}")
+        return str(output_path)
+
+
+def convert_database_file(source: Union[str, Path], target: Union[str, Path],
+                          codec: Union[str, DatabaseCodec, None] = None) -> Dict[str, Any]:
+    """
+    转换数据库文件的序列化格式
+    
+    Args:
+        source: 源文件路径（格式自动识别）
+        target: 目标文件路径（可与源文件相同，原子替换）
+        codec: 目标格式，默认紧凑JSON
+        
+    Returns:
+        转换结果（格式与文件大小）
+    """
+    source, target = Path(source), Path(target)
+    raw = source.read_bytes()
+    source_codec = detect_codec(raw)
+    target_codec = get_codec(codec)
+    payload = target_codec.dumps(source_codec.loads(raw))
+    
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = target.with_name(f".{target.name}.tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, target)
+    
+    logger.info(f"数据库文件已转换: {source}({source_codec.name}) -> {target}({target_codec.name})")
+    return {
+        "source_format": source_codec.name,
+        "target_format": target_codec.name,
+        "source_bytes": len(raw),
+        "target_bytes": len(payload),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """命令行入口：python -m app.utils.database 源文件 目标文件 --format msgpack"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="转换JSON数据库文件的序列化格式")
+    parser.add_argument("source", help="源数据库文件（格式自动识别）")
+    parser.add_argument("target", nargs="?", help="目标文件，省略时原地转换")
+    parser.add_argument("--format", "-f", default="json", choices=sorted(CODECS), help="目标格式")
+    args = parser.parse_args(argv)
+    
+    result = convert_database_file(args.source, args.target or args.source, args.format)
+    print(f"{result['source_format']} ({result['source_bytes']} 字节) -> "
+          f"{result['target_format']} ({result['target_bytes']} 字节)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
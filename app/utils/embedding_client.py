@@ -0,0 +1,172 @@
+"""
+批量嵌入客户端：按服务商的批量上限切分、相同文本只请求一次，批次在信号量与令牌桶限速下并发执行，
+失败的批次单独按带抖动的指数退避重试
+"""
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 同步的批量请求函数：输入文本列表，返回等长的向量列表（失败时抛出异常）
+RequestBatch = Callable[[List[str]], List[List[float]]]
+
+
+class EmbeddingRequestError(Exception):
+    """嵌入服务返回错误"""
+    
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+    
+    @property
+    def retryable(self) -> bool:
+        """限流（429）、服务端错误（5xx）或没有状态码（网络错误）时可以重试，其余视为输入有误"""
+        return self.status_code is None or self.status_code == 429 or self.status_code >= 500
+    
+    @property
+    def bad_input(self) -> bool:
+        """请求参数有误（400、413），可能只是批次中的个别文本有问题；鉴权等其他错误对整批都一样"""
+        return self.status_code in (400, 413)
+
+
+class TokenBucket:
+    """令牌桶限速器
+    
+    按固定速率补充令牌，最多积累capacity个。取令牌时先在锁内预留（令牌可以透支），
+    再在锁外等待透支部分补足所需的时间，因此可以同时被多个线程和事件循环使用。
+    """
+    
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """
+        初始化限速器
+        
+        Args:
+            rate: 每秒补充的令牌数
+            capacity: 令牌上限（允许的突发请求数），默认等于rate
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def reserve(self, tokens: float = 1.0) -> float:
+        """预留令牌，返回需要等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+    
+    async def acquire(self, tokens: float = 1.0):
+        """取得令牌（必要时异步等待）"""
+        delay = self.reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class EmbeddingClient:
+    """异步批量嵌入客户端
+    
+    同步的服务商调用在有界线程池中执行（线程数即全局的最大并发请求数），每次embed调用另以信号量
+    限制自身同时在途的批次数，所有请求共享一个令牌桶。批次因输入有误失败时对半拆分以找出出错的文本，
+    只有该文本得到None，同批的其他文本不受影响。
+    """
+    
+    def __init__(self, request_batch: RequestBatch, batch_size: int = 10, max_concurrency: int = 4,
+                 requests_per_second: float = 5.0, burst: Optional[float] = None, max_retries: int = 3,
+                 base_delay: float = 0.5, max_delay: float = 8.0):
+        """
+        初始化客户端
+        
+        Args:
+            request_batch: 同步的批量请求函数
+            batch_size: 服务商允许的单次请求文本数
+            max_concurrency: 最大并发请求数
+            requests_per_second: 每秒请求数上限
+            burst: 允许的突发请求数，默认等于每秒请求数
+            max_retries: 可重试错误的最大重试次数
+            base_delay: 退避的基础等待秒数
+            max_delay: 退避的最大等待秒数
+        """
+        self.request_batch = request_batch
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.limiter = TokenBucket(requests_per_second, burst)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="embedding")
+    
+    def _backoff(self, attempt: int) -> float:
+        """第attempt次重试前的等待时间（full jitter）"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+    
+    async def _request(self, texts: List[str]) -> List[List[float]]:
+        """发送一个批次，可重试的错误按退避重试，重试用尽或不可重试时抛出最后一次的异常"""
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.acquire()
+            try:
+                embeddings = await loop.run_in_executor(self._executor, self.request_batch, texts)
+                if len(embeddings) != len(texts):
+                    raise EmbeddingRequestError(f"返回 {len(embeddings)} 个向量，请求了 {len(texts)} 个文本")
+                return embeddings
+            except Exception as e:
+                retryable = e.retryable if isinstance(e, EmbeddingRequestError) else True
+                if not retryable or attempt == self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning(f"嵌入请求失败（第 {attempt + 1} 次），{delay:.2f} 秒后重试: {str(e)}")
+                await asyncio.sleep(delay)
+    
+    async def _embed_batch(self, texts: List[str], semaphore: asyncio.Semaphore) -> List[Optional[List[float]]]:
+        try:
+            async with semaphore:
+                return await self._request(texts)
+        except Exception as e:
+            if isinstance(e, EmbeddingRequestError) and e.bad_input and len(texts) > 1:
+                # 输入有误：对半拆分，只让出错的文本失败
+                middle = len(texts) // 2
+                left, right = await asyncio.gather(self._embed_batch(texts[:middle], semaphore),
+                                                   self._embed_batch(texts[middle:], semaphore))
+                return left + right
+            logger.error(f"{len(texts)} 个文本生成嵌入失败: {str(e)}")
+            return [None] * len(texts)
+    
+    async def embed(self, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """
+        批量生成嵌入
+        
+        Args:
+            texts: 文本列表（可以重复）
+            
+        Returns:
+            与texts等长的向量列表，生成失败的文本为None
+        """
+        # 相同文本只请求一次
+        unique: Dict[str, int] = {}
+        for text in texts:
+            unique.setdefault(text, len(unique))
+        distinct = list(unique)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        batches = await asyncio.gather(*(self._embed_batch(distinct[start:start + self.batch_size], semaphore)
+                                         for start in range(0, len(distinct), self.batch_size)))
+        embeddings = [embedding for batch in batches for embedding in batch]
+        return [embeddings[unique[text]] for text in texts]
+    
+    def embed_sync(self, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """同步接口：在新的事件循环中执行embed（当前线程已有运行中的事件循环时改在独立线程中执行）"""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.embed(texts))
+        with ThreadPoolExecutor(max_workers=1) as runner:
+            return runner.submit(asyncio.run, self.embed(texts)).result()
@@ -0,0 +1,189 @@
+"""
+持久化的嵌入向量索引：文本块按内容哈希保存向量，重建时只为新增或修改的文本块生成嵌入
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 批量生成嵌入的函数：输入文本列表，返回等长的向量列表（整批失败时抛出异常，单个文本失败时该位置为None）
+EmbedBatch = Callable[[List[str]], List[Optional[List[float]]]]
+
+
+def content_hash(text: str) -> str:
+    """文本内容的SHA-256哈希"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """按行L2归一化（零向量保持为零）"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class EmbeddingIndex:
+    """按内容哈希保存的嵌入向量索引
+    
+    目录结构：
+        index.json   模型名称、向量维度及各行对应的内容哈希
+        vectors.npy  L2归一化后的float32向量矩阵（行顺序与index.json一致）
+    
+    模型名称或维度与磁盘上的索引不一致时，已有向量全部作废。
+    向量已归一化，余弦相似度即为点积，检索只需一次矩阵向量乘法。
+    """
+    
+    def __init__(self, path: Union[str, Path], model: str, dimension: int):
+        """
+        初始化索引
+        
+        Args:
+            path: 索引目录
+            model: 嵌入模型名称
+            dimension: 向量维度
+        """
+        self.path = Path(path)
+        self.model = model
+        self.dimension = dimension
+        self.hashes: List[str] = []
+        self.vectors = np.zeros((0, dimension), dtype=np.float32)
+        self._rows: Dict[str, int] = {}
+    
+    def __len__(self) -> int:
+        return len(self.hashes)
+    
+    def __contains__(self, digest: str) -> bool:
+        return digest in self._rows
+    
+    def _set(self, hashes: List[str], vectors: np.ndarray):
+        self.hashes = hashes
+        self.vectors = vectors
+        self._rows = {digest: row for row, digest in enumerate(hashes)}
+    
+    def load(self) -> bool:
+        """
+        从磁盘加载索引
+        
+        Returns:
+            是否加载成功（索引不存在、损坏或模型/维度不一致时返回False，索引保持为空）
+        """
+        index_path = self.path / "index.json"
+        vectors_path = self.path / "vectors.npy"
+        if not index_path.exists() or not vectors_path.exists():
+            return False
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                header = json.load(f)
+            if header.get("model") != self.model or header.get("dimension") != self.dimension:
+                logger.warning(f"嵌入索引的模型或维度与当前配置不一致，忽略已有索引: {self.path}")
+                return False
+            vectors = np.load(vectors_path)
+            if vectors.shape != (len(header["hashes"]), self.dimension):
+                logger.warning(f"嵌入索引的向量数量与清单不一致，忽略已有索引: {self.path}")
+                return False
+            self._set(list(header["hashes"]), vectors.astype(np.float32, copy=False))
+            logger.info(f"已加载嵌入索引: {self.path}，共 {len(self.hashes)} 个向量")
+            return True
+        except Exception as e:
+            logger.error(f"加载嵌入索引失败: {str(e)}")
+            return False
+    
+    def save(self):
+        """原子地保存索引（先写临时文件再替换）"""
+        self.path.mkdir(parents=True, exist_ok=True)
+        vectors_tmp = self.path / ".vectors.npy.tmp"
+        index_tmp = self.path / ".index.json.tmp"
+        with open(vectors_tmp, 'wb') as f:
+            np.save(f, self.vectors)
+        with open(index_tmp, 'w', encoding='utf-8') as f:
+            json.dump({"model": self.model, "dimension": self.dimension, "hashes": self.hashes}, f)
+        os.replace(vectors_tmp, self.path / "vectors.npy")
+        os.replace(index_tmp, self.path / "index.json")
+    
+    def build(self, texts: Sequence[str], embed_batch: EmbedBatch, batch_size: int = 10) -> Dict[str, int]:
+        """
+        为文本列表建立索引：复用已有向量，只为新内容生成嵌入，未出现在texts中的向量被移除
+        
+        Args:
+            texts: 文本块列表
+            embed_batch: 批量生成嵌入的函数
+            batch_size: 每批文本数量
+            
+        Returns:
+            统计：reused（复用）、embedded（新生成）、failed（生成失败，未进入索引）
+        """
+        digests = [content_hash(text) for text in texts]
+        pending: Dict[str, str] = {}
+        for digest, text in zip(digests, texts):
+            if digest not in self._rows and digest not in pending:
+                pending[digest] = text
+        
+        fresh: Dict[str, np.ndarray] = {}
+        items = list(pending.items())
+        for start in range(0, len(items), batch_size):
+            batch = items[start:start + batch_size]
+            try:
+                embeddings = embed_batch([text for _, text in batch])
+            except Exception as e:
+                logger.error(f"第 {start // batch_size + 1} 批文本生成嵌入失败: {str(e)}")
+                continue
+            for (digest, _), embedding in zip(batch, embeddings):
+                if embedding is not None:
+                    fresh[digest] = normalize_rows(np.asarray(embedding, dtype=np.float32))
+        
+        hashes: List[str] = []
+        rows: List[np.ndarray] = []
+        seen = set()
+        for digest in digests:
+            if digest in seen:
+                continue
+            if digest in self._rows:
+                rows.append(self.vectors[self._rows[digest]])
+            elif digest in fresh:
+                rows.append(fresh[digest])
+            else:
+                continue
+            seen.add(digest)
+            hashes.append(digest)
+        
+        reused = len(hashes) - len(fresh)
+        self._set(hashes, np.vstack(rows) if rows else np.zeros((0, self.dimension), dtype=np.float32))
+        stats = {"reused": reused, "embedded": len(fresh), "failed": len(pending) - len(fresh)}
+        logger.info(f"嵌入索引构建完成: 复用 {stats['reused']} 个，新生成 {stats['embedded']} 个，失败 {stats['failed']} 个")
+        return stats
+    
+    def rows_for(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        文本在索引中的行号
+        
+        Returns:
+            行号数组，未建立索引的文本为-1
+        """
+        return np.array([self._rows.get(content_hash(text), -1) for text in texts], dtype=np.int64)
+    
+    def get(self, text: str) -> Optional[np.ndarray]:
+        """文本的归一化向量，未建立索引时返回None"""
+        row = self._rows.get(content_hash(text))
+        return self.vectors[row] if row is not None else None
+    
+    @staticmethod
+    def top_k(matrix: np.ndarray, query: Sequence[float], k: int) -> List[Tuple[int, float]]:
+        """
+        在归一化矩阵中检索与查询向量余弦相似度最高的k行
+        
+        Returns:
+            (行号, 相似度) 列表，按相似度降序
+        """
+        if len(matrix) == 0 or k <= 0:
+            return []
+        scores = matrix @ normalize_rows(np.asarray(query, dtype=np.float32))
+        order = np.argsort(-scores, kind="stable")[:k]
+        return [(int(row), float(scores[row])) for row in order]
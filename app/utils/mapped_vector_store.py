@@ -0,0 +1,269 @@
+"""
+磁盘向量库：向量量化后存放在内存映射文件中，文档ID与元数据保存在追加写的索引日志里
+"""
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence, Union
+
+import numpy as np
+
+from app.utils.logger import get_logger
+from app.utils.vector_store import VectorStore
+
+logger = get_logger(__name__)
+
+# 支持的量化格式
+QUANTIZED_DTYPES = {"int8": np.int8, "float16": np.float16}
+# 粗排时每次转换为float32计算的行数（转换缓冲区保持在CPU缓存内）
+SCORE_BLOCK_ROWS = 1024
+
+
+class MappedVectorStore(VectorStore):
+    """内存映射的量化向量库
+    
+    目录结构：
+        meta.json       向量维度、量化格式、是否保留float32副本
+        vectors.int8    按行对称量化的int8向量（或vectors.float16），检索时逐块扫描
+        scales.f32      int8量化的每行缩放系数
+        vectors.f32     float32向量副本（可选），只读取粗排候选行用于精排
+        index.jsonl     追加写的索引日志：每行记录一次写入（行号、文档ID、元数据）或删除
+        ivf.npz         近似索引的质心与分配结果（挂载IVF索引时）
+    
+    打开时只映射文件并重放索引日志，不解析向量。int8格式常驻内存的向量数据为float32的1/4，
+    粗排按量化得分取出top_k * candidates_per_hit个候选，再用float32副本重新计算相似度。
+    """
+    
+    def __init__(self, path: Union[str, Path], dimension: int, fields: Sequence[str] = (),
+                 dtype: str = "int8", rescore: bool = True, initial_capacity: int = 1024):
+        """
+        打开或创建向量库
+        
+        Args:
+            path: 向量库目录
+            dimension: 向量维度
+            fields: 支持过滤的元数据字段
+            dtype: 量化格式（int8或float16），已有向量库以磁盘上的格式为准
+            rescore: 是否保留float32副本用于精排
+            initial_capacity: 新建时的初始行数
+        """
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        meta_path = self.path / "meta.json"
+        if meta_path.exists():
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta["dimension"] != dimension:
+                raise ValueError(f"向量库维度为 {meta['dimension']}，与当前配置的 {dimension} 不一致: {self.path}")
+            dtype, rescore = meta["dtype"], meta["rescore"]
+        else:
+            if dtype not in QUANTIZED_DTYPES:
+                raise ValueError(f"不支持的量化格式: {dtype}")
+            with open(meta_path, 'w', encoding='utf-8') as f:
+                json.dump({"dimension": dimension, "dtype": dtype, "rescore": rescore}, f)
+        self.dtype = dtype
+        self.rescore = rescore
+        self.candidates_per_hit = 4 if rescore else 1
+        self._quantized: Optional[np.memmap] = None
+        self._scales: Optional[np.memmap] = None
+        self._full: Optional[np.memmap] = None
+        
+        existing = self._file_rows(self._quantized_path, np.dtype(QUANTIZED_DTYPES[dtype]).itemsize * dimension)
+        super().__init__(dimension, fields, initial_capacity=max(initial_capacity, existing))
+        self._replay()
+        self._log = open(self._log_path, 'a', encoding='utf-8')
+        logger.info(f"向量库已打开: {self.path}，共 {len(self)} 个向量（{dtype}）")
+    
+    @property
+    def _quantized_path(self) -> Path:
+        return self.path / f"vectors.{self.dtype}"
+    
+    @property
+    def _log_path(self) -> Path:
+        return self.path / "index.jsonl"
+    
+    @staticmethod
+    def _file_rows(path: Path, row_bytes: int) -> int:
+        return path.stat().st_size // row_bytes if path.exists() else 0
+    
+    @property
+    def _index_path(self) -> Path:
+        return self.path / "ivf.npz"
+    
+    def attach_index(self, index: Any):
+        """挂载近似索引：优先加载磁盘上的索引，不存在时按需训练"""
+        if not index.ready:
+            index.load(self._index_path, self)
+        super().attach_index(index)
+    
+    def _index_trained(self):
+        self.ann.save(self._index_path, len(self._ids))
+    
+    def _files(self):
+        """(文件路径, 元素类型, 每行元素数, 属性名)"""
+        files = [(self._quantized_path, QUANTIZED_DTYPES[self.dtype], self.dimension, "_quantized")]
+        if self.dtype == "int8":
+            files.append((self.path / "scales.f32", np.float32, 1, "_scales"))
+        if self.rescore:
+            files.append((self.path / "vectors.f32", np.float32, self.dimension, "_full"))
+        return files
+    
+    @staticmethod
+    def _map(path: Path, dtype: Any, width: int, capacity: int) -> np.memmap:
+        shape = (capacity, width) if width > 1 else (capacity,)
+        return np.memmap(path, dtype=dtype, mode="r+", shape=shape)
+    
+    # 向量存储
+    
+    def _resize_storage(self, capacity: int):
+        for path, dtype, width, attr in self._files():
+            current = getattr(self, attr)
+            if current is not None:
+                current.flush()
+                setattr(self, attr, None)
+                del current
+            with open(path, 'ab') as f:
+                # 只扩展不截断（扩展部分为稀疏的零）
+                size = capacity * width * np.dtype(dtype).itemsize
+                if f.tell() < size:
+                    f.truncate(size)
+            setattr(self, attr, self._map(path, dtype, width, capacity))
+    
+    def _quantize(self, vectors: np.ndarray):
+        if self.dtype == "float16":
+            return vectors.astype(np.float16), None
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        return codes, scales.astype(np.float32)
+    
+    def _write_vectors(self, rows: np.ndarray, vectors: np.ndarray):
+        codes, scales = self._quantize(vectors)
+        self._quantized[rows] = codes
+        if scales is not None:
+            self._scales[rows] = scales
+        if self._full is not None:
+            self._full[rows] = vectors
+        # 向量先落盘，索引日志后写，日志中出现的行一定有对应的向量
+        for _, _, _, attr in self._files():
+            getattr(self, attr).flush()
+    
+    def _dequantize(self, rows: Union[slice, np.ndarray]) -> np.ndarray:
+        block = self._quantized[rows].astype(np.float32)
+        if self._scales is not None:
+            block *= self._scales[rows][:, None]
+        return block
+    
+    def _score(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        total = len(self._ids) if rows is None else len(rows)
+        scores = np.empty(total, dtype=np.float32)
+        buffer = np.empty((min(SCORE_BLOCK_ROWS, total), self.dimension), dtype=np.float32)
+        for start in range(0, total, SCORE_BLOCK_ROWS):
+            end = min(start + SCORE_BLOCK_ROWS, total)
+            block = slice(start, end) if rows is None else rows[start:end]
+            converted = buffer[:end - start]
+            converted[...] = self._quantized[block]
+            scores[start:end] = converted @ query
+            if self._scales is not None:
+                scores[start:end] *= self._scales[block]
+        return scores
+    
+    def _rescore(self, query: np.ndarray, rows: np.ndarray, scores: np.ndarray) -> np.ndarray:
+        if self._full is None:
+            return scores
+        return self._full[rows] @ query
+    
+    def _read_vectors(self, rows: np.ndarray) -> np.ndarray:
+        if self._full is not None:
+            return self._full[rows]
+        return self._dequantize(rows)
+    
+    def _compact_storage(self, live: np.ndarray, capacity: int):
+        for path, dtype, width, attr in self._files():
+            current = getattr(self, attr)
+            tmp_path = path.with_name(f".{path.name}.tmp")
+            with open(tmp_path, 'wb') as f:
+                f.truncate(capacity * width * np.dtype(dtype).itemsize)
+            compacted = self._map(tmp_path, dtype, width, capacity)
+            for start in range(0, len(live), 16 * SCORE_BLOCK_ROWS):
+                chunk = live[start:start + 16 * SCORE_BLOCK_ROWS]
+                compacted[start:start + len(chunk)] = current[chunk]
+            compacted.flush()
+            setattr(self, attr, None)
+            del current, compacted
+            os.replace(tmp_path, path)
+            setattr(self, attr, self._map(path, dtype, width, capacity))
+    
+    # 索引日志
+    
+    def _replay(self):
+        if not self._log_path.exists():
+            return
+        with open(self._log_path, 'r', encoding='utf-8') as f:
+            lines = f.readlines()
+        for number, line in enumerate(lines, 1):
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # 末尾不完整的记录（写入中断）
+                logger.warning(f"忽略向量库索引日志中无法解析的第 {number} 行: {self._log_path}")
+                continue
+            if entry.get("op") == "delete":
+                self._release(entry["id"])
+            else:
+                # 被跳过的记录留下的空行按墓碑处理
+                while len(self._ids) < entry["row"]:
+                    self._ids.append(None)
+                    self._metadata.append(None)
+                previous = self._rows.get(entry["id"])
+                if previous is not None and previous != entry["row"]:
+                    self._release(entry["id"])
+                self._assign(entry["id"], entry.get("metadata"), row=entry["row"])
+    
+    def _append_log(self, entries):
+        for entry in entries:
+            self._log.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+        self._log.flush()
+    
+    def add_many(self, doc_ids: Sequence[str], vectors: Union[np.ndarray, Sequence[Sequence[float]]],
+                 metadata: Optional[Sequence[Optional[Dict[str, Any]]]] = None) -> np.ndarray:
+        rows = super().add_many(doc_ids, vectors, metadata)
+        metadata = metadata if metadata is not None else [None] * len(doc_ids)
+        self._append_log({"op": "add", "row": int(row), "id": doc_id, "metadata": meta}
+                         for doc_id, row, meta in zip(doc_ids, rows, metadata))
+        return rows
+    
+    def _release(self, doc_id: str) -> Optional[int]:
+        row = super()._release(doc_id)
+        if row is not None and getattr(self, "_log", None) is not None:
+            self._append_log([{"op": "delete", "id": doc_id}])
+        return row
+    
+    def compact(self):
+        """移除墓碑行并重写向量文件与索引日志"""
+        super().compact()
+        tmp_path = self._log_path.with_name(f".{self._log_path.name}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for row, (doc_id, meta) in enumerate(zip(self._ids, self._metadata)):
+                f.write(json.dumps({"op": "add", "row": row, "id": doc_id, "metadata": meta},
+                                   ensure_ascii=False, default=str) + "\n")
+        self._log.close()
+        os.replace(tmp_path, self._log_path)
+        self._log = open(self._log_path, 'a', encoding='utf-8')
+        if self.ann is not None and self.ann.ready:
+            self.ann.save(self._index_path, len(self._ids))
+        logger.info(f"向量库已压缩: {self.path}，保留 {len(self)} 个向量")
+    
+    def disk_usage(self) -> int:
+        """向量库目录占用的字节数（按文件逻辑大小计）"""
+        return sum(path.stat().st_size for path in self.path.iterdir() if path.is_file())
+    
+    def close(self):
+        """落盘并关闭文件（近似索引一并保存）"""
+        if self.ann is not None and self.ann.ready:
+            self.ann.save(self._index_path, len(self._ids))
+        for _, _, _, attr in self._files():
+            current = getattr(self, attr)
+            if current is not None:
+                current.flush()
+        self._log.close()
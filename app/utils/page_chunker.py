@@ -0,0 +1,195 @@
+"""
+MinerU解析结果的分块：按阅读顺序遍历一次content_list.json（缺失时遍历layout.json），
+生成带页码与所属章节、相邻块之间有重叠的文本块
+"""
+import html
+import json
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple, Union
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 默认分块大小（近似词元数）
+TARGET_TOKENS = 400
+MAX_TOKENS = 500
+OVERLAP_TOKENS = 80
+
+# 近似词元：拉丁文单词或数字算一个，其余每个非空白字符（汉字、标点）算一个
+_TOKEN_PATTERN = re.compile(r"[A-Za-z0-9]+|\S")
+# 句末标点，过长的段落在这些位置切分
+_SENTENCE_PATTERN = re.compile(r"[^。！？；!?;\n]*[。！？；!?;\n]+|[^。！？；!?;\n]+")
+_TAG_PATTERN = re.compile(r"<[^>]+>")
+
+
+def count_tokens(text: str) -> int:
+    """估算文本的词元数"""
+    return len(_TOKEN_PATTERN.findall(text))
+
+
+@dataclass
+class TextChunk:
+    """文本块"""
+    content: str
+    page_number: int  # 起始页码（从1开始）
+    end_page: int  # 结束页码
+    section: str  # 所属章节标题
+
+
+# (文本, 页码, 是否为标题)
+Block = Tuple[str, int, bool]
+
+
+def _caption(value: Any) -> str:
+    if isinstance(value, list):
+        return " ".join(str(item) for item in value if item)
+    return str(value or "")
+
+
+def _content_list_blocks(items: List[Dict[str, Any]]) -> Iterator[Block]:
+    for item in items:
+        page = int(item.get("page_idx", 0)) + 1
+        kind = item.get("type")
+        if kind == "text":
+            yield item.get("text", ""), page, bool(item.get("text_level"))
+        elif kind == "table":
+            # 表格只保留标题与单元格文本
+            body = html.unescape(_TAG_PATTERN.sub(" ", item.get("table_body", "")))
+            yield f"{_caption(item.get('table_caption'))}\n{' '.join(body.split())}", page, False
+        elif kind in ("image", "equation"):
+            yield _caption(item.get("img_caption")) or item.get("text", ""), page, False
+
+
+def _layout_blocks(pages: List[Dict[str, Any]]) -> Iterator[Block]:
+    for page_info in pages:
+        page = int(page_info.get("page_idx", 0)) + 1
+        for block in page_info.get("para_blocks", []):
+            if block.get("type") not in ("text", "title"):
+                continue
+            text = "".join(span.get("content", "")
+                           for line in block.get("lines", []) for span in line.get("spans", []))
+            yield text, page, block.get("type") == "title"
+
+
+def read_blocks(document_dir: Union[str, Path]) -> List[Block]:
+    """
+    读取MinerU输出目录中按阅读顺序排列的内容块
+    
+    Args:
+        document_dir: MinerU输出目录（含 *_content_list.json 或 layout.json）
+        
+    Returns:
+        (文本, 页码, 是否为标题) 列表；两种文件都不存在时为空
+    """
+    document_dir = Path(document_dir)
+    content_lists = sorted(document_dir.glob("*_content_list.json"))
+    if content_lists:
+        with open(content_lists[0], 'r', encoding='utf-8') as f:
+            blocks = _content_list_blocks(json.load(f))
+    elif (document_dir / "layout.json").exists():
+        with open(document_dir / "layout.json", 'r', encoding='utf-8') as f:
+            blocks = _layout_blocks(json.load(f).get("pdf_info", []))
+    else:
+        logger.warning(f"目录中没有content_list.json或layout.json: {document_dir}")
+        return []
+    return [(text.strip(), page, heading) for text, page, heading in blocks if text and text.strip()]
+
+
+def _units(text: str, page: int, max_tokens: int) -> Iterator[Tuple[str, int, int]]:
+    """把内容块切成不超过max_tokens的单元：(文本, 页码, 词元数)"""
+    tokens = count_tokens(text)
+    if tokens <= max_tokens:
+        yield text, page, tokens
+        return
+    for sentence in _SENTENCE_PATTERN.findall(text):
+        sentence_tokens = count_tokens(sentence)
+        if sentence_tokens <= max_tokens:
+            if sentence_tokens:
+                yield sentence, page, sentence_tokens
+            continue
+        # 没有句末标点的超长文本按词元硬切分
+        pieces = _TOKEN_PATTERN.findall(sentence)
+        for start in range(0, len(pieces), max_tokens):
+            piece = pieces[start:start + max_tokens]
+            yield " ".join(piece) if piece[0].isascii() else "".join(piece), page, len(piece)
+
+
+def chunk_blocks(blocks: List[Block], target_tokens: int = TARGET_TOKENS, max_tokens: int = MAX_TOKENS,
+                 overlap_tokens: int = OVERLAP_TOKENS, default_section: str = "前言") -> List[TextChunk]:
+    """
+    把内容块合并为重叠的文本块
+    
+    文本块不跨章节：遇到标题时结束当前文本块，标题作为新章节的第一行。每个文本块累积到target_tokens
+    后结束（不超过max_tokens），下一个文本块以上一个文本块末尾约overlap_tokens的单元开头。
+    页码直接取自单元所在的内容块，不需要事后按文本匹配。
+    
+    Args:
+        blocks: read_blocks返回的内容块
+        target_tokens: 目标词元数
+        max_tokens: 词元数上限
+        overlap_tokens: 相邻文本块的重叠词元数
+        default_section: 第一个标题之前内容的章节名
+        
+    Returns:
+        文本块列表
+    """
+    chunks: List[TextChunk] = []
+    section = default_section
+    # 当前文本块的单元：(文本, 页码, 词元数)
+    current: List[Tuple[str, int, int]] = []
+    current_tokens = 0
+    # 当前文本块中是否有尚未输出过的正文（只有重叠部分或标题时不输出）
+    fresh = False
+    # 当前文本块是否只由连续的标题组成
+    headings_only = False
+    
+    def emit():
+        nonlocal current, current_tokens, fresh
+        chunks.append(TextChunk(content="\n".join(text for text, _, _ in current),
+                                page_number=current[0][1], end_page=current[-1][1], section=section))
+        # 末尾不超过overlap_tokens的单元作为下一个文本块的开头
+        overlap, overlap_total = [], 0
+        for unit in reversed(current):
+            if overlap_total + unit[2] > overlap_tokens:
+                break
+            overlap.insert(0, unit)
+            overlap_total += unit[2]
+        current, current_tokens, fresh = overlap, overlap_total, False
+    
+    for text, page, heading in blocks:
+        if heading:
+            if fresh:
+                emit()
+            # 文本块不跨章节；连续的标题（如章标题后紧跟节标题）合并到同一个文本块开头
+            if not headings_only:
+                current, current_tokens = [], 0
+            section = text.lstrip("#").strip()
+            line = f"# {section}"
+            current.append((line, page, count_tokens(line)))
+            current_tokens += current[-1][2]
+            headings_only = True
+            continue
+        for unit in _units(text, page, max_tokens):
+            if current_tokens + unit[2] > max_tokens:
+                if fresh:
+                    emit()
+                # 放不下的重叠部分从前往后丢弃
+                while current and current_tokens + unit[2] > max_tokens:
+                    current_tokens -= current.pop(0)[2]
+            current.append(unit)
+            current_tokens += unit[2]
+            fresh, headings_only = True, False
+            if current_tokens >= target_tokens:
+                emit()
+    if fresh:
+        emit()
+    return chunks
+
+
+def chunk_document(document_dir: Union[str, Path], target_tokens: int = TARGET_TOKENS,
+                   max_tokens: int = MAX_TOKENS, overlap_tokens: int = OVERLAP_TOKENS) -> List[TextChunk]:
+    """读取MinerU输出目录并分块（参数含义同chunk_blocks）"""
+    return chunk_blocks(read_blocks(document_dir), target_tokens, max_tokens, overlap_tokens)
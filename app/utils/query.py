@@ -0,0 +1,171 @@
+"""
+记录查询工具：条件匹配、多键排序、分页与字段投影
+"""
+import heapq
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+# 支持的条件运算符
+COMPARISON_OPERATORS = ("$gt", "$gte", "$lt", "$lte")
+OPERATORS = ("$eq", "$ne", "$in", "$nin") + COMPARISON_OPERATORS
+
+SortSpec = Union[str, Sequence[Union[str, Tuple[str, str]]], None]
+
+
+class QueryResult(list):
+    """查询结果列表，total为分页前满足条件的记录总数，version为结果所基于的数据版本（如有）"""
+    
+    def __init__(self, items: Iterable[Dict[str, Any]] = (), total: Optional[int] = None,
+                 version: Optional[int] = None):
+        super().__init__(items)
+        self.total = len(self) if total is None else total
+        self.version = version
+
+
+def is_operator(value: Any) -> bool:
+    """条件值是否为运算符表达式，如 {"$in": [...]}、{"$gte": "2024-01-01"}"""
+    return isinstance(value, dict) and bool(value) and all(key in OPERATORS for key in value)
+
+
+def _normalize(value: Any) -> Any:
+    # 记录中的日期以ISO字符串存储，条件中的日期对象按同样格式比较
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def _compare(operator: str, actual: Any, expected: Any) -> bool:
+    if actual is None:
+        return False
+    try:
+        if operator == "$gt":
+            return actual > expected
+        if operator == "$gte":
+            return actual >= expected
+        if operator == "$lt":
+            return actual < expected
+        return actual <= expected
+    except TypeError:
+        return False
+
+
+def match_condition(actual: Any, condition: Any) -> bool:
+    """判断字段值是否满足单个条件（普通值表示相等）"""
+    if not is_operator(condition):
+        return actual == condition
+    for operator, expected in condition.items():
+        if operator == "$eq":
+            if actual != _normalize(expected):
+                return False
+        elif operator == "$ne":
+            if actual == _normalize(expected):
+                return False
+        elif operator == "$in":
+            if actual not in [_normalize(value) for value in expected]:
+                return False
+        elif operator == "$nin":
+            if actual in [_normalize(value) for value in expected]:
+                return False
+        elif not _compare(operator, actual, _normalize(expected)):
+            return False
+    return True
+
+
+def matches(item: Dict[str, Any], filters: Optional[Dict[str, Any]]) -> bool:
+    """判断记录是否满足全部过滤条件"""
+    if not filters:
+        return True
+    for key, condition in filters.items():
+        if not match_condition(item.get(key), condition):
+            return False
+    return True
+
+
+def parse_sort(sort: SortSpec) -> List[Tuple[str, bool]]:
+    """
+    解析排序声明
+    
+    支持 "due_date"、"-priority"（降序）、"a,-b" 以及 [("due_date", "desc"), ...] 等写法。
+    
+    Returns:
+        (字段, 是否降序) 列表
+    """
+    if not sort:
+        return []
+    if isinstance(sort, str):
+        sort = [part.strip() for part in sort.split(",") if part.strip()]
+    spec = []
+    for entry in sort:
+        if isinstance(entry, str):
+            descending = entry.startswith("-")
+            spec.append((entry.lstrip("+-"), descending))
+        else:
+            field, direction = entry
+            spec.append((field, str(direction).lower() == "desc"))
+    return spec
+
+
+class _SortKey:
+    """多键排序键，支持逐字段升降序；空值始终排在最后"""
+    
+    __slots__ = ("values", "spec")
+    
+    def __init__(self, values: List[Any], spec: List[Tuple[str, bool]]):
+        self.values = values
+        self.spec = spec
+    
+    def __lt__(self, other: "_SortKey") -> bool:
+        for (_, descending), left, right in zip(self.spec, self.values, other.values):
+            if left == right:
+                continue
+            if left is None:
+                return False
+            if right is None:
+                return True
+            try:
+                less = left < right
+            except TypeError:
+                less = str(left) < str(right)
+            return not less if descending else less
+        return False
+
+
+def sort_key(spec: List[Tuple[str, bool]]) -> Callable[[Dict[str, Any]], _SortKey]:
+    """根据排序声明生成排序键函数"""
+    return lambda item: _SortKey([item.get(field) for field, _ in spec], spec)
+
+
+def paginate(items: List[Dict[str, Any]], sort: SortSpec = None, offset: int = 0,
+             limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    排序并截取一页记录，指定limit时使用堆只保留前offset+limit条
+    
+    Args:
+        items: 已满足过滤条件的记录
+        sort: 排序声明
+        offset: 跳过的记录数
+        limit: 返回的最大记录数
+    """
+    spec = parse_sort(sort)
+    offset = max(offset or 0, 0)
+    if spec:
+        key = sort_key(spec)
+        if limit is not None:
+            return heapq.nsmallest(offset + limit, items, key=key)[offset:]
+        return sorted(items, key=key)[offset:]
+    end = offset + limit if limit is not None else None
+    return items[offset:end]
+
+
+def page_window(page: Optional[int], page_size: Optional[int]) -> Tuple[int, Optional[int]]:
+    """将页码与每页大小换算为(offset, limit)，未指定分页时返回(0, None)"""
+    if not page_size:
+        return 0, None
+    return (max(page or 1, 1) - 1) * page_size, page_size
+
+
+def project(item: Dict[str, Any], fields: Optional[Sequence[str]]) -> Dict[str, Any]:
+    """字段投影：只保留指定字段（fields为空时原样返回）"""
+    if not fields:
+        return item
+    return {field: item[field] for field in fields if field in item}
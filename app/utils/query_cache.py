@@ -0,0 +1,267 @@
+"""
+检索缓存：规范化查询 -> 查询嵌入的LRU缓存（追加写日志持久化），
+以及按（查询嵌入分桶、过滤条件、索引版本）缓存检索结果的语义结果缓存
+"""
+import json
+import os
+import re
+import struct
+import threading
+import unicodedata
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Hashable, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from app.utils.embedding_index import normalize_rows
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+try:
+    import fcntl
+except ImportError:  # Windows等平台不支持flock
+    fcntl = None
+
+# 日志记录：查询长度 + 规范化查询（UTF-8）+ float32向量
+_KEY_LENGTH = struct.Struct("<H")
+# 查询末尾不影响语义的标点
+_TRAILING_PUNCTUATION = re.compile(r"[\s。．.？?！!，,；;：:、~～…]+$")
+
+
+def normalize_query(query: str) -> str:
+    """规范化查询：全角转半角（NFKC）、转小写、合并空白、去掉末尾标点"""
+    text = unicodedata.normalize("NFKC", query).lower()
+    text = " ".join(text.split())
+    return _TRAILING_PUNCTUATION.sub("", text)
+
+
+class EmbeddingCache:
+    """查询嵌入的LRU缓存
+    
+    目录结构：
+        meta.json     嵌入模型名称与向量维度（与当前配置不一致时丢弃已有缓存）
+        entries.bin   追加写的缓存日志：每条记录为规范化查询与其嵌入向量
+        entries.lock  多个进程共用日志时的文件锁
+    
+    打开时按写入顺序重放日志，只保留最近写入的capacity条；运行中的命中只调整内存中的LRU顺序，不写日志。
+    追加与重写都持有文件锁；日志记录数超过容量的两倍时，先合并其他进程追加的记录再按LRU顺序重写。
+    """
+    
+    def __init__(self, path: Union[str, Path], model: str, dimension: int, capacity: int = 10000):
+        """
+        打开或创建缓存
+        
+        Args:
+            path: 缓存目录
+            model: 嵌入模型名称
+            dimension: 向量维度
+            capacity: 最多缓存的查询数
+        """
+        self.path = Path(path)
+        self.model = model
+        self.dimension = dimension
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._vector_bytes = 4 * dimension
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._lock_file = open(self.path / "entries.lock", "a+b")
+        if fcntl is None:
+            logger.warning("当前平台不支持fcntl文件锁，多个进程共用查询嵌入缓存时可能丢失记录")
+        with self._file_lock():
+            self._entries, self._records = self._load()
+            self._log = open(self._log_path, "ab")
+    
+    @property
+    def _log_path(self) -> Path:
+        return self.path / "entries.bin"
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    @contextmanager
+    def _file_lock(self):
+        """跨进程排他锁（不支持fcntl的平台上只有进程内互斥）"""
+        if fcntl is None:
+            yield
+            return
+        fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+    
+    def _load(self) -> Tuple["OrderedDict[str, np.ndarray]", int]:
+        """校验元数据并重放缓存日志，返回缓存内容与日志中的记录数（调用方持有文件锁）"""
+        meta_path = self.path / "meta.json"
+        meta = {"model": self.model, "dimension": self.dimension}
+        if meta_path.exists():
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                if json.load(f) != meta:
+                    logger.warning(f"查询嵌入缓存的模型或维度与当前配置不一致，丢弃已有缓存: {self.path}")
+                    self._log_path.unlink(missing_ok=True)
+        with open(meta_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        return self._replay()
+    
+    def _replay(self) -> Tuple["OrderedDict[str, np.ndarray]", int]:
+        """按写入顺序重放日志，只保留最近写入的capacity条"""
+        entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        if not self._log_path.exists():
+            return entries, 0
+        payload = self._log_path.read_bytes()
+        offset = records = 0
+        while offset + _KEY_LENGTH.size <= len(payload):
+            (length,) = _KEY_LENGTH.unpack_from(payload, offset)
+            start = offset + _KEY_LENGTH.size
+            end = start + length + self._vector_bytes
+            if end > len(payload):
+                # 末尾不完整的记录（写入中断）
+                logger.warning(f"忽略查询嵌入缓存日志末尾不完整的记录: {self._log_path}")
+                break
+            key = payload[start:start + length].decode("utf-8")
+            entries[key] = np.frombuffer(payload, dtype=np.float32, count=self.dimension, offset=start + length)
+            entries.move_to_end(key)
+            offset = end
+            records += 1
+        while len(entries) > self.capacity:
+            entries.popitem(last=False)
+        return entries, records
+    
+    def _encode(self, key: str, vector: np.ndarray) -> bytes:
+        encoded = key.encode("utf-8")
+        return _KEY_LENGTH.pack(len(encoded)) + encoded + vector.tobytes()
+    
+    def _reopen_if_replaced(self):
+        """其他进程重写日志后，改为追加到新文件"""
+        try:
+            current = os.stat(self._log_path).st_ino
+        except FileNotFoundError:
+            current = None
+        if current != os.fstat(self._log.fileno()).st_ino:
+            self._log.close()
+            self._log = open(self._log_path, "ab")
+    
+    def get(self, query: str) -> Optional[np.ndarray]:
+        """查找查询的嵌入（按规范化后的查询匹配）"""
+        key = normalize_query(query)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+    
+    def put(self, query: str, embedding: Sequence[float]):
+        """缓存查询的嵌入并追加到日志"""
+        key = normalize_query(query)
+        vector = np.asarray(embedding, dtype=np.float32)
+        if vector.shape != (self.dimension,) or len(key.encode("utf-8")) > 0xFFFF:
+            return
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+            with self._file_lock():
+                self._reopen_if_replaced()
+                self._log.write(self._encode(key, vector))
+                self._log.flush()
+                self._records += 1
+                if self._records > 2 * self.capacity:
+                    self._rewrite()
+    
+    def _rewrite(self):
+        """合并日志中其他进程追加的记录，再按LRU顺序重写日志（调用方持有进程内锁与文件锁）"""
+        merged, _ = self._replay()
+        # 本进程的条目按LRU顺序排在后面，其他进程写入而本进程未见过的条目保留
+        for key, vector in self._entries.items():
+            merged[key] = vector
+            merged.move_to_end(key)
+        while len(merged) > self.capacity:
+            merged.popitem(last=False)
+        tmp_path = self._log_path.with_name(f".{self._log_path.name}.tmp")
+        with open(tmp_path, "wb") as f:
+            for key, vector in merged.items():
+                f.write(self._encode(key, vector))
+        self._log.close()
+        tmp_path.replace(self._log_path)
+        self._log = open(self._log_path, "ab")
+        self._entries = merged
+        self._records = len(merged)
+    
+    def close(self):
+        """按LRU顺序重写日志并关闭"""
+        with self._lock, self._file_lock():
+            self._rewrite()
+            self._log.close()
+        self._lock_file.close()
+
+
+class ResultCache:
+    """检索结果的语义缓存
+    
+    查询嵌入经固定的随机超平面投影后取符号位（SimHash），嵌入几乎相同的查询落入同一分桶，
+    与过滤条件一起组成缓存键。每个命名空间（如项目文档、PMBOK知识库）有各自的索引版本，
+    索引变化后旧版本的结果不再命中，并在写入新版本的结果时清除。
+    """
+    
+    def __init__(self, dimension: int, capacity: int = 1024, bits: int = 64, seed: int = 0):
+        """
+        初始化结果缓存
+        
+        Args:
+            dimension: 查询嵌入的维度
+            capacity: 最多缓存的结果数
+            bits: 分桶使用的超平面数
+            seed: 超平面的随机种子
+        """
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._planes = np.random.default_rng(seed).standard_normal((bits, dimension)).astype(np.float32)
+        # (命名空间, 分桶, 过滤条件) -> (索引版本, 结果)
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._versions: Dict[str, Hashable] = {}
+        self._lock = threading.Lock()
+    
+    def bucket(self, embedding: Sequence[float]) -> bytes:
+        """查询嵌入所在的分桶"""
+        projection = self._planes @ normalize_rows(np.asarray(embedding, dtype=np.float32))
+        return np.packbits(projection > 0).tobytes()
+    
+    def get(self, namespace: str, bucket: bytes, filters: Hashable, version: Hashable) -> Optional[Any]:
+        """查找缓存的结果（索引版本不一致时视为未命中）"""
+        key = (namespace, bucket, filters)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+    
+    def put(self, namespace: str, bucket: bytes, filters: Hashable, version: Hashable, value: Any):
+        """缓存结果；命名空间的索引版本变化时先清除该命名空间的旧结果"""
+        with self._lock:
+            if self._versions.get(namespace, version) != version:
+                for key in [key for key, entry in self._entries.items() if key[0] == namespace]:
+                    del self._entries[key]
+            self._versions[namespace] = version
+            self._entries[(namespace, bucket, filters)] = (version, value)
+            self._entries.move_to_end((namespace, bucket, filters))
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
@@ -0,0 +1,875 @@
+"""
+SQLite数据库操作类
+"""
+import json
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Union
+from datetime import date, datetime
+from app.utils.logger import get_logger
+from app.utils.change_feed import Change, ChangeFeed
+from app.utils.database import STREAM_CHUNK_SIZE, chunked, iter_jsonl, read_database_file, write_jsonl
+from app.utils.text_index import parse_query, score_record
+from app.utils.query import QueryResult, SortSpec, is_operator, matches, paginate, project
+
+logger = get_logger(__name__)
+
+# 与 scripts/init.sql 保持一致的字段索引（集合 -> 字段列表）
+SQLITE_FIELD_INDEXES: Dict[str, List[str]] = {
+    "projects": ["manager_id", "status"],
+    "tasks": ["project_id", "assigned_to", "status"],
+    "risks": ["project_id", "risk_level", "status"],
+    "issues": ["project_id", "task_id", "assigned_to", "status"],
+    "milestones": ["project_id"],
+    "resources": ["project_id"],
+    "time_tracking": ["project_id"],
+    "change_requests": ["project_id"],
+    "chat_sessions": ["user_id", "project_id"],
+    "vector_embeddings": ["doc_id"],
+}
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+_SQL_COMPARISONS = {"$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+_SQLITE_HEADER = b"SQLite format 3\x00"
+
+
+def _is_scalar(value: Any) -> bool:
+    """可直接作为SQL参数与json_extract结果比较的值（布尔值在JSON中另有表示，不下推）"""
+    return (value is None or isinstance(value, (str, int, float))) and not isinstance(value, bool)
+
+
+def _sql_scalar(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, (date, datetime)) else value
+
+
+class SQLiteDatabase:
+    """SQLite数据库操作类
+    
+    与 JSONDatabase 提供相同的接口。每个列表集合对应一张文档表，
+    记录以JSON文本保存，并对主键和 init.sql 中的外键字段建立表达式索引。
+    非列表集合（如 project_metrics、metadata）保存在 _documents 表中。
+    写操作提交后按顺序发布到变更流changes（事务内的变更在提交时发布，回滚时丢弃）。
+    """
+    
+    def __init__(self, db_path: str = "./data/simulated_database.sqlite3",
+                 indexes: Optional[Dict[str, List[str]]] = None):
+        """
+        初始化SQLite数据库
+        
+        Args:
+            db_path: 数据库文件路径
+            indexes: 字段索引声明（集合 -> 字段列表），默认使用SQLITE_FIELD_INDEXES
+        """
+        self.db_path = Path(db_path)
+        self.lock = threading.RLock()  # 写操作串行化，读操作使用各线程自己的连接
+        self.index_fields: Dict[str, List[str]] = {
+            name: list(fields)
+            for name, fields in (SQLITE_FIELD_INDEXES if indexes is None else indexes).items()
+        }
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._known_tables: set = set()
+        self.changes = ChangeFeed()
+        self._ensure_db_file()
+    
+    def _connect(self) -> sqlite3.Connection:
+        """获取当前线程的数据库连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self.lock:
+                self._connections.append(conn)
+        return conn
+    
+    def _ensure_db_file(self):
+        """确保数据库文件与基础表存在"""
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self._connect()
+        conn.execute("CREATE TABLE IF NOT EXISTS _documents (name TEXT PRIMARY KEY, data TEXT NOT NULL)")
+        if self._get_document("metadata") is None:
+            now = datetime.now().isoformat()
+            self._put_document("metadata", {"created_at": now, "version": "1.0.0", "last_updated": now})
+            for name in ["projects", "tasks", "milestones", "risks", "issues", "resources",
+                         "time_tracking", "change_requests", "users"]:
+                self._ensure_table(name)
+            self._put_document("project_metrics", {})
+            logger.info(f"创建初始SQLite数据库: {self.db_path}")
+    
+    @staticmethod
+    def _table(collection_name: str) -> str:
+        """校验集合名并返回带引号的表名"""
+        if not _IDENTIFIER.match(collection_name):
+            raise ValueError(f"非法的集合名称: {collection_name}")
+        return f'"c_{collection_name}"'
+    
+    def _ensure_table(self, collection_name: str):
+        """确保集合对应的表与索引存在"""
+        if collection_name in self._known_tables:
+            return
+        table = self._table(collection_name)
+        conn = self._connect()
+        with self.lock:
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                "seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "rec_id TEXT, rec_key TEXT, data TEXT NOT NULL)"
+            )
+            conn.execute(f'CREATE INDEX IF NOT EXISTS "idx_{collection_name}_rec_id" ON {table}(rec_id)')
+            conn.execute(f'CREATE INDEX IF NOT EXISTS "idx_{collection_name}_rec_key" ON {table}(rec_key)')
+            for field in self.index_fields.get(collection_name, []):
+                self._create_field_index(conn, collection_name, field)
+            self._known_tables.add(collection_name)
+    
+    def _create_field_index(self, conn: sqlite3.Connection, collection_name: str, field_name: str):
+        if not _IDENTIFIER.match(field_name):
+            raise ValueError(f"非法的字段名称: {field_name}")
+        conn.execute(
+            f'CREATE INDEX IF NOT EXISTS "idx_{collection_name}_{field_name}" '
+            f"ON {self._table(collection_name)}(json_extract(data, '$.{field_name}'))"
+        )
+    
+    def _table_exists(self, collection_name: str) -> bool:
+        if collection_name in self._known_tables:
+            return True
+        row = self._connect().execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (f"c_{collection_name}",)
+        ).fetchone()
+        return row is not None
+    
+    def _get_document(self, name: str) -> Any:
+        row = self._connect().execute("SELECT data FROM _documents WHERE name=?", (name,)).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def _put_document(self, name: str, value: Any):
+        with self.lock:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO _documents (name, data) VALUES (?, ?)",
+                (name, json.dumps(value, ensure_ascii=False))
+            )
+    
+    def _keys(self, collection_name: str, item: Dict[str, Any]):
+        """提取记录的两个主键列，规则与 JSONDatabase 一致"""
+        rec_id = item.get("id")
+        rec_key = item.get(f"{collection_name[:-1]}_id")
+        return (None if rec_id is None else str(rec_id)), (None if rec_key is None else str(rec_key))
+    
+    def _encode(self, collection_name: str, item: Dict[str, Any]):
+        rec_id, rec_key = self._keys(collection_name, item)
+        return rec_id, rec_key, json.dumps(item, ensure_ascii=False)
+    
+    def _record_key(self, collection_name: str, item: Dict[str, Any]) -> Any:
+        """记录的主键值（id或<集合名单数>_id）"""
+        return item.get("id") if item.get("id") is not None else item.get(f"{collection_name[:-1]}_id")
+    
+    def _emit(self, changes: List[Change]):
+        """发布变更：事务内暂存到提交时发布，否则立即发布"""
+        if getattr(self._local, "tx_depth", 0) > 0:
+            self._local.changes.extend(changes)
+        elif changes:
+            self.changes.publish(changes)
+    
+    def _find_row(self, collection_name: str, item_id: Any) -> Optional[sqlite3.Row]:
+        if not self._table_exists(collection_name):
+            return None
+        key = str(item_id)
+        return self._connect().execute(
+            f"SELECT seq, data FROM {self._table(collection_name)} "
+            "WHERE rec_id = ? OR rec_key = ? ORDER BY seq LIMIT 1",
+            (key, key)
+        ).fetchone()
+    
+    def _select(self, collection_name: str, filters: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+        """按过滤条件查询，标量相等、$in与范围条件下推到SQL，运算符条件再在Python中复核"""
+        if not self._table_exists(collection_name):
+            return []
+        clauses, params, residual = [], [], {}
+        for key, value in (filters or {}).items():
+            if not _IDENTIFIER.match(key):
+                residual[key] = value
+            elif is_operator(value):
+                for operator, expected in value.items():
+                    expected = [_sql_scalar(v) for v in expected] if operator in ("$in", "$nin") else _sql_scalar(expected)
+                    if operator == "$in" and all(_is_scalar(v) for v in expected) and None not in expected:
+                        clauses.append(f"json_extract(data, '$.{key}') IN ({', '.join('?' * len(expected))})")
+                        params.extend(expected)
+                    elif operator in _SQL_COMPARISONS and _is_scalar(expected) and expected is not None:
+                        clauses.append(f"json_extract(data, '$.{key}') {_SQL_COMPARISONS[operator]} ?")
+                        params.append(expected)
+                residual[key] = value
+            elif _is_scalar(value):
+                if value is None:
+                    clauses.append(f"json_extract(data, '$.{key}') IS NULL")
+                else:
+                    clauses.append(f"json_extract(data, '$.{key}') = ?")
+                    params.append(value)
+            else:
+                residual[key] = value
+        sql = f"SELECT data FROM {self._table(collection_name)}"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY seq"
+        items = [json.loads(row[0]) for row in self._connect().execute(sql, params)]
+        if residual:
+            items = [item for item in items if matches(item, residual)]
+        return items
+    
+    def query(self, collection_name: str, filters: Dict[str, Any] = None, sort: SortSpec = None,
+              offset: int = 0, limit: Optional[int] = None, fields: List[str] = None,
+              search: Optional[str] = None, search_fields: List[str] = None) -> QueryResult:
+        """
+        条件查询（参数与返回值同JSONDatabase.query）
+        
+        Args:
+            collection_name: 集合名称
+            filters: 过滤条件（可选）
+            sort: 排序声明（可选）
+            offset: 跳过的记录数
+            limit: 返回的最大记录数（可选）
+            fields: 投影字段（可选）
+            search: 全文搜索词（可选）
+            search_fields: 全文搜索字段（可选）
+            
+        Returns:
+            当前页记录，total属性为满足条件的记录总数
+        """
+        if search:
+            items = [item for item in self.search(collection_name, search, search_fields) if matches(item, filters)]
+        else:
+            items = self._select(collection_name, filters)
+        page = paginate(items, sort, offset, limit)
+        return QueryResult((project(item, fields) for item in page), total=len(items))
+    
+    def create_index(self, collection_name: str, field_name: str):
+        """
+        声明字段索引
+        
+        Args:
+            collection_name: 集合名称
+            field_name: 字段名
+        """
+        fields = self.index_fields.setdefault(collection_name, [])
+        if field_name not in fields:
+            fields.append(field_name)
+        self._ensure_table(collection_name)
+        with self.lock:
+            self._create_field_index(self._connect(), collection_name, field_name)
+        logger.info(f"为集合 {collection_name} 创建索引: {field_name}")
+    
+    @contextmanager
+    def transaction(self) -> Iterator["SQLiteDatabase"]:
+        """
+        事务上下文：块内的全部写操作在一个SQLite事务中提交，发生异常时回滚
+        
+        事务期间持有写锁，嵌套事务并入最外层事务。
+        """
+        with self.lock:
+            conn = self._connect()
+            depth = getattr(self._local, "tx_depth", 0)
+            if depth > 0:
+                self._local.tx_depth = depth + 1
+                try:
+                    yield self
+                finally:
+                    self._local.tx_depth = depth
+                return
+            
+            conn.execute("BEGIN IMMEDIATE")
+            self._local.tx_depth = 1
+            self._local.changes = []
+            # 事务内创建的表随回滚撤销，已知表缓存一并恢复
+            known_tables = set(self._known_tables)
+            try:
+                yield self
+            except BaseException:
+                conn.execute("ROLLBACK")
+                self._known_tables = known_tables
+                logger.warning("事务已回滚")
+                raise
+            else:
+                conn.execute("COMMIT")
+            finally:
+                self._local.tx_depth = 0
+                changes, self._local.changes = self._local.changes, []
+            self._emit(changes)
+    
+    def flush(self) -> bool:
+        """SQLite每次写操作已提交，无需额外落盘"""
+        return False
+    
+    def close(self):
+        """关闭所有线程的数据库连接"""
+        with self.lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except sqlite3.ProgrammingError:
+                    pass
+            self._connections = []
+        self._local = threading.local()
+    
+    def create(self, collection_name: str, item: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        创建新记录
+        
+        Args:
+            collection_name: 集合名称
+            item: 要创建的记录
+            
+        Returns:
+            创建后的记录
+        """
+        self._ensure_table(collection_name)
+        # 写入副本，不修改调用方传入的字典
+        current_time = datetime.now().isoformat()
+        item = {**item, "created_at": current_time, "updated_at": current_time}
+        with self.lock:
+            self._connect().execute(
+                f"INSERT INTO {self._table(collection_name)} (rec_id, rec_key, data) VALUES (?, ?, ?)",
+                self._encode(collection_name, item)
+            )
+            self._emit([("create", collection_name, self._record_key(collection_name, item), None, item)])
+        logger.info(f"在集合 {collection_name} 中创建新记录")
+        return item
+    
+    def create_many(self, collection_name: str, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        批量创建记录，只提交一次
+        
+        Args:
+            collection_name: 集合名称
+            items: 要创建的记录列表
+            
+        Returns:
+            创建后的记录列表
+        """
+        self._ensure_table(collection_name)
+        current_time = datetime.now().isoformat()
+        items = [{**item, "created_at": current_time, "updated_at": current_time} for item in items]
+        with self.transaction() as db:
+            db._connect().executemany(
+                f"INSERT INTO {self._table(collection_name)} (rec_id, rec_key, data) VALUES (?, ?, ?)",
+                [self._encode(collection_name, item) for item in items]
+            )
+            db._emit([("create", collection_name, self._record_key(collection_name, item), None, item)
+                      for item in items])
+        logger.info(f"在集合 {collection_name} 中批量创建 {len(items)} 条记录")
+        return items
+    
+    def read(self, collection_name: str, item_id: str = None, filters: Dict[str, Any] = None) -> Union[List[Dict[str, Any]], Dict[str, Any], None]:
+        """
+        读取记录
+        
+        Args:
+            collection_name: 集合名称
+            item_id: 记录ID（可选）
+            filters: 过滤条件（可选）
+            
+        Returns:
+            记录列表或单个记录
+        """
+        if item_id:
+            row = self._find_row(collection_name, item_id)
+            return json.loads(row[1]) if row else None
+        
+        if not self._table_exists(collection_name):
+            document = self._get_document(collection_name)
+            return document if document is not None else []
+        return self._select(collection_name, filters)
+    
+    def update(self, collection_name: str, item_id: str, updates: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        更新记录
+        
+        Args:
+            collection_name: 集合名称
+            item_id: 记录ID
+            updates: 更新数据
+            
+        Returns:
+            更新后的记录或None
+        """
+        with self.lock:
+            row = self._find_row(collection_name, item_id)
+            if row is None:
+                logger.warning(f"在集合 {collection_name} 中未找到记录 {item_id}")
+                return None
+            
+            before = json.loads(row[1])
+            item = {**before, **updates, "updated_at": datetime.now().isoformat()}
+            self._write_row(collection_name, row[0], item)
+            self._emit([("update", collection_name, self._record_key(collection_name, item), before, item)])
+        
+        logger.info(f"更新集合 {collection_name} 中的记录 {item_id}")
+        return item
+    
+    def _write_row(self, collection_name: str, seq: int, item: Dict[str, Any]):
+        rec_id, rec_key, data = self._encode(collection_name, item)
+        self._connect().execute(
+            f"UPDATE {self._table(collection_name)} SET rec_id = ?, rec_key = ?, data = ? WHERE seq = ?",
+            (rec_id, rec_key, data, seq)
+        )
+    
+    def update_many(self, collection_name: str, updates: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        批量更新记录，只提交一次
+        
+        Args:
+            collection_name: 集合名称
+            updates: 记录ID -> 更新数据
+            
+        Returns:
+            更新后的记录列表（未找到的记录被跳过）
+        """
+        updated = []
+        with self.transaction():
+            for item_id, item_updates in updates.items():
+                row = self._find_row(collection_name, item_id)
+                if row is None:
+                    logger.warning(f"在集合 {collection_name} 中未找到记录 {item_id}")
+                    continue
+                before = json.loads(row[1])
+                item = {**before, **item_updates, "updated_at": datetime.now().isoformat()}
+                self._write_row(collection_name, row[0], item)
+                self._emit([("update", collection_name, self._record_key(collection_name, item), before, item)])
+                updated.append(item)
+        logger.info(f"批量更新集合 {collection_name} 中的 {len(updated)} 条记录")
+        return updated
+    
+    def upsert_many(self, collection_name: str, items: List[Dict[str, Any]], key_field: str = None) -> List[Dict[str, Any]]:
+        """
+        批量插入或更新记录，只提交一次
+        
+        Args:
+            collection_name: 集合名称
+            items: 记录列表
+            key_field: 用于匹配已有记录的字段，默认为 <集合名单数>_id
+            
+        Returns:
+            插入或更新后的记录列表
+        """
+        key_field = key_field or f"{collection_name[:-1]}_id"
+        if not _IDENTIFIER.match(key_field):
+            raise ValueError(f"非法的字段名称: {key_field}")
+        self._ensure_table(collection_name)
+        table = self._table(collection_name)
+        results = []
+        created = 0
+        with self.transaction() as db:
+            conn = db._connect()
+            current_time = datetime.now().isoformat()
+            for item in items:
+                key = item.get(key_field)
+                row = None
+                if key is not None:
+                    row = conn.execute(
+                        f"SELECT seq, data FROM {table} WHERE json_extract(data, '$.{key_field}') = ? "
+                        "ORDER BY seq LIMIT 1",
+                        (key,)
+                    ).fetchone()
+                if row is None:
+                    item = {**item, "created_at": current_time, "updated_at": current_time}
+                    conn.execute(
+                        f"INSERT INTO {table} (rec_id, rec_key, data) VALUES (?, ?, ?)",
+                        self._encode(collection_name, item)
+                    )
+                    db._emit([("create", collection_name, self._record_key(collection_name, item), None, item)])
+                    results.append(item)
+                    created += 1
+                else:
+                    before = json.loads(row[1])
+                    existing = {**before, **item, "updated_at": current_time}
+                    self._write_row(collection_name, row[0], existing)
+                    db._emit([("update", collection_name, self._record_key(collection_name, existing), before, existing)])
+                    results.append(existing)
+        logger.info(f"批量写入集合 {collection_name}：新增 {created} 条，更新 {len(results) - created} 条")
+        return results
+    
+    def delete(self, collection_name: str, item_id: str) -> bool:
+        """
+        删除记录
+        
+        Args:
+            collection_name: 集合名称
+            item_id: 记录ID
+            
+        Returns:
+            是否删除成功
+        """
+        with self.lock:
+            row = self._find_row(collection_name, item_id)
+            if row is None:
+                logger.warning(f"在集合 {collection_name} 中未找到记录 {item_id}")
+                return False
+            self._connect().execute(f"DELETE FROM {self._table(collection_name)} WHERE seq = ?", (row[0],))
+            before = json.loads(row[1])
+            self._emit([("delete", collection_name, self._record_key(collection_name, before), before, None)])
+        
+        logger.info(f"从集合 {collection_name} 中删除记录 {item_id}")
+        return True
+    
+    def count(self, collection_name: str, filters: Dict[str, Any] = None) -> int:
+        """
+        统计记录数量
+        
+        Args:
+            collection_name: 集合名称
+            filters: 过滤条件（可选）
+            
+        Returns:
+            记录数量
+        """
+        if not self._table_exists(collection_name):
+            document = self._get_document(collection_name)
+            return len(document) if document is not None else 0
+        if not filters:
+            row = self._connect().execute(f"SELECT COUNT(*) FROM {self._table(collection_name)}").fetchone()
+            return row[0]
+        return len(self._select(collection_name, filters))
+    
+    def search(self, collection_name: str, search_term: str, search_fields: List[str] = None,
+               mode: str = "and", limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        搜索记录（命中规则与排序同JSONDatabase.search）
+        
+        Args:
+            collection_name: 集合名称
+            search_term: 搜索词
+            search_fields: 搜索字段列表（可选）
+            mode: 多个查询词的组合方式，"and"或"or"
+            limit: 最多返回的记录数（可选）
+            
+        Returns:
+            匹配的记录列表
+        """
+        if mode not in ("and", "or"):
+            raise ValueError(f"不支持的搜索模式: {mode}")
+        terms = parse_query(search_term)
+        items = self._select(collection_name)
+        if terms:
+            scored = []
+            for item in items:
+                score = score_record(item, terms, search_fields, mode)
+                if score is not None:
+                    scored.append((score, item))
+            scored.sort(key=lambda pair: pair[0], reverse=True)
+            items = [item for _, item in scored]
+        return items[:limit] if limit is not None else items
+    
+    def get_by_field(self, collection_name: str, field_name: str, field_value: Any) -> List[Dict[str, Any]]:
+        """
+        根据字段值获取记录
+        
+        Args:
+            collection_name: 集合名称
+            field_name: 字段名
+            field_value: 字段值
+            
+        Returns:
+            匹配的记录列表
+        """
+        return self._select(collection_name, {field_name: field_value})
+    
+    def backup(self, backup_path: str = None) -> str:
+        """
+        备份数据库（使用SQLite在线备份）
+        
+        Args:
+            backup_path: 备份文件路径（可选）
+            
+        Returns:
+            备份文件路径
+        """
+        if not backup_path:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            backup_path = f"{self.db_path.stem}_backup_{timestamp}.sqlite3"
+        
+        backup_path = Path(backup_path)
+        backup_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        target = sqlite3.connect(str(backup_path))
+        try:
+            with self.lock:
+                self._connect().backup(target)
+        finally:
+            target.close()
+        
+        logger.info(f"数据库已备份到: {backup_path}")
+        return str(backup_path)
+    
+    def restore(self, backup_path: str) -> bool:
+        """
+        恢复数据库
+        
+        Args:
+            backup_path: 备份文件路径（SQLite备份或JSON数据库文件，JSON数据库文件格式自动识别）
+            
+        Returns:
+            是否恢复成功
+        """
+        backup_path = Path(backup_path)
+        if not backup_path.exists():
+            logger.error(f"备份文件不存在: {backup_path}")
+            return False
+        
+        try:
+            with self.lock:
+                with open(backup_path, 'rb') as f:
+                    is_sqlite = f.read(len(_SQLITE_HEADER)) == _SQLITE_HEADER
+                if not is_sqlite:
+                    self._replace_all(read_database_file(backup_path))
+                else:
+                    source = sqlite3.connect(str(backup_path))
+                    try:
+                        source.backup(self._connect())
+                    finally:
+                        source.close()
+                    self._known_tables = set()
+            
+            logger.info(f"数据库已从备份恢复: {backup_path}")
+            return True
+        except Exception as e:
+            logger.error(f"恢复数据库失败: {e}")
+            return False
+    
+    def restore_data(self, data: Dict[str, Any]):
+        """
+        用完整的数据库内容整体替换当前数据
+        
+        Args:
+            data: 数据库内容（集合名称 -> 集合数据，含metadata）
+        """
+        with self.lock:
+            self._replace_all(data)
+    
+    def _replace_all(self, data: Dict[str, Any]):
+        """用JSON数据库结构整体替换当前数据"""
+        with self.transaction():
+            conn = self._connect()
+            existing = self.get_collections()
+            for name in existing:
+                if self._table_exists(name):
+                    conn.execute(f"DELETE FROM {self._table(name)}")
+            conn.execute("DELETE FROM _documents")
+            for name, value in data.items():
+                if isinstance(value, list):
+                    self._ensure_table(name)
+                    conn.executemany(
+                        f"INSERT INTO {self._table(name)} (rec_id, rec_key, data) VALUES (?, ?, ?)",
+                        [self._encode(name, item) for item in value]
+                    )
+                else:
+                    self._put_document(name, value)
+            names = existing + [name for name in data if name not in existing and name != "metadata"]
+            self._emit([("replace", name, None, None, None) for name in names])
+    
+    def migrate_from_json(self, json_path: str) -> bool:
+        """
+        从JSON数据库文件导入全部数据
+        
+        Args:
+            json_path: JSON数据库文件路径
+            
+        Returns:
+            是否导入成功
+        """
+        json_path = Path(json_path)
+        if not json_path.exists():
+            return False
+        with self.lock:
+            self._replace_all(read_database_file(json_path))
+        logger.info(f"已从JSON数据库迁移数据: {json_path}")
+        return True
+    
+    def is_empty(self) -> bool:
+        """数据库中是否没有任何记录"""
+        return all(self.count(name) == 0 for name in self.get_collections() if self._table_exists(name))
+    
+    def get_metadata(self) -> Dict[str, Any]:
+        """
+        获取数据库元数据
+        
+        Returns:
+            元数据字典
+        """
+        return self._get_document("metadata") or {}
+    
+    def get_collections(self) -> List[str]:
+        """
+        获取所有集合名称
+        
+        Returns:
+            集合名称列表
+        """
+        conn = self._connect()
+        tables = [row[0][2:] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name LIKE 'c\\_%' ESCAPE '\\' ORDER BY name"
+        )]
+        documents = [row[0] for row in conn.execute("SELECT name FROM _documents WHERE name != 'metadata'")]
+        return tables + [name for name in documents if name not in tables]
+    
+    def clear_collection(self, collection_name: str) -> bool:
+        """
+        清空集合
+        
+        Args:
+            collection_name: 集合名称
+            
+        Returns:
+            是否清空成功
+        """
+        with self.lock:
+            if self._table_exists(collection_name):
+                self._connect().execute(f"DELETE FROM {self._table(collection_name)}")
+            elif self._get_document(collection_name) is not None:
+                self._put_document(collection_name, [])
+            else:
+                logger.warning(f"集合不存在: {collection_name}")
+                return False
+            self._emit([("replace", collection_name, None, None, None)])
+        logger.info(f"已清空集合: {collection_name}")
+        return True
+    
+    def import_data(self, collection_name: str, items: List[Dict[str, Any]], clear_existing: bool = False) -> int:
+        """
+        导入数据到集合
+        
+        Args:
+            collection_name: 集合名称
+            items: 要导入的数据项列表
+            clear_existing: 是否清空现有数据
+            
+        Returns:
+            导入的记录数量
+        """
+        self._ensure_table(collection_name)
+        current_time = datetime.now().isoformat()
+        items = [{"created_at": current_time, **item, "updated_at": current_time} for item in items]
+        
+        with self.transaction():
+            conn = self._connect()
+            if clear_existing:
+                conn.execute(f"DELETE FROM {self._table(collection_name)}")
+                self._emit([("replace", collection_name, None, None, None)])
+            conn.executemany(
+                f"INSERT INTO {self._table(collection_name)} (rec_id, rec_key, data) VALUES (?, ?, ?)",
+                [self._encode(collection_name, item) for item in items]
+            )
+            self._emit([("create", collection_name, self._record_key(collection_name, item), None, item)
+                        for item in items])
+        
+        logger.info(f"向集合 {collection_name} 导入了 {len(items)} 条记录")
+        return len(items)
+    
+    def export_data(self, collection_name: str, output_path: str = None) -> str:
+        """
+        导出集合数据
+        
+        Args:
+            collection_name: 集合名称
+            output_path: 输出文件路径（可选）
+            
+        Returns:
+            输出文件路径
+        """
+        if not output_path:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            output_path = f"{collection_name}_export_{timestamp}.json"
+        
+        output_path = Path(output_path)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(self.read(collection_name), f, ensure_ascii=False, indent=2)
+        
+        logger.info(f"集合 {collection_name} 的数据已导出到: {output_path}")
+        return str(output_path)
+    
+    def import_stream(self, collection_name: str, items: Union[str, Path, Iterable[Dict[str, Any]]],
+                      chunk_size: int = STREAM_CHUNK_SIZE, clear_existing: bool = False,
+                      progress: Optional[Callable[[int], None]] = None) -> int:
+        """
+        流式导入记录：每块在一个SQLite事务中提交，内存占用只与块大小有关
+        
+        Args:
+            collection_name: 集合名称
+            items: 记录的可迭代对象（可为生成器），或JSONL文件路径
+            chunk_size: 每次提交的记录数
+            clear_existing: 是否先清空现有数据
+            progress: 进度回调，每提交一块后以已导入的记录总数调用
+            
+        Returns:
+            导入的记录数量
+        """
+        if isinstance(items, (str, Path)):
+            items = iter_jsonl(items)
+        self._ensure_table(collection_name)
+        if clear_existing:
+            self.clear_collection(collection_name)
+        
+        imported = 0
+        for chunk in chunked(items, chunk_size):
+            current_time = datetime.now().isoformat()
+            chunk = [{"created_at": current_time, **item, "updated_at": current_time} for item in chunk]
+            with self.transaction():
+                self._connect().executemany(
+                    f"INSERT INTO {self._table(collection_name)} (rec_id, rec_key, data) VALUES (?, ?, ?)",
+                    [self._encode(collection_name, item) for item in chunk]
+                )
+                self._emit([("create", collection_name, self._record_key(collection_name, item), None, item)
+                            for item in chunk])
+            imported += len(chunk)
+            if progress is not None:
+                progress(imported)
+        
+        logger.info(f"向集合 {collection_name} 流式导入了 {imported} 条记录")
+        return imported
+    
+    def export_stream(self, collection_name: str, filters: Dict[str, Any] = None) -> Iterator[str]:
+        """
+        流式导出集合为JSONL行，逐行读取游标，无过滤条件时直接输出存储的JSON文本
+        
+        Args:
+            collection_name: 集合名称
+            filters: 过滤条件（可选）
+            
+        Yields:
+            以换行结尾的JSON行
+        """
+        if not self._table_exists(collection_name):
+            document = self._get_document(collection_name)
+            for item in document if isinstance(document, list) else ([document] if document else []):
+                if matches(item, filters):
+                    yield json.dumps(item, ensure_ascii=False) + "\n"
+            return
+        cursor = self._connect().execute(f"SELECT data FROM {self._table(collection_name)} ORDER BY seq")
+        for (data,) in cursor:
+            if not filters or matches(json.loads(data), filters):
+                yield data + "\n"
+    
+    def export_jsonl(self, collection_name: str, output_path: str = None, filters: Dict[str, Any] = None,
+                     progress: Optional[Callable[[int], None]] = None) -> str:
+        """
+        将集合分块导出为JSONL文件
+        
+        Args:
+            collection_name: 集合名称
+            output_path: 输出文件路径（可选）
+            filters: 过滤条件（可选）
+            progress: 进度回调，每写出一块后以已导出的记录数调用
+            
+        Returns:
+            输出文件路径
+        """
+        if not output_path:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            output_path = f"{collection_name}_export_{timestamp}.jsonl"
+        
+        exported = write_jsonl(self.export_stream(collection_name, filters), output_path, progress)
+        logger.info(f"集合 {collection_name} 的 {exported} 条记录已导出到: {output_path}")
+        return str(output_path)
@@ -0,0 +1,380 @@
+"""
+中英文全文倒排索引
+"""
+import heapq
+import re
+from bisect import bisect_left, insort
+from collections import Counter
+from operator import itemgetter
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple, Union
+
+from app.utils.cow import RecordBucket, ShardedMap
+
+# 拉丁字母/数字单词，或连续的中日韩文字
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+|[㐀-䶿一-鿿豈-﫿぀-ヿ가-힯]+")
+# 有序词表中前缀区间的上界
+_MAX_CHAR = chr(0x10FFFF)
+
+
+def _is_cjk(text: str) -> bool:
+    return not text[0].isascii()
+
+
+def tokenize(text: Any) -> List[str]:
+    """
+    分词：拉丁文按单词切分，中日韩文字按相邻二元组（bigram）切分
+    
+    Args:
+        text: 待分词文本（非字符串会先转换为字符串）
+        
+    Returns:
+        词元列表（保留重复，便于统计词频）
+    """
+    tokens = []
+    for run in _TOKEN_PATTERN.findall(str(text).lower()):
+        if not _is_cjk(run):
+            tokens.append(run)
+        elif len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def parse_query(query: str) -> List[Tuple[str, bool]]:
+    """
+    解析查询串：按空白切分为多个查询词，以*结尾的查询词按前缀匹配
+    
+    最后一个查询词以拉丁单词结尾时默认按前缀匹配（搜索框边输入边查询的场景，如"web"命中"Website"）。
+    
+    Returns:
+        (小写查询词, 是否前缀匹配) 列表
+    """
+    terms = []
+    for raw in query.lower().split():
+        prefix = raw.endswith("*")
+        term = raw.rstrip("*")
+        if term:
+            terms.append((term, prefix))
+    if terms and not terms[-1][1]:
+        tokens = tokenize(terms[-1][0])
+        if tokens and not _is_cjk(tokens[-1]):
+            terms[-1] = (terms[-1][0], True)
+    return terms
+
+
+def _token_frequency(token: str, counts: Dict[str, int], prefix: bool) -> int:
+    """字段中与查询词元匹配的词元出现次数"""
+    if prefix:
+        return sum(tf for candidate, tf in counts.items() if candidate.startswith(token))
+    if len(token) == 1 and _is_cjk(token):
+        # 单个汉字按子串命中：出现在二元组的开头或结尾；连续文字中间的字同时出现在前后两个二元组中，取较大者
+        starts = sum(tf for candidate, tf in counts.items() if candidate[0] == token)
+        ends = sum(tf for candidate, tf in counts.items() if len(candidate) > 1 and candidate[-1] == token)
+        return max(starts, ends)
+    return counts.get(token, 0)
+
+
+def term_frequency(tokens: List[str], counts: Dict[str, int], prefix: bool = False) -> int:
+    """
+    由字段的词元词频计算查询词的词频
+    
+    拉丁词需整词命中（前缀查询时按词首匹配），单个汉字按子串命中；多词元的查询词取各词元词频的最小值。
+    
+    Args:
+        tokens: 查询词的词元（去重）
+        counts: 字段的词元 -> 词频
+        prefix: 最后一个词元是否按前缀匹配
+        
+    Returns:
+        词频；任一词元未命中时为0
+    """
+    frequency = 0
+    for i, token in enumerate(tokens):
+        tf = _token_frequency(token, counts, prefix and i == len(tokens) - 1)
+        if not tf:
+            return 0
+        frequency = tf if i == 0 else min(frequency, tf)
+    return frequency
+
+
+def score_record(record: Dict[str, Any], terms: List[Tuple[str, bool]], fields: Optional[List[str]] = None,
+                 mode: str = "and") -> Optional[int]:
+    """
+    计算记录对查询的词频得分（全表扫描时使用，命中规则与得分与FullTextIndex.search一致）
+    
+    Args:
+        record: 记录
+        terms: parse_query解析出的查询词
+        fields: 搜索字段（为空时搜索全部字段）
+        mode: "and"要求全部查询词命中，"or"命中任一即可
+        
+    Returns:
+        查询词在命中字段中的词频之和；记录不满足查询时返回None
+    """
+    if fields:
+        texts = [str(record[field]).lower() for field in fields if field in record]
+    else:
+        texts = [str(value).lower() for value in record.values()]
+    counts: List[Optional[Dict[str, int]]] = [None] * len(texts)
+    score = 0
+    hits = 0
+    for term, prefix in terms:
+        tokens = list(dict.fromkeys(tokenize(term)))
+        frequency = 0
+        for i, text in enumerate(texts):
+            if term not in text:
+                continue
+            if not tokens:
+                # 查询词不含可索引的词元（如纯符号），按子串计数
+                frequency += text.count(term)
+                continue
+            if counts[i] is None:
+                counts[i] = Counter(tokenize(text))
+            frequency += term_frequency(tokens, counts[i], prefix)
+        if frequency:
+            hits += 1
+            score += frequency
+        elif mode == "and":
+            return None
+    return score if hits else None
+
+
+class FullTextIndex:
+    """按字段维护的倒排索引，随记录增删增量更新
+    
+    倒排列表给出包含词元的记录，另按记录保存各字段的词元词频：检索时从最短的倒排列表取候选，
+    其余词元用词频表判断，得分直接由词频计算，不需要重新分词。前缀查询与单个汉字查询
+    在有序词表（及倒序词表）上二分查找展开。
+    """
+    
+    def __init__(self, fields: List[str]):
+        """
+        初始化全文索引
+        
+        Args:
+            fields: 建立索引的字段列表
+        """
+        self.fields = list(fields)
+        # 字段 -> 词元 -> 记录桶（记录对象id -> 记录）
+        self.postings: Dict[str, ShardedMap] = {field: ShardedMap() for field in self.fields}
+        # 字段 -> 记录对象id -> 词元词频
+        self.counts: Dict[str, ShardedMap] = {field: ShardedMap() for field in self.fields}
+        # 字段 -> 有序词表；中日韩词元另按倒序保存，供单个汉字查询匹配以其结尾的二元组
+        self.vocabulary: Dict[str, List[str]] = {field: [] for field in self.fields}
+        self.suffixes: Dict[str, List[str]] = {field: [] for field in self.fields}
+        # 写时复制时记录本版本自有的记录桶与词表，None表示全部自有
+        self._owned: Optional[Set[int]] = None
+        self._owned_vocabulary: Optional[Set[str]] = None
+    
+    def copy(self) -> "FullTextIndex":
+        """复制索引用于构建新版本，只复制分片目录，记录桶与词表在首次修改时才复制"""
+        clone = FullTextIndex.__new__(FullTextIndex)
+        clone.fields = self.fields
+        clone.postings = {field: postings.copy() for field, postings in self.postings.items()}
+        clone.counts = {field: counts.copy() for field, counts in self.counts.items()}
+        clone.vocabulary = dict(self.vocabulary)
+        clone.suffixes = dict(self.suffixes)
+        clone._owned = set()
+        clone._owned_vocabulary = set()
+        return clone
+    
+    def _posting(self, postings: ShardedMap, token: str, create: bool) -> Optional[RecordBucket]:
+        bucket = postings.get(token)
+        if bucket is None:
+            if not create:
+                return None
+            bucket = postings[token] = RecordBucket()
+        elif self._owned is not None and id(bucket) not in self._owned:
+            bucket = postings[token] = bucket.copy()
+        else:
+            return bucket
+        if self._owned is not None:
+            self._owned.add(id(bucket))
+        return bucket
+    
+    def _writable_vocabulary(self, field: str) -> Tuple[List[str], List[str]]:
+        if self._owned_vocabulary is not None and field not in self._owned_vocabulary:
+            self.vocabulary[field] = list(self.vocabulary[field])
+            self.suffixes[field] = list(self.suffixes[field])
+            self._owned_vocabulary.add(field)
+        return self.vocabulary[field], self.suffixes[field]
+    
+    def _add_token(self, field: str, token: str):
+        vocabulary, suffixes = self._writable_vocabulary(field)
+        insort(vocabulary, token)
+        if _is_cjk(token):
+            insort(suffixes, token[::-1])
+    
+    def _remove_token(self, field: str, token: str):
+        vocabulary, suffixes = self._writable_vocabulary(field)
+        for words, word in ((vocabulary, token), (suffixes, token[::-1])):
+            position = bisect_left(words, word)
+            if position < len(words) and words[position] == word:
+                del words[position]
+    
+    def covers(self, fields: Iterable[str]) -> bool:
+        """给定字段是否全部建有全文索引"""
+        return all(field in self.postings for field in fields)
+    
+    def add(self, record: Dict[str, Any]):
+        """将记录加入索引"""
+        for field in self.fields:
+            value = record.get(field)
+            if value is None:
+                continue
+            counts = dict(Counter(tokenize(value)))
+            if not counts:
+                continue
+            self.counts[field][id(record)] = counts
+            postings = self.postings[field]
+            for token in counts:
+                if token not in postings:
+                    self._add_token(field, token)
+                self._posting(postings, token, create=True).add(record)
+    
+    def remove(self, record: Dict[str, Any]):
+        """将记录移出索引"""
+        for field in self.fields:
+            counts = self.counts[field].get(id(record))
+            if counts is None:
+                continue
+            del self.counts[field][id(record)]
+            postings = self.postings[field]
+            for token in counts:
+                bucket = self._posting(postings, token, create=False)
+                if bucket is None or not bucket.remove(record):
+                    continue
+                if not bucket:
+                    del postings[token]
+                    self._remove_token(field, token)
+    
+    @staticmethod
+    def _prefixed(words: List[str], prefix: str) -> List[str]:
+        """有序词表中以prefix开头的词"""
+        return words[bisect_left(words, prefix):bisect_left(words, prefix + _MAX_CHAR)]
+    
+    def _expand(self, field: str, token: str, prefix: bool) -> List[Union[str, FrozenSet[str]]]:
+        """
+        词表中与查询词元匹配的词元组：精确匹配为词元本身；前缀查询为全部以其开头的词元；
+        单个汉字为以其开头、以其结尾的两组二元组（词频取两组中较大者）。词表中没有匹配时为空
+        """
+        if not prefix and not (len(token) == 1 and _is_cjk(token)):
+            return [token] if token in self.postings[field] else []
+        groups = [frozenset(self._prefixed(self.vocabulary[field], token))]
+        if not prefix:
+            groups.append(frozenset(word[::-1] for word in self._prefixed(self.suffixes[field], token) if len(word) > 1))
+        return [group for group in groups if group]
+    
+    @staticmethod
+    def _frequency(matchers: List[List[Union[str, FrozenSet[str]]]], counts: Dict[str, int]) -> int:
+        """由词元组计算查询词在字段中的词频（规则同term_frequency）"""
+        frequency = 0
+        for i, groups in enumerate(matchers):
+            tf = 0
+            for group in groups:
+                if isinstance(group, str):
+                    tf = max(tf, counts.get(group, 0))
+                else:
+                    tf = max(tf, sum(counts[word] for word in group.intersection(counts)))
+            if not tf:
+                return 0
+            frequency = tf if i == 0 else min(frequency, tf)
+        return frequency
+    
+    def _compile_field(self, field: str, tokens: List[str], prefix: bool) -> Optional[Tuple[int, List[RecordBucket], list]]:
+        """
+        查询词在字段中的候选来源与词元组
+        
+        Returns:
+            (最短倒排列表的记录数, 其记录桶, 各词元的词元组)；有词元在字段词表中没有匹配时为None
+        """
+        postings = self.postings[field]
+        shortest = None
+        matchers = []
+        for i, token in enumerate(tokens):
+            groups = self._expand(field, token, prefix and i == len(tokens) - 1)
+            if not groups:
+                return None
+            words = set().union(*({group} if isinstance(group, str) else group for group in groups))
+            buckets = [postings[word] for word in words]
+            size = sum(len(bucket) for bucket in buckets)
+            if shortest is None or size < shortest[0]:
+                shortest = (size, buckets)
+            matchers.append(groups)
+        return shortest[0], shortest[1], matchers
+    
+    def _score(self, key: int, record: Dict[str, Any], compiled: list, mode: str) -> Optional[int]:
+        score = 0
+        hits = 0
+        for term, exact, by_field in compiled:
+            frequency = 0
+            for field, (_, _, matchers) in by_field.items():
+                counts = self.counts[field].get(key)
+                if counts is None:
+                    continue
+                tf = self._frequency(matchers, counts)
+                if tf and (exact or term in str(record[field]).lower()):
+                    frequency += tf
+            if frequency:
+                hits += 1
+                score += frequency
+            elif mode == "and":
+                return None
+        return score if hits else None
+    
+    def search(self, terms: List[Tuple[str, bool]], fields: List[str], mode: str = "and",
+               limit: Optional[int] = None) -> Optional[List[Dict[str, Any]]]:
+        """
+        检索记录
+        
+        AND查询只遍历总长度最短的查询词的候选，其余查询词通过词频表判断；OR查询遍历全部查询词的候选。
+        
+        Args:
+            terms: parse_query解析出的查询词
+            fields: 查询字段
+            mode: "and"要求全部查询词命中，"or"命中任一即可
+            limit: 最多返回的记录数（可选，按得分用堆选出）
+            
+        Returns:
+            按词频得分降序的记录；有查询词无法分词时返回None，调用方应回退到全表扫描
+        """
+        # 查询词 -> (查询词, 是否只有一个与查询词相同的词元, 字段 -> 候选来源与词元组)
+        compiled = []
+        for term, prefix in terms:
+            tokens = list(dict.fromkeys(tokenize(term)))
+            if not tokens:
+                return None
+            by_field = {}
+            for field in fields:
+                found = self._compile_field(field, tokens, prefix)
+                if found is not None:
+                    by_field[field] = found
+            # 多词元的查询词（如“设计评审”“c++”）还需在原文中连续出现
+            compiled.append((term, tokens == [term], by_field))
+        if mode == "and":
+            term = min(compiled, key=lambda item: sum(size for size, _, _ in item[2].values()))
+            sources = [buckets for _, buckets, _ in term[2].values()]
+        else:
+            sources = [buckets for _, _, by_field in compiled for _, buckets, _ in by_field.values()]
+        
+        buckets = [bucket for group in sources for bucket in group]
+        
+        def scored() -> Iterable[Tuple[int, Dict[str, Any]]]:
+            # 多个倒排列表的并集需要去重
+            seen: Optional[Set[int]] = set() if len(buckets) > 1 else None
+            for bucket in buckets:
+                for key, record in bucket.items():
+                    if seen is not None:
+                        if key in seen:
+                            continue
+                        seen.add(key)
+                    score = self._score(key, record, compiled, mode)
+                    if score is not None:
+                        yield score, record
+        
+        if limit is not None:
+            ranked = heapq.nlargest(limit, scored(), key=itemgetter(0))
+        else:
+            ranked = sorted(scored(), key=itemgetter(0), reverse=True)
+        return [record for _, record in ranked]
@@ -0,0 +1,328 @@
+"""
+内存向量库：L2归一化的向量连续存放在一个float32矩阵中，检索为一次矩阵向量乘法加部分排序
+"""
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from app.utils.embedding_index import normalize_rows
+
+# 过滤条件：字段 -> 取值或取值列表
+Filters = Dict[str, Union[Any, Sequence[Any]]]
+
+
+def top_positions(scores: np.ndarray, k: int) -> np.ndarray:
+    """得分最高的k个下标（按得分降序，得分相同时下标小的在前）"""
+    if k < len(scores):
+        top = np.argpartition(scores, len(scores) - k)[len(scores) - k:]
+    else:
+        top = np.arange(len(scores))
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+class VectorStore:
+    """连续存储的向量库
+    
+    向量按行存放在容量倍增的float32矩阵中，文档ID与元数据保存在按行对应的列表里。
+    删除只标记墓碑（该行不再参与检索），墓碑超过一半时压缩矩阵。
+    fields中的元数据字段另外以整数编码的数组保存，过滤条件在检索时向量化求值。
+    
+    子类可以替换向量的存储方式（_resize_storage、_write_vectors、_score、_read_vectors、_compact_storage），
+    行号、墓碑与过滤字段的维护在本类中完成。
+    挂载近似索引（ann，如IVFIndex）后，检索只对索引给出的候选行打分。
+    """
+    
+    # 每个检索结果先按粗排得分取出的候选数量，子类据此在_rescore中精排
+    candidates_per_hit = 1
+    
+    def __init__(self, dimension: int, fields: Sequence[str] = (), initial_capacity: int = 1024):
+        """
+        初始化向量库
+        
+        Args:
+            dimension: 向量维度
+            fields: 支持过滤的元数据字段
+            initial_capacity: 矩阵的初始行数
+        """
+        self.dimension = dimension
+        self.fields = tuple(fields)
+        self._capacity = 0
+        self._alive = np.zeros(0, dtype=bool)
+        self._codes = {name: np.zeros(0, dtype=np.int32) for name in self.fields}
+        # 字段取值 -> 整数编码（0保留给缺失值）
+        self._vocab: Dict[str, Dict[Any, int]] = {name: {None: 0} for name in self.fields}
+        self._ids: List[Optional[str]] = []
+        self._metadata: List[Optional[Dict[str, Any]]] = []
+        self._rows: Dict[str, int] = {}
+        # 近似最近邻索引（可选）
+        self.ann = None
+        # 内容版本：每次添加、覆盖或删除向量后递增，供检索结果缓存判断是否失效
+        self.version = 0
+        self._reserve(initial_capacity)
+    
+    def __len__(self) -> int:
+        return len(self._rows)
+    
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._rows
+    
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+    
+    # 向量存储（子类可替换）
+    
+    def _resize_storage(self, capacity: int):
+        matrix = np.zeros((capacity, self.dimension), dtype=np.float32)
+        if self._capacity:
+            matrix[:len(self._ids)] = self._matrix[:len(self._ids)]
+        self._matrix = matrix
+    
+    def _write_vectors(self, rows: np.ndarray, vectors: np.ndarray):
+        self._matrix[rows] = vectors
+    
+    def _score(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """查询向量与全部已用行（rows为None）或指定行的相似度"""
+        if rows is None:
+            return self._matrix[:len(self._ids)] @ query
+        return self._matrix[rows] @ query
+    
+    def _rescore(self, query: np.ndarray, rows: np.ndarray, scores: np.ndarray) -> np.ndarray:
+        """对粗排候选精排（默认粗排得分即为精确得分）"""
+        return scores
+    
+    def _read_vectors(self, rows: np.ndarray) -> np.ndarray:
+        return self._matrix[rows]
+    
+    def _compact_storage(self, live: np.ndarray, capacity: int):
+        matrix = np.zeros((capacity, self.dimension), dtype=np.float32)
+        matrix[:len(live)] = self._matrix[live]
+        self._matrix = matrix
+    
+    def read_vectors(self, rows: np.ndarray) -> np.ndarray:
+        """读取指定行的归一化向量（float32）"""
+        return np.asarray(self._read_vectors(rows), dtype=np.float32)
+    
+    def live_rows(self) -> np.ndarray:
+        """全部有效行的行号"""
+        return np.flatnonzero(self._alive[:len(self._ids)])
+    
+    # 近似索引
+    
+    def attach_index(self, index: Any):
+        """
+        挂载近似最近邻索引，向量数已达到训练阈值时立即训练
+        
+        Args:
+            index: 近似索引（如IVFIndex）
+        """
+        self.ann = index
+        self._maybe_train()
+    
+    def _maybe_train(self):
+        """向量数达到训练阈值，或已增长到上次训练时的4倍以上时（重新）训练近似索引"""
+        index = self.ann
+        if index is None or len(self) < index.min_train_size:
+            return
+        if not index.ready or len(self) > 4 * index.trained_size:
+            index.train(self)
+            self._index_trained()
+    
+    def _index_trained(self):
+        """近似索引训练完成后的回调（子类可用于持久化）"""
+    
+    # 行号与元数据
+    
+    def _reserve(self, needed: int):
+        capacity = max(self._capacity, 1)
+        if needed <= self._capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        self._resize_storage(capacity)
+        self._alive = np.concatenate([self._alive, np.zeros(capacity - len(self._alive), dtype=bool)])
+        for name, codes in self._codes.items():
+            self._codes[name] = np.concatenate([codes, np.zeros(capacity - len(codes), dtype=np.int32)])
+        self._capacity = capacity
+    
+    def _code(self, name: str, value: Any) -> int:
+        vocab = self._vocab[name]
+        code = vocab.get(value)
+        if code is None:
+            code = vocab[value] = len(vocab)
+        return code
+    
+    def _assign(self, doc_id: str, metadata: Optional[Dict[str, Any]], row: Optional[int] = None) -> int:
+        """登记文档的行号与元数据（新文档追加到末尾），返回行号"""
+        if row is None:
+            row = self._rows.get(doc_id)
+        if row is None:
+            row = len(self._ids)
+        if row == len(self._ids):
+            self._ids.append(doc_id)
+            self._metadata.append(metadata)
+        else:
+            self._ids[row] = doc_id
+            self._metadata[row] = metadata
+        self._rows[doc_id] = row
+        self._alive[row] = True
+        self.version += 1
+        for name in self.fields:
+            self._codes[name][row] = self._code(name, (metadata or {}).get(name))
+        return row
+    
+    def _release(self, doc_id: str) -> Optional[int]:
+        """将文档所在行标记为墓碑，返回行号"""
+        row = self._rows.pop(doc_id, None)
+        if row is not None:
+            self._alive[row] = False
+            self._ids[row] = None
+            self._metadata[row] = None
+            self.version += 1
+        return row
+    
+    def add(self, doc_id: str, vector: Sequence[float], metadata: Optional[Dict[str, Any]] = None):
+        """添加或覆盖一个向量"""
+        self.add_many([doc_id], [vector], [metadata])
+    
+    def add_many(self, doc_ids: Sequence[str], vectors: Union[np.ndarray, Sequence[Sequence[float]]],
+                 metadata: Optional[Sequence[Optional[Dict[str, Any]]]] = None) -> np.ndarray:
+        """
+        批量添加或覆盖向量（已存在的文档ID原位覆盖）
+        
+        Args:
+            doc_ids: 文档ID列表
+            vectors: 向量列表（会被归一化）
+            metadata: 元数据列表（可选）
+            
+        Returns:
+            各文档的行号
+        """
+        if not len(doc_ids):
+            return np.zeros(0, dtype=np.int64)
+        vectors = normalize_rows(np.asarray(vectors, dtype=np.float32).reshape(len(doc_ids), self.dimension))
+        metadata = metadata if metadata is not None else [None] * len(doc_ids)
+        self._reserve(len(self._ids) + len(set(doc_ids) - self._rows.keys()))
+        rows = np.array([self._assign(doc_id, meta) for doc_id, meta in zip(doc_ids, metadata)], dtype=np.int64)
+        self._write_vectors(rows, vectors)
+        if self.ann is not None:
+            if self.ann.ready:
+                self.ann.add(self, rows, vectors)
+            self._maybe_train()
+        return rows
+    
+    def delete(self, doc_id: str) -> bool:
+        """
+        删除向量（标记墓碑）
+        
+        Returns:
+            文档是否存在
+        """
+        if self._release(doc_id) is None:
+            return False
+        if len(self._ids) - len(self._rows) > max(len(self._rows), 1024):
+            self.compact()
+        return True
+    
+    def compact(self):
+        """移除墓碑行，释放多余容量"""
+        live = np.flatnonzero(self._alive[:len(self._ids)])
+        capacity = max(1024, 1 << int(len(live)).bit_length())
+        self._compact_storage(live, capacity)
+        if self.ann is not None:
+            self.ann.remap(live)
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:len(live)] = True
+        for name, codes in self._codes.items():
+            compacted = np.zeros(capacity, dtype=np.int32)
+            compacted[:len(live)] = codes[live]
+            self._codes[name] = compacted
+        self._alive = alive
+        self._capacity = capacity
+        self._ids = [self._ids[row] for row in live]
+        self._metadata = [self._metadata[row] for row in live]
+        self._rows = {doc_id: row for row, doc_id in enumerate(self._ids)}
+    
+    def get(self, doc_id: str) -> Optional[Tuple[np.ndarray, Optional[Dict[str, Any]]]]:
+        """
+        获取向量与元数据
+        
+        Returns:
+            (归一化向量, 元数据)，文档不存在时返回None
+        """
+        row = self._rows.get(doc_id)
+        if row is None:
+            return None
+        return np.array(self._read_vectors(np.array([row]))[0], dtype=np.float32), self._metadata[row]
+    
+    def metadata(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """获取元数据（不读取向量），文档不存在时返回None"""
+        row = self._rows.get(doc_id)
+        return None if row is None else self._metadata[row]
+    
+    def items(self) -> Iterator[Tuple[str, Optional[Dict[str, Any]]]]:
+        """遍历(文档ID, 元数据)"""
+        for doc_id, row in self._rows.items():
+            yield doc_id, self._metadata[row]
+    
+    def _mask(self, filters: Optional[Filters]) -> np.ndarray:
+        """按过滤条件计算参与检索的行"""
+        count = len(self._ids)
+        mask = self._alive[:count].copy()
+        for name, wanted in (filters or {}).items():
+            if name not in self._codes:
+                raise ValueError(f"字段 {name} 不支持过滤")
+            values = wanted if isinstance(wanted, (list, tuple, set, frozenset)) else [wanted]
+            codes = [self._vocab[name][value] for value in values if value in self._vocab[name]]
+            mask &= np.isin(self._codes[name][:count], codes)
+        return mask
+    
+    def search(self, query: Sequence[float], top_k: int = 5,
+               filters: Optional[Filters] = None) -> List[Tuple[str, float, Optional[Dict[str, Any]]]]:
+        """
+        检索余弦相似度最高的向量
+        
+        Args:
+            query: 查询向量
+            top_k: 返回数量
+            filters: 过滤条件，如 {"project_id": "P-1", "doc_type": ["task", "risk"]}
+            
+        Returns:
+            (文档ID, 相似度, 元数据) 列表，按相似度降序
+        """
+        count = len(self._ids)
+        if count == 0 or top_k <= 0:
+            return []
+        query = normalize_rows(np.asarray(query, dtype=np.float32))
+        candidates = self.ann.candidates(query) if self.ann is not None and self.ann.ready else None
+        restricted = bool(filters) or candidates is not None
+        if restricted:
+            # 近似索引的候选或过滤后的行较少时只为这些行计算相似度
+            mask = self._mask(filters)
+            rows = np.flatnonzero(mask) if candidates is None else candidates[mask[candidates]]
+            if len(rows) == 0:
+                return []
+            scores = self._score(query, rows) if len(rows) < count // 2 else self._score(query)[rows]
+        else:
+            rows = np.arange(count)
+            scores = self._score(query)
+            if len(self._rows) < count:
+                scores[~self._alive[:count]] = -np.inf
+        
+        top_k = min(top_k, len(rows) if restricted else len(self._rows))
+        top = top_positions(scores, top_k * self.candidates_per_hit)
+        if self.candidates_per_hit > 1:
+            top = top[np.isfinite(scores[top])]
+            refined = self._rescore(query, rows[top], scores[top])
+            order = top_positions(refined, top_k)
+            top, scores = top[order], refined[order]
+        else:
+            scores = scores[top]
+        return [(self._ids[row], float(score), self._metadata[row]) for row, score in zip(rows[top], scores)]
+    
+    def field_counts(self, name: str) -> Dict[Any, int]:
+        """统计过滤字段各取值的文档数量"""
+        count = len(self._ids)
+        codes = self._codes[name][:count][self._alive[:count]]
+        totals = np.bincount(codes, minlength=len(self._vocab[name]))
+        return {value: int(totals[code]) for value, code in self._vocab[name].items() if totals[code]}
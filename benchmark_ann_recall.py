@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测量IVF近似索引在不同nprobe下相对精确检索的召回率与耗时
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from app.utils.ann_index import IVFIndex, recall_benchmark
+from app.utils.vector_store import VectorStore
+
+
+def synthetic_store(count: int = 100000, dimension: int = 256, clusters: int = 1000):
+    """生成带簇结构的合成向量库及查询"""
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((clusters, dimension)).astype(np.float32)
+    store = VectorStore(dimension, initial_capacity=count)
+    for start in range(0, count, 10000):
+        size = min(10000, count - start)
+        vectors = centers[rng.integers(0, clusters, size)] + rng.standard_normal((size, dimension)).astype(np.float32)
+        store.add_many([f"doc_{i}" for i in range(start, start + size)], vectors)
+    queries = centers[rng.integers(0, clusters, 100)] + rng.standard_normal((100, dimension)).astype(np.float32)
+    return store, queries
+
+
+def main():
+    """优先使用RAG系统的向量库，向量数不足时使用合成数据"""
+    store, queries = None, None
+    try:
+        from app.services.rag_system import rag_system
+        if len(rag_system.vector_store) >= 1000:
+            store = rag_system.vector_store
+            queries = store.read_vectors(store.live_rows()[:100])
+            print(f"📦 使用RAG向量库: {len(store)} 个向量")
+    except Exception as e:
+        print(f"⚠️ 无法加载RAG向量库: {e}")
+    if store is None:
+        store, queries = synthetic_store()
+        print(f"📦 使用合成数据: {len(store)} 个向量，维度 {store.dimension}")
+    
+    if store.ann is None or not store.ann.ready:
+        store.attach_index(IVFIndex(min_train_size=1))
+    print(f"   IVF列表数: {len(store.ann.centroids)}")
+    print(f"{'nprobe':>8} {'recall@10':>10} {'avg_ms':>8}")
+    for row in recall_benchmark(store, queries, top_k=10):
+        label = "exact" if row["nprobe"] == 0 else row["nprobe"]
+        print(f"{label:>8} {row['recall']:>10.3f} {row['avg_ms']:>8.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+离线构建知识库索引：导入资料目录下的全部语料（源文件未变化的语料跳过解析，内容未变化的文本块直接复用已有向量）
+"""
+
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.rag_system import rag_system
+
+
+def main():
+    """构建并保存知识库索引"""
+    pmbok_dir = sys.argv[1] if len(sys.argv) > 1 else "PMBOK第七版中英文资料"
+    print(f"📚 构建知识库索引: {pmbok_dir}")
+    
+    start = time.time()
+    stats = rag_system.build_pmbok_index(pmbok_dir)
+    elapsed = time.time() - start
+    
+    print(f"✅ {stats['corpora']} 份语料（解析 {stats['parsed']} 份，跳过 {stats['skipped']} 份），共 {stats['chunks']} 个文本块")
+    print(f"   嵌入：复用 {stats['reused']} 个，新生成 {stats['embedded']} 个，失败 {stats['failed']} 个，耗时 {elapsed:.1f} 秒")
+    print(f"   索引目录: {rag_system.knowledge_base.path}")
+    return 0 if stats["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,6 +8,7 @@ import uvicorn
 import json
 import os
 from datetime import datetime
+import asyncio
 
 # 创建FastAPI应用
 app = FastAPI(
@@ -25,6 +26,22 @@ app.add_middleware(
     allow_headers=["*"],  # 允许所有头部
 )
 
+def _read_json_file(path: str):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def _write_json_file(path: str, data):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+async def load_json_file(path: str):
+    """在线程池中读取并解析JSON数据文件，避免大文件的读取与解析阻塞事件循环"""
+    return await asyncio.to_thread(_read_json_file, path)
+
+async def save_json_file(path: str, data):
+    """在线程池中序列化并写入JSON数据文件"""
+    await asyncio.to_thread(_write_json_file, path, data)
+
 @app.get("/")
 async def root():
     """根路径"""
@@ -45,15 +62,13 @@ async def health_check():
 @app.get("/api/v1/projects")
 async def get_projects():
     """获取项目列表（真实数据）"""
-    import json
     import os
     
     try:
         # 读取真实数据库文件
         db_path = "industry_standard_database_extended.json"
         if os.path.exists(db_path):
-            with open(db_path, 'r', encoding='utf-8') as f:
-                db_data = json.load(f)
+            db_data = await load_json_file(db_path)
             
             projects = db_data.get('projects', [])
             # 添加进度信息
@@ -95,15 +110,13 @@ async def get_projects():
 @app.get("/api/v1/tasks")
 async def get_tasks():
     """获取任务列表（真实数据）"""
-    import json
     import os
     
     try:
         # 读取真实数据库文件
         db_path = "industry_standard_database_extended.json"
         if os.path.exists(db_path):
-            with open(db_path, 'r', encoding='utf-8') as f:
-                db_data = json.load(f)
+            db_data = await load_json_file(db_path)
             
             tasks = db_data.get('tasks', [])
             # 添加进度信息
@@ -165,7 +178,6 @@ async def extract_tasks_from_meeting():
 @app.get("/api/v1/auto-reduce/progress-summary/daily/{project_id}")
 async def get_daily_progress_summary(project_id: str):
     """获取日报（真实数据）"""
-    import json
     import os
     from datetime import datetime
     
@@ -173,8 +185,7 @@ async def get_daily_progress_summary(project_id: str):
         # 读取真实数据库文件
         db_path = "industry_standard_database_extended.json"
         if os.path.exists(db_path):
-            with open(db_path, 'r', encoding='utf-8') as f:
-                db_data = json.load(f)
+            db_data = await load_json_file(db_path)
             
             # 查找项目信息
             project = None
@@ -242,15 +253,13 @@ async def get_daily_progress_summary(project_id: str):
 @app.get("/api/v1/auto-reduce/risk-monitoring/scan/{project_id}")
 async def scan_project_risks(project_id: str):
     """扫描项目风险（真实数据）"""
-    import json
     import os
     
     try:
         # 读取真实数据库文件
         db_path = "industry_standard_database_extended.json"
         if os.path.exists(db_path):
-            with open(db_path, 'r', encoding='utf-8') as f:
-                db_data = json.load(f)
+            db_data = await load_json_file(db_path)
             
             # 查找项目相关风险
             project_risks = [risk for risk in db_data.get('risks', []) 
@@ -367,8 +376,7 @@ async def chat_with_ai(request: dict):
         db_path = "industry_standard_database_extended.json"
         project_context = ""
         if os.path.exists(db_path):
-            with open(db_path, 'r', encoding='utf-8') as f:
-                db_data = json.load(f)
+            db_data = await load_json_file(db_path)
             project_context = json.dumps(db_data, ensure_ascii=False, indent=2)
         
         # 构建系统提示词
@@ -639,7 +647,6 @@ async def call_qwen_api_with_history(system_prompt: str, conversation_history: l
 
 async def data_agent(query_type: str, query_params: dict = None) -> dict:
     """数据获取Agent - 专门负责获取和计算数据"""
-    import json
     import os
     from datetime import datetime
     
@@ -653,8 +660,7 @@ async def data_agent(query_type: str, query_params: dict = None) -> dict:
                 "data_source": db_path
             }
             
-        with open(db_path, 'r', encoding='utf-8') as f:
-            db_data = json.load(f)
+        db_data = await load_json_file(db_path)
         
         # 根据查询类型获取数据
         if query_type == "project_progress":
@@ -1667,8 +1673,7 @@ async def get_knowledge_management_data(db_data: dict, query_params: dict = None
         
         # 加载知识管理数据库
         try:
-            with open("knowledge_management.json", "r", encoding="utf-8") as f:
-                knowledge_db = json.load(f)
+            knowledge_db = await load_json_file("knowledge_management.json")
         except FileNotFoundError:
             knowledge_db = {
                 "knowledge_database": {
@@ -1712,8 +1717,7 @@ async def get_knowledge_management_data(db_data: dict, query_params: dict = None
         knowledge_db["knowledge_statistics"]["last_updated"] = datetime.now().isoformat()
         
         # 保存知识管理数据库
-        with open("knowledge_management.json", "w", encoding="utf-8") as f:
-            json.dump(knowledge_db, f, ensure_ascii=False, indent=2)
+        await save_json_file("knowledge_management.json", knowledge_db)
         
         return {
             "success": True,
@@ -1814,7 +1818,6 @@ async def analyze_intent_and_call_api(user_message: str) -> dict:
 @app.get("/api/v1/auto-reduce/project-progress-calculation/{project_id}")
 async def get_project_progress_calculation(project_id: str):
     """获取项目进度详细计算过程"""
-    import json
     import os
     
     try:
@@ -1827,8 +1830,7 @@ async def get_project_progress_calculation(project_id: str):
                 "data": None
             }
         
-        with open(db_path, 'r', encoding='utf-8') as f:
-            db_data = json.load(f)
+        db_data = await load_json_file(db_path)
         
         # 查找项目
         project = None
@@ -1,6 +1,7 @@
 """
 第三阶段功能测试脚本
 """
+import asyncio
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -56,7 +57,7 @@ def test_qwen_agent():
         print(f"任务创建结果: {mock_task_response['message']}")
         
         # 测试会话管理
-        sessions = qwen_agent_service.get_user_sessions(test_user_id)
+        sessions = asyncio.run(qwen_agent_service.get_user_sessions(test_user_id))
         print(f"用户会话数量: {len(sessions)}")
         
         print("✅ 通义千问Agent服务测试通过")
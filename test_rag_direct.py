@@ -7,6 +7,7 @@
 import json
 import os
 import math
+import hashlib
 import dashscope
 from http import HTTPStatus
 from typing import List, Dict, Any, Optional
@@ -32,6 +33,7 @@ class SimpleRAGSystem:
         self.embedding_dim = 1024
         self.embedding_model = "text-embedding-v4"
         self.pmbok_documents = []
+        self._embedding_cache = {}  # 内容哈希 -> 文档块嵌入，每个文档块只生成一次
         print("RAG检索系统初始化完成，使用text-embedding-v4模型")
     
     def _generate_embedding(self, text: str) -> List[float]:
@@ -55,11 +57,18 @@ class SimpleRAGSystem:
             else:
                 print(f"DashScope API调用失败: {resp.message}")
                 return self._fallback_embedding(text)
-                
+        
         except Exception as e:
             print(f"生成文本嵌入时发生错误: {str(e)}")
             return self._fallback_embedding(text)
     
+    def _document_embedding(self, text: str) -> List[float]:
+        """文档块嵌入（按内容哈希缓存）"""
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        if digest not in self._embedding_cache:
+            self._embedding_cache[digest] = self._generate_embedding(text)
+        return self._embedding_cache[digest]
+    
     def _fallback_embedding(self, text: str) -> List[float]:
         """降级嵌入生成"""
         # 简化的字符频率向量化
@@ -148,7 +157,7 @@ class SimpleRAGSystem:
             
             print(f"成功加载{len(self.pmbok_documents)}个PMBOK文档块")
             return True
-            
+        
         except Exception as e:
             print(f"加载PMBOK文档失败: {str(e)}")
             return False
@@ -164,7 +173,7 @@ class SimpleRAGSystem:
             line = line.strip()
             if not line:
                 continue
-                
+            
             # 检测章节标题
             if line.startswith('# ') and len(line) > 2:
                 # 保存前一章节
@@ -222,7 +231,7 @@ class SimpleRAGSystem:
             # 计算相似度
             results = []
             for doc in self.pmbok_documents:
-                doc_embedding = self._generate_embedding(doc.content)
+                doc_embedding = self._document_embedding(doc.content)
                 similarity = self._cosine_similarity(query_embedding, doc_embedding)
                 
                 results.append({
@@ -237,7 +246,7 @@ class SimpleRAGSystem:
             results.sort(key=lambda x: x["similarity"], reverse=True)
             
             return results[:top_k]
-            
+        
         except Exception as e:
             print(f"搜索PMBOK知识库失败: {str(e)}")
             return []
@@ -266,7 +275,7 @@ class SimpleRAGSystem:
                             break
             
             return validated_pages
-            
+        
         except Exception as e:
             print(f"验证页码引用失败: {str(e)}")
             return claimed_pages
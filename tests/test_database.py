@@ -0,0 +1,945 @@
+"""
+JSON数据库存储层测试
+"""
+import json
+import pytest
+from app.utils.database import JSONDatabase
+from app.utils.sqlite_database import SQLiteDatabase
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """临时数据库文件路径"""
+    return tmp_path / "test_database.json"
+
+
+@pytest.fixture
+def db(db_path):
+    """写穿模式的临时数据库"""
+    database = JSONDatabase(str(db_path))
+    yield database
+    database.close()
+
+
+def _load_file(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+class TestResidentDatabase:
+    """常驻内存与组提交测试"""
+    
+    def test_write_through_persists_immediately(self, db, db_path):
+        """测试默认写穿模式立即落盘"""
+        db.create("tasks", {"task_id": "TASK-1", "project_id": "PRJ-1", "status": "进行中"})
+        
+        data = _load_file(db_path)
+        assert data["tasks"][0]["task_id"] == "TASK-1"
+        assert not db_path.with_name(f".{db_path.name}.tmp").exists()
+    
+    def test_reads_served_from_memory(self, db, db_path):
+        """测试读操作不再访问磁盘"""
+        db.create("tasks", {"task_id": "TASK-1", "project_id": "PRJ-1"})
+        db_path.write_text("{}", encoding='utf-8')
+        
+        assert db.read("tasks", "TASK-1")["project_id"] == "PRJ-1"
+        assert db.count("tasks") == 1
+    
+    def test_group_commit_defers_writes(self, db_path):
+        """测试组提交模式延迟落盘，flush后持久化"""
+        database = JSONDatabase(str(db_path), flush_interval=3600)
+        try:
+            database.create("tasks", {"task_id": "TASK-1"})
+            database.update("tasks", "TASK-1", {"status": "已完成"})
+            assert _load_file(db_path)["tasks"] == []
+            
+            assert database.flush() is True
+            assert _load_file(db_path)["tasks"][0]["status"] == "已完成"
+            assert database.flush() is False
+        finally:
+            database.close()
+    
+    def test_close_flushes_pending_writes(self, db_path):
+        """测试关闭时提交未落盘的修改"""
+        database = JSONDatabase(str(db_path), flush_interval=3600)
+        database.create("risks", {"risk_id": "RISK-1"})
+        database.close()
+        
+        reopened = JSONDatabase(str(db_path))
+        assert reopened.read("risks", "RISK-1") is not None
+        reopened.close()
+    
+    def test_read_returns_list_copy(self, db):
+        """测试读取整个集合返回副本"""
+        db.create("tasks", {"task_id": "TASK-1"})
+        tasks = db.read("tasks")
+        tasks.append({"task_id": "TASK-2"})
+        
+        assert db.count("tasks") == 1
+
+
+class TestIndexes:
+    """主键与二级索引测试"""
+    
+    def test_primary_key_lookup(self, db):
+        """测试按id或<集合>_id主键查找"""
+        db.create("tasks", {"task_id": "TASK-1", "project_id": "PRJ-1"})
+        db.create("tasks", {"id": "raw-2", "project_id": "PRJ-1"})
+        
+        assert db.read("tasks", "TASK-1")["project_id"] == "PRJ-1"
+        assert db.read("tasks", "raw-2") is not None
+        assert db.read("tasks", "missing") is None
+    
+    def test_secondary_index_follows_updates(self, db):
+        """测试二级索引随创建、更新、删除保持同步"""
+        db.create("tasks", {"task_id": "TASK-1", "project_id": "PRJ-1", "status": "进行中"})
+        db.create("tasks", {"task_id": "TASK-2", "project_id": "PRJ-1", "status": "待开始"})
+        db.create("tasks", {"task_id": "TASK-3", "project_id": "PRJ-2", "status": "进行中"})
+        
+        assert [t["task_id"] for t in db.get_by_field("tasks", "project_id", "PRJ-1")] == ["TASK-1", "TASK-2"]
+        
+        db.update("tasks", "TASK-2", {"project_id": "PRJ-2"})
+        assert [t["task_id"] for t in db.get_by_field("tasks", "project_id", "PRJ-1")] == ["TASK-1"]
+        assert db.count("tasks", {"project_id": "PRJ-2", "status": "待开始"}) == 1
+        
+        db.delete("tasks", "TASK-1")
+        assert db.get_by_field("tasks", "project_id", "PRJ-1") == []
+        assert db.read("tasks", "TASK-1") is None
+    
+    def test_import_and_clear_rebuild_indexes(self, db):
+        """测试导入与清空后索引一致"""
+        db.import_data("risks", [
+            {"risk_id": f"RISK-{i}", "project_id": "PRJ-1", "risk_level": "高" if i % 2 else "低"}
+            for i in range(10)
+        ])
+        assert db.count("risks", {"risk_level": "高"}) == 5
+        
+        db.import_data("risks", [{"risk_id": "RISK-X", "project_id": "PRJ-9"}], clear_existing=True)
+        assert db.get_by_field("risks", "project_id", "PRJ-1") == []
+        assert db.read("risks", "RISK-X") is not None
+    
+    def test_create_index_on_demand(self, db):
+        """测试运行时声明新的二级索引"""
+        db.create("tasks", {"task_id": "TASK-1", "priority": "高"})
+        db.create_index("tasks", "priority")
+        db.create("tasks", {"task_id": "TASK-2", "priority": "高"})
+        
+        assert len(db.get_by_field("tasks", "priority", "高")) == 2
+
+
+class TestJournal:
+    """变更日志（WAL）与合并测试"""
+    
+    def test_writes_append_journal_only(self, db_path):
+        """测试写操作只追加日志，不重写快照"""
+        database = JSONDatabase(str(db_path), journal=True)
+        try:
+            snapshot_before = db_path.read_bytes()
+            database.create("tasks", {"task_id": "TASK-1", "status": "进行中"})
+            database.update("tasks", "TASK-1", {"status": "已完成"})
+            
+            assert db_path.read_bytes() == snapshot_before
+            journal_lines = db_path.with_name(f"{db_path.name}.journal").read_text(encoding='utf-8').splitlines()
+            assert [json.loads(line)["op"] for line in journal_lines] == ["append", "put"]
+        finally:
+            database.close()
+    
+    def test_replay_after_crash(self, db_path):
+        """测试未合并的日志在重启时被重放"""
+        crashed = JSONDatabase(str(db_path), journal=True)
+        crashed.create("tasks", {"task_id": "TASK-1", "project_id": "PRJ-1"})
+        crashed.create("tasks", {"task_id": "TASK-2", "project_id": "PRJ-1"})
+        crashed.update("tasks", "TASK-1", {"status": "已完成"})
+        crashed.delete("tasks", "TASK-2")
+        
+        # 模拟崩溃：写入一条残缺记录且不调用close
+        with open(db_path.with_name(f"{db_path.name}.journal"), 'ab') as f:
+            f.write(b'{"seq": 99, "op": "app')
+        
+        recovered = JSONDatabase(str(db_path), journal=True)
+        try:
+            assert recovered.read("tasks", "TASK-1")["status"] == "已完成"
+            assert recovered.read("tasks", "TASK-2") is None
+            assert len(recovered.get_by_field("tasks", "project_id", "PRJ-1")) == 1
+        finally:
+            recovered.close()
+            crashed._closed.set()
+    
+    def test_compact_folds_journal_into_snapshot(self, db_path):
+        """测试合并后快照包含全部数据且日志被清空"""
+        database = JSONDatabase(str(db_path), journal=True)
+        try:
+            database.create("issues", {"issue_id": "ISSUE-1"})
+            assert database.compact() is True
+            
+            journal_path = db_path.with_name(f"{db_path.name}.journal")
+            assert journal_path.stat().st_size == 0
+            assert _load_file(db_path)["issues"][0]["issue_id"] == "ISSUE-1"
+            assert database.compact() is False
+        finally:
+            database.close()
+    
+    def test_replay_skips_records_already_in_snapshot(self, db_path):
+        """测试快照已包含的日志记录不会被重复应用"""
+        database = JSONDatabase(str(db_path), journal=True)
+        database.create("issues", {"issue_id": "ISSUE-1"})
+        journal_path = db_path.with_name(f"{db_path.name}.journal")
+        journal_copy = journal_path.read_bytes()
+        database.close()
+        
+        # 模拟合并时写完快照、清空日志前崩溃
+        journal_path.write_bytes(journal_copy)
+        reopened = JSONDatabase(str(db_path), journal=True)
+        try:
+            assert reopened.count("issues") == 1
+        finally:
+            reopened.close()
+
+
+class TestSQLiteDatabase:
+    """SQLite存储后端测试"""
+    
+    @pytest.fixture
+    def sqlite_db(self, tmp_path):
+        database = SQLiteDatabase(str(tmp_path / "test_database.sqlite3"))
+        yield database
+        database.close()
+    
+    def test_crud_contract(self, sqlite_db):
+        """测试与JSONDatabase一致的增删改查接口"""
+        item = {"task_id": "TASK-1", "project_id": "PRJ-1", "status": "进行中"}
+        created = sqlite_db.create("tasks", item)
+        sqlite_db.create("tasks", {"task_id": "TASK-2", "project_id": "PRJ-1", "status": "待开始"})
+        assert "created_at" in created and "created_at" not in item
+        
+        assert sqlite_db.read("tasks", "TASK-1")["status"] == "进行中"
+        assert len(sqlite_db.get_by_field("tasks", "project_id", "PRJ-1")) == 2
+        assert sqlite_db.count("tasks", {"status": "待开始"}) == 1
+        
+        updated = sqlite_db.update("tasks", "TASK-2", {"status": "已完成"})
+        assert updated["status"] == "已完成"
+        assert sqlite_db.read("tasks", filters={"status": "已完成"})[0]["task_id"] == "TASK-2"
+        
+        assert sqlite_db.delete("tasks", "TASK-1") is True
+        assert sqlite_db.read("tasks", "TASK-1") is None
+        assert sqlite_db.update("tasks", "missing", {}) is None
+    
+    def test_search_and_import(self, sqlite_db):
+        """测试搜索与批量导入"""
+        sqlite_db.import_data("projects", [
+            {"project_id": "PRJ-1", "project_name": "智慧园区建设"},
+            {"project_id": "PRJ-2", "project_name": "ERP Upgrade"},
+        ])
+        assert [p["project_id"] for p in sqlite_db.search("projects", "erp", ["project_name"])] == ["PRJ-2"]
+        assert [p["project_id"] for p in sqlite_db.search("projects", "upg", ["project_name"])] == ["PRJ-2"]
+        assert len(sqlite_db.search("projects", "园区")) == 1
+        
+        sqlite_db.import_data("projects", [{"project_id": "PRJ-3"}], clear_existing=True)
+        assert sqlite_db.count("projects") == 1
+    
+    def test_migrate_from_json(self, db, sqlite_db):
+        """测试从JSON数据库迁移"""
+        db.create("risks", {"risk_id": "RISK-1", "project_id": "PRJ-1"})
+        db.close()
+        
+        assert sqlite_db.migrate_from_json(str(db.db_path)) is True
+        assert sqlite_db.read("risks", "RISK-1")["project_id"] == "PRJ-1"
+        assert sqlite_db.read("project_metrics") == {}
+        assert "risks" in sqlite_db.get_collections()
+
+
+class TestTransactions:
+    """事务与批量写入测试"""
+    
+    def test_create_many_commits_once(self, db, monkeypatch):
+        """测试批量创建只落盘一次"""
+        writes = []
+        original_write = db._write_data
+        monkeypatch.setattr(db, "_write_data", lambda data, **metadata: (writes.append(1), original_write(data, **metadata)))
+        
+        created = db.create_many("tasks", [{"task_id": f"TASK-{i}", "project_id": "PRJ-1"} for i in range(200)])
+        
+        assert len(created) == 200
+        assert len(writes) == 1
+        assert len(db.get_by_field("tasks", "project_id", "PRJ-1")) == 200
+    
+    def test_transaction_groups_mixed_writes(self, db, db_path):
+        """测试事务内的多种写操作合并提交"""
+        db.create("tasks", {"task_id": "TASK-1", "status": "待开始"})
+        with db.transaction():
+            db.update("tasks", "TASK-1", {"status": "进行中"})
+            db.create("risks", {"risk_id": "RISK-1"})
+            assert _load_file(db_path)["tasks"][0]["status"] == "待开始"
+        
+        data = _load_file(db_path)
+        assert data["tasks"][0]["status"] == "进行中"
+        assert data["risks"][0]["risk_id"] == "RISK-1"
+    
+    def test_transaction_rollback(self, db, db_path):
+        """测试异常时回滚全部修改"""
+        db.create("tasks", {"task_id": "TASK-1", "project_id": "PRJ-1", "status": "待开始"})
+        db.create("tasks", {"task_id": "TASK-2", "project_id": "PRJ-1"})
+        
+        with pytest.raises(RuntimeError):
+            with db.transaction():
+                db.update("tasks", "TASK-1", {"status": "已完成", "project_id": "PRJ-2"})
+                db.delete("tasks", "TASK-2")
+                db.create_many("tasks", [{"task_id": "TASK-3", "project_id": "PRJ-1"}])
+                raise RuntimeError("boom")
+        
+        assert [t["task_id"] for t in db.read("tasks")] == ["TASK-1", "TASK-2"]
+        assert db.read("tasks", "TASK-1")["status"] == "待开始"
+        assert len(db.get_by_field("tasks", "project_id", "PRJ-1")) == 2
+        assert db.read("tasks", "TASK-3") is None
+    
+    def test_transaction_reads_own_writes(self, db):
+        """测试事务内的读操作看到本事务暂存的修改，其他线程在提交前看不到"""
+        import threading
+        db.create("tasks", {"task_id": "TASK-1", "project_id": "PRJ-1", "status": "待开始"})
+        outside = []
+        with db.transaction():
+            db.update("tasks", "TASK-1", {"status": "进行中"})
+            db.create("tasks", {"task_id": "TASK-2", "project_id": "PRJ-1", "status": "进行中"})
+            assert db.read("tasks", "TASK-1")["status"] == "进行中"
+            assert db.count("tasks", {"status": "进行中"}) == 2
+            assert [t["task_id"] for t in db.query("tasks", {"project_id": "PRJ-1"}, sort="task_id")] == ["TASK-1", "TASK-2"]
+            assert db.snapshot().collection("tasks")[0]["status"] == "待开始"
+            
+            reader = threading.Thread(target=lambda: outside.append(db.read("tasks", "TASK-2")))
+            reader.start()
+            reader.join()
+        assert outside == [None]
+        assert db.read("tasks", "TASK-2")["status"] == "进行中"
+    
+    def test_transaction_rollback_restores_dirty(self, db_path):
+        """测试回滚后脏标记恢复为事务开始前的状态，下次提交不再写回已回滚的集合"""
+        database = JSONDatabase(str(db_path), flush_interval=60)
+        try:
+            database.create("tasks", {"task_id": "TASK-1"})
+            with pytest.raises(RuntimeError):
+                with database.transaction():
+                    database.create("risks", {"risk_id": "RISK-1"})
+                    raise RuntimeError("boom")
+            assert database._dirty == {"tasks"}
+            assert database.flush()
+            assert database._revisions.get("risks") is None
+            
+            with pytest.raises(RuntimeError):
+                with database.transaction():
+                    database.create("risks", {"risk_id": "RISK-2"})
+                    raise RuntimeError("boom")
+            assert not database.flush()
+        finally:
+            database.close()
+    
+    def test_update_and_upsert_many(self, db):
+        """测试批量更新与按字段upsert"""
+        db.create_many("tasks", [{"task_id": "TASK-1"}, {"task_id": "TASK-2"}])
+        updated = db.update_many("tasks", {"TASK-1": {"status": "已完成"}, "missing": {"status": "x"}})
+        assert [t["task_id"] for t in updated] == ["TASK-1"]
+        
+        db.upsert_many("vector_embeddings", [{"doc_id": "d1", "v": 1}], key_field="doc_id")
+        db.upsert_many("vector_embeddings", [{"doc_id": "d1", "v": 2}, {"doc_id": "d2", "v": 3}], key_field="doc_id")
+        assert db.count("vector_embeddings") == 2
+        assert db.get_by_field("vector_embeddings", "doc_id", "d1")[0]["v"] == 2
+    
+    def test_journal_rollback_discards_records(self, db_path):
+        """测试回滚后变更日志不包含事务记录"""
+        database = JSONDatabase(str(db_path), journal=True)
+        with pytest.raises(ValueError):
+            with database.transaction():
+                database.create("tasks", {"task_id": "TASK-1"})
+                raise ValueError("boom")
+        database.upsert_many("tasks", [{"task_id": "TASK-2"}])
+        database._closed.set()
+        
+        reopened = JSONDatabase(str(db_path), journal=True)
+        try:
+            assert [t["task_id"] for t in reopened.read("tasks")] == ["TASK-2"]
+        finally:
+            reopened.close()
+    
+    def test_sqlite_transaction(self, tmp_path):
+        """测试SQLite后端的事务与批量接口"""
+        database = SQLiteDatabase(str(tmp_path / "tx.sqlite3"))
+        try:
+            items = [{"task_id": f"TASK-{i}"} for i in range(5)]
+            database.create_many("tasks", items)
+            assert items[0] == {"task_id": "TASK-0"}
+            with pytest.raises(RuntimeError):
+                with database.transaction():
+                    database.delete("tasks", "TASK-0")
+                    raise RuntimeError("boom")
+            assert database.count("tasks") == 5
+            
+            upserted = [{"task_id": "TASK-0", "status": "已完成"}, {"task_id": "TASK-9"}]
+            database.upsert_many("tasks", upserted)
+            assert upserted[1] == {"task_id": "TASK-9"}
+            assert database.read("tasks", "TASK-0")["status"] == "已完成"
+            assert database.count("tasks") == 6
+            
+            with pytest.raises(RuntimeError):
+                with database.transaction():
+                    database.create("widgets", {"widget_id": "W-1"})
+                    raise RuntimeError("boom")
+            assert database.read("widgets") == []
+            database.create("widgets", {"widget_id": "W-2"})
+            assert database.read("widgets", "W-2")["widget_id"] == "W-2"
+        finally:
+            database.close()
+
+
+class TestFullTextSearch:
+    """全文索引搜索测试"""
+    
+    @pytest.fixture
+    def search_db(self, db):
+        db.create_many("projects", [
+            {"project_id": "PRJ-1", "project_name": "ERP系统升级", "description": "财务模块 upgrade"},
+            {"project_id": "PRJ-2", "project_name": "项目管理平台", "description": "管理系统建设，管理流程优化"},
+            {"project_id": "PRJ-3", "project_name": "Data Platform", "description": "数据中台"},
+        ])
+        return db
+    
+    def test_tokenize(self):
+        """测试中文二元组与拉丁词分词"""
+        from app.utils.text_index import tokenize
+        assert tokenize("ERP系统升级 v2") == ["erp", "系统", "统升", "升级", "v2"]
+        assert tokenize("A项B") == ["a", "项", "b"]
+    
+    def test_cjk_and_latin_search(self, search_db):
+        """测试中文子串与拉丁整词搜索，最后一个拉丁查询词默认按前缀匹配"""
+        fields = ["project_name", "description"]
+        assert [p["project_id"] for p in search_db.search("projects", "系统", fields)] == ["PRJ-1", "PRJ-2"]
+        assert [p["project_id"] for p in search_db.search("projects", "台", fields)] == ["PRJ-2", "PRJ-3"]
+        assert [p["project_id"] for p in search_db.search("projects", "erp", fields)] == ["PRJ-1"]
+        assert [p["project_id"] for p in search_db.search("projects", "upgr", fields)] == ["PRJ-1"]
+        assert [p["project_id"] for p in search_db.search("projects", "财务 upgr", fields)] == ["PRJ-1"]
+        assert search_db.search("projects", "upgr 财务", fields) == []
+        assert [p["project_id"] for p in search_db.search("projects", "upgr* 财务", fields)] == ["PRJ-1"]
+    
+    def test_and_or_and_ranking(self, search_db):
+        """测试AND/OR组合与词频排序"""
+        fields = ["project_name", "description"]
+        assert [p["project_id"] for p in search_db.search("projects", "系统 财务", fields)] == ["PRJ-1"]
+        result = search_db.search("projects", "系统 财务", fields, mode="or")
+        assert {p["project_id"] for p in result} == {"PRJ-1", "PRJ-2"}
+        # PRJ-2中“管理”出现三次，排在前面
+        result = search_db.search("projects", "管理 数据", fields, mode="or")
+        assert [p["project_id"] for p in result] == ["PRJ-2", "PRJ-3"]
+        assert len(search_db.search("projects", "管理 数据", fields, mode="or", limit=1)) == 1
+    
+    def test_index_follows_writes(self, search_db):
+        """测试写操作后全文索引同步更新"""
+        fields = ["project_name"]
+        search_db.update("projects", "PRJ-3", {"project_name": "数据平台"})
+        assert search_db.search("projects", "data", fields) == []
+        assert [p["project_id"] for p in search_db.search("projects", "数据", fields)] == ["PRJ-3"]
+        search_db.delete("projects", "PRJ-1")
+        assert search_db.search("projects", "系统", fields) == []
+    
+    def test_expansion_follows_vocabulary(self, search_db):
+        """测试前缀查询与单字查询随词表增删更新"""
+        fields = ["project_name", "description"]
+        search_db.delete("projects", "PRJ-1")
+        assert search_db.search("projects", "upgr*", fields) == []
+        search_db.create("projects", {"project_id": "PRJ-4", "project_name": "Upgrade中台", "description": "升级"})
+        assert [p["project_id"] for p in search_db.search("projects", "upgr*", fields)] == ["PRJ-4"]
+        assert {p["project_id"] for p in search_db.search("projects", "台", fields)} == {"PRJ-2", "PRJ-3", "PRJ-4"}
+        assert [p["project_id"] for p in search_db.search("projects", "台 升级", fields)] == ["PRJ-4"]
+    
+    def test_indexed_matches_scan(self, search_db, tmp_path):
+        """测试索引查询与全表扫描结果一致"""
+        fields = ["project_name", "description"]
+        plain_db = JSONDatabase(str(tmp_path / "plain.json"), fulltext_indexes={})
+        plain_db.create_many("projects", [dict(p) for p in search_db.read("projects")])
+        for query in ["系统", "管理 优化", "data*", "升级 platform", "统"]:
+            for mode in ("and", "or"):
+                indexed = search_db.search("projects", query, fields, mode=mode)
+                scanned = plain_db.search("projects", query, fields, mode=mode)
+                assert [p["project_id"] for p in indexed] == [p["project_id"] for p in scanned]
+
+
+class TestQuery:
+    """条件查询测试"""
+    
+    @pytest.fixture
+    def tasks(self):
+        return [
+            {"task_id": f"TASK-{i}", "task_name": f"任务{i}", "project_id": f"PRJ-{i % 3}",
+             "status": ["待开始", "进行中", "已完成"][i % 3], "progress": i * 10,
+             "due_date": f"2024-01-{i + 1:02d}" if i != 4 else None}
+            for i in range(10)
+        ]
+    
+    def test_operators(self, db, tasks):
+        """测试$in、范围与$nin条件"""
+        db.create_many("tasks", tasks)
+        result = db.query("tasks", filters={"status": {"$in": ["待开始", "进行中"]}, "progress": {"$gte": 30}},
+                          sort="progress")
+        assert [t["task_id"] for t in result] == ["TASK-3", "TASK-4", "TASK-6", "TASK-7", "TASK-9"]
+        result = db.query("tasks", filters={"due_date": {"$gte": "2024-01-03", "$lt": "2024-01-07"}})
+        assert [t["task_id"] for t in result] == ["TASK-2", "TASK-3", "TASK-5"]
+        assert db.count("tasks", {"status": {"$nin": ["已完成"]}}) == 7
+        assert len(db.read("tasks", filters={"project_id": {"$in": ["PRJ-0", "PRJ-1"]}})) == 7
+    
+    def test_sort_and_paginate(self, db, tasks):
+        """测试多键排序、分页与总数"""
+        db.create_many("tasks", tasks)
+        result = db.query("tasks", sort="status,-progress", offset=2, limit=3)
+        assert result.total == 10
+        assert [t["task_id"] for t in result] == ["TASK-2", "TASK-9", "TASK-6"]
+        
+        # 空值排在最后
+        result = db.query("tasks", sort=[("due_date", "desc")])
+        assert result[0]["task_id"] == "TASK-9" and result[-1]["task_id"] == "TASK-4"
+        
+        full = db.query("tasks", sort="-due_date")
+        page = db.query("tasks", sort="-due_date", offset=4, limit=4)
+        assert list(page) == list(full[4:8])
+    
+    def test_projection_and_no_copy(self, db, tasks):
+        """测试字段投影，未投影时直接返回内存记录"""
+        db.create_many("tasks", tasks)
+        projected = db.query("tasks", filters={"project_id": "PRJ-1"}, fields=["task_id", "status"])
+        assert projected[0] == {"task_id": "TASK-1", "status": "进行中"}
+        
+        record = db.query("tasks", filters={"task_id": "TASK-1"})[0]
+        assert record is db.read("tasks", "TASK-1")
+    
+    def test_search_with_filters(self, db):
+        """测试搜索与过滤条件组合"""
+        db.create_many("projects", [
+            {"project_id": "PRJ-1", "project_name": "ERP升级", "status": "进行中"},
+            {"project_id": "PRJ-2", "project_name": "ERP运维", "status": "已完成"},
+        ])
+        result = db.query("projects", filters={"status": "进行中"}, search="erp", search_fields=["project_name"])
+        assert [p["project_id"] for p in result] == ["PRJ-1"]
+        assert result.total == 1
+    
+    def test_sqlite_parity(self, db, tasks, tmp_path):
+        """测试SQLite后端的查询结果与JSON后端一致"""
+        database = SQLiteDatabase(str(tmp_path / "query.sqlite3"))
+        try:
+            db.create_many("tasks", tasks)
+            database.create_many("tasks", tasks)
+            for kwargs in [
+                {"filters": {"status": {"$in": ["待开始", "已完成"]}}, "sort": "-progress", "limit": 3},
+                {"filters": {"due_date": {"$lte": "2024-01-05"}, "project_id": "PRJ-1"}, "sort": "task_id"},
+                {"sort": "project_id,due_date", "offset": 5},
+            ]:
+                expected = db.query("tasks", **kwargs)
+                actual = database.query("tasks", **kwargs)
+                assert [t["task_id"] for t in actual] == [t["task_id"] for t in expected]
+                assert actual.total == expected.total
+        finally:
+            database.close()
+
+
+class TestSnapshots:
+    """多版本快照测试"""
+    
+    def test_records_are_read_only(self, db):
+        """测试返回的记录不可原地修改"""
+        import copy
+        created = db.create("tasks", {"task_id": "TASK-1", "status": "待开始"})
+        with pytest.raises(TypeError):
+            created["status"] = "已完成"
+        with pytest.raises(TypeError):
+            db.read("tasks", "TASK-1").update({"status": "已完成"})
+        assert db.read("tasks", "TASK-1")["status"] == "待开始"
+        assert copy.deepcopy(created) == created
+        assert json.loads(json.dumps(created))["task_id"] == "TASK-1"
+    
+    def test_versions(self, db):
+        """测试数据版本单调递增，集合版本只在该集合修改时变化"""
+        start = db.version
+        db.create("tasks", {"task_id": "TASK-1"})
+        tasks_version = db.get_version("tasks")
+        assert db.version == tasks_version > start
+        assert db.read("tasks").version == db.version
+        
+        db.create("risks", {"risk_id": "RISK-1"})
+        assert db.version > tasks_version
+        assert db.get_version("tasks") == tasks_version
+        assert db.query("risks").version == db.version
+    
+    def test_old_snapshot_is_stable(self, db):
+        """测试旧快照不受后续写操作影响"""
+        db.create("tasks", {"task_id": "TASK-1", "status": "待开始"})
+        snapshot = db.snapshot()
+        db.update("tasks", "TASK-1", {"status": "已完成"})
+        db.create("tasks", {"task_id": "TASK-2"})
+        
+        assert snapshot.index("tasks").get("TASK-1")["status"] == "待开始"
+        assert len(snapshot.collection("tasks")) == 1
+        assert db.read("tasks", "TASK-1")["status"] == "已完成"
+        assert db.count("tasks", {"status": "待开始"}) == 0
+    
+    def test_readers_do_not_block_on_transaction(self, db):
+        """测试事务未提交时其他线程无需等待即可读到旧版本"""
+        import threading
+        db.create("tasks", {"task_id": "TASK-1"})
+        seen = []
+        with db.transaction():
+            db.create("tasks", {"task_id": "TASK-2"})
+            reader = threading.Thread(target=lambda: seen.append(db.count("tasks")))
+            reader.start()
+            reader.join(timeout=5)
+            assert not reader.is_alive()
+        assert seen == [1]
+        assert db.count("tasks") == 2
+
+
+class TestCodecs:
+    """快照文件序列化格式测试"""
+    
+    def test_compact_json_by_default(self, db, db_path):
+        """测试默认写入紧凑JSON，且可读取旧版缩进格式的文件"""
+        db.create("tasks", {"task_id": "TASK-1", "task_name": "需求分析"})
+        raw = db_path.read_text(encoding="utf-8")
+        assert "\n" not in raw.strip()
+        assert "需求分析" in raw
+        
+        data = _load_file(db_path)
+        db_path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+        db.reload()
+        assert db.read("tasks", "TASK-1")["task_name"] == "需求分析"
+    
+    def test_msgpack_round_trip_and_detection(self, db_path):
+        """测试MessagePack格式的写入与自动识别"""
+        pytest.importorskip("msgpack")
+        database = JSONDatabase(str(db_path), codec="msgpack")
+        database.create("tasks", {"task_id": "TASK-1", "progress": 0.5})
+        database.close()
+        assert db_path.read_bytes().startswith(b"PMDB")
+        
+        # 以默认格式打开时自动识别，下次写入转换为紧凑JSON
+        reopened = JSONDatabase(str(db_path))
+        try:
+            assert reopened.read("tasks", "TASK-1")["progress"] == 0.5
+            reopened.create("tasks", {"task_id": "TASK-2"})
+            assert len(_load_file(db_path)["tasks"]) == 2
+        finally:
+            reopened.close()
+    
+    def test_backup_and_convert(self, db, db_path, tmp_path):
+        """测试按指定格式备份以及格式转换命令"""
+        from app.utils.database import main, read_database_file
+        db.create("tasks", {"task_id": "TASK-1"})
+        backup = db.backup(str(tmp_path / "backup.json"), codec="json-pretty")
+        assert "\n" in (tmp_path / "backup.json").read_text(encoding="utf-8")
+        assert db.restore(backup)
+        assert db.read("tasks", "TASK-1") is not None
+        
+        target = tmp_path / "converted.json"
+        assert main([backup, str(target), "--format", "json"]) == 0
+        assert read_database_file(target)["tasks"] == read_database_file(backup)["tasks"]
+
+
+class TestMultiProcess:
+    """多进程模式测试（两个实例模拟两个worker进程）"""
+    
+    @pytest.fixture(params=[False, True], ids=["snapshot", "journal"])
+    def workers(self, db_path, request):
+        first = JSONDatabase(str(db_path), multiprocess=True, journal=request.param)
+        second = JSONDatabase(str(db_path), multiprocess=True, journal=request.param)
+        yield first, second
+        first.close()
+        second.close()
+    
+    def test_writers_do_not_clobber(self, workers, db_path):
+        """测试两个进程交替写入时互不覆盖"""
+        first, second = workers
+        for i in range(5):
+            first.create("tasks", {"task_id": f"A-{i}"})
+            second.create("tasks", {"task_id": f"B-{i}"})
+        with second.transaction():
+            second.update("tasks", "A-0", {"status": "已完成"})
+        
+        assert first.count("tasks") == second.count("tasks") == 10
+        assert first.read("tasks", "A-0")["status"] == "已完成"
+        first.close()
+        second.close()
+        reopened = JSONDatabase(str(db_path))
+        try:
+            assert reopened.count("tasks") == 10
+        finally:
+            reopened.close()
+    
+    def test_reload_only_changed_collections(self, workers):
+        """测试只重新加载其他进程修改过的集合"""
+        first, second = workers
+        first.create("tasks", {"task_id": "TASK-1"})
+        first.create("risks", {"risk_id": "RISK-1"})
+        assert second.read("risks", "RISK-1") is not None
+        risks_index = second.snapshot().index("risks")
+        
+        first.update("tasks", "TASK-1", {"status": "进行中"})
+        assert second.read("tasks", "TASK-1")["status"] == "进行中"
+        assert second.snapshot().index("risks") is risks_index
+    
+    def test_compaction_by_other_process(self, db_path):
+        """测试其他进程合并日志后仍能同步"""
+        first = JSONDatabase(str(db_path), multiprocess=True, journal=True)
+        second = JSONDatabase(str(db_path), multiprocess=True, journal=True)
+        try:
+            first.create("tasks", {"task_id": "TASK-1"})
+            assert second.count("tasks") == 1
+            first.create("tasks", {"task_id": "TASK-2"})
+            first.compact()
+            first.create("tasks", {"task_id": "TASK-3"})
+            assert [t["task_id"] for t in second.read("tasks")] == ["TASK-1", "TASK-2", "TASK-3"]
+        finally:
+            first.close()
+            second.close()
+
+
+class TestStreaming:
+    """流式导入导出测试"""
+    
+    @staticmethod
+    def _generate(count):
+        for i in range(count):
+            yield {"task_id": f"TASK-{i}", "project_id": f"PRJ-{i % 3}"}
+    
+    def test_import_stream_in_chunks(self, db, monkeypatch):
+        """测试按块提交、报告进度，且写穿模式下不会每块都重写快照"""
+        writes = []
+        original_write = db._write_data
+        monkeypatch.setattr(db, "_write_data",
+                            lambda data, **metadata: (writes.append(1), original_write(data, **metadata)))
+        progress = []
+        
+        imported = db.import_stream("tasks", self._generate(2500), chunk_size=1000, progress=progress.append)
+        
+        assert imported == 2500
+        assert progress == [1000, 2000, 2500]
+        assert len(writes) == 1
+        assert db.count("tasks", {"project_id": "PRJ-1"}) == 833
+        assert _load_file(db.db_path)["tasks"][-1]["task_id"] == "TASK-2499"
+    
+    def test_export_and_reimport_jsonl(self, db, tmp_path):
+        """测试导出JSONL后再从文件流式导入"""
+        db.import_stream("tasks", self._generate(30))
+        output = db.export_jsonl("tasks", str(tmp_path / "tasks.jsonl"), filters={"project_id": "PRJ-0"})
+        lines = (tmp_path / "tasks.jsonl").read_text(encoding="utf-8").splitlines()
+        assert len(lines) == 10
+        assert json.loads(lines[0])["task_id"] == "TASK-0"
+        
+        assert db.import_stream("archived_tasks", output, chunk_size=4) == 10
+        assert db.import_stream("archived_tasks", output, clear_existing=True) == 10
+        assert db.count("archived_tasks") == 10
+    
+    def test_sqlite_streaming(self, tmp_path):
+        """测试SQLite后端的流式导入导出"""
+        database = SQLiteDatabase(str(tmp_path / "stream.sqlite3"))
+        try:
+            progress = []
+            assert database.import_stream("tasks", self._generate(25), chunk_size=10, progress=progress.append) == 25
+            assert progress == [10, 20, 25]
+            lines = list(database.export_stream("tasks", {"project_id": "PRJ-2"}))
+            assert [json.loads(line)["task_id"] for line in lines] == [f"TASK-{i}" for i in range(2, 25, 3)]
+        finally:
+            database.close()
+
+
+class TestIncrementalBackup:
+    """增量备份测试"""
+    
+    @pytest.fixture
+    def store(self, tmp_path):
+        from app.utils.backup import IncrementalBackupStore
+        return IncrementalBackupStore(tmp_path / "backups")
+    
+    def test_only_changed_collections_are_written(self, db, store):
+        """测试第二次备份只写入变化的集合"""
+        db.create("tasks", {"task_id": "TASK-1"})
+        db.create("risks", {"risk_id": "RISK-1"})
+        first = store.create_backup(db)
+        assert first["bytes_written"] > 0
+        
+        db.update("tasks", "TASK-1", {"status": "已完成"})
+        second = store.create_backup(db)
+        assert second["changed"] == ["tasks"]
+        assert second["parent"] == first["backup_id"]
+        assert second["collections"]["risks"] == first["collections"]["risks"]
+        assert store.create_backup(db)["bytes_written"] == 0
+    
+    def test_point_in_time_restore(self, db, store):
+        """测试按备份ID与时间点恢复"""
+        from datetime import datetime
+        db.create("tasks", {"task_id": "TASK-1", "status": "待开始"})
+        first = store.create_backup(db)
+        moment = datetime.now()
+        db.update("tasks", "TASK-1", {"status": "已完成"})
+        db.create("tasks", {"task_id": "TASK-2"})
+        store.create_backup(db)
+        
+        restored = store.restore(db, at=moment)
+        assert restored["backup_id"] == first["backup_id"]
+        assert db.count("tasks") == 1
+        assert db.read("tasks", "TASK-1")["status"] == "待开始"
+        
+        store.restore(db)
+        assert db.count("tasks") == 2
+        assert [b["backup_id"] for b in store.list_backups()][0] == first["backup_id"]
+    
+    def test_integrity_checks(self, db, store):
+        """测试损坏的备份对象被发现且不会被恢复"""
+        from app.utils.backup import BackupIntegrityError
+        db.create("tasks", {"task_id": "TASK-1"})
+        manifest = store.create_backup(db)
+        assert store.verify_backup(manifest["backup_id"]) == []
+        
+        digest = manifest["collections"]["tasks"]["hash"]
+        (store.objects_dir / digest[:2] / digest).write_bytes(b"corrupted")
+        assert store.verify_backup(manifest["backup_id"])
+        db.create("tasks", {"task_id": "TASK-2"})
+        with pytest.raises(BackupIntegrityError):
+            store.restore(db, manifest["backup_id"])
+        assert db.count("tasks") == 2
+
+
+class TestChangeFeed:
+    """数据变更流测试"""
+    
+    def test_events_follow_mutations(self, db):
+        """测试增删改按顺序发布事件，携带变更前后的记录与数据版本"""
+        events = []
+        db.changes.subscribe(events.append, collections=["tasks"])
+        db.create("tasks", {"task_id": "TASK-1", "status": "待开始"})
+        db.update("tasks", "TASK-1", {"status": "已完成"})
+        db.create("risks", {"risk_id": "RISK-1"})
+        db.delete("tasks", "TASK-1")
+        
+        assert [(e.op, e.key) for e in events] == [("create", "TASK-1"), ("update", "TASK-1"), ("delete", "TASK-1")]
+        assert events[1].before["status"] == "待开始" and events[1].after["status"] == "已完成"
+        assert events[2].after is None and events[2].get("status") == "已完成"
+        assert events[0].version < events[1].version < events[2].version
+    
+    def test_rollback_emits_nothing(self, db):
+        """测试事务提交时一次性发布，回滚的修改不发布"""
+        events = []
+        db.changes.subscribe(events.append)
+        with pytest.raises(RuntimeError):
+            with db.transaction():
+                db.create("tasks", {"task_id": "TASK-1"})
+                raise RuntimeError("abort")
+        assert events == []
+        
+        with db.transaction():
+            db.create("tasks", {"task_id": "TASK-1"})
+            db.create("tasks", {"task_id": "TASK-2"})
+            assert events == []
+        assert [e.key for e in events] == ["TASK-1", "TASK-2"]
+        assert events[0].version == events[1].version
+    
+    def test_batch_subscriber(self, db):
+        """测试批量订阅每次提交只回调一次"""
+        batches = []
+        db.changes.subscribe_batch(batches.append, collections=["tasks"])
+        
+        db.create_many("tasks", [{"task_id": f"TASK-{i}", "project_id": "PRJ-1"} for i in range(50)])
+        db.create("risks", {"risk_id": "RISK-1", "project_id": "PRJ-3"})
+        assert [len(batch) for batch in batches] == [50]
+        assert {event.key for event in batches[0]} == {f"TASK-{i}" for i in range(50)}
+    
+    def test_cursor_replay(self, db):
+        """测试游标从任意位置重放事件，落后于缓冲区时报告缺口"""
+        from app.utils.change_feed import ChangeFeed, ChangeFeedGap
+        cursor = db.changes.cursor()
+        db.create("tasks", {"task_id": "TASK-1"})
+        db.import_data("tasks", [{"task_id": "TASK-2"}], clear_existing=True)
+        assert [(e.op, e.key) for e in cursor.poll()] == [("create", "TASK-1"), ("replace", None)]
+        assert cursor.poll() == []
+        assert [e.key for e in db.changes.events_since(0, collections=["tasks"])] == ["TASK-1", None]
+        
+        feed = ChangeFeed(capacity=2)
+        lagging = feed.cursor()
+        feed.publish([("create", "tasks", i, None, {"task_id": i}) for i in range(3)])
+        with pytest.raises(ChangeFeedGap):
+            lagging.poll()
+    
+    def test_async_subscriber(self, db):
+        """测试异步订阅者在事件循环中按顺序收到事件"""
+        import asyncio
+        
+        async def scenario():
+            received = []
+            
+            async def handler(event):
+                received.append(event.key)
+            
+            subscription = db.changes.subscribe_async(handler, collections=["tasks"])
+            await asyncio.to_thread(db.create, "tasks", {"task_id": "TASK-1"})
+            db.create("tasks", {"task_id": "TASK-2"})
+            for _ in range(50):
+                if len(received) == 2:
+                    break
+                await asyncio.sleep(0.01)
+            subscription.close()
+            return received
+        
+        assert asyncio.run(scenario()) == ["TASK-1", "TASK-2"]
+    
+    def test_sqlite_events_after_commit(self, tmp_path):
+        """测试SQLite后端同样在提交后发布事件"""
+        database = SQLiteDatabase(str(tmp_path / "test_database.sqlite3"))
+        try:
+            events = []
+            database.changes.subscribe(events.append)
+            database.create("tasks", {"task_id": "TASK-1"})
+            with pytest.raises(RuntimeError):
+                with database.transaction():
+                    database.update("tasks", "TASK-1", {"status": "已完成"})
+                    raise RuntimeError("abort")
+            database.update_many("tasks", {"TASK-1": {"status": "进行中"}})
+            assert [(e.op, e.key) for e in events] == [("create", "TASK-1"), ("update", "TASK-1")]
+            assert "status" not in events[1].before and events[1].after["status"] == "进行中"
+        finally:
+            database.close()
+
+
+class TestAsyncDatabase:
+    """异步外观测试"""
+    
+    def test_writes_run_in_io_pool(self, db):
+        """测试写操作在I/O线程池中执行，单进程JSON数据库的读操作直接执行"""
+        import asyncio
+        import threading
+        from app.utils.async_database import AsyncDatabase
+        
+        async_db = AsyncDatabase(db, max_workers=2)
+        threads = []
+        db.changes.subscribe(lambda event: threads.append(threading.current_thread().name))
+        
+        async def scenario():
+            await asyncio.gather(*(async_db.create("tasks", {"task_id": f"TASK-{i}", "project_id": "PRJ-1"})
+                                   for i in range(5)))
+            await async_db.update("tasks", "TASK-1", {"status": "已完成"})
+            return (await async_db.read("tasks", "TASK-1"), await async_db.count("tasks"),
+                    await async_db.get_by_field("tasks", "project_id", "PRJ-1"))
+        
+        try:
+            record, total, by_project = asyncio.run(scenario())
+        finally:
+            async_db.close()
+        assert async_db.inline_reads
+        assert record["status"] == "已完成" and total == 5 and len(by_project) == 5
+        assert threads and all(name.startswith("database-io") for name in threads)
+    
+    def test_sqlite_reads_use_pool(self, tmp_path):
+        """测试SQLite后端的读操作同样在线程池中执行"""
+        import asyncio
+        from app.utils.async_database import AsyncDatabase
+        
+        database = SQLiteDatabase(str(tmp_path / "test_database.sqlite3"))
+        async_db = AsyncDatabase(database)
+        try:
+            assert not async_db.inline_reads
+            asyncio.run(async_db.create("tasks", {"task_id": "TASK-1"}))
+            assert asyncio.run(async_db.read("tasks", "TASK-1"))["task_id"] == "TASK-1"
+        finally:
+            async_db.close()
+            database.close()
@@ -385,6 +385,26 @@ class TestScalability:
         # 验证平均索引时间在可接受范围内
         assert average_time < 1.0  # 平均每个索引操作应在1秒内完成
         assert total_time < 25.0  # 总时间应在25秒内完成
+    
+    def test_ivf_index_recall(self):
+        """测试IVF近似检索相对精确检索的召回率与耗时"""
+        import numpy as np
+        from app.utils.ann_index import IVFIndex, recall_benchmark
+        from app.utils.vector_store import VectorStore
+        
+        rng = np.random.default_rng(0)
+        centers = rng.standard_normal((200, 64)).astype(np.float32)
+        vectors = centers[rng.integers(0, 200, 20000)] + 0.5 * rng.standard_normal((20000, 64)).astype(np.float32)
+        queries = centers[rng.integers(0, 200, 50)] + 0.5 * rng.standard_normal((50, 64)).astype(np.float32)
+        
+        store = VectorStore(64)
+        store.add_many([f"doc_{i}" for i in range(len(vectors))], vectors)
+        store.attach_index(IVFIndex(min_train_size=1000))
+        results = {row["nprobe"]: row for row in recall_benchmark(store, queries, top_k=10, nprobes=(8, 200))}
+        
+        assert results[8]["recall"] >= 0.9
+        assert results[8]["avg_ms"] < results[0]["avg_ms"]
+        assert results[200]["recall"] == 1.0  # 扫描全部列表时与精确检索一致
 
 
 class TestStressTest:
@@ -2,6 +2,7 @@
 服务层测试
 """
 import pytest
+from datetime import datetime
 from unittest.mock import Mock, patch, AsyncMock
 from app.services.project_service import project_service
 from app.services.task_service import task_service
@@ -215,6 +216,156 @@ class TestIntelligentProgressSummaryService:
         assert response.json()["data"]["project_id"] == test_project_id
 
 
+class TestProjectAggregateService:
+    """项目聚合统计服务测试"""
+    
+    @pytest.fixture
+    def aggregates(self, tmp_path):
+        from app.utils.database import JSONDatabase
+        from app.services.project_aggregates import ProjectAggregateService
+        db = JSONDatabase(str(tmp_path / "aggregates.json"))
+        yield ProjectAggregateService(db)
+        db.close()
+    
+    def test_incremental_updates_match_full_scan(self, aggregates):
+        """测试增量维护的统计与全量扫描结果一致"""
+        db = aggregates.db
+        db.create("tasks", {"task_id": "T-1", "project_id": "P-1", "status": "待开始",
+                            "due_date": "2000-01-01", "progress_percentage": 0})
+        assert aggregates.task_statistics("P-1")["overdue"] == 1
+        
+        db.create("tasks", {"task_id": "T-2", "project_id": "P-1", "status": "进行中", "progress_percentage": 50})
+        db.update("tasks", "T-1", {"status": "已完成", "progress_percentage": 100})
+        db.create("risks", {"risk_id": "R-1", "project_id": "P-1", "risk_level": "严重"})
+        db.create("issues", {"issue_id": "I-1", "project_id": "P-1", "status": "已解决"})
+        db.create("issues", {"issue_id": "I-2", "project_id": "P-1", "status": "处理中"})
+        db.delete("issues", "I-1")
+        
+        incremental = (aggregates.task_statistics("P-1"), aggregates.risk_statistics("P-1"),
+                       aggregates.issue_statistics("P-1"))
+        assert incremental[0]["completed"] == 1 and incremental[0]["overdue"] == 0
+        assert incremental[0]["progress_percentage"] == 75.0
+        assert incremental[1]["high"] == 1
+        assert incremental[2] == {"total": 1, "open": 1, "resolved": 0}
+        
+        aggregates.rebuild()
+        assert (aggregates.task_statistics("P-1"), aggregates.risk_statistics("P-1"),
+                aggregates.issue_statistics("P-1")) == incremental
+    
+    def test_collection_replace_triggers_rebuild(self, aggregates):
+        """测试集合被整体替换后重新扫描"""
+        db = aggregates.db
+        db.create("tasks", {"task_id": "T-1", "project_id": "P-1", "status": "待开始"})
+        assert aggregates.task_statistics("P-1")["total"] == 1
+        
+        db.import_data("tasks", [{"task_id": "T-2", "project_id": "P-2", "status": "待开始"}], clear_existing=True)
+        assert aggregates.task_statistics("P-1")["total"] == 0
+        assert aggregates.task_statistics("P-2")["pending"] == 1
+    
+    
+    def test_cache_invalidated_once_per_batch(self, tmp_path):
+        """测试缓存失效按提交批次合并，只清除受影响项目的缓存"""
+        from app.utils.database import JSONDatabase
+        from app.services.cache_service import cache_service, invalidate_on_changes
+        db = JSONDatabase(str(tmp_path / "cache.json"))
+        db.changes.subscribe_batch(invalidate_on_changes)
+        cache_service.clear()
+        cache_service.set("project_PRJ-1_summary", 1)
+        cache_service.set("project_PRJ-2_summary", 2)
+        
+        with patch.object(cache_service, "delete", wraps=cache_service.delete) as delete:
+            db.create_many("tasks", [{"task_id": f"TASK-{i}", "project_id": "PRJ-1"} for i in range(50)])
+            assert delete.call_count == 1
+            db.create("risks", {"risk_id": "RISK-1", "project_id": "PRJ-3"})
+            assert delete.call_count == 1
+        assert cache_service.get("project_PRJ-1_summary") is None
+        assert cache_service.get("project_PRJ-2_summary") == 2
+        cache_service.clear()
+        db.close()
+
+class TestMetricHistoryService:
+    """项目指标历史服务测试"""
+    
+    @pytest.fixture
+    def history(self, tmp_path):
+        from app.utils.database import JSONDatabase
+        from app.services.project_aggregates import ProjectAggregateService
+        from app.services.metric_history import MetricHistoryService
+        db = JSONDatabase(str(tmp_path / "history.json"))
+        service = MetricHistoryService(db, tmp_path / "history.bin", aggregates=ProjectAggregateService(db),
+                                       min_interval=0, background=False)
+        yield service
+        service.close()
+        db.close()
+    
+    def test_mutations_are_sampled(self, history):
+        """测试数据变更后记录项目指标"""
+        db = history.db
+        db.create("projects", {"project_id": "P-1", "budget": 1000, "actual_cost": 250, "progress_percentage": 10})
+        db.create("tasks", {"task_id": "T-1", "project_id": "P-1", "status": "已完成"})
+        db.create("tasks", {"task_id": "T-2", "project_id": "P-1", "status": "进行中"})
+        db.create("risks", {"risk_id": "R-1", "project_id": "P-1", "risk_level": "高"})
+        
+        points = history.series("P-1", "completion_rate", resolution="raw")
+        assert [value for _, value in points] == [0.0, 100.0, 50.0, 50.0]
+        assert history.series("P-1", "budget_utilization")[-1][1] == 25.0
+        assert history.value_at("P-1", "high_risks", datetime.now()) == 1
+        assert history.previous_value("P-1", "high_risks", 30, default=-1) == 0
+        assert history.previous_value("P-2", "high_risks", 30, default=-1) == -1
+    
+    def test_rollups_persistence_and_compaction(self, history, tmp_path):
+        """测试日/周汇总、重启后重放与降采样重写"""
+        from app.services.metric_history import MetricHistoryService
+        start = datetime(2024, 1, 1, 9).timestamp()  # 周一
+        for day in range(14):
+            for hour in range(3):
+                history._append("P-1", start + day * 86400 + hour * 3600, (day * 10 + hour, 0, 0, 0, 0))
+        
+        daily = history.series("P-1", "completion_rate")
+        assert len(daily) == 14 and daily[0][1] == 2 and daily[-1][1] == 132
+        assert [value for _, value in history.series("P-1", "completion_rate", resolution="weekly")] == [62, 132]
+        assert history.value_at("P-1", "completion_rate", datetime(2024, 1, 12, 10, 30)) == 111
+        
+        history.flush()
+        size = history.path.stat().st_size
+        history.compact()
+        assert history.path.stat().st_size < size
+        
+        reloaded = MetricHistoryService(history.db, history.path, aggregates=history.aggregates, background=False)
+        try:
+            assert reloaded.series("P-1", "completion_rate") == daily
+            assert reloaded.series("P-1", "completion_rate", resolution="raw") == []
+        finally:
+            reloaded.close()
+    
+    def test_samples_buffered_and_log_shared(self, history):
+        """测试变更流回调只写缓冲区，多个实例共用日志时重写合并彼此的采样"""
+        from app.services.metric_history import MetricHistoryService
+        db = history.db
+        other = MetricHistoryService(db, history.path, aggregates=history.aggregates, min_interval=0, background=False)
+        try:
+            db.create("tasks", {"task_id": "T-1", "project_id": "P-1", "status": "已完成"})
+            db.create("tasks", {"task_id": "T-2", "project_id": "P-2", "status": "进行中"})
+            assert history.path.stat().st_size == 0
+            
+            assert len(history.series("P-1", "completion_rate", resolution="raw")) == 1
+            
+            history.flush()
+            other.flush()
+            other.compact()
+            history.compact()
+            assert len(history.series("P-1", "completion_rate", resolution="raw")) == 2
+        finally:
+            other.close()
+        
+        reloaded = MetricHistoryService(db, history.path, aggregates=history.aggregates, background=False)
+        try:
+            assert [value for _, value in reloaded.series("P-1", "completion_rate", resolution="raw")] == [100.0] * 2
+            assert len(reloaded.series("P-2", "completion_rate", resolution="raw")) == 2
+        finally:
+            reloaded.close()
+
+
 class TestRiskMonitoringService:
     """风险监控服务测试"""
     
@@ -367,6 +518,364 @@ class TestRAGSystem:
         response = test_client.post(f"/api/v1/auto-reduce/intelligent-chat/rag/index/{test_project_id}")
         assert response.status_code == 200
         assert response.json()["data"]["indexed_count"] == 10
+    
+    def test_embedding_index_reuses_unchanged_chunks(self, tmp_path):
+        """测试嵌入索引重建时只为新内容生成嵌入，并可从磁盘加载"""
+        from app.utils.embedding_index import EmbeddingIndex
+        calls = []
+        
+        def embed(texts):
+            calls.append(list(texts))
+            return [[float(len(text)), 1.0, 0.0] for text in texts]
+        
+        index = EmbeddingIndex(tmp_path / "index", "test-model", 3)
+        assert index.build(["范围管理", "进度管理", "范围管理"], embed) == {"reused": 0, "embedded": 2, "failed": 0}
+        index.save()
+        
+        reloaded = EmbeddingIndex(tmp_path / "index", "test-model", 3)
+        assert reloaded.load()
+        assert reloaded.build(["进度管理", "成本管理"], embed) == {"reused": 1, "embedded": 1, "failed": 0}
+        assert calls == [["范围管理", "进度管理"], ["成本管理"]]
+        assert reloaded.rows_for(["成本管理", "范围管理"]).tolist() == [1, -1]
+        
+        hits = EmbeddingIndex.top_k(reloaded.vectors, [4.0, 1.0, 0.0], 1)
+        assert hits[0][0] == 0 and abs(hits[0][1] - 1.0) < 1e-6
+        assert not EmbeddingIndex(tmp_path / "index", "other-model", 3).load()
+    
+    def test_vector_store_search_filters_and_tombstones(self):
+        """测试向量库的过滤检索、覆盖写入与删除后压缩"""
+        from app.utils.vector_store import VectorStore
+        store = VectorStore(3, fields=("project_id", "doc_type"), initial_capacity=2)
+        store.add_many(["a", "b", "c"], [[1, 0, 0], [0.9, 0.1, 0], [0, 1, 0]],
+                       [{"project_id": "P-1", "doc_type": "task"}, {"project_id": "P-2", "doc_type": "risk"},
+                        {"project_id": "P-1", "doc_type": "risk"}])
+        assert store.capacity == 4
+        assert [hit[0] for hit in store.search([1, 0, 0], top_k=2)] == ["a", "b"]
+        assert [hit[0] for hit in store.search([1, 0, 0], filters={"project_id": "P-1", "doc_type": ["risk"]})] == ["c"]
+        assert store.search([1, 0, 0], filters={"project_id": "P-9"}) == []
+        
+        store.add("a", [0, 0, 1], {"project_id": "P-1", "doc_type": "task"})
+        assert store.delete("b") and not store.delete("b")
+        assert {hit[0] for hit in store.search([1, 0, 0], top_k=5)} == {"a", "c"}
+        assert store.field_counts("doc_type") == {"task": 1, "risk": 1}
+        
+        store.compact()
+        assert len(store) == 2 and store.search([0, 0, 1], top_k=1)[0][0] == "a"
+    
+    @pytest.mark.parametrize("dtype", ["int8", "float16"])
+    def test_mapped_vector_store_persists_quantized_vectors(self, tmp_path, dtype):
+        """测试量化向量库重新打开后内容不变，精排得分与float32一致"""
+        import numpy as np
+        from app.utils.mapped_vector_store import MappedVectorStore
+        vectors = np.random.default_rng(0).standard_normal((50, 16)).astype(np.float32)
+        store = MappedVectorStore(tmp_path / "store", 16, fields=("project_id",), dtype=dtype, initial_capacity=8)
+        store.add_many([f"doc_{i}" for i in range(50)], vectors,
+                       [{"project_id": f"P-{i % 2}", "title": f"文档{i}"} for i in range(50)])
+        store.add("doc_1", vectors[2], {"project_id": "P-1", "title": "覆盖"})
+        store.delete("doc_3")
+        store.close()
+        
+        reopened = MappedVectorStore(tmp_path / "store", 16, fields=("project_id",), dtype="float16")
+        assert reopened.dtype == dtype and len(reopened) == 49 and "doc_3" not in reopened
+        assert reopened.get("doc_1")[1]["title"] == "覆盖"
+        query = vectors[7]
+        exact = vectors @ query / np.linalg.norm(vectors, axis=1) / np.linalg.norm(query)
+        doc_id, score, _ = reopened.search(query, top_k=1, filters={"project_id": "P-1"})[0]
+        assert doc_id == "doc_7" and abs(score - exact[7]) < 1e-5
+        
+        reopened.compact()
+        reopened.close()
+        compacted = MappedVectorStore(tmp_path / "store", 16, fields=("project_id",))
+        assert len(compacted) == 49 and compacted.search(query, top_k=1)[0][0] == "doc_7"
+        compacted.close()
+    
+    def test_ivf_index_incremental_insert_and_persistence(self, tmp_path):
+        """测试IVF索引的增量插入、压缩后重映射与持久化"""
+        import numpy as np
+        from app.utils.ann_index import IVFIndex
+        from app.utils.mapped_vector_store import MappedVectorStore
+        vectors = np.random.default_rng(1).standard_normal((300, 8)).astype(np.float32)
+        store = MappedVectorStore(tmp_path / "store", 8)
+        store.attach_index(IVFIndex(nlist=4, nprobe=4, min_train_size=100))
+        store.add_many([f"doc_{i}" for i in range(50)], vectors[:50])
+        assert not store.ann.ready
+        store.add_many([f"doc_{i}" for i in range(50, 200)], vectors[50:200])
+        assert store.ann.ready and store.ann.trained_size == 200
+        
+        store.add("new", vectors[250])
+        assert store.search(vectors[250], top_k=1)[0][0] == "new"
+        for i in range(100):
+            store.delete(f"doc_{i}")
+        store.compact()
+        assert store.search(vectors[150], top_k=1)[0][0] == "doc_150"
+        store.close()
+        
+        reopened = MappedVectorStore(tmp_path / "store", 8)
+        reopened.attach_index(IVFIndex(nlist=4, nprobe=4, min_train_size=100))
+        assert reopened.ann.trained_size == 200
+        assert reopened.search(vectors[250], top_k=1)[0][0] == "new"
+        reopened.close()
+    
+    def test_bm25_index_ranks_exact_terms(self):
+        """测试BM25按中文bigram与英文单词检索，删除后不再命中"""
+        from app.utils.bm25_index import BM25Index, reciprocal_rank_fusion
+        index = BM25Index()
+        index.add("evm", "挣值管理通过挣值和计划值衡量项目绩效")
+        index.add("wbs", "创建WBS：将项目可交付成果分解为工作包")
+        index.add("risk", "风险登记册记录已识别的风险与应对措施")
+        
+        assert [key for key, _ in index.search("挣值", top_k=3)] == ["evm"]
+        assert [key for key, _ in index.search("wbs 工作包", top_k=3)] == ["wbs"]
+        assert index.search("wbs", top_k=3, accept=lambda key: key != "wbs") == []
+        
+        index.add("wbs2", "WBS词典")
+        index.remove("wbs")
+        index.remove("risk")
+        assert len(index) == 2 and [key for key, _ in index.search("WBS", top_k=3)] == ["wbs2"]
+        
+        fused = reciprocal_rank_fusion([["a", "b"], ["b", "c"]])
+        assert [key for key, _ in fused] == ["b", "a", "c"]
+    
+    def test_search_documents_fuses_lexical_hits(self, tmp_path):
+        """测试嵌入未命中专有名词时，混合检索仍返回包含该词的文档"""
+        from app.utils.bm25_index import BM25Index
+        from app.utils.query_cache import EmbeddingCache, ResultCache
+        from app.utils.vector_store import VectorStore
+        store = VectorStore(2, fields=("project_id", "doc_type"))
+        documents = {"doc_evm": ("挣值分析", "本周CPI为0.92", [0.0, 1.0]),
+                     "doc_plan": ("进度计划", "里程碑按计划推进", [1.0, 0.0]),
+                     "doc_other": ("挣值分析", "其他项目的挣值", [0.0, 1.0])}
+        for doc_id, (title, content, vector) in documents.items():
+            project_id = "P-2" if doc_id == "doc_other" else "P-1"
+            store.add(doc_id, vector, {"title": title, "content": content, "doc_type": "report",
+                                       "project_id": project_id, "metadata": {}})
+        
+        with patch.object(rag_system, "vector_store", store), \
+                patch.object(rag_system, "document_bm25", BM25Index()), \
+                patch.object(rag_system, "_document_bm25_built", False), \
+                patch.object(rag_system, "hybrid_search", True), \
+                patch.object(rag_system, "query_embeddings", EmbeddingCache(tmp_path, "test", 2)), \
+                patch.object(rag_system, "result_cache", ResultCache(2)), \
+                patch.object(rag_system, "_request_embeddings", return_value=[[1.0, 0.0]]):
+            results = rag_system.search_documents("挣值", top_k=2, project_id="P-1")
+        
+        assert {result.doc_id for result in results} == {"doc_evm", "doc_plan"}
+        assert results[0].doc_id == "doc_evm"
+        assert abs(results[0].relevance_score) < 1e-6  # 仍报告余弦相似度
+    
+    def test_page_chunker_tracks_pages_and_sections(self, tmp_path):
+        """测试分块结果带有准确的页码与章节，相邻块重叠且不超过词元上限"""
+        import json
+        from app.utils.page_chunker import chunk_document, count_tokens
+        sentence = "项目团队应定期审查风险登记册并更新应对措施。"
+        content_list = [
+            {"type": "text", "text": "2.1 干系人绩效域", "text_level": 1, "page_idx": 7},
+            {"type": "text", "text": sentence * 10, "page_idx": 7},
+            {"type": "text", "text": sentence * 10, "page_idx": 8},
+            {"type": "table", "table_caption": ["表2-1"], "table_body": "<table><tr><td>WBS</td></tr></table>",
+             "page_idx": 8},
+            {"type": "text", "text": "2.2 团队绩效域", "text_level": 1, "page_idx": 9},
+            {"type": "text", "text": "共享责任", "page_idx": 9},
+        ]
+        with open(tmp_path / "doc_content_list.json", "w", encoding="utf-8") as f:
+            json.dump(content_list, f, ensure_ascii=False)
+        
+        chunks = chunk_document(tmp_path, target_tokens=150, max_tokens=200, overlap_tokens=30)
+        assert [(chunk.section, chunk.page_number, chunk.end_page) for chunk in chunks] == [
+            ("2.1 干系人绩效域", 8, 8), ("2.1 干系人绩效域", 8, 9), ("2.1 干系人绩效域", 9, 9),
+            ("2.1 干系人绩效域", 9, 9), ("2.2 团队绩效域", 10, 10)]
+        assert all(count_tokens(chunk.content) <= 200 for chunk in chunks)
+        # 相邻文本块重叠，新章节不带上一章节的内容
+        assert chunks[1].content.startswith(chunks[0].content.split("\n")[-1])
+        assert chunks[3].content.endswith("表2-1\nWBS") and chunks[4].content == "# 2.2 团队绩效域\n共享责任"
+    
+    def test_knowledge_base_skips_unchanged_corpora(self, tmp_path):
+        """测试多语料导入按源文件哈希跳过未变化的语料，只为新文本块生成嵌入"""
+        import json
+        from app.utils.corpus_pipeline import KnowledgeBase
+        root = tmp_path / "corpora"
+        sources = {}
+        for number, (title, text) in enumerate([("A.pdf", "挣值分析"), ("B.docx", "敏捷迭代")]):
+            corpus_dir = root / f"{number}- {title}-0000000{number}-0000-0000-0000-000000000000"
+            corpus_dir.mkdir(parents=True)
+            sources[title] = corpus_dir / "x_content_list.json"
+            with open(sources[title], "w", encoding="utf-8") as f:
+                json.dump([{"type": "text", "text": text, "page_idx": 0}], f, ensure_ascii=False)
+        calls = []
+        
+        def embed(texts):
+            calls.append(list(texts))
+            return [[1.0, float(len(text))] for text in texts]
+        
+        kb = KnowledgeBase(tmp_path / "index", "test-model", 2)
+        stats = kb.ingest(root, embed, workers=1)
+        assert (stats["parsed"], stats["skipped"], stats["embedded"]) == (2, 0, 2)
+        assert [shard.corpus.name for shard in kb.shards] == ["A", "B"]
+        
+        with open(sources["B.docx"], "w", encoding="utf-8") as f:
+            json.dump([{"type": "text", "text": "敏捷迭代与看板", "page_idx": 2}], f, ensure_ascii=False)
+        reopened = KnowledgeBase(tmp_path / "index", "test-model", 2)
+        stats = reopened.ingest(root, embed, workers=1)
+        assert (stats["parsed"], stats["skipped"], stats["reused"], stats["embedded"]) == (1, 1, 1, 1)
+        assert calls[-1] == ["敏捷迭代与看板"] and reopened.shards[1].chunks[0].page_number == 3
+    
+    def test_pmbok_search_serves_bm25_until_index_built(self, tmp_path):
+        """测试嵌入索引未就绪时PMBOK检索只用BM25、不在请求中构建索引，后台构建完成后使用向量检索"""
+        import json
+        from app.utils.corpus_pipeline import KnowledgeBase
+        from app.utils.query_cache import EmbeddingCache, ResultCache
+        corpus_dir = tmp_path / "corpora" / "1- PMBOK.pdf-00000001-0000-0000-0000-000000000000"
+        corpus_dir.mkdir(parents=True)
+        with open(corpus_dir / "x_content_list.json", "w", encoding="utf-8") as f:
+            json.dump([{"type": "text", "text": "挣值分析", "text_level": 1, "page_idx": 0},
+                       {"type": "text", "text": "挣值管理衡量进度与成本绩效。", "page_idx": 0},
+                       {"type": "text", "text": "风险登记册", "text_level": 1, "page_idx": 1},
+                       {"type": "text", "text": "记录已识别的风险及应对措施。", "page_idx": 1}], f, ensure_ascii=False)
+        
+        with patch.object(rag_system, "knowledge_base", KnowledgeBase(tmp_path / "index", "test", 2)), \
+                patch.object(rag_system, "embedding_dim", 2), \
+                patch.object(rag_system, "pmbok_documents", []), \
+                patch.object(rag_system, "pmbok_bm25", rag_system.pmbok_bm25), \
+                patch.object(rag_system, "_pmbok_positions", rag_system._pmbok_positions), \
+                patch.object(rag_system, "_pmbok_matrix", rag_system._pmbok_matrix), \
+                patch.object(rag_system, "query_embeddings", EmbeddingCache(tmp_path / "queries", "test", 2)), \
+                patch.object(rag_system, "result_cache", ResultCache(2)), \
+                patch.object(rag_system, "_embed_texts",
+                             side_effect=lambda texts: [[1.0, 0.0] if "挣值" in text else [0.0, 1.0] for text in texts]), \
+                patch.object(rag_system, "_request_embeddings", return_value=[[0.0, 1.0]]) as request:
+            with patch.object(rag_system, "start_pmbok_index_build") as start:
+                assert rag_system.load_pmbok_documents(str(tmp_path / "corpora"))
+            start.assert_called_once()
+            
+            results = rag_system.search_pmbok_knowledge("挣值", top_k=1)
+            assert results[0]["section"] == "挣值分析" and results[0]["similarity"] == 0.0
+            assert request.call_count == 0 and len(rag_system._pmbok_positions) == 0
+            
+            rag_system.start_pmbok_index_build(str(tmp_path / "corpora")).join()
+            assert len(rag_system._pmbok_positions) == 2
+            results = rag_system.search_pmbok_knowledge("应对措施", top_k=1)
+            assert results[0]["section"] == "风险登记册" and results[0]["similarity"] > 0.99
+    
+    def test_embedding_client_batches_dedupes_and_isolates_failures(self):
+        """测试嵌入客户端按批并发、去重、限速，失败只影响出错的文本"""
+        import threading
+        import time
+        from app.utils.embedding_client import EmbeddingClient, EmbeddingRequestError
+        lock = threading.Lock()
+        batches, in_flight, peak, throttled = [], [0], [0], set()
+        
+        def request_batch(texts):
+            with lock:
+                batches.append(list(texts))
+                in_flight[0] += 1
+                peak[0] = max(peak[0], in_flight[0])
+            try:
+                time.sleep(0.01)
+                if "坏" in texts:
+                    raise EmbeddingRequestError("输入有误", 400)
+                if "限流" in texts and "限流" not in throttled:
+                    throttled.add("限流")
+                    raise EmbeddingRequestError("Throttling", 429)
+                return [[float(len(text)), 1.0] for text in texts]
+            finally:
+                with lock:
+                    in_flight[0] -= 1
+        
+        client = EmbeddingClient(request_batch, batch_size=4, max_concurrency=2, requests_per_second=200,
+                                 base_delay=0.01)
+        texts = [f"文本{i}" for i in range(10)] + ["坏", "限流", "文本0"]
+        embeddings = client.embed_sync(texts)
+        
+        assert embeddings[10] is None
+        assert all(embedding is not None for i, embedding in enumerate(embeddings) if i != 10)
+        assert embeddings[12] == embeddings[0]
+        assert sum(batch.count("文本0") for batch in batches) == 1  # 重复文本只请求一次
+        assert max(len(batch) for batch in batches) <= 4 and peak[0] <= 2
+        
+        # 令牌桶：每秒20个请求、无突发时，5个单文本批次至少需要约0.2秒
+        limited = EmbeddingClient(request_batch, batch_size=1, requests_per_second=20, burst=1)
+        start = time.monotonic()
+        limited.embed_sync(["甲", "乙", "丙", "丁", "戊"])
+        assert time.monotonic() - start >= 0.15
+    
+    def test_query_embedding_cache_persists_and_evicts(self, tmp_path):
+        """测试查询嵌入缓存按规范化查询命中、重启后保留、超出容量时淘汰最久未用的查询"""
+        from app.utils.query_cache import EmbeddingCache, normalize_query
+        assert normalize_query("  什么是 WBS？ ") == normalize_query("什么是 wbs?") == "什么是 wbs"
+        
+        cache = EmbeddingCache(tmp_path, "text-embedding-v4", 2, capacity=2)
+        cache.put("什么是WBS？", [1.0, 0.0])
+        cache.put("挣值", [0.0, 1.0])
+        assert cache.get("什么是wbs") is not None  # 命中后成为最近使用
+        cache.put("关键路径", [0.6, 0.8])
+        assert cache.get("挣值") is None
+        cache.close()
+        
+        reopened = EmbeddingCache(tmp_path, "text-embedding-v4", 2, capacity=2)
+        assert len(reopened) == 2
+        assert reopened.get("关键路径").tolist() == pytest.approx([0.6, 0.8])
+        reopened.close()
+        # 写入中断的末尾记录被忽略
+        with open(tmp_path / "entries.bin", "ab") as f:
+            f.write(b"\x10\x00abc")
+        assert len(EmbeddingCache(tmp_path, "text-embedding-v4", 2, capacity=2)) == 2
+        # 嵌入模型变化时丢弃旧缓存
+        assert len(EmbeddingCache(tmp_path, "other-model", 2)) == 0
+    
+    def test_query_embedding_cache_shared_by_workers(self, tmp_path):
+        """测试多个进程共用缓存目录时，重写日志不会丢失其他进程追加的记录"""
+        from app.utils.query_cache import EmbeddingCache
+        first = EmbeddingCache(tmp_path, "text-embedding-v4", 2, capacity=8)
+        second = EmbeddingCache(tmp_path, "text-embedding-v4", 2, capacity=8)
+        second.put("挣值", [0.0, 1.0])
+        for i in range(3):
+            first.put(f"查询{i}", [1.0, float(i)])
+        first.close()  # 重写日志
+        second.put("关键路径", [0.6, 0.8])  # 追加到重写后的日志文件
+        
+        reopened = EmbeddingCache(tmp_path, "text-embedding-v4", 2, capacity=8)
+        assert len(reopened) == 5
+        assert reopened.get("挣值") is not None and reopened.get("关键路径") is not None
+    
+    def test_search_results_cached_until_index_changes(self, tmp_path):
+        """测试重复查询不再请求嵌入服务，向量库变化后结果缓存失效"""
+        from app.utils.bm25_index import BM25Index
+        from app.utils.query_cache import EmbeddingCache, ResultCache
+        from app.utils.vector_store import VectorStore
+        store = VectorStore(2, fields=("project_id", "doc_type"))
+        payload = {"content": "内容", "doc_type": "report", "project_id": "P-1", "metadata": {}}
+        store.add("doc_a", [1.0, 0.0], dict(payload, title="甲"))
+        store.add("doc_b", [0.0, 1.0], dict(payload, title="乙"))
+        
+        with patch.object(rag_system, "vector_store", store), \
+                patch.object(rag_system, "hybrid_search", False), \
+                patch.object(rag_system, "query_embeddings", EmbeddingCache(tmp_path, "test", 2)), \
+                patch.object(rag_system, "result_cache", ResultCache(2)), \
+                patch.object(rag_system, "_request_embeddings", return_value=[[0.9, 0.1]]) as request:
+            first = rag_system.search_documents("进度风险", top_k=1)
+            first[0].title = "被调用方修改"
+            second = rag_system.search_documents("进度风险？", top_k=1)
+            assert request.call_count == 1
+            assert rag_system.result_cache.hits == 1 and second[0].title == "甲"
+            
+            store.add("doc_c", [1.0, 0.05], dict(payload, title="丙"))
+            third = rag_system.search_documents("进度风险", top_k=1)
+            assert request.call_count == 1 and rag_system.result_cache.hits == 1
+            assert third[0].doc_id == "doc_c"
+            
+            # 混合检索时BM25一路依赖查询原文，嵌入同桶的不同查询不共用结果
+            with patch.object(rag_system, "hybrid_search", True), \
+                    patch.object(rag_system, "document_bm25", BM25Index()), \
+                    patch.object(rag_system, "_document_bm25_built", False), \
+                    patch.object(rag_system.result_cache, "bucket", return_value=b"same"):
+                assert rag_system.search_documents("进度风险", top_k=1)[0].doc_id == "doc_c"
+                assert rag_system.search_documents("乙", top_k=1)[0].doc_id == "doc_b"
+            assert rag_system.result_cache.hits == 1
+            
+            # 嵌入服务不可用时降级向量不进入缓存
+            request.side_effect = RuntimeError("network")
+            rag_system.search_documents("里程碑", top_k=1)
+            assert rag_system.query_embeddings.get("里程碑") is None
 
 
 class TestAIAnalysisService: